@@ -0,0 +1,122 @@
+"""
+Chat throughput of the AI service against a stub Gemini endpoint.
+
+A local server stands in for the Gemini API and answers every
+generateContent call after ``--latency`` seconds, so the numbers measure how
+many chats the service overlaps rather than model speed. ``--blocking`` also
+runs the previous synchronous client call for comparison.
+
+Usage (from the ai directory):
+    python benchmarks/chat_concurrency_benchmark.py --latency 0.2 --chats 64
+"""
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import uvicorn
+from fastapi import FastAPI
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def build_stub_gemini(latency: float) -> FastAPI:
+    stub = FastAPI()
+
+    @stub.post("/{path:path}")
+    async def generate_content(path: str):
+        await asyncio.sleep(latency)
+        return {"candidates": [{"content": {"role": "model", "parts": [{"text": "ok"}]}}]}
+
+    return stub
+
+
+def start_stub_gemini(latency: float) -> str:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(build_stub_gemini(latency), port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+async def run_level(chat: Callable, concurrency: int, chats: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    remaining = iter(range(chats))
+
+    async def worker():
+        for i in remaining:
+            start = time.perf_counter()
+            result = await chat(f"Show me bamboo toothbrushes ({i})")
+            if "error" in result:
+                raise RuntimeError(result["error"])
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "chats_per_s": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies),
+        "max_ms": max(latencies),
+    }
+
+
+async def main_async(args) -> None:
+    import main as ai
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    async def async_chat(message: str):
+        return await ai.generate_ai_response(message, session_id="benchmark")
+
+    async def blocking_chat(message: str):
+        # The call the chat loop made before it moved to client.aio
+        response = ai.get_gemini_client().models.generate_content(
+            model=ai.AI_MODEL,
+            contents=[ai.types.Content(role="user", parts=[ai.types.Part.from_text(text=message)])],
+            config=ai.GENERATE_CONTENT_CONFIG,
+        )
+        return {"response": response.text}
+
+    modes = {"async": async_chat}
+    if args.blocking:
+        modes["blocking"] = blocking_chat
+
+    print(f"\nChat throughput, {args.latency * 1000:.0f} ms stub model latency, {args.chats} chats per level")
+    print(f"{'mode':<10}{'concurrency':>12}{'chats/s':>12}{'p50 ms':>12}{'max ms':>12}")
+    for name, chat in modes.items():
+        await chat("warm up")
+        for concurrency in args.concurrency:
+            stats = await run_level(chat, concurrency, args.chats)
+            print(
+                f"{name:<10}{concurrency:>12}{stats['chats_per_s']:>12.1f}"
+                f"{stats['p50_ms']:>12.1f}{stats['max_ms']:>12.1f}"
+            )
+    await ai.close_gemini_client()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.2, help="stub model latency in seconds")
+    parser.add_argument("--chats", type=int, default=64, help="chats per concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--blocking", action="store_true", help="also run the synchronous client call")
+    args = parser.parse_args()
+
+    os.environ["GEMINI_BASE_URL"] = start_stub_gemini(args.latency)
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -6,12 +6,15 @@ import os
 import json
 import httpx
 import asyncio
-from typing import Dict, Any, Optional, List
+import uuid
+from typing import Dict, Any, Optional, List, AsyncIterator, Tuple
 from google import genai
 from google.genai import types
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager, aclosing
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from vendor_concierge import vendor_concierge
 
@@ -20,6 +23,15 @@ load_dotenv()
 # Configuration
 BACKEND_BASE_URL = "http://localhost:8000"
 AI_SERVICE_PORT = 8002
+AI_MODEL = os.environ.get("AI_MODEL", "gemini-2.0-flash-exp")
+# Seconds one model call may take before the chat fails with 504
+REQUEST_TIMEOUT = float(os.environ.get("REQUEST_TIMEOUT", "30"))
+# Seconds all tool calls of one model turn may take together
+TOOL_TURN_TIMEOUT = float(os.environ.get("TOOL_TURN_TIMEOUT", "20"))
+# Seconds a started state-changing call may run, even past the turn deadline, before it is abandoned
+TOOL_WRITE_TIMEOUT = float(os.environ.get("TOOL_WRITE_TIMEOUT", "30"))
+# Optional Gemini endpoint override, e.g. a local stub server for benchmarks
+GEMINI_BASE_URL = os.environ.get("GEMINI_BASE_URL")
 
 # In-memory conversation storage (in production, use Redis or database)
 conversation_history = {}
@@ -36,26 +48,102 @@ class ChatResponse(BaseModel):
     function_calls: Optional[List[Dict[str, Any]]] = None
     session_id: Optional[str] = None
 
-# HTTP Client for backend API calls
+# Shared Gemini client; its async HTTP connection pool is reused by every chat
+_gemini_client: Optional[genai.Client] = None
+
+def get_gemini_client() -> genai.Client:
+    """Create the process-wide Gemini client on first use"""
+    global _gemini_client
+    if _gemini_client is None:
+        api_key = os.environ.get("GEMINI_API_KEY")
+        if not api_key:
+            raise HTTPException(status_code=500, detail="GEMINI_API_KEY not configured")
+        http_options = types.HttpOptions(base_url=GEMINI_BASE_URL) if GEMINI_BASE_URL else None
+        _gemini_client = genai.Client(api_key=api_key, http_options=http_options)
+    return _gemini_client
+
+async def close_gemini_client():
+    global _gemini_client
+    if _gemini_client is not None:
+        await _gemini_client.aio.aclose()
+        _gemini_client = None
+
+async def run_until_disconnected(http_request: Request, coro, poll_interval: float = 0.5):
+    """Await ``coro``, cancelling it (and any model call in flight) if the client goes away first"""
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                task.cancel()
+                raise HTTPException(status_code=499, detail="Client closed request")
+    finally:
+        if not task.done():
+            task.cancel()
+
+async def stream_until_disconnected(http_request: Request, events: AsyncIterator, poll_interval: float = 0.5):
+    """Relay ``events`` until the client goes away, then close the stream (and any model call in flight)"""
+    try:
+        while True:
+            step = asyncio.ensure_future(anext(events))
+            try:
+                while True:
+                    done, _ = await asyncio.wait({step}, timeout=poll_interval)
+                    if done:
+                        break
+                    if await http_request.is_disconnected():
+                        return
+            finally:
+                if not step.done():
+                    step.cancel()
+                    await asyncio.wait({step})
+            try:
+                event = step.result()
+            except StopAsyncIteration:
+                return
+            yield event
+    finally:
+        await events.aclose()
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+# HTTP Client for backend API calls; one keep-alive pool shared by every tool call
+_backend_client: Optional[httpx.AsyncClient] = None
+
+def get_backend_client() -> httpx.AsyncClient:
+    """Create the process-wide backend client on first use (the app opens it at startup)"""
+    global _backend_client
+    if _backend_client is None or _backend_client.is_closed:
+        _backend_client = httpx.AsyncClient(base_url=BACKEND_BASE_URL)
+    return _backend_client
+
+async def close_backend_client():
+    global _backend_client
+    if _backend_client is not None:
+        await _backend_client.aclose()
+        _backend_client = None
+
 async def make_api_call(endpoint: str, method: str = "GET", data: Optional[Dict] = None, headers: Optional[Dict] = None) -> Dict[str, Any]:
     """Make HTTP requests to the backend API"""
-    async with httpx.AsyncClient() as client:
-        url = f"{BACKEND_BASE_URL}{endpoint}"
+    client = get_backend_client()
+    
+    try:
+        if method == "GET":
+            response = await client.get(endpoint, headers=headers, params=data)
+        elif method == "POST":
+            response = await client.post(endpoint, headers=headers, json=data)
+        elif method == "PUT":
+            response = await client.put(endpoint, headers=headers, json=data)
+        elif method == "DELETE":
+            response = await client.delete(endpoint, headers=headers)
         
-        try:
-            if method == "GET":
-                response = await client.get(url, headers=headers, params=data)
-            elif method == "POST":
-                response = await client.post(url, headers=headers, json=data)
-            elif method == "PUT":
-                response = await client.put(url, headers=headers, json=data)
-            elif method == "DELETE":
-                response = await client.delete(url, headers=headers)
-            
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPError as e:
-            return {"error": f"API call failed: {str(e)}"}
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPError as e:
+        return {"error": f"API call failed: {str(e)}"}
 
 # Function implementations that call real backend APIs
 async def getProducts(query: Optional[str] = None, category: Optional[str] = None, 
@@ -762,10 +850,21 @@ Be welcoming and informative, helping them understand why AveoEarth is the right
     if len(conversation_history[session_id]) > max_history:
         conversation_history[session_id] = conversation_history[session_id][-max_history:]
 
+# Tools that only read; repeating one with the same arguments in a turn returns the same answer
+READ_ONLY_FUNCTIONS = {
+    "getProducts", "viewRecentOrders", "trackOrder", "viewCart", "getRecommendations", "getUserProfile",
+    "getCategories", "getBrands", "getWishlist", "getSupport",
+    "getVendorAnalytics", "getVendorPerformance", "getVendorRecommendations", "getVendorDailyInsights",
+    "getVendorProducts", "getVendorOrders", "getVendorInventory", "getVendorSustainability",
+    "getVendorBundleRecommendations", "getVendorPersonalizedInsights",
+    "getFAQ", "getHelpTopics", "searchHelp",
+}
+
 async def execute_function_call(function_call, user_token: Optional[str] = None) -> Dict[str, Any]:
     """Execute a function call from the AI model"""
     function_name = function_call.name
-    function_args = function_call.args
+    # Copied so the user token never ends up in the function call echoed back to the model
+    function_args = dict(function_call.args or {})
     
     if function_name not in FUNCTION_MAP:
         return {"error": f"Unknown function: {function_name}"}
@@ -781,365 +880,455 @@ async def execute_function_call(function_call, user_token: Optional[str] = None)
     except Exception as e:
         return {"error": f"Error executing {function_name}: {str(e)}"}
 
-async def generate_ai_response(user_input: str, user_token: Optional[str] = None, 
-                              session_id: Optional[str] = None, user_type: Optional[str] = None, max_iterations: int = 5) -> Dict[str, Any]:
-    """Generate AI response with function calling capability and conversation context"""
-    api_key = os.environ.get("GEMINI_API_KEY")
-    
-    if not api_key:
-        raise HTTPException(status_code=500, detail="GEMINI_API_KEY not configured")
-    
-    client = genai.Client(api_key=api_key)
-    model = "gemini-2.0-flash-exp"
-    
-    # Generate session ID if not provided
-    if not session_id:
-        import uuid
-        session_id = str(uuid.uuid4())
+async def execute_function_calls(function_calls: List, user_token: Optional[str] = None,
+                                 timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Execute every function call of one model turn; results are in call order.
+
+    Calls that change state are barriers: each runs alone, in the order the
+    model made it, after everything before it has finished, so a read the
+    model made after a write sees that write. Between two writes the
+    read-only calls run concurrently, and identical ones (same name and
+    arguments) run once.
+
+    The turn deadline (``timeout``, TOOL_TURN_TIMEOUT) cancels reads and
+    stops later calls from starting, but never interrupts a write: the
+    backend may already have committed it, and a model told it failed would
+    retry it. A started write gets TOOL_WRITE_TIMEOUT; if it is abandoned
+    after that, the model is told the outcome is unknown and not to retry.
+    """
+    timeout = TOOL_TURN_TIMEOUT if timeout is None else timeout
+    results: List[Optional[Dict[str, Any]]] = [None] * len(function_calls)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
     
-    # Get conversation context
-    context_messages = get_conversation_context(session_id)
+    async def run_reads(indexes: List[int]):
+        reads: Dict[str, asyncio.Task] = {}
+        keys = []
+        for i in indexes:
+            function_call = function_calls[i]
+            key = json.dumps([function_call.name, function_call.args or {}], sort_keys=True, default=str)
+            if key not in reads:
+                reads[key] = asyncio.ensure_future(execute_function_call(function_call, user_token))
+            keys.append(key)
+        try:
+            await asyncio.wait(reads.values(), timeout=max(deadline - loop.time(), 0))
+        finally:
+            pending = [task for task in reads.values() if not task.done()]
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.wait(pending)
+            # Reads that finished before the deadline still report their result
+            for i, key in zip(indexes, keys):
+                task = reads[key]
+                if task.done() and not task.cancelled():
+                    results[i] = task.result()
     
-    # Create system instruction based on user type
-    system_instruction = get_system_instruction(user_type, user_token)
+    async def run_write(function_call) -> Dict[str, Any]:
+        task = asyncio.ensure_future(execute_function_call(function_call, user_token))
+        done, _ = await asyncio.wait({task}, timeout=TOOL_WRITE_TIMEOUT)
+        if done:
+            return task.result()
+        task.cancel()
+        await asyncio.wait({task})
+        return {"error": (
+            f"{function_call.name} outcome unknown: no reply within {TOOL_WRITE_TIMEOUT:g}s and it may "
+            f"have been applied. Do not retry it; check its current state first"
+        )}
     
-    # Initialize conversation with system instruction, context, and new user input
-    contents = [system_instruction] + context_messages.copy()
-    contents.append(
-        types.Content(
-            role="user",
-            parts=[types.Part.from_text(text=user_input)],
-        )
-    )
+    reads: List[int] = []
+    for i, function_call in enumerate(function_calls):
+        if function_call.name in READ_ONLY_FUNCTIONS:
+            reads.append(i)
+            continue
+        if reads:
+            await run_reads(reads)
+            reads = []
+        if loop.time() >= deadline:
+            break
+        results[i] = await run_write(function_call)
+    else:
+        if reads and loop.time() < deadline:
+            await run_reads(reads)
     
-    tools = [
-        types.Tool(
-            function_declarations=[
-                types.FunctionDeclaration(
-                    name="getProducts",
-                    description="Fetches a list of products based on search query, category, or filters. Use this for product search, browsing, and discovery.",
-                    parameters=genai.types.Schema(
-                        type=genai.types.Type.OBJECT,
-                        properties={
-                            "query": genai.types.Schema(type=genai.types.Type.STRING, description="Search query for products"),
-                            "category": genai.types.Schema(type=genai.types.Type.STRING, description="Category ID or name to filter by"),
-                            "priceRange": genai.types.Schema(type=genai.types.Type.STRING, description="Price range in format 'min-max' e.g. '10-50'"),
-                            "sortBy": genai.types.Schema(
-                                type=genai.types.Type.STRING,
-                                enum=["price_low_high", "price_high_low", "newest", "popularity"],
-                                description="How to sort the results"
-                            ),
-                            "limit": genai.types.Schema(type=genai.types.Type.INTEGER, description="Number of products to return (default: 20)")
-                        },
-                    ),
+    return [
+        result if result is not None
+        else {"error": f"{function_call.name} did not finish within {timeout:g}s"}
+        if function_call.name in READ_ONLY_FUNCTIONS
+        else {"error": f"{function_call.name} was not run: the turn's {timeout:g}s limit was reached first"}
+        for function_call, result in zip(function_calls, results)
+    ]
+
+# Tool declarations are static, so they are built once rather than per chat
+TOOLS = [
+    types.Tool(
+        function_declarations=[
+            types.FunctionDeclaration(
+                name="getProducts",
+                description="Fetches a list of products based on search query, category, or filters. Use this for product search, browsing, and discovery.",
+                parameters=genai.types.Schema(
+                    type=genai.types.Type.OBJECT,
+                    properties={
+                        "query": genai.types.Schema(type=genai.types.Type.STRING, description="Search query for products"),
+                        "category": genai.types.Schema(type=genai.types.Type.STRING, description="Category ID or name to filter by"),
+                        "priceRange": genai.types.Schema(type=genai.types.Type.STRING, description="Price range in format 'min-max' e.g. '10-50'"),
+                        "sortBy": genai.types.Schema(
+                            type=genai.types.Type.STRING,
+                            enum=["price_low_high", "price_high_low", "newest", "popularity"],
+                            description="How to sort the results"
+                        ),
+                        "limit": genai.types.Schema(type=genai.types.Type.INTEGER, description="Number of products to return (default: 20)")
+                    },
                 ),
-                types.FunctionDeclaration(
-                    name="viewRecentOrders",
-                    description="Retrieves details of the user's recent orders. Requires authentication.",
-                    parameters=genai.types.Schema(
-                        type=genai.types.Type.OBJECT,
-                        properties={
-                            "limit": genai.types.Schema(type=genai.types.Type.INTEGER, description="Number of orders to return"),
-                        },
-                    ),
+            ),
+            types.FunctionDeclaration(
+                name="viewRecentOrders",
+                description="Retrieves details of the user's recent orders. Requires authentication.",
+                parameters=genai.types.Schema(
+                    type=genai.types.Type.OBJECT,
+                    properties={
+                        "limit": genai.types.Schema(type=genai.types.Type.INTEGER, description="Number of orders to return"),
+                    },
                 ),
-                types.FunctionDeclaration(
-                    name="trackOrder",
-                    description="Tracks the current status of a specific order. Requires authentication.",
-                    parameters=genai.types.Schema(
-                        type=genai.types.Type.OBJECT,
-                        properties={
-                            "orderId": genai.types.Schema(type=genai.types.Type.STRING, description="The order ID to track"),
-                        },
-                        required=["orderId"]
-                    ),
+            ),
+            types.FunctionDeclaration(
+                name="trackOrder",
+                description="Tracks the current status of a specific order. Requires authentication.",
+                parameters=genai.types.Schema(
+                    type=genai.types.Type.OBJECT,
+                    properties={
+                        "orderId": genai.types.Schema(type=genai.types.Type.STRING, description="The order ID to track"),
+                    },
+                    required=["orderId"]
                 ),
-                types.FunctionDeclaration(
-                    name="addToCart",
-                    description="Adds a product to the user's shopping cart. Requires authentication.",
-                    parameters=genai.types.Schema(
-                        type=genai.types.Type.OBJECT,
-                        properties={
-                            "productId": genai.types.Schema(type=genai.types.Type.STRING, description="The product ID to add"),
-                            "quantity": genai.types.Schema(type=genai.types.Type.INTEGER, description="Quantity to add (default: 1)"),
-                            "variantId": genai.types.Schema(type=genai.types.Type.STRING, description="Product variant ID if applicable"),
-                        },
-                        required=["productId"]
-                    ),
+            ),
+            types.FunctionDeclaration(
+                name="addToCart",
+                description="Adds a product to the user's shopping cart. Requires authentication.",
+                parameters=genai.types.Schema(
+                    type=genai.types.Type.OBJECT,
+                    properties={
+                        "productId": genai.types.Schema(type=genai.types.Type.STRING, description="The product ID to add"),
+                        "quantity": genai.types.Schema(type=genai.types.Type.INTEGER, description="Quantity to add (default: 1)"),
+                        "variantId": genai.types.Schema(type=genai.types.Type.STRING, description="Product variant ID if applicable"),
+                    },
+                    required=["productId"]
                 ),
-                types.FunctionDeclaration(
-                    name="viewCart",
-                    description="Retrieves the current items in the user's shopping cart. Requires authentication.",
-                    parameters=genai.types.Schema(
-                        type=genai.types.Type.OBJECT,
-                        properties={},
-                    ),
+            ),
+            types.FunctionDeclaration(
+                name="viewCart",
+                description="Retrieves the current items in the user's shopping cart. Requires authentication.",
+                parameters=genai.types.Schema(
+                    type=genai.types.Type.OBJECT,
+                    properties={},
                 ),
-                types.FunctionDeclaration(
-                    name="updateCartItem",
-                    description="Updates the quantity of an item in the cart. Requires authentication.",
-                    parameters=genai.types.Schema(
-                        type=genai.types.Type.OBJECT,
-                        properties={
-                            "cartItemId": genai.types.Schema(type=genai.types.Type.STRING, description="The cart item ID to update"),
-                            "quantity": genai.types.Schema(type=genai.types.Type.INTEGER, description="New quantity"),
-                        },
-                        required=["cartItemId", "quantity"]
-                    ),
+            ),
+            types.FunctionDeclaration(
+                name="updateCartItem",
+                description="Updates the quantity of an item in the cart. Requires authentication.",
+                parameters=genai.types.Schema(
+                    type=genai.types.Type.OBJECT,
+                    properties={
+                        "cartItemId": genai.types.Schema(type=genai.types.Type.STRING, description="The cart item ID to update"),
+                        "quantity": genai.types.Schema(type=genai.types.Type.INTEGER, description="New quantity"),
+                    },
+                    required=["cartItemId", "quantity"]
                 ),
-                types.FunctionDeclaration(
-                    name="removeFromCart",
-                    description="Removes an item from the shopping cart. Requires authentication.",
-                    parameters=genai.types.Schema(
-                        type=genai.types.Type.OBJECT,
-                        properties={
-                            "cartItemId": genai.types.Schema(type=genai.types.Type.STRING, description="The cart item ID to remove"),
-                        },
-                        required=["cartItemId"]
-                    ),
+            ),
+            types.FunctionDeclaration(
+                name="removeFromCart",
+                description="Removes an item from the shopping cart. Requires authentication.",
+                parameters=genai.types.Schema(
+                    type=genai.types.Type.OBJECT,
+                    properties={
+                        "cartItemId": genai.types.Schema(type=genai.types.Type.STRING, description="The cart item ID to remove"),
+                    },
+                    required=["cartItemId"]
                 ),
-                types.FunctionDeclaration(
-                    name="checkout",
-                    description="Initiates the checkout process for items in the cart. Requires authentication.",
-                    parameters=genai.types.Schema(
-                        type=genai.types.Type.OBJECT,
-                        properties={
-                            "paymentMethod": genai.types.Schema(type=genai.types.Type.STRING, description="Payment method to use"),
-                            "billingAddressId": genai.types.Schema(type=genai.types.Type.STRING, description="Billing address ID"),
-                            "shippingAddressId": genai.types.Schema(type=genai.types.Type.STRING, description="Shipping address ID"),
-                            "customerNotes": genai.types.Schema(type=genai.types.Type.STRING, description="Optional customer notes"),
-                        },
-                        required=["paymentMethod", "billingAddressId", "shippingAddressId"]
-                    ),
+            ),
+            types.FunctionDeclaration(
+                name="checkout",
+                description="Initiates the checkout process for items in the cart. Requires authentication.",
+                parameters=genai.types.Schema(
+                    type=genai.types.Type.OBJECT,
+                    properties={
+                        "paymentMethod": genai.types.Schema(type=genai.types.Type.STRING, description="Payment method to use"),
+                        "billingAddressId": genai.types.Schema(type=genai.types.Type.STRING, description="Billing address ID"),
+                        "shippingAddressId": genai.types.Schema(type=genai.types.Type.STRING, description="Shipping address ID"),
+                        "customerNotes": genai.types.Schema(type=genai.types.Type.STRING, description="Optional customer notes"),
+                    },
+                    required=["paymentMethod", "billingAddressId", "shippingAddressId"]
                 ),
-                types.FunctionDeclaration(
-                    name="getRecommendations",
-                    description="Suggests products based on browsing history, preferences, or trending items.",
-                    parameters=genai.types.Schema(
-                        type=genai.types.Type.OBJECT,
-                        properties={
-                            "basedOn": genai.types.Schema(
-                                type=genai.types.Type.STRING,
-                                enum=["browsing_history", "recent_orders", "trending", "new_arrivals", "best_sellers"],
-                                description="What to base recommendations on"
-                            ),
-                            "limit": genai.types.Schema(type=genai.types.Type.INTEGER, description="Number of recommendations"),
-                        },
-                    ),
+            ),
+            types.FunctionDeclaration(
+                name="getRecommendations",
+                description="Suggests products based on browsing history, preferences, or trending items.",
+                parameters=genai.types.Schema(
+                    type=genai.types.Type.OBJECT,
+                    properties={
+                        "basedOn": genai.types.Schema(
+                            type=genai.types.Type.STRING,
+                            enum=["browsing_history", "recent_orders", "trending", "new_arrivals", "best_sellers"],
+                            description="What to base recommendations on"
+                        ),
+                        "limit": genai.types.Schema(type=genai.types.Type.INTEGER, description="Number of recommendations"),
+                    },
                 ),
-                types.FunctionDeclaration(
-                    name="getUserProfile",
-                    description="Retrieves user's profile information. Requires authentication.",
-                    parameters=genai.types.Schema(
-                        type=genai.types.Type.OBJECT,
-                        properties={},
-                    ),
+            ),
+            types.FunctionDeclaration(
+                name="getUserProfile",
+                description="Retrieves user's profile information. Requires authentication.",
+                parameters=genai.types.Schema(
+                    type=genai.types.Type.OBJECT,
+                    properties={},
                 ),
-                types.FunctionDeclaration(
-                    name="updateUserProfile",
-                    description="Updates the user's profile details. Requires authentication.",
-                    parameters=genai.types.Schema(
-                        type=genai.types.Type.OBJECT,
-                        properties={
-                            "name": genai.types.Schema(type=genai.types.Type.STRING, description="User's name"),
-                            "email": genai.types.Schema(type=genai.types.Type.STRING, description="User's email"),
-                            "phone": genai.types.Schema(type=genai.types.Type.STRING, description="User's phone number"),
-                            "bio": genai.types.Schema(type=genai.types.Type.STRING, description="User's bio/description"),
-                        },
-                    ),
+            ),
+            types.FunctionDeclaration(
+                name="updateUserProfile",
+                description="Updates the user's profile details. Requires authentication.",
+                parameters=genai.types.Schema(
+                    type=genai.types.Type.OBJECT,
+                    properties={
+                        "name": genai.types.Schema(type=genai.types.Type.STRING, description="User's name"),
+                        "email": genai.types.Schema(type=genai.types.Type.STRING, description="User's email"),
+                        "phone": genai.types.Schema(type=genai.types.Type.STRING, description="User's phone number"),
+                        "bio": genai.types.Schema(type=genai.types.Type.STRING, description="User's bio/description"),
+                    },
                 ),
-                types.FunctionDeclaration(
-                    name="getCategories",
-                    description="Retrieves available product categories in a tree structure.",
-                    parameters=genai.types.Schema(
-                        type=genai.types.Type.OBJECT,
-                        properties={},
-                    ),
+            ),
+            types.FunctionDeclaration(
+                name="getCategories",
+                description="Retrieves available product categories in a tree structure.",
+                parameters=genai.types.Schema(
+                    type=genai.types.Type.OBJECT,
+                    properties={},
                 ),
-                types.FunctionDeclaration(
-                    name="getBrands",
-                    description="Retrieves available active brands.",
-                    parameters=genai.types.Schema(
-                        type=genai.types.Type.OBJECT,
-                        properties={},
-                    ),
+            ),
+            types.FunctionDeclaration(
+                name="getBrands",
+                description="Retrieves available active brands.",
+                parameters=genai.types.Schema(
+                    type=genai.types.Type.OBJECT,
+                    properties={},
                 ),
-                types.FunctionDeclaration(
-                    name="getWishlist",
-                    description="Retrieves user's wishlist items. Requires authentication.",
-                    parameters=genai.types.Schema(
-                        type=genai.types.Type.OBJECT,
-                        properties={},
-                    ),
+            ),
+            types.FunctionDeclaration(
+                name="getWishlist",
+                description="Retrieves user's wishlist items. Requires authentication.",
+                parameters=genai.types.Schema(
+                    type=genai.types.Type.OBJECT,
+                    properties={},
                 ),
-                types.FunctionDeclaration(
-                    name="addToWishlist",
-                    description="Adds a product to user's wishlist. Requires authentication.",
-                    parameters=genai.types.Schema(
-                        type=genai.types.Type.OBJECT,
-                        properties={
-                            "productId": genai.types.Schema(type=genai.types.Type.STRING, description="Product ID to add to wishlist"),
-                        },
-                        required=["productId"]
-                    ),
+            ),
+            types.FunctionDeclaration(
+                name="addToWishlist",
+                description="Adds a product to user's wishlist. Requires authentication.",
+                parameters=genai.types.Schema(
+                    type=genai.types.Type.OBJECT,
+                    properties={
+                        "productId": genai.types.Schema(type=genai.types.Type.STRING, description="Product ID to add to wishlist"),
+                    },
+                    required=["productId"]
                 ),
-                types.FunctionDeclaration(
-                    name="cancelOrder",
-                    description="Cancels an existing order. Requires authentication.",
-                    parameters=genai.types.Schema(
-                        type=genai.types.Type.OBJECT,
-                        properties={
-                            "orderId": genai.types.Schema(type=genai.types.Type.STRING, description="Order ID to cancel"),
-                            "cancelReason": genai.types.Schema(type=genai.types.Type.STRING, description="Reason for cancellation"),
-                        },
-                        required=["orderId", "cancelReason"]
-                    ),
+            ),
+            types.FunctionDeclaration(
+                name="cancelOrder",
+                description="Cancels an existing order. Requires authentication.",
+                parameters=genai.types.Schema(
+                    type=genai.types.Type.OBJECT,
+                    properties={
+                        "orderId": genai.types.Schema(type=genai.types.Type.STRING, description="Order ID to cancel"),
+                        "cancelReason": genai.types.Schema(type=genai.types.Type.STRING, description="Reason for cancellation"),
+                    },
+                    required=["orderId", "cancelReason"]
                 ),
-                types.FunctionDeclaration(
-                    name="getSupport",
-                    description="Connects the user with customer support or fetches FAQs for specific topics.",
-                    parameters=genai.types.Schema(
-                        type=genai.types.Type.OBJECT,
-                        properties={
-                            "topic": genai.types.Schema(
-                                type=genai.types.Type.STRING,
-                                description="Support topic: orders, products, account, shipping, returns, payment, cart, wishlist"
-                            ),
-                        },
-                        required=["topic"]
-                    ),
+            ),
+            types.FunctionDeclaration(
+                name="getSupport",
+                description="Connects the user with customer support or fetches FAQs for specific topics.",
+                parameters=genai.types.Schema(
+                    type=genai.types.Type.OBJECT,
+                    properties={
+                        "topic": genai.types.Schema(
+                            type=genai.types.Type.STRING,
+                            description="Support topic: orders, products, account, shipping, returns, payment, cart, wishlist"
+                        ),
+                    },
+                    required=["topic"]
                 ),
-                # Vendor Concierge Functions
-                types.FunctionDeclaration(
-                    name="getVendorAnalytics",
-                    description="Get comprehensive vendor analytics and performance metrics. Use this to analyze business performance, revenue, orders, and key metrics.",
-                    parameters=genai.types.Schema(
-                        type=genai.types.Type.OBJECT,
-                        properties={
-                            "days": genai.types.Schema(type=genai.types.Type.INTEGER, description="Number of days to analyze (default: 30)"),
-                        },
-                    ),
+            ),
+            # Vendor Concierge Functions
+            types.FunctionDeclaration(
+                name="getVendorAnalytics",
+                description="Get comprehensive vendor analytics and performance metrics. Use this to analyze business performance, revenue, orders, and key metrics.",
+                parameters=genai.types.Schema(
+                    type=genai.types.Type.OBJECT,
+                    properties={
+                        "days": genai.types.Schema(type=genai.types.Type.INTEGER, description="Number of days to analyze (default: 30)"),
+                    },
                 ),
-                types.FunctionDeclaration(
-                    name="getVendorPerformance",
-                    description="Get detailed vendor performance analysis with insights and recommendations. Use this for comprehensive business analysis.",
-                    parameters=genai.types.Schema(
-                        type=genai.types.Type.OBJECT,
-                        properties={},
-                    ),
+            ),
+            types.FunctionDeclaration(
+                name="getVendorPerformance",
+                description="Get detailed vendor performance analysis with insights and recommendations. Use this for comprehensive business analysis.",
+                parameters=genai.types.Schema(
+                    type=genai.types.Type.OBJECT,
+                    properties={},
                 ),
-                types.FunctionDeclaration(
-                    name="getVendorRecommendations",
-                    description="Get AI-powered business recommendations for vendor growth and optimization. Use this to get actionable business advice.",
-                    parameters=genai.types.Schema(
-                        type=genai.types.Type.OBJECT,
-                        properties={},
-                    ),
+            ),
+            types.FunctionDeclaration(
+                name="getVendorRecommendations",
+                description="Get AI-powered business recommendations for vendor growth and optimization. Use this to get actionable business advice.",
+                parameters=genai.types.Schema(
+                    type=genai.types.Type.OBJECT,
+                    properties={},
                 ),
-                types.FunctionDeclaration(
-                    name="getVendorDailyInsights",
-                    description="Get daily insights and action items for vendors. Use this to get today's priorities and tasks.",
-                    parameters=genai.types.Schema(
-                        type=genai.types.Type.OBJECT,
-                        properties={},
-                    ),
+            ),
+            types.FunctionDeclaration(
+                name="getVendorDailyInsights",
+                description="Get daily insights and action items for vendors. Use this to get today's priorities and tasks.",
+                parameters=genai.types.Schema(
+                    type=genai.types.Type.OBJECT,
+                    properties={},
                 ),
-                types.FunctionDeclaration(
-                    name="getVendorProducts",
-                    description="Get vendor's product catalog with performance metrics. Use this to analyze product portfolio and performance.",
-                    parameters=genai.types.Schema(
-                        type=genai.types.Type.OBJECT,
-                        properties={
-                            "status": genai.types.Schema(
-                                type=genai.types.Type.STRING,
-                                enum=["all", "active", "inactive", "draft"],
-                                description="Filter products by status (default: all)"
-                            ),
-                        },
-                    ),
+            ),
+            types.FunctionDeclaration(
+                name="getVendorProducts",
+                description="Get vendor's product catalog with performance metrics. Use this to analyze product portfolio and performance.",
+                parameters=genai.types.Schema(
+                    type=genai.types.Type.OBJECT,
+                    properties={
+                        "status": genai.types.Schema(
+                            type=genai.types.Type.STRING,
+                            enum=["all", "active", "inactive", "draft"],
+                            description="Filter products by status (default: all)"
+                        ),
+                    },
                 ),
-                types.FunctionDeclaration(
-                    name="getVendorOrders",
-                    description="Get vendor's recent orders and fulfillment status. Use this to track order performance and fulfillment.",
-                    parameters=genai.types.Schema(
-                        type=genai.types.Type.OBJECT,
-                        properties={
-                            "days": genai.types.Schema(type=genai.types.Type.INTEGER, description="Number of days to look back (default: 30)"),
-                        },
-                    ),
+            ),
+            types.FunctionDeclaration(
+                name="getVendorOrders",
+                description="Get vendor's recent orders and fulfillment status. Use this to track order performance and fulfillment.",
+                parameters=genai.types.Schema(
+                    type=genai.types.Type.OBJECT,
+                    properties={
+                        "days": genai.types.Schema(type=genai.types.Type.INTEGER, description="Number of days to look back (default: 30)"),
+                    },
                 ),
-                types.FunctionDeclaration(
-                    name="getVendorInventory",
-                    description="Get inventory status and low stock alerts. Use this to manage inventory and prevent stockouts.",
-                    parameters=genai.types.Schema(
-                        type=genai.types.Type.OBJECT,
-                        properties={},
-                    ),
+            ),
+            types.FunctionDeclaration(
+                name="getVendorInventory",
+                description="Get inventory status and low stock alerts. Use this to manage inventory and prevent stockouts.",
+                parameters=genai.types.Schema(
+                    type=genai.types.Type.OBJECT,
+                    properties={},
                 ),
-                types.FunctionDeclaration(
-                    name="getVendorSustainability",
-                    description="Get sustainability insights and improvement recommendations. Use this to improve environmental impact and sustainability score.",
-                    parameters=genai.types.Schema(
-                        type=genai.types.Type.OBJECT,
-                        properties={},
-                    ),
+            ),
+            types.FunctionDeclaration(
+                name="getVendorSustainability",
+                description="Get sustainability insights and improvement recommendations. Use this to improve environmental impact and sustainability score.",
+                parameters=genai.types.Schema(
+                    type=genai.types.Type.OBJECT,
+                    properties={},
                 ),
-                types.FunctionDeclaration(
-                    name="getVendorBundleRecommendations",
-                    description="Get intelligent product bundle recommendations based on your product catalog and market trends. Use this to create profitable product bundles.",
-                    parameters=genai.types.Schema(
-                        type=genai.types.Type.OBJECT,
-                        properties={},
-                    ),
+            ),
+            types.FunctionDeclaration(
+                name="getVendorBundleRecommendations",
+                description="Get intelligent product bundle recommendations based on your product catalog and market trends. Use this to create profitable product bundles.",
+                parameters=genai.types.Schema(
+                    type=genai.types.Type.OBJECT,
+                    properties={},
                 ),
-                types.FunctionDeclaration(
-                    name="getVendorPersonalizedInsights",
-                    description="Get comprehensive personalized insights combining performance analysis, bundle recommendations, and business advice tailored to your vendor profile.",
-                    parameters=genai.types.Schema(
-                        type=genai.types.Type.OBJECT,
-                        properties={},
-                    ),
+            ),
+            types.FunctionDeclaration(
+                name="getVendorPersonalizedInsights",
+                description="Get comprehensive personalized insights combining performance analysis, bundle recommendations, and business advice tailored to your vendor profile.",
+                parameters=genai.types.Schema(
+                    type=genai.types.Type.OBJECT,
+                    properties={},
                 ),
-                # Universal Help Functions
-                types.FunctionDeclaration(
-                    name="getFAQ",
-                    description="Get frequently asked questions by category. Use this to answer common questions about the platform, shopping, orders, or vendor topics.",
-                    parameters=genai.types.Schema(
-                        type=genai.types.Type.OBJECT,
-                        properties={
-                            "category": genai.types.Schema(
-                                type=genai.types.Type.STRING,
-                                enum=["general", "shopping", "orders", "payments", "vendor", "sustainability"],
-                                description="FAQ category to retrieve questions from"
-                            ),
-                        },
-                    ),
+            ),
+            # Universal Help Functions
+            types.FunctionDeclaration(
+                name="getFAQ",
+                description="Get frequently asked questions by category. Use this to answer common questions about the platform, shopping, orders, or vendor topics.",
+                parameters=genai.types.Schema(
+                    type=genai.types.Type.OBJECT,
+                    properties={
+                        "category": genai.types.Schema(
+                            type=genai.types.Type.STRING,
+                            enum=["general", "shopping", "orders", "payments", "vendor", "sustainability"],
+                            description="FAQ category to retrieve questions from"
+                        ),
+                    },
                 ),
-                types.FunctionDeclaration(
-                    name="getHelpTopics",
-                    description="Get available help topics and resources. Use this to show users what help is available and how to contact support.",
-                    parameters=genai.types.Schema(
-                        type=genai.types.Type.OBJECT,
-                        properties={},
-                    ),
+            ),
+            types.FunctionDeclaration(
+                name="getHelpTopics",
+                description="Get available help topics and resources. Use this to show users what help is available and how to contact support.",
+                parameters=genai.types.Schema(
+                    type=genai.types.Type.OBJECT,
+                    properties={},
                 ),
-                types.FunctionDeclaration(
-                    name="searchHelp",
-                    description="Search help content and FAQs. Use this when users ask specific questions that might be answered in our help documentation.",
-                    parameters=genai.types.Schema(
-                        type=genai.types.Type.OBJECT,
-                        properties={
-                            "query": genai.types.Schema(type=genai.types.Type.STRING, description="Search query for help content"),
-                        },
-                        required=["query"]
-                    ),
+            ),
+            types.FunctionDeclaration(
+                name="searchHelp",
+                description="Search help content and FAQs. Use this when users ask specific questions that might be answered in our help documentation.",
+                parameters=genai.types.Schema(
+                    type=genai.types.Type.OBJECT,
+                    properties={
+                        "query": genai.types.Schema(type=genai.types.Type.STRING, description="Search query for help content"),
+                    },
+                    required=["query"]
                 ),
-            ])
-    ]
-    
-    generate_content_config = types.GenerateContentConfig(
-        tools=tools,
+            ),
+        ])
+]
+
+GENERATE_CONTENT_CONFIG = types.GenerateContentConfig(
+    tools=TOOLS,
+)
+
+def build_chat_contents(user_input: str, session_id: str, user_type: Optional[str] = None,
+                        user_token: Optional[str] = None) -> List[types.Content]:
+    """System instruction, recent conversation context and the new user message"""
+    contents = [get_system_instruction(user_type, user_token)] + get_conversation_context(session_id).copy()
+    contents.append(
+        types.Content(
+            role="user",
+            parts=[types.Part.from_text(text=user_input)],
+        )
     )
+    return contents
+
+def append_function_exchange(contents: List[types.Content], function_call, function_result: Dict[str, Any]):
+    """Add a function call and its result to the conversation sent back to the model"""
+    contents.append(types.Content(
+        role="model",
+        parts=[types.Part(function_call=function_call)]
+    ))
+    contents.append(types.Content(
+        role="user",
+        parts=[types.Part(
+            function_response=types.FunctionResponse(
+                name=function_call.name,
+                response=function_result
+            )
+        )]
+    ))
+
+async def generate_ai_response(user_input: str, user_token: Optional[str] = None, 
+                              session_id: Optional[str] = None, user_type: Optional[str] = None, max_iterations: int = 5) -> Dict[str, Any]:
+    """Generate AI response with function calling capability and conversation context"""
+    client = get_gemini_client()
+    
+    # Generate session ID if not provided
+    if not session_id:
+        session_id = str(uuid.uuid4())
+    
+    # System instruction, context, and new user input
+    contents = build_chat_contents(user_input, session_id, user_type, user_token)
     
     function_call_results = []
     iteration = 0
@@ -1147,44 +1336,35 @@ async def generate_ai_response(user_input: str, user_token: Optional[str] = None
     
     while iteration < max_iterations:
         try:
-            # Generate response from AI
-            response = client.models.generate_content(
-                model=model,
-                contents=contents,
-                config=generate_content_config,
+            # Generate response from AI without blocking the event loop
+            response = await asyncio.wait_for(
+                client.aio.models.generate_content(
+                    model=AI_MODEL,
+                    contents=contents,
+                    config=GENERATE_CONTENT_CONFIG,
+                ),
+                timeout=REQUEST_TIMEOUT,
             )
             
             # Check if response contains function calls or text
             if response.candidates and response.candidates[0].content.parts:
-                has_function_call = False
+                function_calls = []
                 text_response = ""
                 
                 for part in response.candidates[0].content.parts:
                     if hasattr(part, 'function_call') and part.function_call:
-                        # Execute the function call
-                        function_result = await execute_function_call(part.function_call, user_token)
-                        function_call_results.append(function_result)
-                        
-                        # Add function call and result to conversation
-                        contents.append(types.Content(
-                            role="model",
-                            parts=[types.Part(function_call=part.function_call)]
-                        ))
-                        contents.append(types.Content(
-                            role="user",
-                            parts=[types.Part(
-                                function_response=types.FunctionResponse(
-                                    name=part.function_call.name,
-                                    response=function_result
-                                )
-                            )]
-                        ))
-                        
-                        has_function_call = True
-                    
+                        function_calls.append(part.function_call)
                     elif hasattr(part, 'text') and part.text:
                         text_response += part.text
                 
+                # Execute the turn's function calls together
+                function_results = await execute_function_calls(function_calls, user_token)
+                for function_call, function_result in zip(function_calls, function_results):
+                    function_call_results.append(function_result)
+                    # Add function call and result to conversation
+                    append_function_exchange(contents, function_call, function_result)
+                has_function_call = bool(function_calls)
+                
                 # If we have a text response, save it and potentially return
                 if text_response.strip():
                     final_response = text_response.strip()
@@ -1209,6 +1389,8 @@ async def generate_ai_response(user_input: str, user_token: Optional[str] = None
                 # No response parts - break out of loop
                 break
             
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail=f"AI model did not respond within {REQUEST_TIMEOUT:g}s")
         except Exception as e:
             return {"error": f"Error generating AI response: {str(e)}"}
     
@@ -1232,11 +1414,105 @@ async def generate_ai_response(user_input: str, user_token: Optional[str] = None
             "session_id": session_id
         }
 
+async def stream_ai_response(user_input: str, user_token: Optional[str] = None,
+                             session_id: Optional[str] = None, user_type: Optional[str] = None,
+                             max_iterations: int = 5) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Same turn as generate_ai_response, using the model's streaming API.
+
+    Yields ``(event, data)`` as things happen: ``session`` first, then
+    ``text`` for each partial chunk, ``function_call`` / ``function_result``
+    around every tool call, and finally ``done`` (the full response) or
+    ``error``.
+    """
+    client = get_gemini_client()
+    session_id = session_id or str(uuid.uuid4())
+    contents = build_chat_contents(user_input, session_id, user_type, user_token)
+    yield "session", {"session_id": session_id}
+    
+    function_call_results = []
+    iteration = 0
+    while iteration < max_iterations:
+        text_response = ""
+        function_calls = []
+        try:
+            stream = await asyncio.wait_for(
+                client.aio.models.generate_content_stream(
+                    model=AI_MODEL,
+                    contents=contents,
+                    config=GENERATE_CONTENT_CONFIG,
+                ),
+                timeout=REQUEST_TIMEOUT,
+            )
+            async with aclosing(stream):
+                while True:
+                    try:
+                        # The timeout applies to the gap between chunks, not the whole answer
+                        chunk = await asyncio.wait_for(anext(stream), timeout=REQUEST_TIMEOUT)
+                    except StopAsyncIteration:
+                        break
+                    if not (chunk.candidates and chunk.candidates[0].content and chunk.candidates[0].content.parts):
+                        continue
+                    for part in chunk.candidates[0].content.parts:
+                        if part.function_call:
+                            function_calls.append(part.function_call)
+                            yield "function_call", {"name": part.function_call.name, "args": dict(part.function_call.args or {})}
+                        elif part.text:
+                            text_response += part.text
+                            yield "text", {"text": part.text}
+        except asyncio.TimeoutError:
+            yield "error", {"detail": f"AI model did not respond within {REQUEST_TIMEOUT:g}s", "session_id": session_id}
+            return
+        except Exception as e:
+            yield "error", {"detail": f"Error generating AI response: {str(e)}", "session_id": session_id}
+            return
+        
+        function_results = await execute_function_calls(function_calls, user_token)
+        for function_call, function_result in zip(function_calls, function_results):
+            function_call_results.append(function_result)
+            append_function_exchange(contents, function_call, function_result)
+            yield "function_result", function_result
+        
+        if text_response.strip():
+            final_response = text_response.strip()
+            add_to_conversation_history(session_id, user_input, final_response)
+            yield "done", {
+                "response": final_response,
+                "function_calls": function_call_results,
+                "iterations": iteration,
+                "session_id": session_id
+            }
+            return
+        if not function_calls:
+            break
+        iteration += 1
+    
+    if function_call_results:
+        final_response = "I've executed the requested functions but encountered an issue generating a final response. Please try rephrasing your request."
+        add_to_conversation_history(session_id, user_input, final_response)
+        yield "text", {"text": final_response}
+        yield "done", {
+            "response": final_response,
+            "function_calls": function_call_results,
+            "iterations": iteration,
+            "session_id": session_id
+        }
+    else:
+        yield "error", {"detail": "No valid response generated - please try again", "session_id": session_id}
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    get_backend_client()
+    yield
+    await close_backend_client()
+    await close_gemini_client()
+
 # FastAPI Application
 app = FastAPI(
     title="AveoEarth AI Assistant",
     description="AI-powered assistant for AveoEarth e-commerce platform",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -1249,15 +1525,15 @@ app.add_middleware(
 )
 
 @app.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest):
+async def chat_endpoint(request: ChatRequest, http_request: Request):
     """Chat endpoint for AI assistant with conversation context"""
     try:
-        result = await generate_ai_response(
+        result = await run_until_disconnected(http_request, generate_ai_response(
             request.message, 
             request.user_token, 
             request.session_id,
             request.user_type
-        )
+        ))
         
         if "error" in result:
             raise HTTPException(status_code=500, detail=result["error"])
@@ -1267,9 +1543,34 @@ async def chat_endpoint(request: ChatRequest):
             function_calls=result.get("function_calls", []),
             session_id=result.get("session_id")
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Chat processing failed: {str(e)}")
 
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest, http_request: Request):
+    """Chat endpoint streaming partial text and function-call progress as Server-Sent Events"""
+    # Configuration errors surface as a plain 500 before the stream starts
+    get_gemini_client()
+    
+    async def event_stream():
+        events = stream_ai_response(
+            request.message,
+            request.user_token,
+            request.session_id,
+            request.user_type
+        )
+        async for event, data in stream_until_disconnected(http_request, events):
+            yield format_sse(event, data)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/chat/history/{session_id}")
 async def get_conversation_history(session_id: str):
     """Get conversation history for a session"""
@@ -1313,9 +1614,8 @@ async def health_check():
     """Detailed health check"""
     try:
         # Test backend connectivity
-        async with httpx.AsyncClient() as client:
-            backend_response = await client.get(f"{BACKEND_BASE_URL}/health")
-            backend_status = "connected" if backend_response.status_code == 200 else "disconnected"
+        backend_response = await get_backend_client().get("/health")
+        backend_status = "connected" if backend_response.status_code == 200 else "disconnected"
     except:
         backend_status = "disconnected"
     
@@ -1332,6 +1632,7 @@ async def health_check():
             "real_backend_integration": True,
             "conversation_context": True,
             "function_calling": True,
+            "streaming": True,
             "session_management": True
         }
     }
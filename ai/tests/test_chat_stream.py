@@ -0,0 +1,174 @@
+"""
+/chat/stream against a fake streaming model.
+
+The fake stands in for the shared Gemini client: each call to
+``generate_content_stream`` plays back the next scripted turn chunk by chunk.
+"""
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from google.genai import types
+
+import main
+
+
+def text_chunk(text):
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(role="model", parts=[types.Part(text=text)]))]
+    )
+
+
+def call_chunk(name, **args):
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(
+            role="model", parts=[types.Part(function_call=types.FunctionCall(name=name, args=args))]
+        ))]
+    )
+
+
+class FakeStreamingModels:
+    def __init__(self, turns, chunk_delay=0.0):
+        self.turns = list(turns)
+        self.chunk_delay = chunk_delay
+        self.requests = []
+        self.closed = 0
+
+    async def generate_content_stream(self, model, contents, config=None):
+        self.requests.append(list(contents))
+        chunks = self.turns.pop(0)
+
+        async def stream():
+            try:
+                for chunk in chunks:
+                    await asyncio.sleep(self.chunk_delay)
+                    yield chunk
+            finally:
+                self.closed += 1
+
+        return stream()
+
+
+class FakeClient:
+    def __init__(self, models):
+        self.aio = SimpleNamespace(models=models, aclose=self.aclose)
+
+    async def aclose(self):
+        pass
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    def install(turns, chunk_delay=0.0):
+        models = FakeStreamingModels(turns, chunk_delay)
+        monkeypatch.setattr(main, "_gemini_client", FakeClient(models))
+        return models
+
+    monkeypatch.setattr(main, "conversation_history", {})
+    return install
+
+
+def parse_sse(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def stream_chat(message, **fields):
+    with TestClient(main.app) as client:
+        response = client.post("/chat/stream", json={"message": message, **fields})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    return parse_sse(response.text)
+
+
+def test_streams_partial_text_as_it_arrives(fake_model):
+    fake_model([[text_chunk("Bamboo "), text_chunk("toothbrushes "), text_chunk("are in stock.")]])
+
+    events = stream_chat("Any toothbrushes?", session_id="s1")
+
+    assert events[0] == ("session", {"session_id": "s1"})
+    assert [data["text"] for event, data in events if event == "text"] == ["Bamboo ", "toothbrushes ", "are in stock."]
+    event, done = events[-1]
+    assert event == "done"
+    assert done["response"] == "Bamboo toothbrushes are in stock."
+    assert done["function_calls"] == []
+    assert len(main.conversation_history["s1"]) == 2
+
+
+def test_streams_function_call_progress(fake_model, monkeypatch):
+    calls = []
+
+    async def fake_get_products(query=None, **kwargs):
+        calls.append(query)
+        return {"products": [{"name": "Bamboo toothbrush"}]}
+
+    monkeypatch.setitem(main.FUNCTION_MAP, "getProducts", fake_get_products)
+    models = fake_model([
+        [call_chunk("getProducts", query="toothbrush")],
+        [text_chunk("I found a bamboo toothbrush.")],
+    ])
+
+    events = stream_chat("Find me a toothbrush")
+
+    assert [event for event, _ in events] == ["session", "function_call", "function_result", "text", "done"]
+    assert events[1][1] == {"name": "getProducts", "args": {"query": "toothbrush"}}
+    assert events[2][1] == {"function": "getProducts", "result": {"products": [{"name": "Bamboo toothbrush"}]}}
+    assert calls == ["toothbrush"]
+    # The second model turn sees the function call and its result
+    second_turn = models.requests[1]
+    assert second_turn[-2].parts[0].function_call.name == "getProducts"
+    assert second_turn[-1].parts[0].function_response.response == events[2][1]
+    assert events[-1][1]["iterations"] == 1
+
+
+def test_model_failure_is_reported_in_band(fake_model):
+    fake_model([])  # No scripted turn: the fake raises on the first call
+
+    events = stream_chat("Hello", session_id="s2")
+
+    assert events[0][0] == "session"
+    event, data = events[-1]
+    assert event == "error"
+    assert data["session_id"] == "s2"
+    assert "s2" not in main.conversation_history
+
+
+def test_slow_chunk_times_out(fake_model, monkeypatch):
+    monkeypatch.setattr(main, "REQUEST_TIMEOUT", 0.05)
+    fake_model([[text_chunk("Hel"), text_chunk("lo")]], chunk_delay=0.2)
+
+    events = stream_chat("Hello")
+
+    assert events[-1][0] == "error"
+    assert "did not respond" in events[-1][1]["detail"]
+
+
+def test_client_disconnect_cancels_the_model_stream(fake_model):
+    models = fake_model([[text_chunk("Hel")] + [text_chunk("lo")] * 100], chunk_delay=0.05)
+
+    class DisconnectingRequest:
+        def __init__(self):
+            self.polls = 0
+
+        async def is_disconnected(self):
+            self.polls += 1
+            return self.polls > 1
+
+    async def consume():
+        received = []
+        events = main.stream_ai_response("Hello", session_id="s3")
+        async for event, data in main.stream_until_disconnected(DisconnectingRequest(), events, poll_interval=0.01):
+            received.append(event)
+        return received
+
+    received = asyncio.run(consume())
+
+    assert received[0] == "session"
+    assert "done" not in received
+    assert models.closed == 1
+    assert "s3" not in main.conversation_history
@@ -0,0 +1,187 @@
+"""
+Batched execution of one model turn's function calls.
+"""
+import asyncio
+import time
+
+import httpx
+import pytest
+from google.genai import types
+
+import main
+
+
+def call(name, **args):
+    return types.FunctionCall(name=name, args=args)
+
+
+@pytest.fixture
+def tools(monkeypatch):
+    """Replace backend tools with recorders that take ``delay`` seconds"""
+    log = []
+
+    def install(name, delay=0.0):
+        async def tool(user_token=None, **kwargs):
+            log.append(("start", name, kwargs))
+            await asyncio.sleep(delay)
+            log.append(("end", name, kwargs))
+            return {"tool": name, "args": kwargs}
+
+        monkeypatch.setitem(main.FUNCTION_MAP, name, tool)
+
+    return install, log
+
+
+def test_read_calls_run_concurrently(tools):
+    install, _ = tools
+    for name in ("getProducts", "viewCart", "getWishlist"):
+        install(name, delay=0.2)
+
+    start = time.perf_counter()
+    results = asyncio.run(main.execute_function_calls(
+        [call("getProducts", query="soap"), call("viewCart"), call("getWishlist")], "token"
+    ))
+    elapsed = time.perf_counter() - start
+
+    assert [r["function"] for r in results] == ["getProducts", "viewCart", "getWishlist"]
+    assert elapsed < 0.4
+
+
+def test_identical_read_calls_run_once(tools):
+    install, log = tools
+    install("getProducts")
+
+    results = asyncio.run(main.execute_function_calls([
+        call("getProducts", query="soap", limit=5),
+        call("getProducts", limit=5, query="soap"),
+        call("getProducts", query="shampoo", limit=5),
+    ]))
+
+    assert [entry for entry in log if entry[0] == "start"] == [
+        ("start", "getProducts", {"query": "soap", "limit": 5}),
+        ("start", "getProducts", {"query": "shampoo", "limit": 5}),
+    ]
+    assert results[0] == results[1]
+    assert results[2]["result"]["args"]["query"] == "shampoo"
+
+
+def test_write_calls_run_in_order_and_are_not_deduplicated(tools):
+    install, log = tools
+    install("addToCart", delay=0.05)
+
+    results = asyncio.run(main.execute_function_calls([
+        call("addToCart", productId="p1"),
+        call("addToCart", productId="p1"),
+    ]))
+
+    assert [entry[0] for entry in log] == ["start", "end", "start", "end"]
+    assert [r["function"] for r in results] == ["addToCart", "addToCart"]
+
+
+def test_reads_after_a_write_wait_for_it(tools):
+    install, log = tools
+    install("viewCart", delay=0.05)
+    install("addToCart", delay=0.05)
+
+    results = asyncio.run(main.execute_function_calls([
+        call("viewCart"),
+        call("addToCart", productId="p1"),
+        call("viewCart"),
+    ]))
+
+    # The second viewCart is not served from the first, and starts only once the write is done
+    assert [(entry[0], entry[1]) for entry in log] == [
+        ("start", "viewCart"), ("end", "viewCart"),
+        ("start", "addToCart"), ("end", "addToCart"),
+        ("start", "viewCart"), ("end", "viewCart"),
+    ]
+    assert [r["function"] for r in results] == ["viewCart", "addToCart", "viewCart"]
+    assert results[0] is not results[2]
+
+
+def test_calls_past_the_turn_deadline_are_cancelled(tools):
+    install, log = tools
+    install("viewCart", delay=0.01)
+    install("addToCart", delay=0.01)
+    install("getProducts", delay=5)
+    install("getWishlist", delay=0.01)
+    install("checkout", delay=0.01)
+
+    start = time.perf_counter()
+    results = asyncio.run(main.execute_function_calls([
+        call("viewCart"), call("addToCart", productId="p1"),
+        call("getProducts", query="soap"), call("getWishlist"),
+        call("checkout", paymentMethod="card"),
+    ], timeout=0.2))
+
+    assert time.perf_counter() - start < 1
+    assert results[0]["function"] == "viewCart"
+    assert results[1]["function"] == "addToCart"
+    assert results[2] == {"error": "getProducts did not finish within 0.2s"}
+    # Finished alongside the slow read, so its result is kept
+    assert results[3]["function"] == "getWishlist"
+    # Never started: it waits on the reads before it
+    assert results[4] == {"error": "checkout was not run: the turn's 0.2s limit was reached first"}
+    assert ("end", "getProducts", {"query": "soap"}) not in log
+    assert ("start", "checkout", {"paymentMethod": "card"}) not in log
+
+
+def test_a_started_write_finishes_past_the_turn_deadline(tools):
+    install, log = tools
+    install("checkout", delay=0.3)
+    install("viewCart", delay=0.01)
+
+    results = asyncio.run(main.execute_function_calls([
+        call("checkout", paymentMethod="card"), call("viewCart"),
+    ], timeout=0.1))
+
+    assert results[0]["function"] == "checkout"
+    assert ("end", "checkout", {"paymentMethod": "card"}) in log
+    # The deadline has passed by the time the write returns, so nothing after it starts
+    assert results[1] == {"error": "viewCart did not finish within 0.1s"}
+    assert ("start", "viewCart", {}) not in log
+
+
+def test_an_abandoned_write_is_reported_as_unknown(tools, monkeypatch):
+    install, log = tools
+    install("cancelOrder", delay=5)
+    monkeypatch.setattr(main, "TOOL_WRITE_TIMEOUT", 0.1)
+
+    start = time.perf_counter()
+    results = asyncio.run(main.execute_function_calls([call("cancelOrder", orderId="o1")], timeout=10))
+
+    assert time.perf_counter() - start < 1
+    assert "outcome unknown" in results[0]["error"]
+    assert "Do not retry" in results[0]["error"]
+    assert ("end", "cancelOrder", {"orderId": "o1"}) not in log
+
+
+def test_user_token_is_not_echoed_back_to_the_model(tools):
+    install, _ = tools
+    install("viewCart")
+    function_call = call("viewCart")
+
+    asyncio.run(main.execute_function_calls([function_call], "secret"))
+
+    assert "user_token" not in (function_call.args or {})
+
+
+def test_backend_calls_share_one_client(monkeypatch):
+    paths = []
+
+    def handler(request):
+        paths.append(request.url.path)
+        return httpx.Response(200, json={"ok": True})
+
+    async def scenario():
+        client = httpx.AsyncClient(base_url=main.BACKEND_BASE_URL, transport=httpx.MockTransport(handler))
+        monkeypatch.setattr(main, "_backend_client", client)
+        first = await main.make_api_call("/buyer/cart/")
+        second = await main.make_api_call("/search/", "POST", {"query": "soap"})
+        assert main.get_backend_client() is client
+        await main.close_backend_client()
+        return first, second
+
+    assert asyncio.run(scenario()) == ({"ok": True}, {"ok": True})
+    assert paths == ["/buyer/cart/", "/search/"]
+    assert main._backend_client is None
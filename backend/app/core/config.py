@@ -47,6 +47,10 @@ class Settings(BaseSettings):
     SUPABASE_AUDIENCE: str = Field(default="authenticated", env="SUPABASE_AUDIENCE")
     SUPABASE_ISSUER: str = Field(default="", env="SUPABASE_ISSUER")
     SUPABASE_SERVICE_ROLE_KEY: str = Field(default="", env="SUPABASE_SERVICE_ROLE_KEY")
+    SUPABASE_REST_TIMEOUT: float = Field(default=10.0, env="SUPABASE_REST_TIMEOUT")
+    SUPABASE_REST_MAX_CONNECTIONS: int = Field(default=50, env="SUPABASE_REST_MAX_CONNECTIONS")
+    SUPABASE_REST_MAX_CONCURRENCY: int = Field(default=32, env="SUPABASE_REST_MAX_CONCURRENCY")
+    SUPABASE_REST_MAX_RETRIES: int = Field(default=2, env="SUPABASE_REST_MAX_RETRIES")
     WHATSAPP_API_URL: str = Field(default="", env="WHATSAPP_API_URL")
     WHATSAPP_API_TOKEN: str = Field(default="", env="WHATSAPP_API_TOKEN")
     WHATSAPP_PHONE_NUMBER_ID: str = Field(default="", env="WHATSAPP_PHONE_NUMBER_ID")
@@ -69,7 +73,53 @@ class Settings(BaseSettings):
     PAGINATION_LIMIT: int = Field(default=20, env="PAGINATION_LIMIT")
     PAGINATION_MAX_LIMIT: int = Field(default=100, env="PAGINATION_MAX_LIMIT")
     
+    SEARCH_ENGINE: str = Field(default="fulltext", env="SEARCH_ENGINE")
+    FILTER_OPTIONS_CACHE_TTL: int = Field(default=300, env="FILTER_OPTIONS_CACHE_TTL")
+    AUTOCOMPLETE_SNAPSHOT_PATH: str = Field(default=".cache/autocomplete_index.json.gz", env="AUTOCOMPLETE_SNAPSHOT_PATH")
+    AUTOCOMPLETE_REBUILD_INTERVAL: int = Field(default=3600, env="AUTOCOMPLETE_REBUILD_INTERVAL")
+    CART_CACHE_TTL: int = Field(default=120, env="CART_CACHE_TTL")
+    CART_USER_CACHE_TTL: int = Field(default=3600, env="CART_USER_CACHE_TTL")
+    CART_RECONCILE_INTERVAL: int = Field(default=900, env="CART_RECONCILE_INTERVAL")
+    CART_RECONCILE_BATCH_SIZE: int = Field(default=500, env="CART_RECONCILE_BATCH_SIZE")
+    INVENTORY_RESERVATION_TTL: int = Field(default=900, env="INVENTORY_RESERVATION_TTL")
+    INVENTORY_SWEEP_INTERVAL: int = Field(default=60, env="INVENTORY_SWEEP_INTERVAL")
+    BULK_IMPORT_CHUNK_SIZE: int = Field(default=500, env="BULK_IMPORT_CHUNK_SIZE")
+    BULK_IMPORT_MAX_FILE_MB: int = Field(default=50, env="BULK_IMPORT_MAX_FILE_MB")
+    BULK_IMPORT_USE_COPY: bool = Field(default=True, env="BULK_IMPORT_USE_COPY")
+    IMAGE_RENDITION_WORKERS: int = Field(default=0, env="IMAGE_RENDITION_WORKERS")
+    IMAGE_RENDITION_MAX_PENDING: int = Field(default=0, env="IMAGE_RENDITION_MAX_PENDING")
+    IMAGE_STORAGE_BACKEND: str = Field(default="supabase", env="IMAGE_STORAGE_BACKEND")
+    IMAGE_UPLOAD_CONCURRENCY: int = Field(default=16, env="IMAGE_UPLOAD_CONCURRENCY")
+    IMAGE_UPLOAD_RETRIES: int = Field(default=2, env="IMAGE_UPLOAD_RETRIES")
+    IMAGE_PRUNE_INTERVAL: int = Field(default=3600, env="IMAGE_PRUNE_INTERVAL")
+    IMAGE_ORPHAN_GRACE: int = Field(default=86400, env="IMAGE_ORPHAN_GRACE")
+    ACTIVITY_BATCH_SIZE: int = Field(default=200, env="ACTIVITY_BATCH_SIZE")
+    ACTIVITY_FLUSH_INTERVAL_MS: int = Field(default=500, env="ACTIVITY_FLUSH_INTERVAL_MS")
+    ACTIVITY_QUEUE_SIZE: int = Field(default=10000, env="ACTIVITY_QUEUE_SIZE")
+    ACTIVITY_ENQUEUE_TIMEOUT: float = Field(default=1.0, env="ACTIVITY_ENQUEUE_TIMEOUT")
+    ACTIVITY_PROFILE_DEBOUNCE: int = Field(default=30, env="ACTIVITY_PROFILE_DEBOUNCE")
+    BEHAVIOR_HALF_LIFE_DAYS: float = Field(default=7.0, env="BEHAVIOR_HALF_LIFE_DAYS")
+    BEHAVIOR_STATE_CACHE_SIZE: int = Field(default=50000, env="BEHAVIOR_STATE_CACHE_SIZE")
+    BEHAVIOR_COMPACTION_INTERVAL: int = Field(default=21600, env="BEHAVIOR_COMPACTION_INTERVAL")
+    COOCCURRENCE_INDEX_DIR: str = Field(default=".cache/cooccurrence", env="COOCCURRENCE_INDEX_DIR")
+    COOCCURRENCE_REFRESH_INTERVAL: int = Field(default=3600, env="COOCCURRENCE_REFRESH_INTERVAL")
+    COOCCURRENCE_WINDOW_DAYS: int = Field(default=30, env="COOCCURRENCE_WINDOW_DAYS")
+    COOCCURRENCE_MAX_NEIGHBORS: int = Field(default=50, env="COOCCURRENCE_MAX_NEIGHBORS")
+    COOCCURRENCE_MAX_BASKET: int = Field(default=100, env="COOCCURRENCE_MAX_BASKET")
+    RECOMMENDATION_CATALOG_TTL: int = Field(default=300, env="RECOMMENDATION_CATALOG_TTL")
+    DASHBOARD_CACHE_TTL: int = Field(default=60, env="DASHBOARD_CACHE_TTL")
+    DASHBOARD_STALE_TTL: int = Field(default=600, env="DASHBOARD_STALE_TTL")
+    PRODUCT_VIEW_FLUSH_INTERVAL: float = Field(default=2.0, env="PRODUCT_VIEW_FLUSH_INTERVAL")
+    PRODUCT_VIEW_BATCH_SIZE: int = Field(default=500, env="PRODUCT_VIEW_BATCH_SIZE")
+    PRODUCT_VIEW_BUFFER_SIZE: int = Field(default=50000, env="PRODUCT_VIEW_BUFFER_SIZE")
+    PRODUCT_VIEW_COUNT_TTL: int = Field(default=60, env="PRODUCT_VIEW_COUNT_TTL")
+    TRENDING_SNAPSHOT_INTERVAL: int = Field(default=10, env="TRENDING_SNAPSHOT_INTERVAL")
+    TRENDING_CHECKPOINT_INTERVAL: int = Field(default=60, env="TRENDING_CHECKPOINT_INTERVAL")
+    TRENDING_TOP_K: int = Field(default=100, env="TRENDING_TOP_K")
+    
     JWT_CACHE_TTL: int = Field(default=3600, env="JWT_CACHE_TTL")
+    JWT_VERIFIED_CACHE_SIZE: int = Field(default=10000, env="JWT_VERIFIED_CACHE_SIZE")
+    AUTH_USER_CACHE_TTL: int = Field(default=30, env="AUTH_USER_CACHE_TTL")
     OTP_EXPIRY_MINUTES: int = Field(default=10, env="OTP_EXPIRY_MINUTES")
     OTP_MAX_ATTEMPTS: int = Field(default=3, env="OTP_MAX_ATTEMPTS")
     DB_SYNC_MODE: str = Field(default="compare", env="DB_SYNC_MODE")
@@ -0,0 +1,194 @@
+"""
+Process-pool rendition engine for vendor images.
+
+Decoding, resizing and AVIF/WebP encoding are CPU bound and hold the GIL, so
+they run in a bounded ProcessPoolExecutor instead of the event loop. Each job
+decodes the upload once and derives every size from the previous, already
+smaller one (large -> medium -> small -> thumbnail), letting Pillow's
+``reducing_gap`` use cheap integer ``reduce()`` before the final LANCZOS pass.
+A semaphore caps in-flight jobs so a burst of uploads queues in the event
+loop rather than piling decoded images up in worker memory.
+"""
+
+import asyncio
+import hashlib
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger("core.image_renditions")
+
+# Largest first: each rendition is resized from the one before it
+QUALITY_LEVELS: Dict[str, Dict[str, Any]] = {
+    'original': {'size': None, 'quality': 75},
+    'large': {'size': (1200, 1200), 'quality': 80},
+    'medium': {'size': (800, 800), 'quality': 85},
+    'small': {'size': (400, 400), 'quality': 90},
+    'thumbnail': {'size': (150, 150), 'quality': 85},
+}
+
+COMPRESSION_FACTORS = {'high': 0.7, 'medium': 0.85, 'low': 1.0}
+
+
+def content_hash(data: bytes) -> str:
+    """SHA-256 of the upload; the key renditions are stored and deduplicated under"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def auto_detect_compression(dimensions: Tuple[int, int], file_size: int) -> str:
+    """Pick a compression level from the source resolution and upload size"""
+    width, height = dimensions
+    total_pixels = width * height
+    if total_pixels > 2000000 or file_size > 5 * 1024 * 1024:  # 2MP or 5MB
+        return 'high'
+    if total_pixels > 1000000 or file_size > 2 * 1024 * 1024:  # 1MP or 2MB
+        return 'medium'
+    return 'low'
+
+
+def _fit(image, target_size: Tuple[int, int]):
+    """Scale ``image`` to fit inside ``target_size`` keeping the aspect ratio"""
+    from PIL import Image
+
+    width, height = image.size
+    scale = min(target_size[0] / width, target_size[1] / height)
+    if scale == 1:
+        return image
+    new_size = (max(1, int(width * scale)), max(1, int(height * scale)))
+    return image.resize(new_size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+
+def _to_box(image, target_size: Tuple[int, int]):
+    """Center the fitted image on the target box, as the renditions always have been"""
+    width, height = image.size
+    if (width, height) == tuple(target_size):
+        return image
+    left = (width - target_size[0]) // 2
+    top = (height - target_size[1]) // 2
+    return image.crop((left, top, left + target_size[0], top + target_size[1]))
+
+
+def _flatten(image):
+    """Orient by EXIF and drop alpha onto white, once per source image"""
+    from PIL import Image, ImageOps
+
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA'):
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        return background
+    if image.mode != 'RGB':
+        return image.convert('RGB')
+    return image
+
+
+def _encode(image, quality: int, compression_level: str, avif: bool) -> bytes:
+    from PIL import Image, ImageEnhance
+
+    # Slight contrast boost and palette reduction compress better
+    image = ImageEnhance.Contrast(image).enhance(1.05)
+    image = image.quantize(colors=256, method=Image.Quantize.MEDIANCUT).convert('RGB')
+
+    output = io.BytesIO()
+    if compression_level == 'high' and avif:
+        image.save(output, format='AVIF', quality=quality, lossless=False)
+    elif compression_level == 'medium':
+        image.save(output, format='WEBP', quality=quality, method=6)
+    else:
+        image.save(output, format='JPEG', quality=quality, optimize=True)
+    return output.getvalue()
+
+
+def render_image(data: bytes, compression_level: str = 'auto') -> Dict[str, Any]:
+    """
+    Produce every rendition of one upload; runs inside a worker process.
+
+    Returns ``{"images": {size_name: {...}}, "source": {...}, "image_hash": str,
+    "compression_level": str}``.
+    """
+    from PIL import Image
+    try:
+        import pillow_avif  # noqa: F401  registers the AVIF plugin
+        avif = True
+    except ImportError:
+        avif = False
+
+    source = Image.open(io.BytesIO(data))
+    source_info = {'format': source.format, 'dimensions': source.size, 'color_mode': source.mode}
+    if compression_level == 'auto':
+        compression_level = auto_detect_compression(source.size, len(data))
+
+    current = _flatten(source)
+    images = {}
+    for size_name, config in QUALITY_LEVELS.items():
+        quality = int(config['quality'] * COMPRESSION_FACTORS.get(compression_level, 1.0))
+        if config['size']:
+            current = _fit(current, config['size'])
+            rendition = _to_box(current, config['size'])
+        else:
+            rendition = current
+        encoded = _encode(rendition, quality, compression_level, avif)
+        images[size_name] = {
+            'data': encoded,
+            'size': len(encoded),
+            'format': encoded[:4],  # First 4 bytes for format detection
+            'dimensions': rendition.size,
+        }
+
+    return {
+        'images': images,
+        'source': source_info,
+        'image_hash': content_hash(data),
+        'compression_level': compression_level,
+    }
+
+
+class RenditionEngine:
+    def __init__(self, max_workers: Optional[int] = None, max_pending: Optional[int] = None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.max_workers * 2
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        return self._slots
+
+    async def render(self, data: bytes, compression_level: str = 'auto') -> Dict[str, Any]:
+        async with self._semaphore():
+            loop = asyncio.get_running_loop()
+            try:
+                return await loop.run_in_executor(self._executor(), render_image, data, compression_level)
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM on a huge image); start a fresh pool and retry once
+                logger.warning("Image rendition pool broke, restarting it")
+                self.shutdown(wait=False)
+                return await loop.run_in_executor(self._executor(), render_image, data, compression_level)
+
+    async def render_many(self, uploads: List[bytes], compression_level: str = 'auto') -> List[Any]:
+        """Render uploads in parallel; failures are returned in place as exceptions"""
+        return await asyncio.gather(
+            *(self.render(data, compression_level) for data in uploads), return_exceptions=True
+        )
+
+    def shutdown(self, wait: bool = True) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
+
+
+rendition_engine = RenditionEngine(
+    max_workers=settings.IMAGE_RENDITION_WORKERS or None,
+    max_pending=settings.IMAGE_RENDITION_MAX_PENDING or None
+)
@@ -0,0 +1,345 @@
+"""
+Content-addressed store for vendor image renditions.
+
+Uploads are keyed by the SHA-256 of their bytes plus the requested
+compression level. The first upload of some content is rendered and stored
+once under a path derived from the hash; every later upload of the same bytes
+(another variant, another product, another vendor) only gets a row in
+``image_asset_links`` pointing at the existing renditions. Concurrent uploads
+of identical content in one process share a single render/upload.
+
+Assets nothing links to are pruned in the background, but only once they have
+gone unused for a grace period: an asset is recorded (or found by a lookup)
+in one transaction and linked in a later one, and a prune in between must not
+delete it. Because an object can back several products, deleting a product
+or one of its images only drops that product's links (``unlink_product`` /
+``release``); the object itself is left for the pruner.
+
+The index lives in Postgres. Without a database every upload is treated as
+new, which is the behaviour from before the store existed.
+"""
+
+import asyncio
+import json
+import re
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+import app.database.session as db_session
+from app.database.session import pgbouncer_safe
+from app.core.logging import get_logger
+
+logger = get_logger("core.image_store")
+
+# Compression level recorded for uploads stored as-is
+RAW_LEVEL = 'raw'
+
+# content/<hash[:2]>/<hash>/<size>_<level>.<ext>, as written by content_path()
+CONTENT_PATH_RE = re.compile(r'(?:^|/)content/[0-9a-f]{2}/([0-9a-f]{64})/[^/]+_([^/_]+)\.[^/.]+$')
+
+
+def build_image_store_schema_statements() -> List[str]:
+    return [
+        """
+        CREATE TABLE IF NOT EXISTS image_assets (
+            content_hash CHAR(64) NOT NULL,
+            compression_level VARCHAR(10) NOT NULL,
+            original_size BIGINT NOT NULL,
+            compressed_size BIGINT NOT NULL,
+            format VARCHAR(10),
+            width INTEGER,
+            height INTEGER,
+            color_mode VARCHAR(10),
+            renditions JSONB NOT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT now(),
+            used_at TIMESTAMP NOT NULL DEFAULT now(),
+            PRIMARY KEY (content_hash, compression_level)
+        );
+        """,
+        "ALTER TABLE image_assets ADD COLUMN IF NOT EXISTS used_at TIMESTAMP NOT NULL DEFAULT now();",
+        """
+        CREATE TABLE IF NOT EXISTS image_asset_links (
+            id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+            content_hash CHAR(64) NOT NULL,
+            compression_level VARCHAR(10) NOT NULL,
+            vendor_id VARCHAR(100) NOT NULL,
+            product_id VARCHAR(100) NOT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT now(),
+            FOREIGN KEY (content_hash, compression_level)
+                REFERENCES image_assets(content_hash, compression_level) ON DELETE CASCADE,
+            UNIQUE (content_hash, compression_level, vendor_id, product_id)
+        );
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_image_asset_links_vendor_id ON image_asset_links(vendor_id);",
+    ]
+
+
+# A hit marks the asset used so the pruner leaves it alone until it is linked
+LOOKUP_SQL = text("""
+    UPDATE image_assets SET used_at = now()
+    WHERE content_hash = :content_hash AND compression_level = :compression_level
+    RETURNING content_hash, compression_level, original_size, compressed_size, format, width, height,
+              color_mode, renditions
+""")
+
+RECORD_SQL = text("""
+    INSERT INTO image_assets (content_hash, compression_level, original_size, compressed_size, format,
+                              width, height, color_mode, renditions, created_at, used_at)
+    VALUES (:content_hash, :compression_level, :original_size, :compressed_size, :format,
+            :width, :height, :color_mode, CAST(:renditions AS jsonb), now(), now())
+    ON CONFLICT (content_hash, compression_level) DO UPDATE SET used_at = now()
+""")
+
+LINK_SQL = text("""
+    INSERT INTO image_asset_links (id, content_hash, compression_level, vendor_id, product_id, created_at)
+    VALUES (gen_random_uuid(), :content_hash, :compression_level, :vendor_id, :product_id, now())
+    ON CONFLICT (content_hash, compression_level, vendor_id, product_id) DO NOTHING
+""")
+
+# Logical bytes count every link; stored bytes count each asset once
+VENDOR_STATS_SQL = text("""
+    WITH linked AS (
+        SELECT a.content_hash, a.compression_level, a.original_size, a.compressed_size
+        FROM image_asset_links l
+        JOIN image_assets a USING (content_hash, compression_level)
+        WHERE l.vendor_id = :vendor_id
+    ),
+    assets AS (
+        SELECT DISTINCT content_hash, compression_level, original_size, compressed_size FROM linked
+    )
+    SELECT (SELECT count(*) FROM linked) AS total_images,
+           (SELECT count(*) FROM assets) AS unique_images,
+           (SELECT coalesce(sum(original_size), 0) FROM linked) AS logical_original_bytes,
+           (SELECT coalesce(sum(compressed_size), 0) FROM linked) AS logical_stored_bytes,
+           (SELECT coalesce(sum(compressed_size), 0) FROM assets) AS stored_bytes
+""")
+
+PRUNE_ORPHANS_SQL = text("""
+    DELETE FROM image_assets a
+    WHERE a.used_at < now() - make_interval(secs => :grace)
+      AND NOT EXISTS (
+        SELECT 1 FROM image_asset_links l
+        WHERE l.content_hash = a.content_hash AND l.compression_level = a.compression_level
+    )
+    RETURNING a.content_hash, a.compressed_size, a.renditions
+""")
+
+
+UNLINK_SQL = text("""
+    DELETE FROM image_asset_links
+    WHERE product_id = :product_id AND content_hash = :content_hash AND compression_level = :compression_level
+""")
+
+UNLINK_PRODUCT_SQL = text("DELETE FROM image_asset_links WHERE product_id = :product_id")
+
+
+def content_path(content_hash: str, size_name: str, compression_level: str, ext: str) -> str:
+    """Storage path for one rendition; identical content always lands on the same object"""
+    return f"content/{content_hash[:2]}/{content_hash}/{size_name}_{compression_level}.{ext}"
+
+
+def content_key(url_or_path: Optional[str]) -> Optional[Tuple[str, str]]:
+    """``(content_hash, compression_level)`` for a shared object's URL or path, else None"""
+    if not url_or_path:
+        return None
+    match = CONTENT_PATH_RE.search(url_or_path.split('?', 1)[0])
+    return (match.group(1), match.group(2)) if match else None
+
+
+def is_shared(url_or_path: Optional[str]) -> bool:
+    """Shared objects are never deleted directly; only the orphan pruner removes them"""
+    return content_key(url_or_path) is not None
+
+
+def asset_metadata(asset: Dict[str, Any], vendor_id: str, product_id: str) -> Dict[str, Any]:
+    """Processing metadata for an upload served from an existing asset"""
+    original_size = asset['original_size']
+    compressed_size = asset['compressed_size']
+    return {
+        'original_size': original_size,
+        'compressed_size': compressed_size,
+        'compression_ratio': (1 - compressed_size / original_size) * 100 if original_size else 0,
+        'image_hash': asset['content_hash'],
+        'format': asset['format'],
+        'dimensions': asset['dimensions'],
+        'color_mode': asset['color_mode'],
+        'vendor_id': vendor_id,
+        'product_id': product_id,
+        'processed_at': None,
+        'deduplicated': True,
+    }
+
+
+class ImageStore:
+    def __init__(self):
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return db_session.async_engine is not None
+
+    async def lookup(self, content_hash: str, compression_level: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        try:
+            async with db_session.async_engine.begin() as conn:
+                row = (await conn.execute(pgbouncer_safe(LOOKUP_SQL), {
+                    "content_hash": content_hash, "compression_level": compression_level
+                })).first()
+        except Exception as e:
+            logger.warning(f"Image asset lookup failed: {e}")
+            return None
+        if row is None:
+            return None
+        renditions = row.renditions if isinstance(row.renditions, dict) else json.loads(row.renditions)
+        return {
+            'content_hash': row.content_hash,
+            'compression_level': row.compression_level,
+            'original_size': row.original_size,
+            'compressed_size': row.compressed_size,
+            'format': row.format,
+            'dimensions': (row.width, row.height) if row.width else None,
+            'color_mode': row.color_mode,
+            'renditions': renditions,
+        }
+
+    async def record(self, asset: Dict[str, Any]) -> None:
+        if not self.enabled:
+            return
+        width, height = asset.get('dimensions') or (None, None)
+        try:
+            async with db_session.async_engine.begin() as conn:
+                await conn.execute(pgbouncer_safe(RECORD_SQL), {
+                    "content_hash": asset['content_hash'],
+                    "compression_level": asset['compression_level'],
+                    "original_size": asset['original_size'],
+                    "compressed_size": asset['compressed_size'],
+                    "format": asset.get('format'),
+                    "width": width,
+                    "height": height,
+                    "color_mode": asset.get('color_mode'),
+                    "renditions": json.dumps(asset['renditions']),
+                })
+        except Exception as e:
+            logger.warning(f"Recording image asset {asset['content_hash'][:12]} failed: {e}")
+
+    async def link(self, content_hash: str, compression_level: str, vendor_id: str, product_id: str) -> None:
+        if not self.enabled:
+            return
+        try:
+            async with db_session.async_engine.begin() as conn:
+                await conn.execute(pgbouncer_safe(LINK_SQL), {
+                    "content_hash": content_hash,
+                    "compression_level": compression_level,
+                    "vendor_id": str(vendor_id),
+                    "product_id": str(product_id),
+                })
+        except Exception as e:
+            logger.warning(f"Linking image asset {content_hash[:12]} failed: {e}")
+
+    async def release(self, url: str, product_id: str) -> bool:
+        """
+        Drop ``product_id``'s link to the shared object at ``url``. Returns False
+        when ``url`` is not a shared object, in which case the caller owns it and
+        deletes it as before.
+        """
+        key = content_key(url)
+        if key is None:
+            return False
+        if self.enabled:
+            try:
+                async with db_session.async_engine.begin() as conn:
+                    await conn.execute(pgbouncer_safe(UNLINK_SQL), {
+                        "product_id": str(product_id), "content_hash": key[0], "compression_level": key[1],
+                    })
+            except Exception as e:
+                logger.warning(f"Unlinking image asset {key[0][:12]} from product {product_id} failed: {e}")
+        return True
+
+    async def unlink_product(self, product_id: str) -> None:
+        """Drop every link a deleted product holds; its assets become orphans once nothing else uses them"""
+        if not self.enabled:
+            return
+        try:
+            async with db_session.async_engine.begin() as conn:
+                await conn.execute(pgbouncer_safe(UNLINK_PRODUCT_SQL), {"product_id": str(product_id)})
+        except Exception as e:
+            logger.warning(f"Unlinking image assets of product {product_id} failed: {e}")
+
+    async def get_or_create(
+        self,
+        content_hash: str,
+        compression_level: str,
+        create: Callable[[], Awaitable[Optional[Dict[str, Any]]]]
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        Return ``(asset, deduplicated)``.
+
+        ``create`` renders and uploads the content and returns the asset to record,
+        or None if the result should not be shared (e.g. a rendition failed to upload).
+        It only runs when neither the index nor an in-flight upload has this content.
+        """
+        key = (content_hash, compression_level)
+        asset = await self.lookup(content_hash, compression_level)
+        if asset is not None:
+            return asset, True
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            shared = await asyncio.shield(pending)
+            if shared is not None:
+                return shared, True
+            # The first upload could not be shared; do our own
+            return await self._create(key, create), False
+
+        return await self._create(key, create), False
+
+    async def _create(self, key: Tuple[str, str], create) -> Dict[str, Any]:
+        future = asyncio.get_running_loop().create_future()
+        self._inflight.setdefault(key, future)
+        try:
+            asset = await create()
+            if asset is not None:
+                await self.record(asset)
+            future.set_result(asset)
+            return asset
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved when nobody was waiting
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    async def vendor_stats(self, vendor_id: str) -> Dict[str, int]:
+        empty = {
+            'total_images': 0, 'unique_images': 0, 'logical_original_bytes': 0,
+            'logical_stored_bytes': 0, 'stored_bytes': 0,
+        }
+        if not self.enabled:
+            return empty
+        async with db_session.async_engine.connect() as conn:
+            row = (await conn.execute(pgbouncer_safe(VENDOR_STATS_SQL), {"vendor_id": str(vendor_id)})).first()
+        return {key: int(getattr(row, key) or 0) for key in empty} if row else empty
+
+    async def prune_orphans(self, grace: float) -> List[Dict[str, Any]]:
+        """
+        Drop assets no upload links to and nothing has used for ``grace`` seconds;
+        returns them so their objects can be deleted
+        """
+        if not self.enabled:
+            return []
+        async with db_session.async_engine.begin() as conn:
+            rows = (await conn.execute(pgbouncer_safe(PRUNE_ORPHANS_SQL), {"grace": grace})).all()
+        return [
+            {
+                'content_hash': row.content_hash,
+                'compressed_size': row.compressed_size,
+                'renditions': row.renditions if isinstance(row.renditions, dict) else json.loads(row.renditions),
+            }
+            for row in rows
+        ]
+
+
+image_store = ImageStore()
@@ -12,8 +12,13 @@ import logging
 from datetime import datetime
 import json
 
+from .config import settings
 from .image_processor import image_processor
+from .image_renditions import content_hash
+from .image_store import RAW_LEVEL, asset_metadata, content_path, image_store
+from .periodic import PeriodicTask
 from .supabase_storage import SupabaseStorageClient
+from .upload_scheduler import LocalStorageBackend, upload_scheduler
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +27,8 @@ class OptimizedStorageService:
     
     def __init__(self):
         self.storage_client = SupabaseStorageClient()
+        self.upload_scheduler = upload_scheduler
+        self.local_backend = LocalStorageBackend()
         self.compression_enabled = True
         self.deduplication_enabled = True
         self.cache_enabled = True
@@ -56,36 +63,67 @@ class OptimizedStorageService:
             Dict containing upload results and metadata
         """
         try:
-            # Process image with compression
-            processing_result = await image_processor.process_vendor_image(
-                file, vendor_id, product_id, compression_level
-            )
-            
-            if not processing_result['success']:
-                raise HTTPException(status_code=400, detail="Image processing failed")
-            
-            # Upload processed images to storage
-            upload_results = {}
-            metadata = processing_result['metadata']
+            raw_data = await file.read()
+            await file.seek(0)
+            image_hash = await asyncio.get_event_loop().run_in_executor(None, content_hash, raw_data)
+            processed = {}
             
-            for size_name, image_data in processing_result['images'].items():
-                # Generate optimized filename
-                filename = self._generate_filename(
-                    vendor_id, product_id, size_name, 
-                    metadata['format'], compression_level
+            async def render_and_upload() -> Optional[Dict[str, any]]:
+                # Process image with compression
+                processing_result = await image_processor.process_vendor_image(
+                    file, vendor_id, product_id, compression_level
                 )
                 
-                # Upload to storage
-                upload_result = await self._upload_processed_image(
-                    image_data['data'], filename, size_name
-                )
+                if not processing_result['success']:
+                    raise HTTPException(status_code=400, detail="Image processing failed")
+                
+                # Upload every rendition concurrently under the content hash
+                metadata = processing_result['metadata']
+                size_names = list(processing_result['images'])
+                uploads = await asyncio.gather(*(
+                    self._upload_processed_image(
+                        processing_result['images'][size_name]['data'],
+                        self._generate_content_filename(image_hash, size_name, metadata['format'], compression_level),
+                        size_name
+                    )
+                    for size_name in size_names
+                ))
+                upload_results = dict(zip(size_names, uploads))
                 
-                upload_results[size_name] = upload_result
+                processed.update(metadata=metadata, upload_results=upload_results)
+                if not all(result.get('success', False) for result in upload_results.values()):
+                    return None  # Do not let later uploads link to a partial set
+                return {
+                    'content_hash': image_hash,
+                    'compression_level': compression_level,
+                    'original_size': metadata['original_size'],
+                    'compressed_size': metadata['compressed_size'],
+                    'format': metadata['format'],
+                    'dimensions': metadata['dimensions'],
+                    'color_mode': metadata['color_mode'],
+                    'renditions': upload_results
+                }
             
-            # Store metadata
-            metadata_file = await self._store_image_metadata(
-                vendor_id, product_id, metadata, upload_results
+            # Identical content is rendered and stored once; duplicates just link to it
+            asset, deduplicated = await image_store.get_or_create(
+                image_hash, compression_level, render_and_upload
             )
+            if asset is not None:
+                await image_store.link(image_hash, compression_level, vendor_id, product_id)
+            
+            if deduplicated:
+                metadata = asset_metadata(asset, vendor_id, product_id)
+                upload_results = asset['renditions']
+                metadata_file = None
+                logger.info(f"Duplicate image {image_hash[:12]} linked to existing renditions")
+            else:
+                metadata = processed['metadata']
+                upload_results = processed['upload_results']
+                
+                # Store metadata
+                metadata_file = await self._store_image_metadata(
+                    vendor_id, product_id, metadata, upload_results
+                )
             
             # Run verification if requested
             verification_result = None
@@ -109,7 +147,8 @@ class OptimizedStorageService:
                 'verification': verification_result,
                 'efficiency': efficiency_stats,
                 'compression_ratio': metadata['compression_ratio'],
-                'space_saved_mb': efficiency_stats['space_saved_mb']
+                'space_saved_mb': efficiency_stats['space_saved_mb'],
+                'deduplicated': deduplicated
             }
             
         except Exception as e:
@@ -120,13 +159,36 @@ class OptimizedStorageService:
         """Save raw uploaded image without processing, to ensure real persistence when compression fails."""
         try:
             data = await file.read()
-            filename = self._generate_filename(vendor_id, product_id, 'original', 'JPEG', 'low')
-            result = await self._upload_processed_image(data, filename, 'original')
+            await file.seek(0)
+            image_hash = await asyncio.get_event_loop().run_in_executor(None, content_hash, data)
+            uploaded = {}
+            
+            async def upload_raw() -> Optional[Dict[str, any]]:
+                filename = self._generate_content_filename(image_hash, 'original', 'JPEG', RAW_LEVEL)
+                uploaded['original'] = await self._upload_processed_image(data, filename, 'original')
+                if not uploaded['original'].get('success', False):
+                    return None
+                return {
+                    'content_hash': image_hash,
+                    'compression_level': RAW_LEVEL,
+                    'original_size': len(data),
+                    'compressed_size': len(data),
+                    'format': None,
+                    'dimensions': None,
+                    'color_mode': None,
+                    'renditions': dict(uploaded)
+                }
+            
+            asset, deduplicated = await image_store.get_or_create(image_hash, RAW_LEVEL, upload_raw)
+            if asset is not None:
+                await image_store.link(image_hash, RAW_LEVEL, vendor_id, product_id)
+            result = asset['renditions']['original'] if asset is not None else uploaded['original']
             return {
                 'success': result.get('success', False),
                 'url': result.get('url'),
                 'path': result.get('path'),
-                'size': result.get('size')
+                'size': result.get('size'),
+                'deduplicated': deduplicated
             }
         except Exception as e:
             logger.error(f"Saving raw image failed: {str(e)}")
@@ -139,32 +201,28 @@ class OptimizedStorageService:
         product_id: str,
         compression_level: str = 'auto'
     ) -> Dict[str, any]:
-        """Upload multiple images with batch processing"""
-        results = []
-        total_original_size = 0
-        total_compressed_size = 0
-        
-        for i, file in enumerate(files):
+        """Upload multiple images in parallel; the rendition engine bounds concurrency"""
+        async def upload(i: int, file: UploadFile) -> Dict[str, any]:
             try:
-                result = await self.upload_vendor_image(
+                return await self.upload_vendor_image(
                     file, vendor_id, f"{product_id}_{i}", compression_level
                 )
-                results.append(result)
-                
-                # Accumulate size statistics
-                total_original_size += result['metadata']['original_size']
-                total_compressed_size += result['metadata']['compressed_size']
-                
             except Exception as e:
                 logger.error(f"Batch upload failed for image {i}: {str(e)}")
-                results.append({
+                return {
                     'success': False,
                     'error': str(e),
                     'filename': file.filename
-                })
+                }
         
-        # Calculate batch statistics
+        results = await asyncio.gather(*(upload(i, file) for i, file in enumerate(files)))
+        
+        # Accumulate size statistics
         successful_uploads = [r for r in results if r.get('success', False)]
+        total_original_size = sum(r['metadata']['original_size'] for r in successful_uploads)
+        total_compressed_size = sum(r['metadata']['compressed_size'] for r in successful_uploads)
+        
+        # Calculate batch statistics
         batch_compression_ratio = (1 - total_compressed_size / total_original_size) * 100 if total_original_size > 0 else 0
         
         return {
@@ -195,74 +253,68 @@ class OptimizedStorageService:
             'auto': 'auto'
         }.get(compression_level, 'auto')
         
-        # Choose file extension based on format
-        if format == 'AVIF':
-            ext = 'avif'
-        elif format == 'WEBP':
-            ext = 'webp'
-        else:
-            ext = 'jpg'
+        ext = self._file_extension(format)
         
         return f"{vendor_id}/{product_id}/{size_name}_{compression_suffix}_{timestamp}.{ext}"
     
+    def _generate_content_filename(
+        self, 
+        image_hash: str, 
+        size_name: str, 
+        format: str, 
+        compression_level: str
+    ) -> str:
+        """Content-addressed filename: identical uploads share one storage object"""
+        return content_path(image_hash, size_name, compression_level, self._file_extension(format))
+    
+    def _file_extension(self, format: str) -> str:
+        """Choose file extension based on format"""
+        if format == 'AVIF':
+            return 'avif'
+        elif format == 'WEBP':
+            return 'webp'
+        return 'jpg'
+    
     async def _upload_processed_image(
         self, 
         image_data: bytes, 
         filename: str, 
         size_name: str
     ) -> Dict[str, any]:
-        """Upload processed image to storage"""
+        """Upload processed image to storage through the shared upload scheduler"""
+        # Determine bucket based on size
+        bucket_name = self._get_bucket_for_size(size_name)
         try:
-            # Determine bucket based on size
-            bucket_name = self._get_bucket_for_size(size_name)
-            
-            # Upload to Supabase storage
-            upload_result = await asyncio.get_event_loop().run_in_executor(
-                None, self.storage_client.upload_file, bucket_name, filename, image_data
-            )
-
-            # Supabase client returns a public URL string in current implementation
-            if isinstance(upload_result, str):
-                public_url = upload_result
-                return {
-                    'success': True,
-                    'filename': filename,
-                    'bucket': bucket_name,
-                    'size': len(image_data),
-                    'url': public_url,
-                    'path': filename
-                }
-            else:
-                # Fallback if a dict-like result is returned
-                return {
-                    'success': True,
-                    'filename': filename,
-                    'bucket': bucket_name,
-                    'size': len(image_data),
-                    'url': upload_result.get('url') if upload_result else None,
-                    'path': upload_result.get('path') if upload_result else filename
-                }
+            upload_result = await self.upload_scheduler.upload(bucket_name, filename, image_data)
+            return {
+                'success': True,
+                'filename': filename,
+                'bucket': bucket_name,
+                'size': len(image_data),
+                'url': upload_result.get('url'),
+                'path': upload_result.get('path') or filename
+            }
             
         except Exception as e:
             logger.error(f"Storage upload failed: {str(e)}")
+            if isinstance(self.upload_scheduler.backend, LocalStorageBackend):
+                return {
+                    'success': False,
+                    'error': str(e),
+                    'filename': filename
+                }
             # Real fallback: write to local media folder so feature still works without Supabase
             try:
-                local_root = Path(os.getenv('MEDIA_ROOT', 'media')).resolve()
-                local_path = local_root / bucket_name / filename
-                local_path.parent.mkdir(parents=True, exist_ok=True)
-                def _write_file():
-                    with open(local_path, 'wb') as f:
-                        f.write(image_data)
-                await asyncio.get_event_loop().run_in_executor(None, _write_file)
-                local_url_base = os.getenv('MEDIA_URL', '/media')
-                local_url = f"{local_url_base}/{bucket_name}/{filename}"
+                local_result = await asyncio.get_event_loop().run_in_executor(
+                    None, self.local_backend.upload, bucket_name, filename, image_data
+                )
                 return {
                     'success': True,
                     'filename': filename,
                     'bucket': bucket_name,
                     'size': len(image_data),
-                    'url': local_url,
-                    'path': str(local_path)
+                    'url': local_result['url'],
+                    'path': local_result['path']
                 }
             except Exception as e2:
                 logger.error(f"Local media fallback failed: {str(e2)}")
@@ -304,7 +356,7 @@ class OptimizedStorageService:
         try:
             # Upload metadata to storage
             metadata_json = json.dumps(metadata_record, indent=2)
-            await self.storage_client.upload_file(
+            await self.upload_scheduler.upload(
                 'metadata', metadata_filename, metadata_json.encode()
             )
             
@@ -354,6 +406,14 @@ class OptimizedStorageService:
         
         return verification_results
     
+    def get_upload_metrics(self) -> Dict[str, any]:
+        """Per-bucket upload latency histograms"""
+        return {
+            'backend': self.upload_scheduler.backend.name,
+            'max_concurrency': self.upload_scheduler.max_concurrency,
+            'buckets': self.upload_scheduler.metrics()
+        }
+    
     def _calculate_storage_efficiency(
         self, 
         metadata: Dict, 
@@ -379,32 +439,67 @@ class OptimizedStorageService:
         }
     
     async def get_storage_analytics(self, vendor_id: str) -> Dict[str, any]:
-        """Get storage analytics for vendor"""
+        """Get storage analytics for vendor, including what deduplication saved"""
         try:
-            # This would query the database for vendor's storage statistics
-            # For now, return mock data
+            stats = await image_store.vendor_stats(vendor_id)
+            stored_bytes = stats['stored_bytes']
+            dedup_saved = stats['logical_stored_bytes'] - stored_bytes
+            total_saved = stats['logical_original_bytes'] - stored_bytes
+            compression_ratio = (
+                (1 - stats['logical_stored_bytes'] / stats['logical_original_bytes']) * 100
+                if stats['logical_original_bytes'] > 0 else 0
+            )
             return {
                 'vendor_id': vendor_id,
-                'total_images': 0,
-                'total_storage_mb': 0,
-                'average_compression_ratio': 0,
-                'total_space_saved_mb': 0,
-                'storage_cost_savings': 0,
-                'efficiency_score': 0
+                'total_images': stats['total_images'],
+                'unique_images': stats['unique_images'],
+                'duplicate_uploads': stats['total_images'] - stats['unique_images'],
+                'total_storage_mb': stored_bytes / (1024 * 1024),
+                'average_compression_ratio': compression_ratio,
+                'dedup_space_saved_mb': dedup_saved / (1024 * 1024),
+                'total_space_saved_mb': total_saved / (1024 * 1024),
+                'storage_cost_savings': total_saved / (1024 * 1024) * 0.02,  # $0.02 per MB saved
+                'efficiency_score': min(100, compression_ratio * 1.5)
             }
         except Exception as e:
             logger.error(f"Analytics retrieval failed: {str(e)}")
             return {'error': str(e)}
     
     async def optimize_existing_images(self, vendor_id: str) -> Dict[str, any]:
-        """Optimize existing images for better compression"""
-        # This would re-process existing images with better compression
-        return {
-            'vendor_id': vendor_id,
-            'images_optimized': 0,
-            'space_saved_mb': 0,
-            'compression_improvement': 0
-        }
+        """Report what deduplication saves the vendor; orphaned renditions are pruned in the background"""
+        try:
+            stats = await image_store.vendor_stats(vendor_id)
+            dedup_saved = stats['logical_stored_bytes'] - stats['stored_bytes']
+            return {
+                'vendor_id': vendor_id,
+                'images_optimized': stats['total_images'] - stats['unique_images'],
+                'space_saved_mb': dedup_saved / (1024 * 1024),
+                'compression_improvement': (
+                    dedup_saved / stats['logical_stored_bytes'] * 100 if stats['logical_stored_bytes'] > 0 else 0
+                )
+            }
+        except Exception as e:
+            logger.error(f"Image optimization failed: {str(e)}")
+            return {'error': str(e)}
+
+    async def prune_orphaned_images(self) -> int:
+        """Delete assets (and their stored renditions) that no upload has linked to for the grace period"""
+        orphans = await image_store.prune_orphans(settings.IMAGE_ORPHAN_GRACE)
+        await asyncio.gather(*(
+            self.upload_scheduler.delete(
+                result.get('bucket') or self._get_bucket_for_size(size_name),
+                result.get('filename') or result.get('path')
+            )
+            for orphan in orphans
+            for size_name, result in orphan['renditions'].items()
+        ), return_exceptions=True)
+        if orphans:
+            pruned_mb = sum(orphan['compressed_size'] for orphan in orphans) / (1024 * 1024)
+            logger.info(f"Pruned {len(orphans)} orphaned image assets ({pruned_mb:.1f} MB)")
+        return len(orphans)
 
 # Global instance
 optimized_storage = OptimizedStorageService()
+image_orphan_pruner = PeriodicTask(
+    "orphaned image pruning", optimized_storage.prune_orphaned_images, settings.IMAGE_PRUNE_INTERVAL
+)
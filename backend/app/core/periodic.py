@@ -0,0 +1,52 @@
+"""
+Background jobs that run on a fixed interval for the life of the app.
+
+Each job is a ``PeriodicTask`` created at import time and started/stopped
+from the app lifespan, like the other background components.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Optional
+
+from app.core.logging import get_logger
+
+logger = get_logger("core.periodic")
+
+
+class PeriodicTask:
+    """Awaits ``job`` every ``interval`` seconds; an interval of 0 or less disables it"""
+
+    def __init__(self, name: str, job: Callable[[], Awaitable[Any]], interval: float, run_at_start: bool = False):
+        self.name = name
+        self.job = job
+        self.interval = interval
+        # Run once as soon as the task starts instead of waiting a full interval first
+        self.run_at_start = run_at_start
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self) -> None:
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self) -> None:
+        if not self.run_at_start:
+            await asyncio.sleep(self.interval)
+        while True:
+            try:
+                await self.job()
+            except Exception as e:
+                logger.error(f"Periodic task {self.name} failed: {e}")
+            await asyncio.sleep(self.interval)
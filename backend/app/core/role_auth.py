@@ -1,13 +1,17 @@
+import asyncio
 from typing import Dict, Any, Optional, List
 from fastapi import Depends, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import TTLCache
 from app.core.exceptions import AuthenticationException, AuthorizationException
 from app.core.logging import get_logger
-from app.database.base import get_supabase_client
+from app.core.security import can_verify_locally, cached_token_claims, remember_verified_token, verify_access_token
+from app.database.base import get_supabase_client, get_anon_supabase_client
 from app.database.session import get_async_session
 from app.features.auth.cruds.auth_crud import AuthCrud
 from enum import Enum
+from jose import jwt
 import os
 from app.core.config import settings
 
@@ -19,12 +23,135 @@ class UserRole(str, Enum):
     SUPPLIER = "supplier" 
     ADMIN = "admin"
 
-async def get_optional_user(request: Request):
-    auth_header = request.headers.get("authorization")
-    if not auth_header:
+_auth_crud: Optional[AuthCrud] = None
+# user id -> principal built from the users row; short-lived so role changes show up quickly
+_principals = TTLCache(maxsize=settings.JWT_VERIFIED_CACHE_SIZE, ttl=settings.AUTH_USER_CACHE_TTL)
+
+DEBUG_TOKENS = ("debug-token", "auth-bypass", "dev-bypass")
+
+def _get_auth_crud() -> AuthCrud:
+    # One AuthCrud (and its Supabase clients) per process instead of one per request
+    global _auth_crud
+    if _auth_crud is None:
+        _auth_crud = AuthCrud()
+    return _auth_crud
+
+def forget_cached_user(user_id: str) -> None:
+    """Drop the cached principal after the user's row changes"""
+    _principals.invalidate(str(user_id))
+
+def _claims_via_supabase_api(token: str) -> Dict[str, Any]:
+    """Validate with Supabase Auth over the network; only used when the token cannot be verified locally"""
+    if not settings.SUPABASE_URL or not settings.SUPABASE_ANON_KEY:
+        logger.error("Supabase configuration missing - URL or ANON_KEY not set")
+        raise AuthenticationException("Supabase configuration missing")
+    
+    user_response = get_anon_supabase_client().auth.get_user(token)
+    if not user_response or not getattr(user_response, "user", None):
+        logger.error(f"Token validation returned invalid response: user_response={user_response}")
+        raise AuthenticationException("Invalid token response")
+    user = user_response.user
+    try:
+        exp = jwt.get_unverified_claims(token).get("exp")
+    except Exception:
+        exp = None
+    return {
+        "sub": user.id,
+        "email": user.email,
+        "phone": user.phone,
+        "user_metadata": getattr(user, "user_metadata", {}) or {},
+        "email_verified": user.email_confirmed_at is not None,
+        "exp": exp,
+    }
+
+async def _verify_token(token: str) -> Dict[str, Any]:
+    if can_verify_locally(token):
+        return await verify_access_token(token)
+    claims = cached_token_claims(token)
+    if claims is None:
+        claims = await asyncio.get_running_loop().run_in_executor(None, _claims_via_supabase_api, token)
+        remember_verified_token(token, claims)
+    return claims
+
+def _principal_from_user(user_data) -> Dict[str, Any]:
+    # Handle user_type enum - convert to string value
+    user_role = user_data.user_type
+    if hasattr(user_role, 'value'):
+        user_role = user_role.value
+    elif not isinstance(user_role, str):
+        user_role = str(user_role)
+    user_role = user_role.lower() if isinstance(user_role, str) else "buyer"
+    
+    return {
+        "id": str(user_data.id),
+        "email": user_data.email,
+        "user_role": user_role,
+        "phone": user_data.phone,
+        "first_name": user_data.first_name,
+        "last_name": user_data.last_name,
+        "is_verified": user_data.is_email_verified if hasattr(user_data, 'is_email_verified') else user_data.is_verified,
+        "is_active": user_data.is_active,
+        "last_login_at": user_data.last_login_at.isoformat() if user_data.last_login_at else None,
+    }
+
+def _principal_from_claims(claims: Dict[str, Any]) -> Dict[str, Any]:
+    # Basic info from the token's user_metadata for users not yet in the database
+    user_metadata = claims.get("user_metadata") or {}
+    full_name = user_metadata.get("full_name") or user_metadata.get("name") or ""
+    first_name = user_metadata.get("first_name") or (full_name.split()[0] if full_name else "User")
+    last_name = user_metadata.get("last_name") or (" ".join(full_name.split()[1:]) if full_name and len(full_name.split()) > 1 else "")
+    
+    return {
+        "id": claims["sub"],
+        "email": claims.get("email") or "",
+        "user_role": str(user_metadata.get("user_type", user_metadata.get("role", "buyer"))).lower(),
+        "phone": claims.get("phone") or "+10000000000",
+        "first_name": first_name,
+        "last_name": last_name,
+        "is_verified": bool(claims.get("email_verified", user_metadata.get("email_verified", False))),
+        "is_active": True,
+        "last_login_at": None,
+    }
+
+async def authenticate_token(db: AsyncSession, token: str) -> Dict[str, Any]:
+    """
+    Resolve a bearer token to the user dict routes receive.
+
+    Tokens are verified locally (HS256 secret or cached JWKS) and memoized until
+    they expire; the users row is cached for AUTH_USER_CACHE_TTL seconds, so a
+    warm request costs no network or database round trip.
+    """
+    claims = await _verify_token(token)
+    user_id = claims.get("sub")
+    if not user_id:
+        raise AuthenticationException("Invalid token: missing user ID")
+    
+    principal = _principals.get(str(user_id))
+    if principal is None:
+        try:
+            user_data = await _get_auth_crud().get_by_id(db, user_id)
+        except Exception as db_err:
+            logger.warning(f"Could not get user from database: {db_err}, using token claims")
+            return {**_principal_from_claims(claims), "access_token": token}
+        
+        if user_data:
+            principal = _principal_from_user(user_data)
+        else:
+            logger.warning(f"User {user_id} authenticated in Supabase but not found in database")
+            principal = _principal_from_claims(claims)
+        _principals.set(str(user_id), principal)
+    
+    return {**principal, "access_token": token}
+
+async def get_optional_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
+    db: AsyncSession = Depends(get_async_session),
+) -> Optional[Dict[str, Any]]:
+    token = credentials.credentials if credentials else None
+    if not token or token in DEBUG_TOKENS or len(token) <= 20:
         return None
     try:
-        return await get_user_from_token()
+        return await authenticate_token(db, token)
     except Exception:
         return None
 
@@ -33,136 +160,18 @@ async def get_user_from_token(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
     db: AsyncSession = Depends(get_async_session),
 ) -> Dict[str, Any]:
-    logger.info(f"get_user_from_token called: DEBUG={settings.DEBUG}, path={request.url.path if request else 'unknown'}, has_token={credentials and hasattr(credentials, 'credentials') and bool(credentials.credentials)}")
-    
     # FIRST: Try to authenticate with real token if provided (even in DEBUG mode)
-    # Make sure we catch all exceptions during token validation
     if credentials and hasattr(credentials, "credentials") and credentials.credentials:
         token = credentials.credentials
         # Don't treat obvious debug tokens as real
-        if token not in ["debug-token", "auth-bypass", "dev-bypass"] and len(token) > 20:
+        if token not in DEBUG_TOKENS and len(token) > 20:
             try:
-                logger.info(f"Attempting real authentication with token (length: {len(token)})")
-                # Use ANON_KEY client for token validation, not SERVICE_ROLE_KEY
-                from supabase import create_client
-                supabase_url = settings.SUPABASE_URL
-                supabase_anon_key = settings.SUPABASE_ANON_KEY
-                
-                if not supabase_url or not supabase_anon_key:
-                    logger.error("Supabase configuration missing - URL or ANON_KEY not set")
-                    raise AuthenticationException("Supabase configuration missing")
-                
-                # Create a client with ANON_KEY for token validation
-                auth_client = create_client(supabase_url, supabase_anon_key)
-                
-                try:
-                    # Use get_user with the token directly - this validates the JWT token
-                    # The token should be the access_token from Supabase session
-                    user_response = auth_client.auth.get_user(token)
-                    logger.info(f"✅ Token validated successfully via get_user()")
-                except Exception as get_user_err:
-                    logger.error(f"supabase.auth.get_user() raised exception: {get_user_err}")
-                    # Try alternative method - verify JWT token manually and get user via Admin API
-                    try:
-                        import jwt
-                        # Decode token to get user_id (without signature verification)
-                        try:
-                            decoded = jwt.decode(token, options={"verify_signature": False})
-                            user_id_from_token = decoded.get("sub")
-                            if user_id_from_token:
-                                logger.warning(f"Token decode succeeded but Supabase validation failed, using user_id from token: {user_id_from_token}")
-                                # Get user info from Supabase Admin API using service role
-                                from app.features.auth.cruds.auth_crud import AuthCrud
-                                auth_crud = AuthCrud()
-                                admin_response = auth_crud.admin_client.auth.admin.get_user_by_id(user_id_from_token)
-                                if admin_response and hasattr(admin_response, 'user') and admin_response.user:
-                                    # Create a mock response object that matches the expected structure
-                                    class MockResponse:
-                                        def __init__(self, user):
-                                            self.user = user
-                                    user_response = MockResponse(admin_response.user)
-                                    logger.info(f"✅ Got user via admin API")
-                                else:
-                                    raise get_user_err
-                            else:
-                                raise get_user_err
-                        except jwt.DecodeError as jwt_err:
-                            logger.error(f"JWT decode failed: {jwt_err}")
-                            raise get_user_err
-                    except Exception as alt_err:
-                        logger.error(f"Alternative auth method also failed: {alt_err}")
-                        raise get_user_err
-                
-                if user_response and hasattr(user_response, 'user') and user_response.user:
-                    logger.info(f"✅ Real user authenticated: {user_response.user.email} ({user_response.user.id})")
-                    user_id = user_response.user.id
-                    
-                    # Import AuthCrud here to avoid scoping issues
-                    from app.features.auth.cruds.auth_crud import AuthCrud
-                    auth_crud = AuthCrud()
-                    try:
-                    user_data = await auth_crud.get_by_id(db, user_id)
-                    except Exception as db_err:
-                        logger.warning(f"Could not get user from database: {db_err}, using Supabase Auth data")
-                        user_data = None
-                    
-                    if not user_data:
-                        logger.warning(f"User {user_id} authenticated in Supabase but not found in database")
-                        # Return basic info from Supabase Auth with user_metadata
-                        user_metadata = getattr(user_response.user, "user_metadata", {}) or {}
-                        # Extract first_name and last_name from user_metadata
-                        full_name = user_metadata.get("full_name") or user_metadata.get("name") or ""
-                        first_name = user_metadata.get("first_name") or (full_name.split()[0] if full_name else "User")
-                        last_name = user_metadata.get("last_name") or (" ".join(full_name.split()[1:]) if full_name and len(full_name.split()) > 1 else "")
-                        
-                        return {
-                            "id": user_id,
-                            "email": user_response.user.email or "",
-                            "user_role": user_metadata.get("user_type", user_metadata.get("role", "buyer")).lower(),
-                            "phone": user_response.user.phone or "+10000000000",
-                            "first_name": first_name,
-                            "last_name": last_name,
-                            "is_verified": user_response.user.email_confirmed_at is not None,
-                            "is_active": True,
-                            "last_login_at": None,
-                            "access_token": token,
-                        }
-                    
-                    # Handle user_type enum - convert to string value
-                    user_role = user_data.user_type
-                    if hasattr(user_role, 'value'):
-                        user_role = user_role.value
-                    elif not isinstance(user_role, str):
-                        user_role = str(user_role)
-                    user_role = user_role.lower() if isinstance(user_role, str) else "buyer"
-                    
-                    return {
-                        "id": str(user_data.id),
-                        "email": user_data.email,
-                        "user_role": user_role,
-                        "phone": user_data.phone,
-                        "first_name": user_data.first_name,
-                        "last_name": user_data.last_name,
-                        "is_verified": user_data.is_email_verified if hasattr(user_data, 'is_email_verified') else user_data.is_verified,
-                        "is_active": user_data.is_active,
-                        "last_login_at": user_data.last_login_at.isoformat() if user_data.last_login_at else None,
-                        "access_token": token,
-                    }
-                else:
-                    logger.error(f"Token validation returned invalid response: user_response={user_response}")
-                    raise AuthenticationException("Invalid token response")
+                return await authenticate_token(db, token)
             except Exception as e:
-                error_str = str(e).lower()
+                # A real token that fails validation is an error, even in DEBUG mode;
+                # this prevents falling back to fake user IDs
                 logger.error(f"Real token authentication failed: {e}")
-                # If we have a real token (length > 20) but validation failed, don't fall back to DEBUG mode
-                # This prevents using fake user IDs when real authentication is attempted
-                if token and len(token) > 20:
-                    # Real token provided but validation failed - this is a real error
-                    logger.error(f"Real token provided (length {len(token)}) but validation failed - not falling back to DEBUG mode")
-                    raise AuthenticationException(f"Token verification failed: {str(e)}")
-                # Only allow DEBUG fallback if no real token was provided
-                if not settings.DEBUG:
-                    raise AuthenticationException(f"Token verification failed: {str(e)}")
+                raise AuthenticationException(f"Token verification failed: {str(e)}")
     
     # Fallback: DEBUG mode bypass (only if no real token was provided)
     if settings.DEBUG:
@@ -283,7 +292,7 @@ async def get_all_users(user: Optional[Dict[str, Any]] = Depends(get_user_from_t
 def require_roles(allowed_roles: List[UserRole]):
     async def role_checker(user: Dict[str, Any] = Depends(get_user_from_token)) -> Dict[str, Any]:
         # Guard: handle missing user cleanly
-        logger.info(f"require_roles called: user={user is not None}, DEBUG={settings.DEBUG}, allowed_roles={[r.value for r in allowed_roles]}")
+        logger.debug(f"require_roles called: user={user is not None}, DEBUG={settings.DEBUG}, allowed_roles={[r.value for r in allowed_roles]}")
         if user is None:
             # In DEBUG mode, always auto-grant access with first allowed role
             if settings.DEBUG:
@@ -6,9 +6,12 @@ from jose import jwt, jwk
 from jose.utils import base64url_decode
 from fastapi import Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from app.core.cache import TTLCache
 from app.core.config import settings
 from app.core.exceptions import AuthenticationException, AuthorizationException, ExternalServiceException
 from app.core.logging import get_logger
+from app.core.periodic import PeriodicTask
+from app.database.base import get_supabase_rest_client
 from enum import Enum
 from app.features.auth.cruds.auth_crud import AuthCrud
 
@@ -22,35 +25,73 @@ class UserRole(str, Enum):
 
 _jwks_cache: Optional[Dict[str, Any]] = None
 _jwks_cache_ts: float = 0
+_jwks_keys: Dict[str, Any] = {}
+_jwks_forced_ts: float = 0
 JWKS_CACHE_TTL = settings.JWT_CACHE_TTL
+# An unknown ``kid`` may mean the keys rotated; refetch at most this often
+JWKS_FORCED_REFRESH_INTERVAL = 30
 
-async def fetch_jwks() -> Dict[str, Any]:
-    global _jwks_cache, _jwks_cache_ts
+# Verified access token -> claims; entries never outlive the token's ``exp``
+_verified_tokens = TTLCache(maxsize=settings.JWT_VERIFIED_CACHE_SIZE, ttl=JWKS_CACHE_TTL)
+
+
+def jwks_url() -> str:
+    if settings.SUPABASE_JWKS_URL:
+        return settings.SUPABASE_JWKS_URL
+    if settings.SUPABASE_URL:
+        return f"{settings.SUPABASE_URL.rstrip('/')}/auth/v1/.well-known/jwks.json"
+    return ""
+
+async def fetch_jwks(force: bool = False) -> Dict[str, Any]:
+    global _jwks_cache, _jwks_cache_ts, _jwks_keys
     
     current_time = time.time()
-    if _jwks_cache and (current_time - _jwks_cache_ts) < JWKS_CACHE_TTL:
+    if _jwks_cache and not force and (current_time - _jwks_cache_ts) < JWKS_CACHE_TTL:
         return _jwks_cache
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(settings.SUPABASE_JWKS_URL, timeout=10)
-            response.raise_for_status()
-            jwks = response.json()
+        response = await get_supabase_rest_client().request("GET", jwks_url(), operation="GET jwks")
+        response.raise_for_status()
+        jwks = response.json()
             
         _jwks_cache = jwks
         _jwks_cache_ts = current_time
+        _jwks_keys = {}
         logger.debug("JWKS cache updated")
         return jwks
-    except httpx.TimeoutException:
-        logger.error("JWKS fetch timeout")
-        raise ExternalServiceException("JWKS service timeout", "Supabase")
-    except httpx.HTTPStatusError as e:
-        logger.error(f"JWKS fetch HTTP error: {e.response.status_code}")
-        raise ExternalServiceException(f"JWKS service error: {e.response.status_code}", "Supabase")
     except Exception as e:
+        if _jwks_cache:
+            # Keep verifying with the last good key set rather than failing every request
+            logger.warning(f"JWKS refresh failed, keeping cached keys: {e}")
+            return _jwks_cache
+        if isinstance(e, ExternalServiceException):
+            logger.error(f"JWKS fetch failed: {e.message}")
+            raise
+        if isinstance(e, httpx.HTTPStatusError):
+            logger.error(f"JWKS fetch HTTP error: {e.response.status_code}")
+            raise ExternalServiceException(f"JWKS service error: {e.response.status_code}", "Supabase")
         logger.error(f"Failed to fetch JWKS: {str(e)}")
         raise ExternalServiceException("JWKS service unavailable", "Supabase")
 
+async def _jwks_key(kid: str):
+    """Constructed public key for ``kid``; keys are built once per JWKS fetch"""
+    global _jwks_forced_ts
+    key = _jwks_keys.get(kid)
+    if key is not None:
+        return key
+    
+    jwks = await fetch_jwks()
+    key_data = next((item for item in jwks.get("keys", []) if item.get("kid") == kid), None)
+    if key_data is None and time.time() - _jwks_forced_ts > JWKS_FORCED_REFRESH_INTERVAL:
+        _jwks_forced_ts = time.time()
+        jwks = await fetch_jwks(force=True)
+        key_data = next((item for item in jwks.get("keys", []) if item.get("kid") == kid), None)
+    if key_data is None:
+        raise AuthenticationException("Invalid token key ID")
+    key = (jwk.construct(key_data), key_data.get("alg"))
+    _jwks_keys[kid] = key
+    return key
+
 def _decode_with_secret(token: str) -> Dict[str, Any]:
     if not settings.SUPABASE_JWT_SECRET:
         raise AuthenticationException("Server JWT secret not configured")
@@ -74,19 +115,13 @@ def _decode_with_secret(token: str) -> Dict[str, Any]:
 
 
 async def _decode_with_jwks(token: str) -> Dict[str, Any]:
-    jwks = await fetch_jwks()
     unverified_header = jwt.get_unverified_header(token)
     kid = unverified_header.get("kid")
     if not kid:
         raise AuthenticationException("Token missing key ID")
-    key = None
-    for jwk_item in jwks.get("keys", []):
-        if jwk_item.get("kid") == kid:
-            key = jwk_item
-            break
-    if not key:
-        raise AuthenticationException("Invalid token key ID")
-    public_key = jwk.construct(key)
+    public_key, key_alg = await _jwks_key(kid)
+    if key_alg and unverified_header.get("alg") != key_alg:
+        raise AuthenticationException("Token algorithm does not match key")
     message, encoded_sig = token.rsplit(".", 1)
     decoded_sig = base64url_decode(encoded_sig.encode("utf-8"))
     if not public_key.verify(message.encode("utf-8"), decoded_sig):
@@ -107,36 +142,67 @@ async def _decode_with_jwks(token: str) -> Dict[str, Any]:
     return claims
 
 
+def can_verify_locally(token: str) -> bool:
+    """True when the token's algorithm can be checked without calling Supabase Auth"""
+    try:
+        alg = jwt.get_unverified_header(token).get("alg")
+    except Exception:
+        return False
+    if alg == "HS256":
+        return bool(settings.SUPABASE_JWT_SECRET)
+    return bool(jwks_url())
+
+
+def cached_token_claims(token: str) -> Optional[Dict[str, Any]]:
+    return _verified_tokens.get(token)
+
+
+def remember_verified_token(token: str, claims: Dict[str, Any]) -> None:
+    ttl = JWKS_CACHE_TTL
+    if claims.get("exp"):
+        ttl = min(ttl, int(claims["exp"]) - time.time())
+    if ttl > 0:
+        _verified_tokens.set(token, claims, ttl=ttl)
+
+
+async def verify_access_token(token: str) -> Dict[str, Any]:
+    """Verify a Supabase access token locally and return its claims; repeat tokens hit the LRU"""
+    claims = _verified_tokens.get(token)
+    if claims is not None:
+        return claims
+    try:
+        alg = jwt.get_unverified_header(token).get("alg")
+    except Exception as e:
+        raise AuthenticationException(f"Malformed token: {e}")
+    claims = _decode_with_secret(token) if alg == "HS256" else await _decode_with_jwks(token)
+    remember_verified_token(token, claims)
+    return claims
+
+
+async def refresh_jwks() -> None:
+    await fetch_jwks(force=True)
+
+
+# Keeps the JWKS warm so no request waits on a key fetch; off when no JWKS endpoint is configured
+jwks_refresher = PeriodicTask(
+    "JWKS refresh", refresh_jwks, max(JWKS_CACHE_TTL // 2, 60) if jwks_url() else 0, run_at_start=True
+)
+
+
 async def verify_supabase_jwt(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)
 ) -> Dict[str, Any]:
-    # TEMPORARILY DISABLED FOR REVIEW - Return mock claims
-    return {
-        "sub": "temp-vendor-123",
-        "email": "review@example.com",
-        "user_role": "supplier",
-        "app_metadata": {"role": "supplier"},
-        "user_metadata": {},
-        "phone": "+1234567890"
-    }
-    
-    # Original authentication code (commented out):
-    # if not credentials or credentials.scheme.lower() != "bearer":
-    #     raise AuthenticationException("Missing or invalid authorization header")
-    # token = credentials.credentials
-    # try:
-    #     claims = _decode_with_secret(token)
-    #     logger.debug(f"Token verified with secret for user: {claims.get('sub')}")
-    #     return claims
-    # except AuthenticationException as secret_err:
-    #     logger.warning(f"HS256 verification failed, trying JWKS: {secret_err}")
-    #     try:
-    #         claims = await _decode_with_jwks(token)
-    #         logger.debug(f"Token verified with JWKS for user: {claims.get('sub')}")
-    #         return claims
-    #     except Exception as e:
-    #         logger.error(f"JWT verification failed: {e}")
-    #         raise AuthenticationException("Token verification failed")
+    if not credentials or credentials.scheme.lower() != "bearer":
+        raise AuthenticationException("Missing or invalid authorization header")
+    try:
+        claims = await verify_access_token(credentials.credentials)
+        logger.debug(f"Token verified for user: {claims.get('sub')}")
+        return claims
+    except AuthenticationException:
+        raise
+    except Exception as e:
+        logger.error(f"JWT verification failed: {e}")
+        raise AuthenticationException("Token verification failed")
 
 def require_roles(allowed_roles: list[UserRole]):
     async def role_checker(claims: Dict[str, Any] = Depends(verify_supabase_jwt)) -> Dict[str, Any]:
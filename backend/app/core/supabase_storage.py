@@ -1,4 +1,4 @@
-from supabase import create_client, Client
+from supabase import Client
 from typing import Optional, Union, BinaryIO
 import uuid
 import os
@@ -7,15 +7,23 @@ from io import BytesIO
 from app.core.config import settings
 from app.core.logging import get_logger
 from app.core.exceptions import ValidationException
+from app.database.base import get_client_registry
 
 logger = get_logger("supabase_storage")
 
+# Process-wide, like the client itself: buckets confirmed to exist and whether the
+# service key has been checked against storage, so per-request instances skip list_buckets
+_known_buckets: set = set()
+_storage_verified = False
+
 class SupabaseStorageClient:
     def __init__(self):
         self._client: Optional[Client] = None
+        self._known_buckets = _known_buckets
     
     @property
     def client(self) -> Client:
+        global _storage_verified
         if self._client is None:
             if not settings.SUPABASE_URL:
                 raise ValidationException("SUPABASE_URL must be set in environment variables")
@@ -23,16 +31,17 @@ class SupabaseStorageClient:
                 raise ValidationException("SUPABASE_SERVICE_ROLE_KEY must be set in environment variables for storage operations")
             
             try:
-                self._client = create_client(
-                    settings.SUPABASE_URL,
-                    settings.SUPABASE_SERVICE_ROLE_KEY
-                )
-                # Test connection by attempting to list buckets
-                try:
-                    self._client.storage.list_buckets()
-                except Exception as e:
-                    logger.error(f"Supabase storage authentication failed. Please verify SUPABASE_SERVICE_ROLE_KEY is correct: {str(e)}")
-                    raise ValidationException(f"Supabase storage authentication failed. Please check your SUPABASE_SERVICE_ROLE_KEY: {str(e)}")
+                client = get_client_registry().get("service")
+                if not _storage_verified:
+                    # Test connection by attempting to list buckets
+                    try:
+                        buckets = client.storage.list_buckets()
+                    except Exception as e:
+                        logger.error(f"Supabase storage authentication failed. Please verify SUPABASE_SERVICE_ROLE_KEY is correct: {str(e)}")
+                        raise ValidationException(f"Supabase storage authentication failed. Please check your SUPABASE_SERVICE_ROLE_KEY: {str(e)}")
+                    _known_buckets.update(bucket.name for bucket in buckets)
+                    _storage_verified = True
+                self._client = client
             except ValidationException:
                 raise
             except Exception as e:
@@ -102,15 +111,20 @@ class SupabaseStorageClient:
         """
         Ensure bucket exists in Supabase Storage
         """
+        if bucket_name in self._known_buckets:
+            return
         try:
             # List buckets to check if it exists
             buckets = self.client.storage.list_buckets()
             bucket_names = [bucket.name for bucket in buckets] if buckets else []
             
-            if bucket_name not in bucket_names:
+            if bucket_name in bucket_names:
+                self._known_buckets.add(bucket_name)
+            else:
                 # Create bucket if it doesn't exist
                 try:
                     self.client.storage.create_bucket(bucket_name)
+                    self._known_buckets.add(bucket_name)
                     logger.info(f"Created bucket: {bucket_name}")
                 except Exception as create_error:
                     # If bucket creation fails, it might already exist or we don't have permissions
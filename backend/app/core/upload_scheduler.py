@@ -0,0 +1,199 @@
+"""
+Bounded, retrying scheduler for rendition uploads.
+
+One product image fans out into five renditions and a product often has
+several images, so storage round trips dominate an upload request. The
+scheduler runs them concurrently under one global cap, on a dedicated thread
+pool sized to that cap (the storage SDK is blocking), and retries failed
+uploads with exponential backoff. Encoded bytes are handed to the backend as
+they are; the local backend writes them through a memoryview, so nothing is
+copied on the way out. Every attempt is timed into a per-bucket latency
+histogram.
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger("core.upload_scheduler")
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+# Upper bounds of the histogram buckets in milliseconds; the last bucket is open ended
+LATENCY_BOUNDS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class LatencyHistogram:
+    def __init__(self, bounds_ms: Tuple[float, ...] = LATENCY_BOUNDS_MS):
+        self.bounds_ms = bounds_ms
+        self.counts = [0] * (len(bounds_ms) + 1)
+        self.count = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, elapsed_ms: float, ok: bool = True) -> None:
+        index = next((i for i, bound in enumerate(self.bounds_ms) if elapsed_ms <= bound), len(self.bounds_ms))
+        self.counts[index] += 1
+        self.count += 1
+        self.errors += 0 if ok else 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (the max for the open bucket)"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= target:
+                return float(self.bounds_ms[index]) if index < len(self.bounds_ms) else self.max_ms
+        return self.max_ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        labels = [f"le_{bound}ms" for bound in self.bounds_ms] + [f"gt_{self.bounds_ms[-1]}ms"]
+        return {
+            "calls": self.count,
+            "errors": self.errors,
+            "retries": self.retries,
+            "avg_ms": round(self.total_ms / self.count, 2) if self.count else 0.0,
+            "p50_ms": self.quantile(0.5),
+            "p99_ms": self.quantile(0.99),
+            "max_ms": round(self.max_ms, 2),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class LocalStorageBackend:
+    """Writes objects under ``root/<bucket>/<path>``; used offline and as the Supabase fallback"""
+
+    name = "local"
+
+    def __init__(self, root: Optional[str] = None, url_base: Optional[str] = None):
+        self.root = Path(root or os.getenv('MEDIA_ROOT', 'media')).resolve()
+        self.url_base = (url_base or os.getenv('MEDIA_URL', '/media')).rstrip('/')
+
+    def upload(self, bucket: str, path: str, data: BytesLike) -> Dict[str, Any]:
+        target = self.root / bucket / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temp file and rename so concurrent writers of the same content never expose a torn file
+        temp = target.with_name(f".{target.name}.{os.getpid()}.{id(data)}.tmp")
+        with open(temp, 'wb') as f:
+            f.write(memoryview(data))
+        os.replace(temp, target)
+        return {'url': f"{self.url_base}/{bucket}/{path}", 'path': str(target)}
+
+    def delete(self, bucket: str, path: str) -> bool:
+        try:
+            (self.root / bucket / path).unlink()
+            return True
+        except FileNotFoundError:
+            return False
+
+
+class SupabaseStorageBackend:
+    name = "supabase"
+
+    def __init__(self, storage_client=None):
+        if storage_client is None:
+            from app.core.supabase_storage import SupabaseStorageClient
+            storage_client = SupabaseStorageClient()
+        self.storage_client = storage_client
+
+    def upload(self, bucket: str, path: str, data: BytesLike) -> Dict[str, Any]:
+        url = self.storage_client.upload_file(bucket, path, data)
+        if isinstance(url, str):
+            return {'url': url, 'path': path}
+        return {'url': url.get('url') if url else None, 'path': url.get('path') if url else path}
+
+    def delete(self, bucket: str, path: str) -> bool:
+        return self.storage_client.delete_file(bucket, path)
+
+
+class UploadScheduler:
+    def __init__(self, backend, max_concurrency: int = 16, max_retries: int = 2, backoff: float = 0.2):
+        self.backend = backend
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._histograms: Dict[str, LatencyHistogram] = {}
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="upload")
+        return self._executor
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        return self._slots
+
+    def _histogram(self, bucket: str) -> LatencyHistogram:
+        histogram = self._histograms.get(bucket)
+        if histogram is None:
+            histogram = self._histograms[bucket] = LatencyHistogram()
+        return histogram
+
+    async def upload(self, bucket: str, path: str, data: BytesLike) -> Dict[str, Any]:
+        """Upload one object, retrying with backoff; raises the last error once retries are spent"""
+        loop = asyncio.get_running_loop()
+        histogram = self._histogram(bucket)
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                async with self._semaphore():
+                    result = await loop.run_in_executor(self._pool(), self.backend.upload, bucket, path, data)
+            except Exception as e:
+                histogram.observe((time.perf_counter() - start) * 1000, ok=False)
+                if attempt >= self.max_retries:
+                    raise
+                histogram.retries += 1
+                logger.warning(f"Upload of {bucket}/{path} failed (attempt {attempt + 1}), retrying: {e}")
+                await asyncio.sleep(self.backoff * (2 ** attempt))
+            else:
+                histogram.observe((time.perf_counter() - start) * 1000)
+                return result
+
+    async def upload_many(self, items: Iterable[Tuple[str, str, BytesLike]]) -> List[Any]:
+        """Upload ``(bucket, path, data)`` items concurrently; failures are returned in place"""
+        return await asyncio.gather(
+            *(self.upload(bucket, path, data) for bucket, path, data in items), return_exceptions=True
+        )
+
+    async def delete(self, bucket: str, path: str) -> bool:
+        loop = asyncio.get_running_loop()
+        async with self._semaphore():
+            return await loop.run_in_executor(self._pool(), self.backend.delete, bucket, path)
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        return {bucket: histogram.snapshot() for bucket, histogram in self._histograms.items()}
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+def create_storage_backend(name: Optional[str] = None):
+    name = (name or settings.IMAGE_STORAGE_BACKEND).lower()
+    if name == "local":
+        return LocalStorageBackend()
+    return SupabaseStorageBackend()
+
+
+upload_scheduler = UploadScheduler(
+    create_storage_backend(),
+    max_concurrency=settings.IMAGE_UPLOAD_CONCURRENCY,
+    max_retries=settings.IMAGE_UPLOAD_RETRIES
+)
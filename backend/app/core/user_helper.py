@@ -1,8 +1,10 @@
 """
 Helper functions to ensure user exists in public.users table
 """
+import asyncio
 from typing import Dict, Any, Optional
 from app.core.logging import get_logger
+from app.database.base import get_supabase_rest_client, SupabaseRestError
 from app.features.auth.cruds.auth_crud import AuthCrud
 from app.features.auth.models.user import User
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -10,6 +12,12 @@ from sqlalchemy import select
 
 logger = get_logger("core.user_helper")
 
+
+async def _rest_user_exists(user_id: str) -> bool:
+    rows = await get_supabase_rest_client().select("users", {"select": "id", "id": f"eq.{user_id}", "limit": 1})
+    return len(rows) > 0
+
+
 async def ensure_user_exists_in_db(
     db: AsyncSession,
     current_user: Dict[str, Any],
@@ -53,7 +61,7 @@ async def ensure_user_exists_in_db(
         
         # Try to get more info from Supabase Auth
         try:
-            auth_user_response = admin_client.auth.admin.get_user_by_id(user_id)
+            auth_user_response = await asyncio.to_thread(admin_client.auth.admin.get_user_by_id, user_id)
             if auth_user_response and hasattr(auth_user_response, 'user') and auth_user_response.user:
                 auth_user = auth_user_response.user
                 if not user_email:
@@ -87,176 +95,58 @@ async def ensure_user_exists_in_db(
         if last_name:
             user_rest_data["last_name"] = last_name
         
+        rest = get_supabase_rest_client()
+        
         # FIRST: Check if user already exists (to avoid unnecessary creation attempts)
         try:
-            from app.core.config import settings
-            import httpx
-            
-            if settings.SUPABASE_URL and settings.SUPABASE_SERVICE_ROLE_KEY:
-                # Check if user exists first
-                check_url = f"{settings.SUPABASE_URL}/rest/v1/users?id=eq.{user_id}&select=id"
-                check_headers = {
-                    "apikey": settings.SUPABASE_SERVICE_ROLE_KEY,
-                    "Authorization": f"Bearer {settings.SUPABASE_SERVICE_ROLE_KEY}",
-                    "Content-Type": "application/json"
-                }
-                async with httpx.AsyncClient(timeout=10.0) as check_client:
-                    check_response = await check_client.get(check_url, headers=check_headers)
-                    if check_response.status_code == 200:
-                        check_data = check_response.json()
-                        if isinstance(check_data, list) and len(check_data) > 0:
-                            logger.info(f"✅ User {user_id} already exists in public.users (verified via REST API)")
-                            return True
+            if rest.configured and await _rest_user_exists(user_id):
+                logger.info(f"✅ User {user_id} already exists in public.users (verified via REST API)")
+                return True
         except Exception as check_err:
             logger.warning(f"User existence check failed (non-fatal): {check_err}")
             # Continue to creation attempt
         
-        # Try REST API first (most reliable) - use httpx directly with service role key
-        httpx_status = None
-        httpx_error = None
+        # Try REST API first (most reliable) - service role key bypasses RLS
+        rest_status = None
+        rest_failure = None
         try:
-            from app.core.config import settings
-            import httpx
-            
-            logger.info(f"Attempting to create user {user_id} via httpx REST API")
-            logger.info(f"SUPABASE_URL: {settings.SUPABASE_URL[:50] if settings.SUPABASE_URL else 'NOT SET'}...")
-            logger.info(f"SERVICE_ROLE_KEY set: {bool(settings.SUPABASE_SERVICE_ROLE_KEY)}")
+            if not rest.configured:
+                raise Exception("SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be configured")
             
-            if settings.SUPABASE_URL and settings.SUPABASE_SERVICE_ROLE_KEY:
-                # Use httpx directly with service role key to ensure it bypasses RLS
-                rest_url = f"{settings.SUPABASE_URL}/rest/v1/users"
-                headers = {
-                    "apikey": settings.SUPABASE_SERVICE_ROLE_KEY,
-                    "Authorization": f"Bearer {settings.SUPABASE_SERVICE_ROLE_KEY}",
-                    "Content-Type": "application/json",
-                    "Prefer": "return=representation"
-                }
-                
-                logger.info(f"POST {rest_url} with user_data keys: {list(user_rest_data.keys())}")
-                
-                async with httpx.AsyncClient(timeout=10.0) as client:
-                    rest_response = await client.post(rest_url, json=user_rest_data, headers=headers)
-                    httpx_status = rest_response.status_code
-                    
-                    logger.info(f"httpx response status: {rest_response.status_code}")
-                    logger.info(f"httpx response text (first 500 chars): {rest_response.text[:500]}")
-                    
-                    if rest_response.status_code in [200, 201]:
-                        try:
-                            response_data = rest_response.json()
-                            if isinstance(response_data, list) and len(response_data) > 0:
-                                logger.info(f"✅ Created user {user_id} via REST API (httpx)")
-                                # Wait a bit and verify user exists
-                                import asyncio
-                                await asyncio.sleep(0.5)
-                                # Verify user was created
-                                verify_resp = await client.get(
-                                    f"{settings.SUPABASE_URL}/rest/v1/users?id=eq.{user_id}&select=id",
-                                    headers=headers
-                                )
-                                if verify_resp.status_code == 200:
-                                    verify_data = verify_resp.json()
-                                    if isinstance(verify_data, list) and len(verify_data) > 0:
-                                        logger.info(f"✅ Verified user {user_id} exists in database")
-                                        return True
-                            elif isinstance(response_data, dict) and response_data.get("id"):
-                                logger.info(f"✅ Created user {user_id} via REST API (httpx)")
-                                import asyncio
-                                await asyncio.sleep(0.5)
-                                # Verify user was created
-                                verify_resp = await client.get(
-                                    f"{settings.SUPABASE_URL}/rest/v1/users?id=eq.{user_id}&select=id",
-                                    headers=headers
-                                )
-                                if verify_resp.status_code == 200:
-                                    verify_data = verify_resp.json()
-                                    if isinstance(verify_data, list) and len(verify_data) > 0:
-                                        logger.info(f"✅ Verified user {user_id} exists in database")
-                                        return True
-                            else:
-                                logger.warning(f"Unexpected response format: {type(response_data)}")
-                        except Exception as json_err:
-                            logger.error(f"Failed to parse JSON response: {json_err}, response text: {rest_response.text[:200]}")
-                    elif rest_response.status_code == 409 or "duplicate" in rest_response.text.lower():
-                        logger.info(f"User {user_id} already exists (duplicate error)")
-                        return True
-                    elif rest_response.status_code == 401 or rest_response.status_code == 403:
-                        httpx_error = f"Permission denied: {rest_response.status_code} - {rest_response.text[:200]}"
-                        logger.warning(f"⚠️ {httpx_error}")
-                        # Check if user exists despite permission error (might be RLS blocking insert but user exists)
-                        try:
-                            check_resp = await client.get(
-                                f"{settings.SUPABASE_URL}/rest/v1/users?id=eq.{user_id}&select=id",
-                                headers={
-                                    "apikey": settings.SUPABASE_SERVICE_ROLE_KEY,
-                                    "Authorization": f"Bearer {settings.SUPABASE_SERVICE_ROLE_KEY}",
-                                    "Content-Type": "application/json"
-                                }
-                            )
-                            if check_resp.status_code == 200:
-                                check_data = check_resp.json()
-                                if isinstance(check_data, list) and len(check_data) > 0:
-                                    logger.info(f"✅ User {user_id} exists despite permission error (403)")
-                                    return True
-                        except Exception:
-                            pass
-                        logger.error(f"   Check if SERVICE_ROLE_KEY is correct and has proper permissions")
-                        # Don't raise here - try fallback methods
-                        httpx_error = f"Permission denied: {rest_response.status_code} - {rest_response.text[:200]}"
-                    else:
-                        httpx_error = f"REST API insert returned {rest_response.status_code}: {rest_response.text[:200]}"
-                        logger.warning(f"{httpx_error}")
-                        # For 400/422 errors, check if it's a validation error we can handle
-                        if rest_response.status_code == 400 or rest_response.status_code == 422:
-                            # Check if user exists despite the error
-                            try:
-                                check_resp = await client.get(
-                                    f"{settings.SUPABASE_URL}/rest/v1/users?id=eq.{user_id}&select=id",
-                                    headers={
-                                        "apikey": settings.SUPABASE_SERVICE_ROLE_KEY,
-                                        "Authorization": f"Bearer {settings.SUPABASE_SERVICE_ROLE_KEY}",
-                                        "Content-Type": "application/json"
-                                    }
-                                )
-                                if check_resp.status_code == 200:
-                                    check_data = check_resp.json()
-                                    if isinstance(check_data, list) and len(check_data) > 0:
-                                        logger.info(f"User {user_id} exists despite error response")
-                                        return True
-                            except Exception:
-                                pass
-                        # Don't raise here - try fallback methods
-            else:
-                logger.warning("SERVICE_ROLE_KEY not configured, trying Supabase client")
-                if not settings.SUPABASE_URL:
-                    raise Exception("SUPABASE_URL not configured")
-                if not settings.SUPABASE_SERVICE_ROLE_KEY:
-                    raise Exception("SUPABASE_SERVICE_ROLE_KEY not configured")
-                # Fallback to Supabase client
-                rest_response = admin_client.table("users").insert(user_rest_data).execute()
-                if rest_response.data and len(rest_response.data) > 0:
+            logger.info(f"Attempting to create user {user_id} via REST API with user_data keys: {list(user_rest_data.keys())}")
+            try:
+                created = await rest.insert("users", user_rest_data)
+                rest_status = 201
+                if created:
                     logger.info(f"✅ Created user {user_id} via REST API")
-                    import asyncio
                     await asyncio.sleep(0.5)
-                    return True
-                else:
-                    logger.warning("REST API insert returned no data, checking if user exists...")
-                    check_response = admin_client.table("users").select("id").eq("id", user_id).limit(1).execute()
-                    if check_response.data and len(check_response.data) > 0:
-                        logger.info(f"✅ User {user_id} exists (verified after insert)")
+                    if await _rest_user_exists(user_id):
+                        logger.info(f"✅ Verified user {user_id} exists in database")
                         return True
+            except SupabaseRestError as rest_error:
+                rest_status = rest_error.status_code
+                if rest_error.status_code == 409 or "duplicate" in rest_error.body.lower():
+                    logger.info(f"User {user_id} already exists (duplicate error)")
+                    return True
+                rest_failure = f"REST API insert returned {rest_error.status_code}: {rest_error.body[:200]}"
+                logger.warning(f"⚠️ {rest_failure}")
+                # RLS may block the insert while the row exists; validation errors may mean the same
+                if rest_error.status_code in (400, 401, 403, 422) and await _rest_user_exists(user_id):
+                    logger.info(f"✅ User {user_id} exists despite error response ({rest_error.status_code})")
+                    return True
+                # Don't raise here - try fallback methods
         except Exception as rest_err:
             error_str = str(rest_err).lower()
             if "duplicate" in error_str or "already exists" in error_str or "unique" in error_str:
                 logger.info(f"User {user_id} already exists (duplicate error)")
                 return True
-            httpx_error = f"REST API insert failed: {rest_err}"
-            logger.warning(f"{httpx_error}")
+            rest_failure = f"REST API insert failed: {rest_err}"
+            logger.warning(f"{rest_failure}")
         
         # Fallback to SQLAlchemy - commented out as it may have enum issues
         # Instead, just verify user exists via query
         try:
-            # Check if user was created by httpx call
+            # Check if user was created by the REST call
             check_query = select(User).where(User.id == user_id)
             from app.core.config import settings
             if "supabase.co" in (settings.DATABASE_URL or ""):
@@ -271,14 +161,13 @@ async def ensure_user_exists_in_db(
         
         # Final check - maybe user was created by another process
         try:
-            final_check = admin_client.table("users").select("id").eq("id", user_id).limit(1).execute()
-            if final_check.data and len(final_check.data) > 0:
+            if await _rest_user_exists(user_id):
                 logger.info(f"✅ User {user_id} exists (verified after failures)")
                 return True
         except Exception:
             pass
         
-        error_details = f"httpx_status={httpx_status}, httpx_error={httpx_error}" if httpx_status or httpx_error else "no httpx attempt"
+        error_details = f"rest_status={rest_status}, rest_failure={rest_failure}" if rest_status or rest_failure else "no REST attempt"
         logger.error(f"❌ Failed to create user {user_id} via all methods ({error_details})")
         
         # Check if user exists anyway (maybe created by another process)
@@ -295,10 +184,9 @@ async def ensure_user_exists_in_db(
         except Exception as check_final_err:
             logger.warning(f"Final user check failed: {check_final_err}")
         
-        # Try one more REST API check via admin_client
+        # Try one more REST API check
         try:
-            final_rest_check = admin_client.table("users").select("id").eq("id", user_id).limit(1).execute()
-            if final_rest_check.data and len(final_rest_check.data) > 0:
+            if await _rest_user_exists(user_id):
                 logger.info(f"✅ User {user_id} exists (verified via REST API final check)")
                 return True
         except Exception as final_check_err:
@@ -1,30 +1,315 @@
-from supabase import create_client, Client
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from supabase import create_client, Client, ClientOptions
+from supabase_auth import SyncGoTrueClient
 from app.core.config import settings
 from app.core.logging import get_logger
-from app.core.exceptions import ValidationException
-from typing import Optional
+from app.core.exceptions import ValidationException, ExternalServiceException
 
 logger = get_logger("database")
 
+# Default key for each client role
+_ROLE_KEYS = {
+    "service": lambda: settings.SUPABASE_SERVICE_ROLE_KEY,
+    "anon": lambda: settings.SUPABASE_ANON_KEY,
+}
+
+
+class SupabaseClientRegistry:
+    """
+    Process-wide Supabase clients keyed by ``(url, key, role)``.
+
+    ``create_client`` builds a fresh set of HTTP clients each time, so clients
+    are created lazily on first use and then shared by every CRUD and route.
+    Creation happens under a lock (it never awaits), so concurrent requests and
+    executor threads see exactly one client per key. Shared clients never
+    persist or auto-refresh sessions and are only used for stateless or admin
+    calls: anything that stores a user session (sign-in, sign-up, refresh) runs
+    on ``get_auth_session_client()`` so no session is ever shared across requests.
+    """
+
+    def __init__(self):
+        self._clients: Dict[Tuple[str, str, str], Client] = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.lookups = 0
+
+    def get(self, role: str = "service", url: Optional[str] = None, key: Optional[str] = None) -> Client:
+        url = url or settings.SUPABASE_URL
+        key = key or _ROLE_KEYS.get(role, lambda: "")()
+        if not url:
+            raise ValidationException("SUPABASE_URL must be set")
+        if not key:
+            raise ValidationException(f"Supabase key for role '{role}' must be set")
+        
+        cache_key = (url, key, role)
+        self.lookups += 1
+        client = self._clients.get(cache_key)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(cache_key)
+                if client is None:
+                    client = create_client(
+                        url, key, options=ClientOptions(auto_refresh_token=False, persist_session=False)
+                    )
+                    self._clients[cache_key] = client
+                    self.created += 1
+                    logger.info(f"Supabase client created (role={role})")
+        return client
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clients.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"clients": len(self._clients), "created": self.created, "lookups": self.lookups}
+
+
+_client_registry = SupabaseClientRegistry()
+
+def get_client_registry() -> SupabaseClientRegistry:
+    return _client_registry
+
 def create_supabase_client() -> Client:
     if not settings.SUPABASE_URL:
         raise ValidationException("SUPABASE_URL must be set")
     key = settings.SUPABASE_SERVICE_ROLE_KEY
     if not key:
         raise ValidationException("SUPABASE_SERVICE_ROLE_KEY must be set")
-    client = create_client(settings.SUPABASE_URL, key)
-    return client
-
-_supabase_client: Optional[Client] = None
+    return _client_registry.get("service")
 
 def get_supabase_client() -> Client:
-    global _supabase_client
-    if _supabase_client is None:
-        _supabase_client = create_supabase_client()
-    return _supabase_client
+    return create_supabase_client()
+
+def get_anon_supabase_client() -> Client:
+    """Client for Supabase Auth user flows; falls back to the service key when no anon key is set"""
+    if settings.SUPABASE_ANON_KEY:
+        return _client_registry.get("anon")
+    return _client_registry.get("anon", key=settings.SUPABASE_SERVICE_ROLE_KEY)
+
+def get_auth_session_client() -> SyncGoTrueClient:
+    """
+    Short-lived Supabase Auth client for one request's session-bearing calls.
+
+    ``sign_in_with_password``, ``sign_up`` and ``refresh_session`` keep the
+    resulting session on the client they ran on, so they must never run on a
+    shared one. This client holds that session alone and is dropped after the
+    request; it reuses the anon client's pooled HTTP connections, so it costs
+    no extra TLS handshake.
+    """
+    shared = get_anon_supabase_client().auth
+    return SyncGoTrueClient(
+        url=shared._url,
+        headers=dict(shared._headers),
+        http_client=shared._http_client,
+        auto_refresh_token=False,
+        persist_session=False,
+    )
 
 def get_authenticated_supabase_client(user_token: str) -> Client:
+    # Carries one user's token in its headers, so it is deliberately not shared
     client = create_client(settings.SUPABASE_URL, settings.SUPABASE_ANON_KEY)
     client.options.headers["Authorization"] = f"Bearer {user_token}"
     logger.info("Authenticated Supabase client created")
     return client
+
+
+class SupabaseRestError(ExternalServiceException):
+    def __init__(self, status_code: int, body: str, operation: str):
+        self.status_code = status_code
+        self.body = body
+        self.operation = operation
+        super().__init__(f"{operation} returned {status_code}: {body[:500]}", "Supabase")
+
+
+class SupabaseRestClient:
+    """
+    Shared async client for PostgREST tables and RPC functions.
+
+    One pooled ``httpx.AsyncClient`` (HTTP/2 when ``h2`` is installed) is kept
+    for the lifetime of the app so requests reuse warm TLS connections. A
+    semaphore bounds in-flight calls, idempotent calls are retried with
+    exponential backoff on transport errors and 429/5xx responses, and every
+    call is timed per operation.
+    """
+
+    RETRY_STATUSES = {429, 502, 503, 504}
+    IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "DELETE"}
+
+    def __init__(
+        self,
+        url: str,
+        key: str,
+        timeout: float = 10.0,
+        max_connections: int = 50,
+        max_concurrency: int = 32,
+        max_retries: int = 2,
+        backoff: float = 0.2
+    ):
+        self.url = (url or "").strip().rstrip("/")
+        self.key = (key or "").strip()
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._metrics: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.url and self.key)
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            try:
+                import h2  # noqa: F401
+                http2 = True
+            except ImportError:
+                http2 = False
+            self._client = httpx.AsyncClient(
+                http2=http2,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=60.0
+                )
+            )
+            logger.info(f"Supabase REST client started (http2={http2}, max_connections={self.max_connections})")
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+    def _record(self, operation: str, elapsed: float, ok: bool) -> None:
+        stats = self._metrics.setdefault(operation, {"calls": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0, "recent_ms": deque(maxlen=512)})
+        elapsed_ms = elapsed * 1000
+        stats["calls"] += 1
+        stats["errors"] += 0 if ok else 1
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+        stats["recent_ms"].append(elapsed_ms)
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        report = {}
+        for operation, stats in self._metrics.items():
+            recent = sorted(stats["recent_ms"])
+            report[operation] = {
+                "calls": stats["calls"],
+                "errors": stats["errors"],
+                "avg_ms": round(stats["total_ms"] / stats["calls"], 2) if stats["calls"] else 0.0,
+                "p50_ms": round(recent[len(recent) // 2], 2) if recent else 0.0,
+                "p99_ms": round(recent[min(len(recent) - 1, int(len(recent) * 0.99))], 2) if recent else 0.0,
+                "max_ms": round(stats["max_ms"], 2)
+            }
+        return report
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        json: Any = None,
+        headers: Optional[Dict[str, str]] = None,
+        retry: Optional[bool] = None,
+        operation: Optional[str] = None
+    ) -> httpx.Response:
+        """Raw call; ``path`` is relative to ``/rest/v1`` unless it is an absolute URL"""
+        method = method.upper()
+        if path.startswith("http"):
+            # Absolute URLs (e.g. JWKS) share the pool but never get the service key
+            url = path
+        else:
+            url = f"{self.url}/rest/v1/{path.lstrip('/')}"
+            headers = {"apikey": self.key, "Authorization": f"Bearer {self.key}", **(headers or {})}
+        operation = operation or f"{method} {path.split('?')[0]}"
+        if retry is None:
+            retry = method in self.IDEMPOTENT_METHODS
+        attempts = self.max_retries + 1 if retry else 1
+
+        for attempt in range(attempts):
+            start = time.perf_counter()
+            try:
+                async with self._semaphore:
+                    response = await self.client.request(method, url, params=params, json=json, headers=headers)
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                self._record(operation, time.perf_counter() - start, False)
+                if attempt + 1 >= attempts:
+                    raise ExternalServiceException(f"{operation} failed: {e}", "Supabase")
+            else:
+                ok = response.status_code < 400
+                self._record(operation, time.perf_counter() - start, ok)
+                if ok or response.status_code not in self.RETRY_STATUSES or attempt + 1 >= attempts:
+                    return response
+            await asyncio.sleep(self.backoff * (2 ** attempt))
+
+    async def _json(self, method: str, path: str, **kwargs) -> Any:
+        response = await self.request(method, path, **kwargs)
+        if response.status_code >= 400:
+            raise SupabaseRestError(response.status_code, response.text, f"{method} {path}")
+        return response.json() if response.content else None
+
+    async def select(self, table: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """``params`` are PostgREST query params, e.g. ``{"select": "id", "id": "eq.<uuid>"}``"""
+        return await self._json("GET", table, params=params) or []
+
+    async def select_with_count(self, table: str, params: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        response = await self.request("GET", table, params=params, headers={"Prefer": "count=exact"})
+        if response.status_code >= 400:
+            raise SupabaseRestError(response.status_code, response.text, f"GET {table}")
+        content_range = response.headers.get("content-range", "")
+        total = None
+        if "/" in content_range and content_range.split("/")[1].isdigit():
+            total = int(content_range.split("/")[1])
+        return response.json() or [], total
+
+    async def insert(
+        self,
+        table: str,
+        rows: Any,
+        upsert: bool = False,
+        on_conflict: Optional[str] = None,
+        ignore_duplicates: bool = False
+    ) -> List[Dict[str, Any]]:
+        """Insert one row or a list of rows; with ``ignore_duplicates`` only new rows are returned"""
+        prefer = "return=representation"
+        if ignore_duplicates:
+            prefer += ",resolution=ignore-duplicates"
+        elif upsert:
+            prefer += ",resolution=merge-duplicates"
+        params = {"on_conflict": on_conflict} if on_conflict else None
+        return await self._json("POST", table, json=rows, params=params, headers={"Prefer": prefer}) or []
+
+    async def rpc(self, function: str, payload: Optional[Dict[str, Any]] = None) -> Any:
+        return await self._json("POST", f"rpc/{function}", json=payload or {})
+
+
+_supabase_rest_client: Optional[SupabaseRestClient] = None
+
+def get_supabase_rest_client() -> SupabaseRestClient:
+    global _supabase_rest_client
+    if _supabase_rest_client is None:
+        _supabase_rest_client = SupabaseRestClient(
+            settings.SUPABASE_URL,
+            settings.SUPABASE_SERVICE_ROLE_KEY,
+            timeout=settings.SUPABASE_REST_TIMEOUT,
+            max_connections=settings.SUPABASE_REST_MAX_CONNECTIONS,
+            max_concurrency=settings.SUPABASE_REST_MAX_CONCURRENCY,
+            max_retries=settings.SUPABASE_REST_MAX_RETRIES
+        )
+    return _supabase_rest_client
+
+async def close_supabase_rest_client() -> None:
+    global _supabase_rest_client
+    if _supabase_rest_client is not None:
+        await _supabase_rest_client.close()
+        _supabase_rest_client = None
@@ -265,6 +265,197 @@ async def create_database_indexes():
     except Exception as e:
         logger.error(f"Error creating indexes: {str(e)}")
 
+async def create_search_infrastructure():
+    """Create the tsvector column, sync trigger and GIN/trigram indexes used by product search"""
+    if not db_session.async_engine:
+        logger.warning("Database engine not available, skipping search infrastructure")
+        return False
+    
+    from app.features.products.services.product_search_engine import (
+        build_search_vector_sql, set_search_infrastructure_ready
+    )
+    
+    statements = [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm;",
+        "ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector;",
+        f"""
+        CREATE OR REPLACE FUNCTION products_search_vector_refresh() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {build_search_vector_sql("NEW.")};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql;
+        """,
+        "DROP TRIGGER IF EXISTS trg_products_search_vector ON products;",
+        "CREATE TRIGGER trg_products_search_vector BEFORE INSERT OR UPDATE OF name, short_description, description, tags "
+        "ON products FOR EACH ROW EXECUTE FUNCTION products_search_vector_refresh();",
+        f"UPDATE products SET search_vector = {build_search_vector_sql()} WHERE search_vector IS NULL;",
+        "CREATE INDEX IF NOT EXISTS idx_products_search_vector ON products USING GIN(search_vector);",
+        "CREATE INDEX IF NOT EXISTS idx_products_name_trgm ON products USING GIN(name gin_trgm_ops);",
+    ]
+    
+    success = await _apply_statements(statements, "search infrastructure")
+    if not success:
+        # Another worker may have created everything while this one failed (e.g. a lock timeout)
+        success = await _search_infrastructure_exists()
+    set_search_infrastructure_ready(success)
+    if success:
+        logger.info("Product search infrastructure ready")
+    else:
+        logger.warning("Product search infrastructure unavailable, searching with ilike")
+    return success
+
+async def _search_infrastructure_exists() -> bool:
+    try:
+        async with db_session.async_engine.connect() as conn:
+            result = await conn.execute(text("""
+                SELECT EXISTS (SELECT 1 FROM information_schema.columns
+                               WHERE table_name = 'products' AND column_name = 'search_vector')
+                   AND EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')
+            """))
+            return bool(result.scalar())
+    except Exception as e:
+        logger.error(f"Checking search infrastructure failed: {e}")
+        return False
+
+async def create_facet_infrastructure():
+    """Create the product_facet_counts summary table and the trigger that keeps it current"""
+    if not db_session.async_engine:
+        logger.warning("Database engine not available, skipping facet infrastructure")
+        return False
+    
+    from app.features.products.services.product_facet_store import build_facet_schema_statements, rebuild_facet_counts
+    
+    success = await _apply_statements(build_facet_schema_statements(), "facet infrastructure")
+    if not success:
+        return False
+    
+    try:
+        async with db_session.async_engine.connect() as conn:
+            seeded = (await conn.execute(text("SELECT EXISTS (SELECT 1 FROM product_facet_counts)"))).scalar()
+    except Exception as e:
+        logger.warning(f"Could not inspect product_facet_counts: {e}")
+        return False
+    
+    if not seeded:
+        return await rebuild_facet_counts()
+    logger.info("Product facet infrastructure ready")
+    return True
+
+async def create_reservation_infrastructure():
+    """Create the inventory_reservations table and the reserved <= quantity guard"""
+    if not db_session.async_engine:
+        logger.warning("Database engine not available, skipping reservation infrastructure")
+        return False
+    
+    from app.features.products.services.inventory_reservations import build_reservation_schema_statements
+    
+    success = await _apply_statements(build_reservation_schema_statements(), "reservation infrastructure")
+    if success:
+        logger.info("Inventory reservation infrastructure ready")
+    return success
+
+async def create_image_store_infrastructure():
+    """Create the content-addressed image asset index"""
+    if not db_session.async_engine:
+        logger.warning("Database engine not available, skipping image store infrastructure")
+        return False
+    
+    from app.core.image_store import build_image_store_schema_statements
+    
+    success = await _apply_statements(build_image_store_schema_statements(), "image store infrastructure")
+    if success:
+        logger.info("Image store infrastructure ready")
+    return success
+
+async def create_import_job_infrastructure():
+    """Create the table that shares CSV import job progress between workers"""
+    if not db_session.async_engine:
+        logger.warning("Database engine not available, skipping import job infrastructure")
+        return False
+    
+    from app.features.products.services.product_bulk_import import build_import_job_schema_statements
+    
+    success = await _apply_statements(build_import_job_schema_statements(), "import job infrastructure")
+    if success:
+        logger.info("Import job infrastructure ready")
+    return success
+
+async def _apply_statements(statements, label: str) -> bool:
+    success = True
+    for statement in statements:
+        try:
+            async with db_session.async_engine.begin() as conn:
+                await conn.execute(text(statement))
+        except Exception as e:
+            success = False
+            logger.warning(f"Failed to apply {label} statement: {statement.strip()[:80]} - {e}")
+    return success
+
 def create_database_indexes_sync():
     logger.warning("Sync index creation is deprecated, use async version")
     return
+
+
+async def create_behavior_infrastructure():
+    """Create the per-user incremental behaviour counter table"""
+    if not db_session.async_engine:
+        logger.warning("Database engine not available, skipping behaviour infrastructure")
+        return False
+    
+    from app.features.analytics.services.behavior_aggregator import build_behavior_schema_statements
+    
+    success = await _apply_statements(build_behavior_schema_statements(), "behaviour infrastructure")
+    if success:
+        logger.info("Behaviour infrastructure ready")
+    return success
+
+
+async def create_view_count_infrastructure():
+    """Create the product_view_counts daily rollup, seeding it from product_views on first run"""
+    if not db_session.async_engine:
+        logger.warning("Database engine not available, skipping view count infrastructure")
+        return False
+    
+    from app.features.products.services.product_view_counter import build_view_count_schema_statements, rebuild_view_counts
+    
+    success = await _apply_statements(build_view_count_schema_statements(), "view count infrastructure")
+    if not success:
+        return False
+    
+    try:
+        async with db_session.async_engine.connect() as conn:
+            seeded = (await conn.execute(text("SELECT EXISTS (SELECT 1 FROM product_view_counts)"))).scalar()
+    except Exception as e:
+        logger.warning(f"Could not inspect product_view_counts: {e}")
+        return False
+    
+    if not seeded:
+        return await rebuild_view_counts()
+    logger.info("Product view count infrastructure ready")
+    return True
+
+
+async def create_trending_infrastructure():
+    """Create the shared trending score table, seeding it from recent history on first run"""
+    if not db_session.async_engine:
+        logger.warning("Database engine not available, skipping trending infrastructure")
+        return False
+    
+    from app.features.products.services.trending_engine import build_trending_schema_statements, seed_trending_scores
+    
+    success = await _apply_statements(build_trending_schema_statements(), "trending infrastructure")
+    if not success:
+        return False
+    
+    try:
+        async with db_session.async_engine.connect() as conn:
+            seeded = (await conn.execute(text("SELECT EXISTS (SELECT 1 FROM product_trending_scores)"))).scalar()
+    except Exception as e:
+        logger.warning(f"Could not inspect product_trending_scores: {e}")
+        return False
+    
+    if not seeded:
+        return await seed_trending_scores()
+    logger.info("Trending infrastructure ready")
+    return True
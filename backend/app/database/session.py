@@ -193,6 +193,12 @@ async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
         if session:
             await session.close()
 
+def pgbouncer_safe(statement):
+    """``statement`` with prepared statements disabled when running behind the Supabase pgbouncer"""
+    if "supabase.co" in (settings.DATABASE_URL or ""):
+        return statement.execution_options(prepared_statement_cache_size=0)
+    return statement
+
 def get_async_engine():
     return async_engine
 
@@ -0,0 +1,286 @@
+"""
+Buffered ingestion for tracked user activity.
+
+``track_user_activity`` used to commit one ``user_activities`` row per event
+and then recompute the user's behaviour profile on the request's session.
+Events now go onto a bounded in-process queue. A single writer drains it
+and inserts up to ``batch_size`` rows per statement, or whatever arrived
+within ``flush_interval`` of the first event. When the queue is full, callers
+wait up to ``enqueue_timeout`` for space. After that the event is dropped
+and counted, so a slow database cannot pile up request handlers. ID columns
+are validated when the event is queued, and a batch the database rejects is
+split and retried, so a bad event only loses itself.
+
+Each written batch is folded into the users' incremental behaviour counters.
+Writing the profile from those counters is debounced per user. The first
+event arms a timer, and later events for the same user within
+``profile_debounce`` seconds ride along with it, so a browsing session
+triggers one profile write instead of one per click.
+"""
+
+import asyncio
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+import app.database.session as db_session
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.features.analytics.models.user_activity import UserActivity, ActivityType
+from app.features.analytics.services.behavior_aggregator import behavior_aggregator
+from app.features.products.services.trending_engine import trending_engine, ENGAGEMENT_ACTIVITY_TYPES
+
+logger = get_logger("analytics.activity_ingestion")
+
+# activity_data keys copied onto their own columns
+ACTIVITY_DATA_COLUMNS = (
+    'product_id', 'category_id', 'brand_id', 'cart_value', 'order_value', 'quantity', 'price',
+    'time_spent', 'scroll_depth', 'recommendation_id', 'recommendation_type', 'recommendation_score',
+    'recommendation_position', 'conversion_value', 'conversion_type', 'funnel_stage',
+)
+CONTEXT_COLUMNS = (
+    'page_url', 'referrer_url', 'user_agent', 'ip_address', 'device_type', 'browser', 'os', 'country', 'city',
+)
+
+# UUID columns; a malformed id is stored as NULL rather than failing the insert
+ID_COLUMNS = ('user_id', 'product_id', 'category_id', 'brand_id', 'recommendation_id')
+
+# Concurrent profile recomputes; each holds a pooled connection
+PROFILE_CONCURRENCY = 4
+
+
+def _coerce_uuid(value: Any) -> Optional[str]:
+    if value is None or value == '':
+        return None
+    try:
+        return str(uuid.UUID(str(value)))
+    except ValueError:
+        return None
+
+
+def activity_row(
+    user_id: Optional[str],
+    session_id: str,
+    activity_type: ActivityType,
+    activity_data: Optional[Dict[str, Any]],
+    context: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Column values for one ``user_activities`` row; every row has the same keys so batches insert together"""
+    data = activity_data or {}
+    context = context or {}
+    now = datetime.utcnow()
+    row = {
+        'id': uuid.uuid4(),
+        'user_id': user_id,
+        'session_id': session_id,
+        'activity_type': activity_type.value,
+        'activity_data': activity_data,
+        'click_count': 0,
+        'view_count': 0,
+        'created_at': now,
+        'updated_at': now,
+    }
+    row.update({column: context.get(column) for column in CONTEXT_COLUMNS})
+    row.update({column: data.get(column) for column in ACTIVITY_DATA_COLUMNS})
+    for column in ID_COLUMNS:
+        row[column] = _coerce_uuid(row[column])
+    return row
+
+
+class ActivityIngestionBuffer:
+    def __init__(
+        self,
+        batch_size: int = 200,
+        flush_interval: float = 0.5,
+        max_queue: int = 10000,
+        enqueue_timeout: float = 1.0,
+        profile_debounce: float = 30.0
+    ):
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_queue = max(1, max_queue)
+        self.enqueue_timeout = enqueue_timeout
+        self.profile_debounce = profile_debounce
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pending: List[Dict[str, Any]] = []
+        self._flushing: Optional[asyncio.Future] = None
+        self._profile_timers: Dict[str, asyncio.TimerHandle] = {}
+        self._profile_tasks: Set[asyncio.Task] = set()
+        self._profile_slots: Optional[asyncio.Semaphore] = None
+        self._stats = {
+            'enqueued': 0, 'written': 0, 'batches': 0, 'dropped': 0, 'failed': 0,
+            'max_queue_depth': 0, 'last_flush_ms': 0.0,
+            'profile_updates': 0, 'profile_updates_coalesced': 0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._profile_slots = asyncio.Semaphore(PROFILE_CONCURRENCY)
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """Write everything still buffered; pending profile recomputes are dropped"""
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        if self._flushing is not None and not self._flushing.done():
+            await self._flushing
+
+        rows, self._pending = self._pending, []
+        while not self._queue.empty():
+            rows.append(self._queue.get_nowait())
+        for start in range(0, len(rows), self.batch_size):
+            await self._flush(rows[start:start + self.batch_size])
+        if rows:
+            logger.info(f"Flushed {len(rows)} buffered activities on shutdown")
+
+        for handle in self._profile_timers.values():
+            handle.cancel()
+        self._profile_timers.clear()
+        for profile_task in list(self._profile_tasks):
+            profile_task.cancel()
+        await asyncio.gather(*self._profile_tasks, return_exceptions=True)
+
+    async def submit(self, row: Dict[str, Any]) -> bool:
+        """Queue one activity row; returns False if it was dropped"""
+        if self._task is None:
+            # Not running (scripts, or after shutdown): write straight through
+            await self._flush([row])
+            return True
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self._queue.put(row), self.enqueue_timeout)
+            except asyncio.TimeoutError:
+                self._stats['dropped'] += 1
+                logger.warning(f"Activity queue full ({self.max_queue}), dropping {row['activity_type']} event")
+                return False
+        self._stats['enqueued'] += 1
+        self._stats['max_queue_depth'] = max(self._stats['max_queue_depth'], self._queue.qsize())
+        return True
+
+    async def _loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            self._pending.append(await self._queue.get())
+            deadline = loop.time() + self.flush_interval
+            while len(self._pending) < self.batch_size:
+                try:
+                    self._pending.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    self._pending.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            batch, self._pending = self._pending, []
+            # Shielded so stop() can let an in-flight insert finish rather than abort it
+            self._flushing = asyncio.ensure_future(self._flush(batch))
+            await asyncio.shield(self._flushing)
+
+    async def _flush(self, rows: List[Dict[str, Any]]) -> None:
+        if not rows:
+            return
+        if db_session.async_engine is None:
+            self._stats['dropped'] += len(rows)
+            return
+        start = time.perf_counter()
+        rows = await self._insert(rows)
+        if not rows:
+            return
+        self._stats['written'] += len(rows)
+        self._stats['batches'] += 1
+        self._stats['last_flush_ms'] = round((time.perf_counter() - start) * 1000, 2)
+
+        try:
+            await behavior_aggregator.apply(rows)
+        except Exception as e:
+            logger.warning(f"Updating behaviour counters failed: {e}")
+        # Product views reach the trending engine through the view counter instead
+        trending_engine.record(row['product_id'] for row in rows if row['activity_type'] in ENGAGEMENT_ACTIVITY_TYPES)
+
+        if self._task is not None:
+            for user_id in {str(row['user_id']) for row in rows if row.get('user_id')}:
+                self.schedule_profile_update(user_id)
+
+    async def _insert(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert ``rows``, returning the ones written; a rejected batch is bisected down to its bad rows"""
+        try:
+            async with db_session.async_engine.begin() as conn:
+                await conn.execute(insert(UserActivity.__table__), rows)
+            return rows
+        except (IntegrityError, DataError) as e:
+            # The database rejected some row (FK miss, bad value); an unreachable database is not retried
+            if len(rows) == 1:
+                self._stats['failed'] += 1
+                logger.warning(f"Dropping rejected {rows[0]['activity_type']} activity: {e}")
+                return []
+        except Exception as e:
+            self._stats['failed'] += len(rows)
+            logger.error(f"Writing {len(rows)} activities failed: {e}")
+            return []
+        middle = len(rows) // 2
+        return await self._insert(rows[:middle]) + await self._insert(rows[middle:])
+
+    def schedule_profile_update(self, user_id: str) -> None:
+        if user_id in self._profile_timers:
+            self._stats['profile_updates_coalesced'] += 1
+            return
+        loop = asyncio.get_running_loop()
+        self._profile_timers[user_id] = loop.call_later(self.profile_debounce, self._start_profile_update, user_id)
+
+    def _start_profile_update(self, user_id: str) -> None:
+        self._profile_timers.pop(user_id, None)
+        task = asyncio.create_task(self._update_profile(user_id))
+        self._profile_tasks.add(task)
+        task.add_done_callback(self._profile_tasks.discard)
+
+    async def _update_profile(self, user_id: str) -> None:
+        if db_session.AsyncSessionLocal is None:
+            return
+        from app.features.analytics.services.personalization_engine import PersonalizationEngine
+
+        async with self._profile_slots:
+            async with db_session.AsyncSessionLocal() as db:
+                await PersonalizationEngine(db)._update_behavior_profile(user_id)
+        self._stats['profile_updates'] += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            'running': self.running,
+            'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+            'queue_capacity': self.max_queue,
+            'batch_size': self.batch_size,
+            'avg_batch': round(self._stats['written'] / self._stats['batches'], 1) if self._stats['batches'] else 0.0,
+            'pending_profile_updates': len(self._profile_timers),
+            **self._stats,
+        }
+
+
+activity_ingestion = ActivityIngestionBuffer(
+    batch_size=settings.ACTIVITY_BATCH_SIZE,
+    flush_interval=settings.ACTIVITY_FLUSH_INTERVAL_MS / 1000,
+    max_queue=settings.ACTIVITY_QUEUE_SIZE,
+    enqueue_timeout=settings.ACTIVITY_ENQUEUE_TIMEOUT,
+    profile_debounce=settings.ACTIVITY_PROFILE_DEBOUNCE
+)
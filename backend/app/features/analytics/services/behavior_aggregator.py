@@ -0,0 +1,585 @@
+"""
+Incremental user behaviour aggregation.
+
+Rebuilding a ``UserBehaviorProfile`` used to mean reloading every activity
+the user produced in the last 30 days and folding over all of them, on every
+tracked event. ``BehaviorCounters`` keeps the running state those metrics
+need instead: decayed category/brand affinities, Welford price statistics,
+order and session totals, and hour/weekday/device histograms. Each event is
+applied in O(1), and the profile metrics are read straight off the counters.
+
+Affinities use forward decay. An event at time ``t`` adds
+``exp((t - landmark) / tau)``, so older events count for less without
+touching every score on each update. ``tau`` is derived from
+BEHAVIOR_HALF_LIFE_DAYS.
+
+Counters for recently active users are cached in memory. Each process also
+keeps the events it applied since the last save as a per-user delta, and
+whenever the profile is written the stored row in ``user_behavior_counters``
+is locked and the delta merged into it, so workers serving the same user add
+to each other's counts instead of overwriting them. A user with no stored
+counters is seeded once from raw history. ``behavior_compactor`` periodically
+rebuilds every stored user's counters from the raw 30-day window. That ages
+out events that have left the window and reconciles any drift (a delta lost
+with its process, or one merged on top of a compaction that already counted
+it).
+"""
+
+import json
+import math
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import select, text
+
+import app.database.session as db_session
+from app.database.session import pgbouncer_safe
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.periodic import PeriodicTask
+from app.features.analytics.models.user_activity import UserActivity
+
+logger = get_logger("analytics.behavior_aggregator")
+
+PROFILE_WINDOW_DAYS = 30
+EPOCH = datetime(1970, 1, 1)
+# Rebase decayed scores before exp() gets anywhere near float overflow
+MAX_DECAY_EXPONENT = 60.0
+
+# Only the columns the counters read, so seeding and compaction skip the wide JSON/text columns
+ACTIVITY_COLUMNS = (
+    UserActivity.user_id, UserActivity.session_id, UserActivity.created_at, UserActivity.category_id,
+    UserActivity.brand_id, UserActivity.price, UserActivity.time_spent, UserActivity.order_value,
+    UserActivity.device_type, UserActivity.click_count, UserActivity.view_count,
+)
+
+
+def build_behavior_schema_statements() -> List[str]:
+    return [
+        """
+        CREATE TABLE IF NOT EXISTS user_behavior_counters (
+            user_id UUID PRIMARY KEY,
+            state JSONB NOT NULL,
+            event_count INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP NOT NULL DEFAULT now()
+        );
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_user_behavior_counters_updated_at ON user_behavior_counters(updated_at);",
+    ]
+
+
+LOAD_SQL = text("SELECT user_id, state FROM user_behavior_counters WHERE user_id = ANY(:user_ids)")
+
+# Held until the caller commits, so concurrent merges into one user's row queue up
+LOCK_SQL = text("""
+    SELECT user_id, state FROM user_behavior_counters WHERE user_id = ANY(:user_ids)
+    FOR UPDATE
+""")
+
+UPSERT_SQL = text("""
+    INSERT INTO user_behavior_counters (user_id, state, event_count, updated_at)
+    VALUES (:user_id, CAST(:state AS jsonb), :event_count, now())
+    ON CONFLICT (user_id) DO UPDATE
+    SET state = EXCLUDED.state, event_count = EXCLUDED.event_count, updated_at = now()
+""")
+
+STORED_USERS_SQL = text("""
+    SELECT user_id FROM user_behavior_counters
+    WHERE user_id > :after
+    ORDER BY user_id
+    LIMIT :limit
+""")
+
+DELETE_SQL = text("DELETE FROM user_behavior_counters WHERE user_id = ANY(:user_ids)")
+
+
+def _field(event: Any, name: str) -> Any:
+    # Buffered rows are dicts; seeded history comes back as Row objects
+    if isinstance(event, dict):
+        return event.get(name)
+    return getattr(event, name, None)
+
+
+def _seconds(moment: datetime) -> float:
+    return (moment - EPOCH).total_seconds()
+
+
+def time_period(hour: int) -> str:
+    """Convert hour to time period"""
+    if 6 <= hour < 12:
+        return 'morning'
+    elif 12 <= hour < 18:
+        return 'afternoon'
+    elif 18 <= hour < 22:
+        return 'evening'
+    else:
+        return 'night'
+
+
+class BehaviorCounters:
+    """Running aggregates for one user; ``apply`` is O(1) and ``metrics`` matches the old full rebuild"""
+
+    def __init__(self, half_life_days: float = 7.0, landmark: Optional[float] = None):
+        self.tau = half_life_days * 86400 / math.log(2)
+        self.landmark = landmark
+        self.events = 0
+        self.category_scores: Dict[str, float] = defaultdict(float)
+        self.brand_scores: Dict[str, float] = defaultdict(float)
+        self.brand_counts: Dict[str, int] = defaultdict(int)
+        self.brand_events = 0
+        self.brand_max = 0
+        self.price_n = 0
+        self.price_mean = 0.0
+        self.price_m2 = 0.0
+        self.duration_n = 0
+        self.duration_sum = 0.0
+        self.orders = 0
+        self.order_sum = 0.0
+        self.first_purchase: Optional[float] = None
+        self.last_purchase: Optional[float] = None
+        self.purchase_gap_days = 0
+        self.devices: Dict[str, int] = defaultdict(int)
+        self.hours = [0] * 24
+        self.weekdays = [0] * 7
+        self.clicks = 0
+        self.views = 0
+        self.sessions: set = set()
+        self.last_event: Optional[float] = None
+
+    def _weight(self, at: float) -> float:
+        if self.landmark is None:
+            self.landmark = at
+        exponent = (at - self.landmark) / self.tau
+        if exponent > MAX_DECAY_EXPONENT:
+            self._rebase(at)
+            exponent = 0.0
+        return math.exp(exponent)
+
+    def _rebase(self, at: float) -> None:
+        scale = math.exp(-(at - self.landmark) / self.tau)
+        for scores in (self.category_scores, self.brand_scores):
+            for key in scores:
+                scores[key] *= scale
+        self.landmark = at
+
+    def apply(self, event: Any) -> None:
+        created_at = _field(event, 'created_at') or datetime.utcnow()
+        at = _seconds(created_at)
+        weight = self._weight(at)
+        self.events += 1
+        self.last_event = at if self.last_event is None else max(self.last_event, at)
+
+        category_id = _field(event, 'category_id')
+        if category_id:
+            self.category_scores[str(category_id)] += weight
+        brand_id = _field(event, 'brand_id')
+        if brand_id:
+            brand = str(brand_id)
+            self.brand_scores[brand] += weight
+            self.brand_counts[brand] += 1
+            self.brand_events += 1
+            self.brand_max = max(self.brand_max, self.brand_counts[brand])
+
+        price = _field(event, 'price')
+        if price:
+            self.price_n += 1
+            delta = price - self.price_mean
+            self.price_mean += delta / self.price_n
+            self.price_m2 += delta * (price - self.price_mean)
+
+        time_spent = _field(event, 'time_spent')
+        if time_spent:
+            self.duration_n += 1
+            self.duration_sum += time_spent
+
+        order_value = _field(event, 'order_value')
+        if order_value:
+            self.orders += 1
+            self.order_sum += order_value
+            if self.last_purchase is not None:
+                self.purchase_gap_days += int((at - self.last_purchase) // 86400)
+            else:
+                self.first_purchase = at
+            self.last_purchase = at
+
+        device_type = _field(event, 'device_type')
+        if device_type:
+            self.devices[device_type] += 1
+        self.hours[created_at.hour] += 1
+        self.weekdays[created_at.weekday()] += 1
+
+        self.clicks += _field(event, 'click_count') or 0
+        self.views += _field(event, 'view_count') or 0
+        session_id = _field(event, 'session_id')
+        if session_id:
+            self.sessions.add(session_id)
+
+    def merge(self, other: "BehaviorCounters") -> None:
+        """Fold in counters built from later, disjoint events (another process's unsaved delta)"""
+        if not other.events:
+            return
+        if self.landmark is None:
+            self.landmark = other.landmark
+        exponent = (other.landmark - self.landmark) / self.tau
+        if exponent > MAX_DECAY_EXPONENT:
+            self._rebase(other.landmark)
+            exponent = 0.0
+        scale = math.exp(exponent)
+        for scores, theirs in ((self.category_scores, other.category_scores), (self.brand_scores, other.brand_scores)):
+            for key, score in theirs.items():
+                scores[key] += score * scale
+        for key, count in other.brand_counts.items():
+            self.brand_counts[key] += count
+        self.brand_events += other.brand_events
+        self.brand_max = max(self.brand_counts.values(), default=0)
+
+        if other.price_n:
+            # Chan et al. pairwise update of the Welford state
+            n = self.price_n + other.price_n
+            delta = other.price_mean - self.price_mean
+            self.price_m2 += other.price_m2 + delta * delta * self.price_n * other.price_n / n
+            self.price_mean += delta * other.price_n / n
+            self.price_n = n
+
+        self.duration_n += other.duration_n
+        self.duration_sum += other.duration_sum
+        if other.orders:
+            if self.last_purchase is not None:
+                self.purchase_gap_days += int((other.first_purchase - self.last_purchase) // 86400)
+            else:
+                self.first_purchase = other.first_purchase
+            self.purchase_gap_days += other.purchase_gap_days
+            self.last_purchase = other.last_purchase
+        self.orders += other.orders
+        self.order_sum += other.order_sum
+
+        for key, count in other.devices.items():
+            self.devices[key] += count
+        self.hours = [mine + theirs for mine, theirs in zip(self.hours, other.hours)]
+        self.weekdays = [mine + theirs for mine, theirs in zip(self.weekdays, other.weekdays)]
+        self.clicks += other.clicks
+        self.views += other.views
+        self.sessions |= other.sessions
+        self.events += other.events
+        self.last_event = other.last_event if self.last_event is None else max(self.last_event, other.last_event)
+
+    @classmethod
+    def from_activities(cls, activities: Iterable[Any], half_life_days: float = 7.0) -> "BehaviorCounters":
+        counters = cls(half_life_days)
+        for activity in sorted(activities, key=lambda a: _field(a, 'created_at') or EPOCH):
+            counters.apply(activity)
+        return counters
+
+    def metrics(self) -> Dict[str, Any]:
+        metrics = {
+            'preferred_categories': [],
+            'preferred_brands': [],
+            'price_sensitivity': 0.0,
+            'brand_loyalty': 0.0,
+            'deal_seeking': False,
+            'impulse_buying': False,
+            'research_intensive': False,
+            'shopping_frequency': 'monthly',
+            'preferred_shopping_time': 'afternoon',
+            'preferred_shopping_day': 'weekend',
+            'avg_session_duration': 0,
+            'avg_pages_per_session': 0.0,
+            'bounce_rate': 0.0,
+            'return_visitor': False,
+            'avg_order_value': 0.0,
+            'total_orders': 0,
+            'total_spent': 0.0,
+            'purchase_frequency': 0.0,
+            'risk_score': 0.0,
+            'customer_lifecycle_stage': 'new',
+            'customer_lifetime_value': 0.0,
+            'personalization_score': 0.0,
+            'engagement_score': 0.0
+        }
+
+        if self.category_scores:
+            metrics['preferred_categories'] = sorted(self.category_scores, key=self.category_scores.get, reverse=True)[:5]
+        if self.brand_scores:
+            metrics['preferred_brands'] = sorted(self.brand_scores, key=self.brand_scores.get, reverse=True)[:5]
+            if self.brand_events > 1:
+                metrics['brand_loyalty'] = self.brand_max / self.brand_events
+
+        if self.price_n:
+            price_std = math.sqrt(self.price_m2 / self.price_n)
+            metrics['price_sensitivity'] = min(1.0, price_std / self.price_mean if self.price_mean > 0 else 0)
+
+        if self.orders > 1:
+            avg_days = self.purchase_gap_days / (self.orders - 1)
+            if avg_days <= 7:
+                metrics['shopping_frequency'] = 'daily'
+            elif avg_days <= 30:
+                metrics['shopping_frequency'] = 'weekly'
+            else:
+                metrics['shopping_frequency'] = 'monthly'
+
+        if self.devices:
+            metrics['preferred_device'] = max(self.devices, key=self.devices.get)
+        if self.events:
+            metrics['preferred_shopping_time'] = time_period(max(range(24), key=self.hours.__getitem__))
+            metrics['preferred_shopping_day'] = 'weekend' if max(range(7), key=self.weekdays.__getitem__) >= 5 else 'weekday'
+
+        if self.duration_n:
+            metrics['avg_session_duration'] = self.duration_sum / self.duration_n
+        if self.views > 0:
+            metrics['avg_pages_per_session'] = self.views / max(1, len(self.sessions))
+            metrics['bounce_rate'] = 1.0 - (self.clicks / self.views)
+
+        if self.orders:
+            metrics['avg_order_value'] = self.order_sum / self.orders
+            metrics['total_orders'] = self.orders
+            metrics['total_spent'] = self.order_sum
+            metrics['purchase_frequency'] = self.orders / 30  # orders per month
+
+        if metrics['total_orders'] == 0:
+            metrics['customer_lifecycle_stage'] = 'new'
+        elif metrics['total_orders'] >= 10:
+            metrics['customer_lifecycle_stage'] = 'loyal'
+        elif metrics['total_orders'] >= 3:
+            metrics['customer_lifecycle_stage'] = 'active'
+        else:
+            metrics['customer_lifecycle_stage'] = 'at_risk'
+
+        metrics['customer_lifetime_value'] = metrics['total_spent']
+
+        engagement_score = min(1.0, (self.clicks + self.views) / 100)
+        purchase_score = min(1.0, metrics['total_orders'] / 10)
+        metrics['personalization_score'] = (engagement_score + purchase_score) / 2
+        metrics['engagement_score'] = engagement_score
+        return metrics
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'landmark': self.landmark, 'events': self.events,
+            'category_scores': self.category_scores, 'brand_scores': self.brand_scores,
+            'brand_counts': self.brand_counts, 'brand_events': self.brand_events, 'brand_max': self.brand_max,
+            'price_n': self.price_n, 'price_mean': self.price_mean, 'price_m2': self.price_m2,
+            'duration_n': self.duration_n, 'duration_sum': self.duration_sum,
+            'orders': self.orders, 'order_sum': self.order_sum, 'first_purchase': self.first_purchase,
+            'last_purchase': self.last_purchase, 'purchase_gap_days': self.purchase_gap_days,
+            'devices': self.devices, 'hours': self.hours, 'weekdays': self.weekdays,
+            'clicks': self.clicks, 'views': self.views, 'sessions': sorted(self.sessions),
+            'last_event': self.last_event,
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any], half_life_days: float = 7.0) -> "BehaviorCounters":
+        counters = cls(half_life_days, landmark=state.get('landmark'))
+        for name in ('events', 'brand_events', 'brand_max', 'price_n', 'price_mean', 'price_m2', 'duration_n',
+                     'duration_sum', 'orders', 'order_sum', 'first_purchase', 'last_purchase', 'purchase_gap_days', 'clicks',
+                     'views', 'last_event'):
+            if name in state:
+                setattr(counters, name, state[name])
+        for name in ('category_scores', 'brand_scores', 'brand_counts', 'devices'):
+            getattr(counters, name).update(state.get(name) or {})
+        counters.hours = list(state.get('hours') or counters.hours)
+        counters.weekdays = list(state.get('weekdays') or counters.weekdays)
+        counters.sessions = set(state.get('sessions') or ())
+        return counters
+
+
+class BehaviorAggregator:
+    def __init__(self, half_life_days: float = 7.0, max_users: int = 50000, state_ttl: float = 6 * 3600):
+        self.half_life_days = half_life_days
+        self._states = TTLCache(maxsize=max_users, ttl=state_ttl)
+        # Events applied here but not yet merged into the stored row
+        self._pending = TTLCache(maxsize=max_users, ttl=state_ttl)
+        self._stats = {'events': 0, 'seeded': 0, 'loaded': 0, 'compacted': 0, 'drifted': 0}
+
+    def _new(self) -> BehaviorCounters:
+        return BehaviorCounters(self.half_life_days)
+
+    async def _load(self, user_ids: List[str]) -> Dict[str, BehaviorCounters]:
+        if db_session.async_engine is None or not user_ids:
+            return {}
+        try:
+            async with db_session.async_engine.connect() as conn:
+                rows = (await conn.execute(pgbouncer_safe(LOAD_SQL), {"user_ids": user_ids})).all()
+        except Exception as e:
+            logger.warning(f"Loading behaviour counters failed: {e}")
+            return {}
+        loaded = self._decode(rows)
+        self._stats['loaded'] += len(loaded)
+        return loaded
+
+    def _decode(self, rows) -> Dict[str, BehaviorCounters]:
+        decoded = {}
+        for row in rows:
+            state = row.state if isinstance(row.state, dict) else json.loads(row.state)
+            decoded[str(row.user_id)] = BehaviorCounters.from_dict(state, self.half_life_days)
+        return decoded
+
+    async def rebuild(self, user_ids: List[str]) -> Dict[str, BehaviorCounters]:
+        """Counters for each user rebuilt from the raw activity window (one query for the whole list)"""
+        rebuilt = {user_id: self._new() for user_id in user_ids}
+        if db_session.async_engine is None or not user_ids:
+            return rebuilt
+        since = datetime.utcnow() - timedelta(days=PROFILE_WINDOW_DAYS)
+        query = (
+            select(*ACTIVITY_COLUMNS)
+            .where(UserActivity.user_id.in_(user_ids), UserActivity.created_at >= since)
+            .order_by(UserActivity.created_at)
+        )
+        async with db_session.async_engine.connect() as conn:
+            result = await conn.stream(query)
+            async for row in result:
+                rebuilt[str(row.user_id)].apply(row)
+        return rebuilt
+
+    async def _states_for(self, user_ids: List[str]) -> Dict[str, tuple]:
+        """``{user_id: (counters, seeded)}``; seeded counters already include everything written so far"""
+        states = {}
+        missing = []
+        for user_id in user_ids:
+            counters = self._states.get(user_id)
+            if counters is None:
+                missing.append(user_id)
+            else:
+                states[user_id] = (counters, False)
+        if missing:
+            loaded = await self._load(missing)
+            unseen = [user_id for user_id in missing if user_id not in loaded]
+            try:
+                seeded = await self.rebuild(unseen)
+            except Exception as e:
+                logger.warning(f"Seeding behaviour counters failed: {e}")
+                seeded = {user_id: self._new() for user_id in unseen}
+            self._stats['seeded'] += len(unseen)
+            for user_id, counters in loaded.items():
+                states[user_id] = (counters, False)
+            for user_id, counters in seeded.items():
+                states[user_id] = (counters, True)
+            for user_id in missing:
+                self._states.set(user_id, states[user_id][0])
+        return states
+
+    async def apply(self, rows: List[Dict[str, Any]]) -> None:
+        """Fold freshly written activity rows into their users' counters"""
+        by_user: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for row in rows:
+            if row.get('user_id'):
+                by_user[str(row['user_id'])].append(row)
+        if not by_user:
+            return
+        states = await self._states_for(list(by_user))
+        for user_id, user_rows in by_user.items():
+            counters, seeded = states[user_id]
+            if seeded:
+                # Seeding read the raw history after these rows were committed
+                continue
+            delta = self._pending.get(user_id)
+            if delta is None:
+                delta = self._new()
+                self._pending.set(user_id, delta)
+            for row in user_rows:
+                counters.apply(row)
+                delta.apply(row)
+            self._stats['events'] += len(user_rows)
+
+    async def counters_for(self, user_id: str) -> BehaviorCounters:
+        states = await self._states_for([str(user_id)])
+        return states[str(user_id)][0]
+
+    async def persist(self, db, user_ids: List[str], replace: bool = False) -> Dict[str, BehaviorCounters]:
+        """
+        Save counters on ``db`` and return what was written; the caller commits, so counters
+        and profile land together.
+
+        Users with a stored row get this process's unsaved delta merged into it under a row
+        lock; users without one (just seeded) are written from the cache. ``replace`` writes
+        the cached counters as they are, for compaction.
+        """
+        user_ids = [str(user_id) for user_id in user_ids]
+        stored = {} if replace else self._decode(
+            (await db.execute(pgbouncer_safe(LOCK_SQL), {"user_ids": user_ids})).all()
+        )
+        written = {}
+        for user_id in user_ids:
+            delta = self._pending.get(user_id)
+            self._pending.invalidate(user_id)
+            if user_id in stored:
+                counters = stored[user_id]
+                if delta is not None:
+                    counters.merge(delta)
+                self._states.set(user_id, counters)
+            else:
+                counters = self._states.get(user_id)
+            if counters is not None:
+                written[user_id] = counters
+        if written:
+            await db.execute(pgbouncer_safe(UPSERT_SQL), [
+                {"user_id": user_id, "state": json.dumps(counters.to_dict()), "event_count": counters.events}
+                for user_id, counters in written.items()
+            ])
+        return written
+
+    async def compact(self, batch_size: int = 500) -> Dict[str, int]:
+        """Rebuild every stored user's counters from the raw window and rewrite drifted profiles"""
+        if db_session.AsyncSessionLocal is None:
+            return {'users': 0, 'drifted': 0, 'removed': 0}
+        from app.features.analytics.services.personalization_engine import PersonalizationEngine
+
+        totals = {'users': 0, 'drifted': 0, 'removed': 0}
+        after = '00000000-0000-0000-0000-000000000000'
+        while True:
+            async with db_session.async_engine.connect() as conn:
+                user_ids = [str(row.user_id) for row in (await conn.execute(
+                    pgbouncer_safe(STORED_USERS_SQL), {"after": after, "limit": batch_size}
+                )).all()]
+            if not user_ids:
+                break
+            after = user_ids[-1]
+            stored = await self._load(user_ids)
+            rebuilt = await self.rebuild(user_ids)
+
+            idle = [user_id for user_id, counters in rebuilt.items() if not counters.events]
+            active = [user_id for user_id in user_ids if user_id not in idle]
+            drifted = [
+                user_id for user_id in active
+                if user_id not in stored or stored[user_id].events != rebuilt[user_id].events
+            ]
+            for user_id in active:
+                self._states.set(user_id, rebuilt[user_id])
+            for user_id in idle:
+                self._states.invalidate(user_id)
+                self._pending.invalidate(user_id)
+
+            async with db_session.AsyncSessionLocal() as db:
+                engine = PersonalizationEngine(db)
+                for user_id in drifted:
+                    await engine.write_profile(user_id, rebuilt[user_id].metrics())
+                await self.persist(db, active, replace=True)
+                if idle:
+                    await db.execute(pgbouncer_safe(DELETE_SQL), {"user_ids": idle})
+                await db.commit()
+
+            totals['users'] += len(user_ids)
+            totals['drifted'] += len(drifted)
+            totals['removed'] += len(idle)
+
+        self._stats['compacted'] += totals['users']
+        self._stats['drifted'] += totals['drifted']
+        if totals['users']:
+            logger.info(
+                f"Compacted behaviour counters for {totals['users']} users "
+                f"({totals['drifted']} drifted, {totals['removed']} idle removed)"
+            )
+        return totals
+
+    def metrics(self) -> Dict[str, Any]:
+        return {**self._stats, 'cached_users': len(self._states)}
+
+
+behavior_aggregator = BehaviorAggregator(
+    half_life_days=settings.BEHAVIOR_HALF_LIFE_DAYS,
+    max_users=settings.BEHAVIOR_STATE_CACHE_SIZE
+)
+behavior_compactor = PeriodicTask(
+    "behaviour counter compaction", behavior_aggregator.compact, settings.BEHAVIOR_COMPACTION_INTERVAL
+)
@@ -13,6 +13,7 @@ from app.features.products.models.product import Product
 from app.features.products.models.category import Category
 from app.features.products.models.brand import Brand
 from app.core.logging import get_logger
+from app.features.analytics.services.cooccurrence_index import cooccurrence_index
 
 logger = get_logger("bundle_automation")
 
@@ -240,58 +241,36 @@ class BundleAutomationEngine:
     async def _get_frequently_bought_together(self) -> List[List[Product]]:
         """Get products that are frequently bought together"""
         try:
-            # Query for products that appear together in orders
-            thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-            
-            query = text("""
-                SELECT 
-                    p1.id as product1_id,
-                    p2.id as product2_id,
-                    COUNT(*) as frequency
-                FROM order_items oi1
-                JOIN order_items oi2 ON oi1.order_id = oi2.order_id
-                JOIN products p1 ON oi1.product_id = p1.id
-                JOIN products p2 ON oi2.product_id = p2.id
-                WHERE oi1.product_id != oi2.product_id
-                AND oi1.created_at >= :thirty_days_ago
-                GROUP BY p1.id, p2.id
-                HAVING COUNT(*) >= 2
-                ORDER BY frequency DESC
-                LIMIT 20
-            """)
-            
-            result = await self.db.execute(query, {"thirty_days_ago": thirty_days_ago})
-            frequent_pairs = result.fetchall()
-            
-            # Group products that appear together
-            product_groups = defaultdict(set)
-            for pair in frequent_pairs:
-                product_groups[pair.product1_id].add(pair.product2_id)
-                product_groups[pair.product2_id].add(pair.product1_id)
-            
-            # Convert to product objects
+            matrix = cooccurrence_index.get('bought')
+            if matrix is not None:
+                # Precomputed index: the strongest products and their top co-purchases
+                product_groups = {
+                    product_id: [related_id for related_id, _ in matrix.neighbors(product_id, 2)]
+                    for product_id in matrix.top_products(20)
+                }
+            else:
+                product_groups = await self._query_frequently_bought_together()
+            
+            # One query for every product involved instead of two per group
+            product_ids = set(product_groups)
+            for related_product_ids in product_groups.values():
+                product_ids.update(related_product_ids)
+            if not product_ids:
+                return []
+            products_result = await self.db.execute(select(Product).where(Product.id.in_(list(product_ids))))
+            products = {str(product.id): product for product in products_result.scalars().all()}
+            
             bundles = []
             for main_product_id, related_product_ids in product_groups.items():
-                if len(related_product_ids) >= 1:
-                    # Get main product
-                    main_product_query = select(Product).where(Product.id == main_product_id)
-                    main_result = await self.db.execute(main_product_query)
-                    main_product = main_result.scalar_one_or_none()
-                    
-                    if main_product:
-                        # Get related products
-                        related_products_query = select(Product).where(
-                            and_(
-                                Product.id.in_(list(related_product_ids)[:2]),  # Limit to 2 related products
-                                Product.is_active == True
-                            )
-                        )
-                        related_result = await self.db.execute(related_products_query)
-                        related_products = related_result.scalars().all()
-                        
-                        if related_products:
-                            bundle_products = [main_product] + list(related_products)
-                            bundles.append(bundle_products)
+                main_product = products.get(str(main_product_id))
+                if not main_product:
+                    continue
+                related_products = [
+                    products[str(related_id)] for related_id in related_product_ids[:2]  # Limit to 2 related products
+                    if str(related_id) in products and products[str(related_id)].is_active
+                ]
+                if related_products:
+                    bundles.append([main_product] + related_products)
             
             return bundles
             
@@ -299,6 +278,35 @@ class BundleAutomationEngine:
             self.logger.error(f"Error getting frequently bought together: {str(e)}")
             return []
     
+    async def _query_frequently_bought_together(self) -> Dict[str, List[str]]:
+        """Live self-join over recent order items; used until the co-occurrence index is built"""
+        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
+        
+        query = text("""
+            SELECT 
+                oi1.product_id as product1_id,
+                oi2.product_id as product2_id,
+                COUNT(*) as frequency
+            FROM order_items oi1
+            JOIN order_items oi2 ON oi1.order_id = oi2.order_id
+            WHERE oi1.product_id != oi2.product_id
+            AND oi1.created_at >= :thirty_days_ago
+            GROUP BY oi1.product_id, oi2.product_id
+            HAVING COUNT(*) >= 2
+            ORDER BY frequency DESC
+            LIMIT 20
+        """)
+        
+        result = await self.db.execute(query, {"thirty_days_ago": thirty_days_ago})
+        
+        # Group products that appear together
+        product_groups = defaultdict(list)
+        for pair in result.fetchall():
+            for main_id, related_id in ((pair.product1_id, pair.product2_id), (pair.product2_id, pair.product1_id)):
+                if related_id not in product_groups[main_id]:
+                    product_groups[main_id].append(related_id)
+        return product_groups
+    
     async def _get_trending_products_in_category(
         self,
         category_id: str,
@@ -0,0 +1,272 @@
+"""
+Precomputed item-item co-occurrence for "bought together" and "viewed together".
+
+Both features used to self-join ``order_items`` / ``product_views`` on every
+request. Here the baskets (orders, or browsing sessions) from the last
+COOCCURRENCE_WINDOW_DAYS are read once into a sparse basket x product
+incidence matrix ``B``. The co-occurrence counts come from ``B.T @ B``. Each
+product's row is sorted by count and truncated to COOCCURRENCE_MAX_NEIGHBORS,
+so top-k for a product is the first k entries of its row.
+
+An index is four ``.npy`` files (CSR ``indptr``/``indices``/``data`` plus the
+product ids). Each build goes into its own versioned directory, and then a
+small manifest is swapped atomically to point at it. Every worker
+memory-maps the current version, so the pages are shared. A worker only
+rebuilds when the manifest is older than the refresh interval. Otherwise it
+picks up another worker's build.
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+from sqlalchemy import text
+
+import app.database.session as db_session
+from app.database.session import pgbouncer_safe
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.periodic import PeriodicTask
+
+logger = get_logger("analytics.cooccurrence_index")
+
+ORDER_BASKETS_SQL = text("""
+    SELECT order_id AS basket, product_id
+    FROM order_items
+    WHERE created_at >= :since
+""")
+
+VIEW_BASKETS_SQL = text("""
+    SELECT session_id AS basket, product_id
+    FROM product_views
+    WHERE viewed_at >= :since AND session_id IS NOT NULL
+""")
+
+# kind -> (basket query, minimum co-occurrence count kept)
+KINDS = {
+    'bought': (ORDER_BASKETS_SQL, 2),
+    'viewed': (VIEW_BASKETS_SQL, 1),
+}
+
+INDEX_FILES = ('ids', 'indptr', 'indices', 'data')
+
+
+def build_cooccurrence(
+    basket_codes: np.ndarray,
+    product_codes: np.ndarray,
+    n_products: int,
+    min_count: int = 1,
+    max_neighbors: int = 50,
+    max_basket: int = 100
+) -> Dict[str, np.ndarray]:
+    """
+    CSR co-occurrence counts with each row sorted by count, descending.
+
+    Baskets with more than ``max_basket`` distinct products (crawlers, bulk
+    orders) are skipped because they would contribute quadratically many pairs.
+    """
+    n_baskets = int(basket_codes.max()) + 1 if len(basket_codes) else 0
+    incidence = sp.csr_matrix(
+        (np.ones(len(basket_codes), dtype=np.float32), (basket_codes, product_codes)),
+        shape=(n_baskets, n_products)
+    )
+    incidence.sum_duplicates()
+    incidence.data[:] = 1  # A product counts once per basket
+    basket_sizes = np.diff(incidence.indptr)
+    if max_basket and (basket_sizes > max_basket).any():
+        incidence = sp.diags((basket_sizes <= max_basket).astype(np.float32)) @ incidence
+
+    counts = (incidence.T @ incidence).tocsr()
+    counts.setdiag(0)
+    counts.data[counts.data < min_count] = 0
+    counts.eliminate_zeros()
+
+    row_lengths = np.diff(counts.indptr)
+    rows = np.repeat(np.arange(n_products), row_lengths)
+    order = np.lexsort((-counts.data, rows))
+    rank = np.arange(len(order)) - np.repeat(counts.indptr[:-1], row_lengths)
+    keep = order[rank < max_neighbors]
+
+    kept_lengths = np.minimum(row_lengths, max_neighbors)
+    return {
+        'indptr': np.concatenate(([0], np.cumsum(kept_lengths))).astype(np.int64),
+        'indices': counts.indices[keep].astype(np.int32),
+        'data': counts.data[keep].astype(np.float32),
+    }
+
+
+class CooccurrenceMatrix:
+    """One loaded (memory-mapped) index"""
+
+    def __init__(self, version: str, ids: List[str], indptr: np.ndarray, indices: np.ndarray, data: np.ndarray):
+        self.version = version
+        self.ids = ids
+        self.rows = {product_id: row for row, product_id in enumerate(ids)}
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+
+    @classmethod
+    def load(cls, directory: Path, version: str) -> "CooccurrenceMatrix":
+        # Plain ndarray views over the maps: same shared pages, without np.memmap's per-slice overhead
+        arrays = {name: np.asarray(np.load(directory / f"{name}.npy", mmap_mode='r')) for name in INDEX_FILES}
+        ids = [str(uuid.UUID(bytes=row.tobytes())) for row in np.asarray(arrays['ids'])]
+        return cls(version, ids, arrays['indptr'], arrays['indices'], arrays['data'])
+
+    def neighbors(self, product_id: str, k: int) -> List[Tuple[str, float]]:
+        row = self.rows.get(str(product_id))
+        if row is None:
+            return []
+        start = int(self.indptr[row])
+        end = min(int(self.indptr[row + 1]), start + k)
+        ids = self.ids
+        return [
+            (ids[i], count)
+            for i, count in zip(self.indices[start:end].tolist(), self.data[start:end].tolist())
+        ]
+
+    def top_products(self, n: int) -> List[str]:
+        """Products whose strongest co-occurrence is highest"""
+        lengths = np.diff(self.indptr)
+        candidates = np.flatnonzero(lengths)
+        if not len(candidates):
+            return []
+        heads = np.asarray(self.data)[np.asarray(self.indptr)[candidates]]
+        if len(candidates) > n:
+            top = np.argpartition(-heads, n - 1)[:n]
+        else:
+            top = np.arange(len(candidates))
+        top = top[np.argsort(-heads[top], kind='stable')]
+        return [self.ids[i] for i in candidates[top]]
+
+
+class CooccurrenceIndex:
+    def __init__(self, root: str, refresh_interval: int, window_days: int, max_neighbors: int, max_basket: int):
+        self.root = Path(root)
+        self.refresh_interval = refresh_interval
+        self.window_days = window_days
+        self.max_neighbors = max_neighbors
+        self.max_basket = max_basket
+        self._matrices: Dict[str, CooccurrenceMatrix] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def get(self, kind: str) -> Optional[CooccurrenceMatrix]:
+        return self._matrices.get(kind)
+
+    def neighbors(self, kind: str, product_id: str, k: int) -> Optional[List[Tuple[str, float]]]:
+        """Top-k ``(product_id, count)`` for a product; None when no index is loaded yet"""
+        matrix = self._matrices.get(kind)
+        if matrix is None:
+            return None
+        return matrix.neighbors(product_id, k)
+
+    def _manifest(self, kind: str) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads((self.root / f"{kind}.json").read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _load(self, kind: str, manifest: Dict[str, Any]) -> None:
+        current = self._matrices.get(kind)
+        if current is not None and current.version == manifest['version']:
+            return
+        self._matrices[kind] = CooccurrenceMatrix.load(self.root / kind / manifest['version'], manifest['version'])
+        self._stats[kind] = manifest
+
+    async def _fetch_baskets(self, kind: str) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+        query, _ = KINDS[kind]
+        since = datetime.utcnow() - timedelta(days=self.window_days)
+        basket_index: Dict[Any, int] = {}
+        product_index: Dict[Any, int] = {}
+        basket_codes: List[int] = []
+        product_codes: List[int] = []
+        async with db_session.async_engine.connect() as conn:
+            result = await conn.stream(pgbouncer_safe(query), {"since": since})
+            async for basket, product_id in result:
+                basket_codes.append(basket_index.setdefault(basket, len(basket_index)))
+                product_codes.append(product_index.setdefault(product_id, len(product_index)))
+        products = [str(product_id) for product_id in product_index]
+        return np.asarray(basket_codes, dtype=np.int64), np.asarray(product_codes, dtype=np.int64), products
+
+    def _write(self, kind: str, products: List[str], arrays: Dict[str, np.ndarray], baskets: int) -> Dict[str, Any]:
+        version = f"{int(time.time() * 1000)}-{os.getpid()}"
+        directory = self.root / kind / version
+        directory.mkdir(parents=True, exist_ok=True)
+        ids = np.frombuffer(b''.join(uuid.UUID(p).bytes for p in products), dtype=np.uint8).reshape(-1, 16)
+        np.save(directory / "ids.npy", ids)
+        for name in ('indptr', 'indices', 'data'):
+            np.save(directory / f"{name}.npy", arrays[name])
+
+        manifest = {
+            'version': version,
+            'built_at': time.time(),
+            'products': len(products),
+            'pairs': int(len(arrays['indices'])),
+            'baskets': baskets,
+        }
+        temp = self.root / f".{kind}.json.{os.getpid()}.tmp"
+        temp.write_text(json.dumps(manifest))
+        os.replace(temp, self.root / f"{kind}.json")
+
+        # Keep the previous version for workers that have not switched yet
+        versions = sorted((p for p in (self.root / kind).iterdir() if p.is_dir()), key=lambda p: p.name)
+        for stale in versions[:-2]:
+            shutil.rmtree(stale, ignore_errors=True)
+        return manifest
+
+    async def rebuild(self, kind: str) -> Dict[str, Any]:
+        start = time.perf_counter()
+        basket_codes, product_codes, products = await self._fetch_baskets(kind)
+        _, min_count = KINDS[kind]
+        loop = asyncio.get_running_loop()
+        arrays = await loop.run_in_executor(
+            None, build_cooccurrence, basket_codes, product_codes, len(products),
+            min_count, self.max_neighbors, self.max_basket
+        )
+        baskets = int(basket_codes.max()) + 1 if len(basket_codes) else 0
+        manifest = await loop.run_in_executor(None, self._write, kind, products, arrays, baskets)
+        manifest['build_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        self._load(kind, manifest)
+        logger.info(
+            f"Built {kind} co-occurrence index: {manifest['products']} products, "
+            f"{manifest['pairs']} pairs from {baskets} baskets in {manifest['build_ms']} ms"
+        )
+        return manifest
+
+    async def refresh(self) -> None:
+        """Load the current build of each kind, rebuilding any that is missing or older than the interval"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        for kind in KINDS:
+            manifest = self._manifest(kind)
+            try:
+                fresh = manifest and time.time() - manifest['built_at'] < self.refresh_interval
+                if fresh or db_session.async_engine is None:
+                    if manifest:
+                        self._load(kind, manifest)
+                    continue
+                await self.rebuild(kind)
+            except Exception as e:
+                logger.error(f"Refreshing {kind} co-occurrence index failed: {e}")
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        return {kind: dict(stats) for kind, stats in self._stats.items()}
+
+
+cooccurrence_index = CooccurrenceIndex(
+    root=settings.COOCCURRENCE_INDEX_DIR,
+    refresh_interval=settings.COOCCURRENCE_REFRESH_INTERVAL,
+    window_days=settings.COOCCURRENCE_WINDOW_DAYS,
+    max_neighbors=settings.COOCCURRENCE_MAX_NEIGHBORS,
+    max_basket=settings.COOCCURRENCE_MAX_BASKET
+)
+cooccurrence_refresher = PeriodicTask(
+    "co-occurrence refresh", cooccurrence_index.refresh, settings.COOCCURRENCE_REFRESH_INTERVAL, run_at_start=True
+)
@@ -0,0 +1,345 @@
+"""
+Admin dashboard overview aggregation.
+
+The overview used to await eight helpers one after another on the request's
+session. ``_get_key_metrics`` alone ran five scalar queries, and the funnel
+ran one more per stage. Here the scalar metrics are folded into one aggregate
+query per table, with ``count(*) FILTER (WHERE ...)`` for the conditional
+counts. Independent sections run concurrently, each on its own pooled session.
+
+Finished overviews are cached per ``days`` window. Within DASHBOARD_CACHE_TTL
+an entry is served as is. Up to DASHBOARD_STALE_TTL it is still served, and a
+single background task recomputes it. Older or missing entries are computed
+inline, and concurrent callers for the same window wait on one computation.
+"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import desc, func, select
+
+import app.database.session as db_session
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.features.analytics.models.user_activity import (
+    UserActivity, UserBehaviorProfile, RecommendationLog, BundleRecommendation
+)
+from app.features.products.models.category import Category
+from app.features.products.models.product import Product
+from app.features.products.services.trending_engine import trending_engine, window_for_days
+
+logger = get_logger("analytics.dashboard_aggregator")
+
+# Sections querying at once per overview; each holds a pooled connection
+SECTION_CONCURRENCY = 4
+
+FUNNEL_STAGES = ('page_view', 'product_view', 'add_to_cart', 'purchase')
+
+PROFIT_INSIGHTS = {
+    "revenue_optimization_opportunities": [
+        "Increase prices on high-margin products by 5-10%",
+        "Create premium bundles with high-margin products",
+        "Implement dynamic pricing based on demand"
+    ],
+    "cost_optimization_opportunities": [
+        "Reduce inventory costs for slow-moving products",
+        "Optimize marketing spend on high-ROI channels",
+        "Implement automated customer service"
+    ],
+    "margin_improvement_suggestions": [
+        "Focus on high-margin product categories",
+        "Create exclusive products with higher margins",
+        "Implement upselling strategies"
+    ]
+}
+
+
+def _rates(impressions: int, clicks: int, conversions: int) -> Dict[str, float]:
+    return {
+        "click_through_rate": (clicks / impressions) if impressions > 0 else 0,
+        "conversion_rate": (conversions / clicks) if clicks > 0 else 0,
+    }
+
+
+async def _profile_metrics(db, start_date: datetime) -> Dict[str, Any]:
+    row = (await db.execute(select(
+        func.count().label('total_users'),
+        func.count().filter(UserBehaviorProfile.last_activity_at >= start_date).label('active_users'),
+        func.avg(UserBehaviorProfile.avg_session_duration).label('avg_session_duration'),
+        func.sum(UserBehaviorProfile.customer_lifetime_value).label('total_revenue'),
+    ))).one()
+    return {
+        "total_users": row.total_users,
+        "active_users": row.active_users,
+        "avg_session_duration": float(row.avg_session_duration or 0),
+        "total_revenue": float(row.total_revenue or 0),
+    }
+
+
+async def _activity_counts(db, start_date: datetime) -> Dict[str, int]:
+    """Total activities in the window plus one count per funnel stage, in a single scan"""
+    row = (await db.execute(
+        select(
+            func.count().label('total'),
+            *[func.count().filter(UserActivity.activity_type == stage).label(stage) for stage in FUNNEL_STAGES]
+        ).where(UserActivity.created_at >= start_date)
+    )).one()
+    return {"total": row.total, **{stage: getattr(row, stage) for stage in FUNNEL_STAGES}}
+
+
+async def _user_segmentation(db, start_date: datetime) -> Dict[str, Any]:
+    segments = (await db.execute(
+        select(
+            UserBehaviorProfile.customer_lifecycle_stage,
+            func.count(UserBehaviorProfile.id).label('count'),
+            func.avg(UserBehaviorProfile.customer_lifetime_value).label('avg_clv'),
+            func.sum(UserBehaviorProfile.customer_lifetime_value).label('total_revenue')
+        ).group_by(UserBehaviorProfile.customer_lifecycle_stage)
+    )).fetchall()
+    return {
+        "segments": [
+            {
+                "stage": segment.customer_lifecycle_stage,
+                "count": segment.count,
+                "avg_clv": float(segment.avg_clv or 0),
+                "total_revenue": float(segment.total_revenue or 0)
+            }
+            for segment in segments
+        ]
+    }
+
+
+async def _recommendation_performance(db, start_date: datetime) -> Dict[str, Any]:
+    performance = (await db.execute(
+        select(
+            func.count(RecommendationLog.id).label('total_recommendations'),
+            func.sum(RecommendationLog.impressions).label('total_impressions'),
+            func.sum(RecommendationLog.clicks).label('total_clicks'),
+            func.sum(RecommendationLog.conversions).label('total_conversions'),
+            func.sum(RecommendationLog.revenue_generated).label('total_revenue')
+        ).where(RecommendationLog.created_at >= start_date)
+    )).one()
+    impressions = performance.total_impressions or 0
+    clicks = performance.total_clicks or 0
+    conversions = performance.total_conversions or 0
+    return {
+        "total_recommendations": performance.total_recommendations or 0,
+        "total_impressions": impressions,
+        "total_clicks": clicks,
+        "total_conversions": conversions,
+        "total_revenue": float(performance.total_revenue or 0),
+        **_rates(impressions, clicks, conversions)
+    }
+
+
+async def _bundle_performance(db, start_date: datetime) -> Dict[str, Any]:
+    performance = (await db.execute(
+        select(
+            func.count(BundleRecommendation.id).label('total_bundles'),
+            func.sum(BundleRecommendation.impressions).label('total_impressions'),
+            func.sum(BundleRecommendation.clicks).label('total_clicks'),
+            func.sum(BundleRecommendation.conversions).label('total_conversions'),
+            func.sum(BundleRecommendation.revenue_generated).label('total_revenue'),
+            func.avg(BundleRecommendation.discount_percentage).label('avg_discount')
+        ).where(BundleRecommendation.created_at >= start_date)
+    )).one()
+    impressions = performance.total_impressions or 0
+    clicks = performance.total_clicks or 0
+    conversions = performance.total_conversions or 0
+    return {
+        "total_bundles": performance.total_bundles or 0,
+        "total_impressions": impressions,
+        "total_clicks": clicks,
+        "total_conversions": conversions,
+        "total_revenue": float(performance.total_revenue or 0),
+        "avg_discount": float(performance.avg_discount or 0),
+        **_rates(impressions, clicks, conversions)
+    }
+
+
+async def _trending_products(db, start_date: datetime) -> List[Dict[str, Any]]:
+    days = round((datetime.utcnow() - start_date).total_seconds() / 86400)
+    ranked = trending_engine.top(window_for_days(days), 10) or []
+    if not ranked:
+        return []
+    products = {
+        str(product.id): product
+        for product in (await db.execute(
+            select(Product.id, Product.name, Product.price).where(
+                Product.id.in_([product_id for product_id, _ in ranked])
+            )
+        )).fetchall()
+    }
+    return [
+        {
+            "id": product_id,
+            "name": products[product_id].name,
+            "price": float(products[product_id].price),
+            "activity_count": round(score)
+        }
+        for product_id, score in ranked
+        if product_id in products
+    ]
+
+
+async def _top_categories(db, start_date: datetime) -> List[Dict[str, Any]]:
+    categories = (await db.execute(
+        select(
+            Category.id,
+            Category.name,
+            func.count(UserActivity.id).label('activity_count')
+        ).join(
+            UserActivity, Category.id == UserActivity.category_id
+        ).where(
+            UserActivity.created_at >= start_date
+        ).group_by(
+            Category.id, Category.name
+        ).order_by(
+            desc('activity_count')
+        ).limit(10)
+    )).fetchall()
+    return [
+        {
+            "id": str(category.id),
+            "name": category.name,
+            "activity_count": category.activity_count
+        }
+        for category in categories
+    ]
+
+
+def _conversion_funnel(counts: Dict[str, int]) -> Dict[str, Any]:
+    funnel_data = {stage: counts[stage] for stage in FUNNEL_STAGES}
+    conversion_rates = {}
+    if funnel_data['page_view'] > 0:
+        conversion_rates['page_to_product'] = funnel_data['product_view'] / funnel_data['page_view']
+    if funnel_data['product_view'] > 0:
+        conversion_rates['product_to_cart'] = funnel_data['add_to_cart'] / funnel_data['product_view']
+    if funnel_data['add_to_cart'] > 0:
+        conversion_rates['cart_to_purchase'] = funnel_data['purchase'] / funnel_data['add_to_cart']
+    return {"funnel_data": funnel_data, "conversion_rates": conversion_rates}
+
+
+# section name -> query; each runs on its own session
+SECTIONS: Dict[str, Callable[[Any, datetime], Awaitable[Any]]] = {
+    'profile_metrics': _profile_metrics,
+    'activity_counts': _activity_counts,
+    'user_segmentation': _user_segmentation,
+    'recommendation_performance': _recommendation_performance,
+    'bundle_performance': _bundle_performance,
+    'trending_products': _trending_products,
+    'top_categories': _top_categories,
+}
+
+# What a failed section contributes, matching what the old helpers returned on error
+SECTION_FALLBACKS = {
+    'trending_products': [],
+    'top_categories': [],
+}
+
+
+class DashboardAggregator:
+    def __init__(self, ttl: float, stale_ttl: float):
+        self.ttl = ttl
+        self.stale_ttl = max(stale_ttl, ttl)
+        # days -> (overview, computed_at monotonic)
+        self._entries: Dict[int, Tuple[Dict[str, Any], float]] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._refreshing: Set[asyncio.Task] = set()
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def invalidate(self) -> None:
+        self._entries.clear()
+
+    async def _run_section(self, name: str, start_date: datetime) -> Tuple[Any, bool]:
+        async with self._slots:
+            try:
+                async with db_session.AsyncSessionLocal() as db:
+                    return await SECTIONS[name](db, start_date), True
+            except Exception as e:
+                logger.error(f"Dashboard section {name} failed: {e}")
+                return SECTION_FALLBACKS.get(name, {}), False
+
+    async def compute(self, days: int) -> Tuple[Dict[str, Any], bool]:
+        """Build the overview for a window; the flag is False if any section failed"""
+        if db_session.AsyncSessionLocal is None:
+            raise RuntimeError("Database is not initialized")
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(SECTION_CONCURRENCY)
+        start_date = datetime.utcnow() - timedelta(days=days)
+        outcomes = await asyncio.gather(*(self._run_section(name, start_date) for name in SECTIONS))
+        results = {name: value for name, (value, _) in zip(SECTIONS, outcomes)}
+        complete = all(ok for _, ok in outcomes)
+
+        profiles, activities = results['profile_metrics'], results['activity_counts']
+        key_metrics = {}
+        if profiles and activities:
+            total_users = profiles['total_users']
+            key_metrics = {
+                "total_users": total_users,
+                "active_users": profiles['active_users'],
+                "total_activities": activities['total'],
+                "avg_session_duration": profiles['avg_session_duration'],
+                "total_revenue": profiles['total_revenue'],
+                "revenue_per_user": profiles['total_revenue'] / total_users if total_users > 0 else 0
+            }
+
+        overview = {
+            "overview": {
+                "period_days": days,
+                "timestamp": datetime.utcnow().isoformat()
+            },
+            "key_metrics": key_metrics,
+            "user_segmentation": results['user_segmentation'],
+            "recommendation_performance": results['recommendation_performance'],
+            "bundle_performance": results['bundle_performance'],
+            "profit_insights": PROFIT_INSIGHTS,
+            "trending_products": results['trending_products'],
+            "top_categories": results['top_categories'],
+            "conversion_funnel": _conversion_funnel(activities) if activities else {}
+        }
+        return overview, complete
+
+    async def _refresh(self, days: int) -> Dict[str, Any]:
+        lock = self._locks.setdefault(days, asyncio.Lock())
+        async with lock:
+            # Another caller may have refreshed while we waited
+            entry = self._entries.get(days)
+            if entry is not None and time.monotonic() - entry[1] < self.ttl:
+                return entry[0]
+            overview, complete = await self.compute(days)
+            # Partial results are returned but not cached, so a blip does not stick for the whole TTL
+            if complete:
+                self._entries[days] = (overview, time.monotonic())
+            return overview
+
+    def _refresh_in_background(self, days: int) -> None:
+        if self._locks.get(days) is not None and self._locks[days].locked():
+            return
+        task = asyncio.create_task(self._refresh(days))
+        self._refreshing.add(task)
+        task.add_done_callback(self._refresh_done)
+
+    def _refresh_done(self, task: asyncio.Task) -> None:
+        self._refreshing.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Dashboard background refresh failed: {task.exception()}")
+
+    async def overview(self, days: int) -> Dict[str, Any]:
+        entry = self._entries.get(days)
+        if entry is not None:
+            age = time.monotonic() - entry[1]
+            if age < self.ttl:
+                return entry[0]
+            if age < self.stale_ttl:
+                self._refresh_in_background(days)
+                return entry[0]
+        return await self._refresh(days)
+
+
+dashboard_aggregator = DashboardAggregator(
+    ttl=settings.DASHBOARD_CACHE_TTL,
+    stale_ttl=settings.DASHBOARD_STALE_TTL
+)
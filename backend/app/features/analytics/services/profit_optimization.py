@@ -10,6 +10,7 @@ from app.features.analytics.models.user_activity import (
     UserActivity, UserBehaviorProfile, ActivityType
 )
 from app.features.products.models.product import Product
+from app.features.products.services.trending_engine import trending_engine, window_for_days
 from app.features.orders.models.order import Order
 # from app.features.orders.models.order_item import OrderItem  # Not available yet
 from app.core.logging import get_logger
@@ -392,42 +393,25 @@ class ProfitOptimizationEngine:
     async def _get_fast_moving_products(self) -> List[Dict[str, Any]]:
         """Get fast-moving products"""
         try:
-            thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-            
-            query = select(
-                Product.id,
-                Product.name,
-                Product.price,
-                func.count(UserActivity.id).label('activity_count')
-            ).join(
-                UserActivity, Product.id == UserActivity.product_id
-            ).where(
-                and_(
-                    UserActivity.activity_type.in_([
-                        ActivityType.PRODUCT_VIEW.value,
-                        ActivityType.ADD_TO_CART.value,
-                        ActivityType.PURCHASE.value
-                    ]),
-                    UserActivity.created_at >= thirty_days_ago,
-                    Product.is_active == True
-                )
-            ).group_by(
-                Product.id, Product.name, Product.price
-            ).order_by(
-                desc('activity_count')
-            ).limit(10)
+            ranked = trending_engine.top(window_for_days(30), 10) or []
+            if not ranked:
+                return []
             
+            query = select(Product.id, Product.name, Product.price).where(
+                Product.id.in_([product_id for product_id, _ in ranked])
+            )
             result = await self.db.execute(query)
-            fast_moving = result.fetchall()
+            products = {str(product.id): product for product in result.fetchall()}
             
             return [
                 {
-                    'id': str(product.id),
-                    'name': product.name,
-                    'price': float(product.price),
-                    'activity_count': product.activity_count
+                    'id': product_id,
+                    'name': products[product_id].name,
+                    'price': float(products[product_id].price),
+                    'activity_count': round(score)
                 }
-                for product in fast_moving
+                for product_id, score in ranked
+                if product_id in products
             ]
             
         except Exception as e:
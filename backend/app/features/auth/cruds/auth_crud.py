@@ -5,7 +5,7 @@ import secrets
 import string
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from app.database.base import get_supabase_client
+from app.database.base import get_supabase_client, get_anon_supabase_client, get_auth_session_client
 from app.core.base import BaseCrud
 from app.features.auth.models.user import User
 from app.core.exceptions import (
@@ -28,20 +28,18 @@ async def get_referrer_by_code(db: AsyncSession, referral_code: str) -> Optional
 class AuthCrud(BaseCrud[User]):
     def __init__(self):
         super().__init__(get_supabase_client(), User)
-        # Use service role client for admin operations to bypass rate limits
-        from app.core.config import settings
-        from supabase import create_client
-        if settings.SUPABASE_URL and settings.SUPABASE_SERVICE_ROLE_KEY:
-            # Use service role key for admin operations (bypasses rate limits)
-            self.admin_client = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_ROLE_KEY)
-            # Also create anon key client for user-facing operations
-            if settings.SUPABASE_ANON_KEY:
-                self.auth_client = create_client(settings.SUPABASE_URL, settings.SUPABASE_ANON_KEY)
-            else:
-                self.auth_client = self.admin_client
-        else:
-            self.auth_client = self.client
-            self.admin_client = self.client
+        # Shared registry clients: service role for admin operations (bypasses rate limits),
+        # anon for stateless user flows (OTP, OAuth URLs, emails). Sign-in and sign-up keep the
+        # session on the client, so they each run on a per-call get_auth_session_client()
+        self.admin_client = self.client
+        self.auth_client = get_anon_supabase_client()
+    
+    async def update(self, db: AsyncSession, id: str, data: Dict[str, Any], commit: bool = True) -> User:
+        user = await super().update(db, id, data, commit)
+        # Authenticated requests serve this row from a short-lived cache; drop it so the change shows at once
+        from app.core.role_auth import forget_cached_user
+        forget_cached_user(id)
+        return user
     
     def _user_to_dict(self, user: User) -> Dict[str, Any]:
         # Handle user_type enum - convert to string value
@@ -170,7 +168,7 @@ class AuthCrud(BaseCrud[User]):
                 # Admin API doesn't return a session, so we need to sign in to get session
                 if hasattr(auth_response, 'user') and auth_response.user:
                     try:
-                        session_response = self.auth_client.auth.sign_in_with_password({
+                        session_response = get_auth_session_client().sign_in_with_password({
                             "email": signup_data["email"],
                             "password": signup_data["password"]
                         })
@@ -193,7 +191,7 @@ class AuthCrud(BaseCrud[User]):
                             # User exists, try to sign in instead
                             logger.info(f"User exists, attempting sign in instead of signup")
                             try:
-                                session_response = self.auth_client.auth.sign_in_with_password({
+                                session_response = get_auth_session_client().sign_in_with_password({
                                     "email": signup_data["email"],
                                     "password": signup_data["password"]
                                 })
@@ -217,7 +215,7 @@ class AuthCrud(BaseCrud[User]):
                 # Fallback to regular signup if admin API fails (but not rate limit)
                 logger.warning(f"Admin user creation failed, falling back to regular signup: {str(admin_error)}")
                 try:
-                    auth_response = self.auth_client.auth.sign_up({
+                    auth_response = get_auth_session_client().sign_up({
                         "email": signup_data["email"],
                         "password": signup_data["password"],
                         "options": {
@@ -599,7 +597,7 @@ class AuthCrud(BaseCrud[User]):
     
     async def login_with_email(self, db: AsyncSession, email: str, password: str) -> Dict[str, Any]:
         try:
-            auth_response = self.auth_client.auth.sign_in_with_password({
+            auth_response = get_auth_session_client().sign_in_with_password({
                 "email": email,
                 "password": password
             })
@@ -817,7 +815,7 @@ class AuthCrud(BaseCrud[User]):
             
             user_data = self._user_to_dict(user_obj)
             
-            auth_response = self.auth_client.auth.sign_in_with_password({
+            auth_response = get_auth_session_client().sign_in_with_password({
                 "email": user_data["email"],
                 "password": password
             })
@@ -4,7 +4,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.exceptions import AuthenticationException
 from app.core.role_auth import get_all_users
 from app.database.session import get_async_session
-from app.database.base import get_supabase_client
+from app.database.base import get_supabase_client, get_anon_supabase_client, get_auth_session_client
+from app.features.auth.requests.password_request import RefreshTokenRequest
 from app.features.auth.requests.phone_referral_request import SignupPhoneRequest
 from app.features.auth.requests.signup_request import SignupRequest
 from app.features.auth.requests.login_request import LoginEmailRequest, LoginPhoneRequest
@@ -136,8 +137,10 @@ async def google_signin(db: AsyncSession = Depends(get_async_session)):
 @auth_router.post("/logout")
 async def logout(current_user: Dict[str, Any] = Depends(get_all_users)):
     try:
-        supabase = get_supabase_client()
-        supabase.auth.sign_out()
+        # Revoke this caller's own session; a bare sign_out() acts on whatever session the client holds
+        access_token = current_user.get("access_token")
+        if access_token:
+            get_supabase_client().auth.admin.sign_out(access_token)
         logger.info(f"User logged out: {current_user['id']}")
         from app.core.base import SuccessResponse
         return SuccessResponse(message="Logged out successfully")
@@ -385,10 +388,9 @@ async def get_current_user_info(
             )
 
 @auth_router.post("/refresh")
-async def refresh_token(current_user: Dict[str, Any] = Depends(get_all_users)):
+async def refresh_token(request: RefreshTokenRequest, current_user: Dict[str, Any] = Depends(get_all_users)):
     try:
-        supabase = get_supabase_client()
-        refresh_response = supabase.auth.refresh_session()
+        refresh_response = get_auth_session_client().refresh_session(request.refresh_token)
         
         if not refresh_response.session:
             raise AuthenticationException("Failed to refresh token")
@@ -457,7 +459,7 @@ async def resend_email_verification(
             from app.core.base import SuccessResponse
             return SuccessResponse(message="Email is already verified")
         
-        supabase = get_supabase_client()
+        supabase = get_anon_supabase_client()
         try:
             result = supabase.auth.resend({
             "type": "signup",
@@ -44,15 +44,17 @@ async def change_password(
     
     try:
         # Verify current password
-        from app.database.base import get_supabase_client
-        supabase = get_supabase_client()
-        verify_result = supabase.auth.sign_in_with_password({
+        from app.database.base import get_auth_session_client
+        auth_client = get_auth_session_client()
+        verify_result = auth_client.sign_in_with_password({
             "email": user_data.email,
             "password": request.current_password
         })
         
         if not verify_result.user:
             raise AuthenticationException("Current password is incorrect")
+        # The check only needed the credentials; revoke the session it just opened
+        auth_client.sign_out({"scope": "local"})
     except Exception as e:
         logger.error(f"Password verification failed: {str(e)}")
         raise AuthenticationException("Current password is incorrect")
@@ -1,8 +1,10 @@
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 from datetime import datetime, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_, delete, func, update, text
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 import uuid
 from app.core.base import BaseCrud
 from app.core.exceptions import NotFoundException, ValidationException
@@ -13,468 +15,122 @@ from app.features.products.models.product_variant import ProductVariant
 from datetime import datetime
 from app.features.products.cruds.product_inventory_crud import ProductInventoryCrud
 from app.features.orders.responses.cart_response import CartResponse, CartWithItemsResponse, CartItemResponse
+from app.features.orders.services.cart_cache import cart_cache
 from app.database.base import get_supabase_client
+from app.database.session import pgbouncer_safe
 from app.core.config import settings  # Import at module level for all functions
 
 logger = get_logger("crud.cart")
 
+_auth_crud = None
+
+
+def _get_auth_crud():
+    # One AuthCrud (and its admin client) per process instead of one per request
+    global _auth_crud
+    if _auth_crud is None:
+        from app.features.auth.cruds.auth_crud import AuthCrud
+        _auth_crud = AuthCrud()
+    return _auth_crud
+
 
 class CartCrud(BaseCrud[Cart]):
     def __init__(self):
         super().__init__(get_supabase_client(), Cart)
 
-    async def get_or_create_cart(self, db: AsyncSession, user_id: Optional[str] = None, session_id: Optional[str] = None) -> Cart:
-        try:
-            if not user_id and not session_id:
-                raise ValidationException("Either user_id or session_id must be provided")
+    @staticmethod
+    def _cart_from_view(view: Dict[str, Any]) -> Cart:
+        """Transient Cart carrying the cached columns; never added to a session"""
+        return Cart(
+            id=uuid.UUID(view["id"]),
+            user_id=uuid.UUID(view["user_id"]) if view.get("user_id") else None,
+            session_id=view.get("session_id"),
+            currency=view.get("currency", "INR"),
+            subtotal=view.get("subtotal", 0),
+            tax_amount=view.get("tax_amount", 0),
+            shipping_amount=view.get("shipping_amount", 0),
+            discount_amount=view.get("discount_amount", 0),
+            total_amount=view.get("total_amount", 0),
+            expires_at=datetime.fromisoformat(view["expires_at"]) if view.get("expires_at") else None
+        )
+
+    async def ensure_user(self, db: AsyncSession, current_user: Dict[str, Any]) -> bool:
+        """ensure_user_exists_in_db, memoized per user once the row is known to exist"""
+        user_id = str(current_user["id"])
+        if cart_cache.is_known_user(user_id):
+            return True
+        from app.core.user_helper import ensure_user_exists_in_db
+        exists = await ensure_user_exists_in_db(db, current_user, _get_auth_crud())
+        if exists:
+            cart_cache.remember_user(user_id)
+        return exists
 
-            # If user_id is provided, user is authenticated (via require_buyer/require_supplier)
-            # They exist in auth.users which is sufficient for foreign key constraints
-            # Skip user verification - proceed directly to cart creation
-            # If user doesn't exist in public.users, we'll handle the foreign key error gracefully
-            if user_id:
-                logger.info(f"User {user_id} is authenticated - proceeding with cart creation (skipping user verification)")
-                user_exists_via_rest = False  # Will check if user exists
-                rest_user_check = None
-                
-                # Check if user exists in public.users table
-                try:
-                    from app.features.auth.cruds.auth_crud import AuthCrud
-                    auth_crud = AuthCrud()
-                    rest_supabase = auth_crud.admin_client
-                    rest_user_check = rest_supabase.table("users").select("id").eq("id", user_id).limit(1).execute()
-                    
-                    if rest_user_check.data and len(rest_user_check.data) > 0:
-                        logger.info(f"✅ User {user_id} exists in public.users table")
-                        user_exists_via_rest = True
-                    else:
-                        logger.info(f"User {user_id} not in public.users - will create user record")
-                        user_exists_via_rest = False
-                except Exception as rest_check_err:
-                    logger.warning(f"User check failed: {rest_check_err} - will try to create user")
-                    user_exists_via_rest = False
-                
-                # Create user in public.users if they don't exist (they're authenticated in auth.users)
-                # This is needed for foreign key constraints when creating cart
-                if not user_exists_via_rest:  # User doesn't exist in public.users
-                    logger.warning(f"User {user_id} not found in users table, creating user record via user_helper before cart creation")
-                    # Use user_helper which handles user creation reliably
-                    from app.core.user_helper import ensure_user_exists_in_db
-                    from app.features.auth.cruds.auth_crud import AuthCrud
-                    auth_crud = AuthCrud()
-                    
-                    # Build current_user dict from available info
-                    current_user_dict = {
-                        "id": user_id,
-                        "email": None,  # Will be fetched from Supabase Auth
-                        "user_role": "buyer",  # Default
-                        "phone": None,
-                        "first_name": None,
-                        "last_name": None,
-                        "is_verified": False
-                    }
-                    
-                    # Try to get user info from Supabase Auth
-                    try:
-                        auth_user_response = auth_crud.admin_client.auth.admin.get_user_by_id(user_id)
-                        if auth_user_response and hasattr(auth_user_response, 'user') and auth_user_response.user:
-                            auth_user = auth_user_response.user
-                            current_user_dict["email"] = getattr(auth_user, 'email', None)
-                            user_metadata = getattr(auth_user, 'user_metadata', {}) or {}
-                            current_user_dict["user_role"] = user_metadata.get('user_type', user_metadata.get('role', 'buyer')).lower()
-                            current_user_dict["phone"] = getattr(auth_user, 'phone', None)
-                            full_name = user_metadata.get("full_name") or user_metadata.get("name") or ""
-                            current_user_dict["first_name"] = user_metadata.get('first_name') or (full_name.split()[0] if full_name else None)
-                            current_user_dict["last_name"] = user_metadata.get('last_name') or (" ".join(full_name.split()[1:]) if full_name and len(full_name.split()) > 1 else None)
-                            current_user_dict["is_verified"] = getattr(auth_user, 'email_confirmed_at', None) is not None
-                    except Exception as auth_err:
-                        logger.warning(f"Could not get user from Supabase Auth: {auth_err}")
-                    
-                    # Use user_helper to ensure user exists
-                    user_created = await ensure_user_exists_in_db(db, current_user_dict, auth_crud)
-                    if user_created:
-                        logger.info(f"✅ User {user_id} created/verified via user_helper")
-                        user_exists_via_rest = True
-                    else:
-                        logger.warning(f"⚠️ User {user_id} creation failed, but proceeding anyway (user is authenticated)")
-                        user_exists_via_rest = True  # Assume exists in auth.users
-                
-                # User exists (either verified or assumed from authentication)
-                user_exists_via_rest = True
+    async def get_or_create_cart(self, db: AsyncSession, user_id: Optional[str] = None, session_id: Optional[str] = None) -> Cart:
+        if not user_id and not session_id:
+            raise ValidationException("Either user_id or session_id must be provided")
 
-            # Try to get existing cart - use REST API if user was verified via REST API only
-            cart = None
-            if user_id and user_exists_via_rest:
-                # User exists in REST API but not visible in SQLAlchemy - use REST API to check for cart
-                logger.info(f"Checking for existing cart via REST API (user verified via REST API)")
-                try:
-                    # Use admin_client (service role) for reliable access
-                    from app.features.auth.cruds.auth_crud import AuthCrud
-                    auth_crud = AuthCrud()
-                    rest_supabase_cart = auth_crud.admin_client
-                    rest_cart_check = rest_supabase_cart.table("carts").select("*").eq("user_id", user_id).limit(1).execute()
-                    if rest_cart_check.data and len(rest_cart_check.data) > 0:
-                        # Cart exists - create Cart object from REST response
-                        cart_data = rest_cart_check.data[0]
-                        cart = Cart(
-                            id=uuid.UUID(cart_data["id"]),
-                            user_id=uuid.UUID(cart_data["user_id"]) if cart_data.get("user_id") else None,
-                            session_id=cart_data.get("session_id"),
-                            currency=cart_data.get("currency", "INR"),
-                            subtotal=float(cart_data.get("subtotal", 0)),
-                            tax_amount=float(cart_data.get("tax_amount", 0)),
-                            shipping_amount=float(cart_data.get("shipping_amount", 0)),
-                            discount_amount=float(cart_data.get("discount_amount", 0)),
-                            total_amount=float(cart_data.get("total_amount", 0)),
-                            expires_at=datetime.fromisoformat(cart_data["expires_at"].replace('Z', '+00:00')) if cart_data.get("expires_at") else None
-                        )
-                        logger.info(f"✅ Found existing cart {cart.id} via REST API")
-                except Exception as rest_cart_check_err:
-                    logger.warning(f"REST API cart check failed: {rest_cart_check_err}, trying SQLAlchemy")
-            
-            # If cart not found via REST API, try SQLAlchemy
-            if not cart:
-                query = select(Cart)
-                if user_id:
-                    query = query.where(Cart.user_id == user_id)
-                else:
-                    query = query.where(Cart.session_id == session_id)
+        view = await self._current_view(db, cart_cache.get_owner_view(user_id, session_id))
+        if view:
+            return self._cart_from_view(view)
 
-                # Execute with statement-level options to avoid prepared statements for pgbouncer
-                from app.core.config import settings
-                if "supabase.co" in (settings.DATABASE_URL or ""):
-                    result = await db.execute(query.execution_options(prepared_statement_cache_size=0))
-                else:
-                    result = await db.execute(query)
-                cart = result.scalar_one_or_none()
+        try:
+            query = select(Cart).where(Cart.user_id == user_id) if user_id else select(Cart).where(Cart.session_id == session_id)
+            cart = (await db.execute(pgbouncer_safe(query))).scalar_one_or_none()
+            if cart:
+                cart_cache.set_cart_id(str(cart.id), user_id, session_id)
+                return cart
+
+            logger.info(f"Creating new cart for user_id: {user_id}, session_id: {session_id}")
+            # carts.user_id references public.users, which can lag behind auth.users after signup
+            if user_id:
+                await self.ensure_user(db, {"id": user_id, "user_role": "buyer"})
 
-            if not cart:
-                logger.info(f"Creating new cart for user_id: {user_id}, session_id: {session_id}")
-                
-                # CRITICAL: Ensure user exists in public.users BEFORE creating cart
-                # User is authenticated (via require_buyer/require_supplier), so they exist in auth.users
-                # But they might not exist in public.users yet (propagation delay or signup issue)
-                if user_id:
-                    from app.features.auth.cruds.auth_crud import AuthCrud
-                    auth_crud = AuthCrud()
-                    
-                    # Check if user exists in public.users via REST API
-                    user_exists_in_db = False
-                    try:
-                        user_check = auth_crud.admin_client.table("users").select("id").eq("id", user_id).limit(1).execute()
-                        if user_check.data and len(user_check.data) > 0:
-                            user_exists_in_db = True
-                            logger.info(f"✅ User {user_id} exists in public.users")
-                    except Exception as check_err:
-                        logger.warning(f"Could not check user existence: {check_err}")
-                        # Ensure session is clean after check error
-                        try:
-                            await db.rollback()
-                        except:
-                            pass
-                    
-                    # If user doesn't exist, create them via REST API
-                    if not user_exists_in_db:
-                        logger.info(f"User {user_id} not found in public.users, creating via REST API...")
-                        max_retries = 3
-                        for retry in range(max_retries):
-                            try:
-                                # Get user info from Supabase Auth
-                                auth_user = auth_crud.admin_client.auth.admin.get_user_by_id(user_id)
-                                if auth_user and hasattr(auth_user, 'user') and auth_user.user:
-                                    user_email = auth_user.user.email
-                                    user_meta = getattr(auth_user.user, 'user_metadata', {}) or {}
-                                    user_type = user_meta.get('user_type', 'buyer').lower()
-                                    phone = getattr(auth_user.user, 'phone', None) or "+10000000000"
-                                    
-                                    user_data_rest = {
-                                        "id": str(user_id),
-                                        "email": user_email,
-                                        "phone": phone,
-                                        "user_type": user_type,
-                                        "is_active": True,
-                                        "is_verified": False,
-                                        "is_email_verified": getattr(auth_user.user, 'email_confirmed_at', None) is not None,
-                                        "is_phone_verified": False
-                                    }
-                                    
-                                    if user_meta.get('first_name'):
-                                        user_data_rest["first_name"] = user_meta.get('first_name')
-                                    if user_meta.get('last_name'):
-                                        user_data_rest["last_name"] = user_meta.get('last_name')
-                                    
-                                    # Create user via REST API
-                                    logger.info(f"Creating user {user_id} via REST API (attempt {retry + 1}/{max_retries})")
-                                    user_rest_response = auth_crud.admin_client.table("users").insert(user_data_rest).execute()
-                                    if user_rest_response.data:
-                                        logger.info(f"✅ Created user {user_id} in public.users via REST API")
-                                        import asyncio
-                                        await asyncio.sleep(1.5)  # Allow propagation
-                                        
-                                        # Verify user was created
-                                        verify_check = auth_crud.admin_client.table("users").select("id").eq("id", user_id).limit(1).execute()
-                                        if verify_check.data and len(verify_check.data) > 0:
-                                            user_exists_in_db = True
-                                            logger.info(f"✅ Verified user {user_id} exists in public.users")
-                                            break
-                                        else:
-                                            logger.warning(f"User creation succeeded but verification failed (attempt {retry + 1})")
-                                            if retry < max_retries - 1:
-                                                await asyncio.sleep(1.0)
-                                                continue
-                                    else:
-                                        # Check if user exists (duplicate)
-                                        try:
-                                            user_check = auth_crud.admin_client.table("users").select("id").eq("id", user_id).limit(1).execute()
-                                            if user_check.data and len(user_check.data) > 0:
-                                                user_exists_in_db = True
-                                                logger.info(f"✅ User {user_id} exists in public.users (duplicate)")
-                                                break
-                                        except:
-                                            pass
-                            except Exception as create_user_err:
-                                err_str = str(create_user_err).lower()
-                                if "duplicate" in err_str or "already exists" in err_str or "unique" in err_str:
-                                    logger.info(f"User {user_id} already exists (duplicate)")
-                                    # Verify it exists
-                                    try:
-                                        user_check = auth_crud.admin_client.table("users").select("id").eq("id", user_id).limit(1).execute()
-                                        if user_check.data and len(user_check.data) > 0:
-                                            user_exists_in_db = True
-                                            logger.info(f"✅ Verified user {user_id} exists")
-                                            break
-                                    except:
-                                        pass
-                                else:
-                                    err_lower = str(create_user_err).lower()
-                                    # Permission denied might mean user already exists (RLS blocking our check)
-                                    if "permission denied" in err_lower or "42501" in str(create_user_err):
-                                        logger.warning(f"Permission denied creating user {user_id} (attempt {retry + 1}) - user might already exist, waiting and verifying...")
-                                        # Wait longer and verify multiple times - user might be created during signup but not visible yet
-                                        import asyncio
-                                        verification_passed = False
-                                        for verify_attempt in range(5):  # Try 5 times with increasing delays
-                                            wait_time = 1.0 + (verify_attempt * 0.5)  # 1.0, 1.5, 2.0, 2.5, 3.0 seconds
-                                            await asyncio.sleep(wait_time)
-                                            try:
-                                                verify_check = auth_crud.admin_client.table("users").select("id").eq("id", user_id).limit(1).execute()
-                                                if verify_check.data and len(verify_check.data) > 0:
-                                                    user_exists_in_db = True
-                                                    verification_passed = True
-                                                    logger.info(f"✅ User {user_id} exists in public.users (verified after {verify_attempt + 1} attempts, {wait_time:.1f}s wait)")
-                                                    break
-                                            except Exception as verify_err:
-                                                logger.debug(f"Verification attempt {verify_attempt + 1} failed: {verify_err}")
-                                        
-                                        if not verification_passed:
-                                            # Still can't verify - this is a problem
-                                            logger.error(f"❌ Cannot verify user {user_id} exists after permission denied and 5 verification attempts")
-                                            # Don't assume user exists - this will cause foreign key error
-                                            # But let's try one more time with SQLAlchemy to see if user exists there
-                                            if db:
-                                                try:
-                                                    from app.features.auth.models.user import User
-                                                    user_query = select(User).where(User.id == uuid.UUID(user_id))
-                                                    if "supabase.co" in (settings.DATABASE_URL or ""):
-                                                        user_result = await db.execute(user_query.execution_options(prepared_statement_cache_size=0))
-                                                    else:
-                                                        user_result = await db.execute(user_query)
-                                                    sqlalchemy_user = user_result.scalar_one_or_none()
-                                                    if sqlalchemy_user:
-                                                        user_exists_in_db = True
-                                                        logger.info(f"✅ User {user_id} exists (found via SQLAlchemy)")
-                                                        verification_passed = True
-                                                except Exception as sqlalchemy_check_err:
-                                                    logger.debug(f"SQLAlchemy check failed: {sqlalchemy_check_err}")
-                                            
-                                            if not verification_passed:
-                                                # Last resort: user is authenticated so they exist in auth.users
-                                                # But they don't exist in public.users and we can't create them
-                                                # This is a critical error - user should have been created during signup
-                                                # However, let's try one more thing: use SQLAlchemy to create the user directly
-                                                # This bypasses REST API permission issues
-                                                logger.warning(f"⚠️ All verification attempts failed. Trying AuthCrud.create for user {user_id}")
-                                                try:
-                                                    # Use AuthCrud.create method which handles enum conversion properly
-                                                    # CRITICAL: id must be a UUID object, not a string
-                                                    # CRITICAL: Ensure user_type is lowercase string for enum
-                                                    user_type_clean = user_type.lower() if isinstance(user_type, str) else "buyer"
-                                                    user_data_sql = {
-                                                        "id": uuid.UUID(user_id),
-                                                        "email": auth_user.user.email if auth_user and hasattr(auth_user, 'user') else f"user_{user_id[:8]}@temp.example.com",
-                                                        "phone": phone,
-                                                        "user_type": user_type_clean,  # Must be lowercase: "buyer", "supplier", "admin"
-                                                        "is_active": True,
-                                                        "is_verified": False,
-                                                        "is_email_verified": getattr(auth_user.user, 'email_confirmed_at', None) is not None if auth_user and hasattr(auth_user, 'user') else False,
-                                                        "is_phone_verified": False,
-                                                        "first_name": user_meta.get('first_name') if user_meta else None,
-                                                        "last_name": user_meta.get('last_name') if user_meta else None,
-                                                    }
-                                                    logger.info(f"Creating user via AuthCrud.create with: user_type={user_type_clean}, phone={phone}, email={user_data_sql['email']}")
-                                                    new_user = await auth_crud.create(db, user_data_sql)
-                                                    user_exists_in_db = True
-                                                    logger.info(f"✅ Created user {user_id} via AuthCrud.create (last resort)")
-                                                    verification_passed = True
-                                                except Exception as sqlalchemy_insert_err:
-                                                    logger.error(f"❌ SQLAlchemy direct insert also failed: {sqlalchemy_insert_err}")
-                                                    # At this point, we've tried everything
-                                                    # The user is authenticated, so they exist in auth.users
-                                                    # But we can't create them in public.users
-                                                    # This will cause a foreign key error when creating the cart
-                                                    # Let's proceed anyway and let the foreign key constraint catch it
-                                                    # The error message will be clearer
-                                                    logger.error(f"❌ CRITICAL: User {user_id} does not exist in public.users and all creation attempts failed. This will cause a foreign key error.")
-                                                    # Don't raise here - let the SQLAlchemy cart creation try and fail with a clearer error
-                                                    user_exists_in_db = False  # Will fail at cart creation
-                                        else:
-                                            break  # Exit retry loop since verification passed
-                                    else:
-                                        logger.warning(f"Could not create user {user_id} in public.users (attempt {retry + 1}): {create_user_err}")
-                                        if retry < max_retries - 1:
-                                            import asyncio
-                                            await asyncio.sleep(1.0)
-                                            continue
-                                        else:
-                                            logger.error(f"❌ Failed to create user {user_id} after {max_retries} attempts")
-                                            raise Exception(f"User {user_id} could not be created in public.users: {create_user_err}")
-                        
-                        # If user still doesn't exist after all attempts, we'll try cart creation anyway
-                        # The foreign key constraint will provide a clear error if user truly doesn't exist
-                        if not user_exists_in_db:
-                            logger.error(f"❌ User {user_id} does not exist in public.users after all creation attempts")
-                            # Don't raise - let cart creation try and fail with foreign key error
-                            # This will give us a clearer error message
-                
-                # CRITICAL: User is authenticated (via require_buyer/require_supplier), so they exist in auth.users
-                # Ensure session is in a clean state before attempting cart creation
-                try:
-                    await db.rollback()
-                except:
-                    pass
-                
-                # Try SQLAlchemy first (most reliable for authenticated users)
-                try:
-                    cart_data = {
-                        "user_id": uuid.UUID(user_id) if user_id else None,
-                        "session_id": session_id,
-                        "currency": "INR",
-                        "subtotal": 0,
-                        "tax_amount": 0,
-                        "shipping_amount": 0,
-                        "discount_amount": 0,
-                        "total_amount": 0,
-                        "expires_at": datetime.utcnow() + timedelta(days=30)
-                    }
-                    
-                    logger.info(f"Creating cart via SQLAlchemy (primary method)")
-                    cart = Cart(**cart_data)
-                    db.add(cart)
-                    await db.commit()
-                    await db.refresh(cart)
-                    logger.info(f"✅ Created cart {cart.id} via SQLAlchemy")
-                except Exception as sqlalchemy_err:
-                    sql_err_str = str(sqlalchemy_err).lower()
-                    logger.warning(f"SQLAlchemy cart creation failed: {sqlalchemy_err}")
-                    
-                    # Rollback the failed transaction first
-                    try:
-                        await db.rollback()
-                    except:
-                        pass
-                    
-                    # Check if it's a foreign key error - user doesn't exist
-                    if "foreign key" in sql_err_str or "foreign_key_violation" in sql_err_str or "carts_user_id_fkey" in sql_err_str:
-                        logger.error(f"❌ Foreign key error - user {user_id} does not exist in public.users")
-                        # This is the root cause - user not in public.users
-                        # Try one final time to create user using user_helper (which uses httpx)
-                        logger.warning(f"⚠️ Attempting final user creation via user_helper for {user_id}")
-                        try:
-                            from app.core.user_helper import ensure_user_exists_in_db
-                            from app.features.auth.cruds.auth_crud import AuthCrud
-                            auth_crud_final = AuthCrud()
-                            auth_user_final = auth_crud_final.admin_client.auth.admin.get_user_by_id(user_id)
-                            
-                            if auth_user_final and hasattr(auth_user_final, 'user') and auth_user_final.user:
-                                # Build current_user dict
-                                user_meta_final = getattr(auth_user_final.user, 'user_metadata', {}) or {}
-                                current_user_dict_final = {
-                                    "id": user_id,
-                                    "email": auth_user_final.user.email,
-                                    "user_role": user_meta_final.get('user_type', user_meta_final.get('role', 'buyer')).lower(),
-                                    "phone": getattr(auth_user_final.user, 'phone', None) or "+10000000000",
-                                    "first_name": user_meta_final.get('first_name'),
-                                    "last_name": user_meta_final.get('last_name'),
-                                    "is_verified": getattr(auth_user_final.user, 'email_confirmed_at', None) is not None
-                                }
-                                
-                                logger.info(f"Creating user via user_helper with: user_type={current_user_dict_final['user_role']}, email={current_user_dict_final['email']}")
-                                try:
-                                    user_created_final = await ensure_user_exists_in_db(db, current_user_dict_final, auth_crud_final)
-                                    
-                                    if user_created_final:
-                                        logger.info(f"✅ Created user {user_id} via user_helper (final attempt)")
-                                        # Wait a moment for propagation
-                                        import asyncio
-                                        await asyncio.sleep(0.5)
-                                        # Retry cart creation with fresh transaction
-                                        await db.rollback()  # Ensure clean state
-                                        cart = Cart(**cart_data)
-                                        db.add(cart)
-                                        await db.commit()
-                                        await db.refresh(cart)
-                                        logger.info(f"✅ Created cart {cart.id} via SQLAlchemy after user creation")
-                                    else:
-                                        raise Exception(f"User {user_id} creation via user_helper returned False")
-                                except Exception as helper_err:
-                                    logger.error(f"user_helper raised exception: {helper_err}")
-                                    import traceback
-                                    logger.error(f"Full traceback: {traceback.format_exc()}")
-                                    # Don't raise - user exists in auth.users, proceed with cart creation
-                                    # The foreign key error will tell us if user really doesn't exist
-                                    logger.warning(f"User creation failed, but user is authenticated - proceeding with cart creation")
-                                    user_created_final = False
-                            else:
-                                raise Exception(f"User {user_id} does not exist in public.users and could not be created. User authentication data not available.")
-                        except Exception as final_user_err:
-                            logger.error(f"❌ Final user creation attempt failed: {final_user_err}")
-                            # Rollback again if final attempt failed
-                            try:
-                                await db.rollback()
-                            except:
-                                pass
-                            # Final attempt: Check if this is just a permission issue
-                            # If user exists in auth.users (they're authenticated), try cart creation anyway
-                            # The DB foreign key might allow it if user exists in auth schema
-                            logger.warning(f"Attempting cart creation anyway - user is authenticated in auth.users")
-                            # Try one more time with a fresh transaction
-                            try:
-                                await db.rollback()
-                                cart = Cart(**cart_data)
-                                db.add(cart)
-                                await db.commit()
-                                await db.refresh(cart)
-                                logger.info(f"✅ Created cart {cart.id} despite user creation failure (user authenticated)")
-                            except Exception as final_cart_err:
-                                final_err_str = str(final_cart_err).lower()
-                                if "foreign key" in final_err_str or "foreign_key_violation" in final_err_str:
-                                    raise Exception(f"User {user_id} does not exist in public.users and could not be created. Please run the RLS fix SQL script in Supabase dashboard: scripts/sql/fix_all_rls_and_schema.sql. Error: {final_user_err}")
-                                raise
-                    
-                    # For other errors, log and re-raise
-                    logger.error(f"❌ SQLAlchemy cart creation failed with non-foreign-key error: {sqlalchemy_err}")
-                    raise Exception(f"Cart creation failed: {sqlalchemy_err}")
-            
+            try:
+                cart = await self._insert_cart(db, user_id, session_id)
+            except IntegrityError as e:
+                await db.rollback()
+                missing_user = "carts_user_id_fkey" in str(e) or "foreign key" in str(e).lower()
+                if not user_id or not missing_user:
+                    raise
+                # The memoized user row has gone away; re-create it and retry once
+                logger.warning(f"Cart insert hit missing user {user_id}, re-creating user record")
+                cart_cache.forget_user(user_id)
+                if not await self.ensure_user(db, {"id": user_id, "user_role": "buyer"}):
+                    raise ValidationException("User account not properly set up. Please try logging out and back in.")
+                cart = await self._insert_cart(db, user_id, session_id)
+
+            logger.info(f"Created cart {cart.id}")
+            cart_cache.set_cart_id(str(cart.id), user_id, session_id)
             return cart
         except Exception as e:
-            import traceback
-            error_trace = traceback.format_exc()
-            logger.error(f"Error getting or creating cart: {str(e)}\n{error_trace}")
+            logger.error(f"Error getting or creating cart: {str(e)}")
             raise
 
+    async def _insert_cart(self, db: AsyncSession, user_id: Optional[str], session_id: Optional[str]) -> Cart:
+        cart = Cart(
+            user_id=uuid.UUID(str(user_id)) if user_id else None,
+            session_id=session_id,
+            currency="INR",
+            subtotal=0,
+            tax_amount=0,
+            shipping_amount=0,
+            discount_amount=0,
+            total_amount=0,
+            expires_at=datetime.utcnow() + timedelta(days=30)
+        )
+        db.add(cart)
+        await db.commit()
+        await db.refresh(cart)
+        return cart
+
     async def get_cart_with_items(self, db: AsyncSession, cart_id: str) -> CartWithItemsResponse:
+        cached = await self._current_view(db, cart_cache.get_view(cart_id))
+        if cached:
+            return CartWithItemsResponse(**cached)
         try:
-            query = select(Cart).where(Cart.id == cart_id)
+            # populate_existing: the cached view records updated_at, which a Core
+            # UPDATE earlier in this session leaves stale on an identity-mapped Cart
+            query = select(Cart).where(Cart.id == cart_id).execution_options(populate_existing=True)
             if "supabase.co" in (settings.DATABASE_URL or ""):
                 result = await db.execute(query.execution_options(prepared_statement_cache_size=0))
             else:
@@ -483,6 +139,7 @@ class CartCrud(BaseCrud[Cart]):
             cart = result.scalar_one_or_none()
             
             if not cart:
+                cart_cache.invalidate(cart_id)
                 raise NotFoundException("Cart not found")
 
             items_query = select(CartItem).where(CartItem.cart_id == cart_id).options(
@@ -511,18 +168,16 @@ class CartCrud(BaseCrud[Cart]):
                 items_with_details.append(item_dict)
             
             cart_dict["items"] = items_with_details
-            
+            cart_dict["items_count"] = len(items_with_details)
+            cart_cache.put_view(cart_dict)
+
             return CartWithItemsResponse(**cart_dict)
         except Exception as e:
             logger.error(f"Error getting cart with items: {str(e)}")
             raise
 
     async def add_item_to_cart(self, db: AsyncSession, cart_id: str, product_id: str, quantity: int, variant_id: Optional[str] = None) -> CartItemResponse:
-        import uuid
-        import traceback
-        logger.info("=" * 80)
-        logger.info(f"🚀 ADD_ITEM_TO_CART START: cart_id={cart_id}, product_id={product_id}, quantity={quantity}, variant_id={variant_id}")
-        logger.info("=" * 80)
+        logger.debug(f"Adding product {product_id} (variant {variant_id}) x{quantity} to cart {cart_id}")
         
         # Ensure clean transaction state
         try:
@@ -535,57 +190,14 @@ class CartCrud(BaseCrud[Cart]):
             # Ensure cart_id is a UUID string
             try:
                 cart_uuid = uuid.UUID(cart_id)
-                logger.info(f"Cart UUID parsed: {cart_uuid}")
-            except ValueError as ve:
-                logger.error(f"Invalid cart ID format: {cart_id} - {ve}")
+            except ValueError:
                 raise ValidationException(f"Invalid cart ID format: {cart_id}")
             
-            # Try to get cart - first via SQLAlchemy, then via REST API if not found (transaction isolation)
-            cart = None
-            try:
-                cart = await self.get_by_id(db, cart_id)
-                logger.info(f"Cart retrieved via SQLAlchemy: {cart.id if cart else 'None'}")
-            except Exception as cart_err:
-                logger.warning(f"Error getting cart via SQLAlchemy {cart_id}: {cart_err}, trying REST API...")
-            
-            # If cart not found via SQLAlchemy, try REST API (may be transaction isolation issue)
-            if not cart:
-                logger.info(f"Cart {cart_id} not found via SQLAlchemy, checking REST API...")
-                try:
-                    # Use admin_client (service role) for reliable access
-                    from app.features.auth.cruds.auth_crud import AuthCrud
-                    auth_crud = AuthCrud()
-                    rest_supabase = auth_crud.admin_client
-                    rest_cart_check = rest_supabase.table("carts").select("*").eq("id", cart_id).limit(1).execute()
-                    
-                    if rest_cart_check.data and len(rest_cart_check.data) > 0:
-                        # Cart exists in REST API - create Cart object from REST response
-                        cart_data = rest_cart_check.data[0]
-                        cart = Cart(
-                            id=uuid.UUID(cart_data["id"]),
-                            user_id=uuid.UUID(cart_data["user_id"]) if cart_data.get("user_id") else None,
-                            session_id=cart_data.get("session_id"),
-                            currency=cart_data.get("currency", "INR"),
-                            subtotal=float(cart_data.get("subtotal", 0)),
-                            tax_amount=float(cart_data.get("tax_amount", 0)),
-                            shipping_amount=float(cart_data.get("shipping_amount", 0)),
-                            discount_amount=float(cart_data.get("discount_amount", 0)),
-                            total_amount=float(cart_data.get("total_amount", 0)),
-                            expires_at=datetime.fromisoformat(cart_data["expires_at"].replace('Z', '+00:00')) if cart_data.get("expires_at") else None
-                        )
-                        logger.info(f"✅ Cart {cart_id} retrieved via REST API (transaction isolation issue)")
-                    else:
-                        logger.error(f"Cart {cart_id} not found in REST API either")
-                        raise NotFoundException(f"Cart not found: {cart_id}")
-                except NotFoundException:
-                    raise
-                except Exception as rest_err:
-                    logger.error(f"Error checking cart via REST API: {rest_err}")
+            # A cached view means the cart exists; otherwise check on this session
+            if not cart_cache.get_view(str(cart_uuid)):
+                cart_exists = await db.execute(pgbouncer_safe(select(Cart.id).where(Cart.id == cart_uuid)))
+                if cart_exists.scalar_one_or_none() is None:
                     raise NotFoundException(f"Cart not found: {cart_id}")
-            
-            if not cart:
-                logger.error(f"Cart not found: {cart_id}")
-                raise NotFoundException(f"Cart not found: {cart_id}")
 
             # Ensure product_id is a UUID string
             try:
@@ -593,17 +205,12 @@ class CartCrud(BaseCrud[Cart]):
             except ValueError:
                 raise ValidationException(f"Invalid product ID format: {product_id}")
             
-            # Execute with statement-level options to avoid prepared statements for pgbouncer
-            from app.core.config import settings
             product_query = select(Product).where(Product.id == product_uuid)
             
             # Wrap product query in try-except to handle enum validation errors
             product = None
             try:
-                if "supabase.co" in (settings.DATABASE_URL or ""):
-                    product_result = await db.execute(product_query.execution_options(prepared_statement_cache_size=0))
-                else:
-                    product_result = await db.execute(product_query)
+                product_result = await db.execute(pgbouncer_safe(product_query))
                 product = product_result.scalar_one_or_none()
             except Exception as product_load_err:
                 error_str = str(product_load_err).lower()
@@ -629,7 +236,7 @@ class CartCrud(BaseCrud[Cart]):
                                         # Store as string for manual validation
                                         setattr(product, key, str(value) if value else None)
                             product.id = product_uuid
-                            logger.info(f"Product loaded via raw query (bypassed enum validation)")
+                            logger.debug("Product loaded via raw query (bypassed enum validation)")
                     except Exception as raw_err:
                         logger.error(f"Raw query also failed: {raw_err}")
                         await db.rollback()
@@ -652,7 +259,7 @@ class CartCrud(BaseCrud[Cart]):
                     try:
                         normalized_status = ProductStatusEnum[status_str.upper()]
                         product.status = normalized_status
-                        logger.info(f"Normalized product status from '{status_str}' to '{normalized_status.value}'")
+                        logger.debug(f"Normalized product status from '{status_str}' to '{normalized_status.value}'")
                     except (KeyError, AttributeError):
                         logger.warning(f"Could not normalize status '{status_str}' to enum, keeping as-is")
             
@@ -713,11 +320,7 @@ class CartCrud(BaseCrud[Cart]):
                     raise ValidationException(f"Invalid variant ID format: {variant_id}")
                 
                 variant_query = select(ProductVariant).where(ProductVariant.id == variant_uuid)
-                from app.core.config import settings
-                if "supabase.co" in (settings.DATABASE_URL or ""):
-                    variant_result = await db.execute(variant_query.execution_options(prepared_statement_cache_size=0))
-                else:
-                    variant_result = await db.execute(variant_query)
+                variant_result = await db.execute(pgbouncer_safe(variant_query))
                 variant = variant_result.scalar_one_or_none()
                 
                 if not variant:
@@ -748,6 +351,7 @@ class CartCrud(BaseCrud[Cart]):
             except:
                 pass
             
+            await self._lock_cart(db, cart_uuid)
             existing_item = None
             try:
                 existing_item_query = select(CartItem).options(
@@ -763,11 +367,7 @@ class CartCrud(BaseCrud[Cart]):
                     existing_item_query = existing_item_query.where(CartItem.variant_id == variant_uuid)
                 else:
                     existing_item_query = existing_item_query.where(CartItem.variant_id.is_(None))
-                from app.core.config import settings
-                if "supabase.co" in (settings.DATABASE_URL or ""):
-                    existing_item_result = await db.execute(existing_item_query.execution_options(prepared_statement_cache_size=0))
-                else:
-                    existing_item_result = await db.execute(existing_item_query)
+                existing_item_result = await db.execute(pgbouncer_safe(existing_item_query))
                 existing_item = existing_item_result.scalar_one_or_none()
             except Exception as existing_item_err:
                 error_str = str(existing_item_err).lower()
@@ -776,10 +376,7 @@ class CartCrud(BaseCrud[Cart]):
                     await db.rollback()
                     # Retry the query
                     try:
-                        if "supabase.co" in (settings.DATABASE_URL or ""):
-                            existing_item_result = await db.execute(existing_item_query.execution_options(prepared_statement_cache_size=0))
-                        else:
-                            existing_item_result = await db.execute(existing_item_query)
+                        existing_item_result = await db.execute(pgbouncer_safe(existing_item_query))
                         existing_item = existing_item_result.scalar_one_or_none()
                     except Exception as retry_err:
                         logger.error(f"Retry also failed: {retry_err}")
@@ -791,28 +388,25 @@ class CartCrud(BaseCrud[Cart]):
                     existing_item = None  # Continue without existing item
 
             if existing_item:
-                new_quantity = existing_item.quantity + quantity
                 # Stock validation already done above (if inventory check succeeded)
-                
-                existing_item.quantity = new_quantity
-                existing_item.total_price = existing_item.quantity * existing_item.unit_price
+                # Increment in SQL so concurrent adds of the same item cannot lose an update
+                increment_query = update(CartItem).where(CartItem.id == existing_item.id).values(
+                    quantity=CartItem.quantity + quantity,
+                    total_price=(CartItem.quantity + quantity) * CartItem.unit_price
+                ).returning(CartItem.quantity, CartItem.total_price)
+                incremented = (await db.execute(pgbouncer_safe(increment_query))).one()
+                await self._apply_totals_delta(db, cart_uuid, quantity * existing_item.unit_price)
                 await db.commit()
-                await db.refresh(existing_item)
+                set_committed_value(existing_item, "quantity", incremented.quantity)
+                set_committed_value(existing_item, "total_price", incremented.total_price)
                 # Load relationships if needed
-                from app.core.config import settings
                 if not hasattr(existing_item, 'product') or not existing_item.product:
                     product_query = select(Product).where(Product.id == existing_item.product_id)
-                    if "supabase.co" in (settings.DATABASE_URL or ""):
-                        product_res = await db.execute(product_query.execution_options(prepared_statement_cache_size=0))
-                    else:
-                        product_res = await db.execute(product_query)
+                    product_res = await db.execute(pgbouncer_safe(product_query))
                     existing_item.product = product_res.scalar_one_or_none()
                 if existing_item.variant_id and (not hasattr(existing_item, 'variant') or not existing_item.variant):
                     variant_query = select(ProductVariant).where(ProductVariant.id == existing_item.variant_id)
-                    if "supabase.co" in (settings.DATABASE_URL or ""):
-                        variant_res = await db.execute(variant_query.execution_options(prepared_statement_cache_size=0))
-                    else:
-                        variant_res = await db.execute(variant_query)
+                    variant_res = await db.execute(pgbouncer_safe(variant_query))
                     existing_item.variant = variant_res.scalar_one_or_none()
                 cart_item = existing_item
             else:
@@ -828,37 +422,23 @@ class CartCrud(BaseCrud[Cart]):
                 if variant_uuid:
                     cart_item_data["variant_id"] = variant_uuid
                 
-                logger.info(f"📦 Creating NEW cart item with data: {cart_item_data}")
-                logger.info(f"   - cart_id (UUID): {type(cart_item_data.get('cart_id'))} = {cart_item_data.get('cart_id')}")
-                logger.info(f"   - product_id (UUID): {type(cart_item_data.get('product_id'))} = {cart_item_data.get('product_id')}")
-                logger.info(f"   - variant_id (UUID): {type(cart_item_data.get('variant_id'))} = {cart_item_data.get('variant_id')}")
-                logger.info(f"   - quantity: {cart_item_data.get('quantity')}")
-                logger.info(f"   - unit_price: {cart_item_data.get('unit_price')}")
-                logger.info(f"   - total_price: {cart_item_data.get('total_price')}")
+                logger.debug(f"Creating cart item: {cart_item_data}")
                 try:
                     cart_item = CartItem(**cart_item_data)
-                    logger.info(f"✅ CartItem object created, adding to session...")
                     db.add(cart_item)
-                    logger.info(f"✅ CartItem added to session, committing...")
+                    await db.flush()
+                    await self._apply_totals_delta(db, cart_uuid, cart_item.total_price)
                     await db.commit()
-                    logger.info(f"✅✅ Cart item COMMITTED successfully: {cart_item.id}")
                     try:
                         await db.refresh(cart_item)
                         # Load relationships for product/variant info - use selectinload query instead
-                        from app.core.config import settings
                         if not hasattr(cart_item, 'product') or not cart_item.product:
                             product_query = select(Product).where(Product.id == cart_item.product_id)
-                            if "supabase.co" in (settings.DATABASE_URL or ""):
-                                product_res = await db.execute(product_query.execution_options(prepared_statement_cache_size=0))
-                            else:
-                                product_res = await db.execute(product_query)
+                            product_res = await db.execute(pgbouncer_safe(product_query))
                             cart_item.product = product_res.scalar_one_or_none()
                         if cart_item.variant_id and (not hasattr(cart_item, 'variant') or not cart_item.variant):
                             variant_query = select(ProductVariant).where(ProductVariant.id == cart_item.variant_id)
-                            if "supabase.co" in (settings.DATABASE_URL or ""):
-                                variant_res = await db.execute(variant_query.execution_options(prepared_statement_cache_size=0))
-                            else:
-                                variant_res = await db.execute(variant_query)
+                            variant_res = await db.execute(pgbouncer_safe(variant_query))
                             cart_item.variant = variant_res.scalar_one_or_none()
                     except Exception as refresh_err:
                         logger.warning(f"Could not refresh cart item (may be OK): {refresh_err}")
@@ -867,34 +447,18 @@ class CartCrud(BaseCrud[Cart]):
                             selectinload(CartItem.product),
                             selectinload(CartItem.variant)
                         ).where(CartItem.id == cart_item.id)
-                        from app.core.config import settings
-                        if "supabase.co" in (settings.DATABASE_URL or ""):
-                            cart_item_result = await db.execute(cart_item_query.execution_options(prepared_statement_cache_size=0))
-                        else:
-                            cart_item_result = await db.execute(cart_item_query)
+                        cart_item_result = await db.execute(pgbouncer_safe(cart_item_query))
                         cart_item = cart_item_result.scalar_one_or_none()
                         if not cart_item:
-                            logger.error(f"Could not re-fetch cart item after creation")
+                            logger.error("Could not re-fetch cart item after creation")
                             raise NotFoundException("Cart item created but could not be retrieved")
                 except Exception as create_err:
-                    error_trace = traceback.format_exc()
-                    logger.error("=" * 80)
-                    logger.error(f"❌❌ ERROR CREATING CART ITEM:")
-                    logger.error(f"   Error Type: {type(create_err).__name__}")
-                    logger.error(f"   Error Message: {str(create_err)}")
-                    logger.error(f"   Full Traceback:\n{error_trace}")
-                    logger.error("=" * 80)
+                    logger.error(f"Error creating cart item in cart {cart_id}: {type(create_err).__name__}: {create_err}")
                     await db.rollback()
                     raise
 
-            logger.info(f"📊 Updating cart totals for cart {cart_id}...")
-            await self._update_cart_totals(db, str(cart_uuid))
-            logger.info(f"✅ Cart totals updated")
-            
-            logger.info("=" * 80)
-            logger.info(f"✅✅ ADD_ITEM_TO_CART SUCCESS: cart_id={cart_id}, product_id={product_id}, quantity={quantity}")
-            logger.info(f"   Cart Item ID: {cart_item.id}")
-            logger.info("=" * 80)
+            await self._refresh_cached_cart(db, str(cart_uuid))
+            logger.debug(f"Added product {product_id} x{quantity} to cart {cart_id} as item {cart_item.id}")
             
             # Build response dict with all required fields
             cart_item_dict = cart_item.to_dict()
@@ -920,25 +484,23 @@ class CartCrud(BaseCrud[Cart]):
                     cart_item_dict["sku"] = getattr(cart_item.variant, 'sku', None)
             
             return CartItemResponse(**cart_item_dict)
+        except (NotFoundException, ValidationException):
+            await db.rollback()
+            raise
         except Exception as e:
-            error_trace = traceback.format_exc()
             await db.rollback()
-            logger.error("=" * 80)
-            logger.error(f"❌❌❌ ADD_ITEM_TO_CART FAILED:")
-            logger.error(f"   Cart ID: {cart_id}")
-            logger.error(f"   Product ID: {product_id}")
-            logger.error(f"   Quantity: {quantity}")
-            logger.error(f"   Variant ID: {variant_id}")
-            logger.error(f"   Error Type: {type(e).__name__}")
-            logger.error(f"   Error Message: {str(e)}")
-            logger.error(f"   Full Traceback:\n{error_trace}")
-            logger.error("=" * 80)
+            logger.error(
+                f"Adding product {product_id} (variant {variant_id}) x{quantity} to cart {cart_id} failed: "
+                f"{type(e).__name__}: {e}"
+            )
             raise
 
     async def update_cart_item_quantity(self, db: AsyncSession, cart_item_id: str, quantity: int) -> CartItemResponse:
         try:
             from app.core.config import settings
-            cart_item_query = select(CartItem).where(CartItem.id == cart_item_id)
+            await self._lock_cart_of_item(db, cart_item_id)
+            # Row lock keeps the old total stable until the delta is applied
+            cart_item_query = select(CartItem).where(CartItem.id == cart_item_id).with_for_update()
             if "supabase.co" in (settings.DATABASE_URL or ""):
                 cart_item_result = await db.execute(cart_item_query.execution_options(prepared_statement_cache_size=0))
             else:
@@ -953,8 +515,9 @@ class CartCrud(BaseCrud[Cart]):
                 cart_id = str(cart_item.cart_id)
                 cart_item_dict = cart_item.to_dict()
                 await db.delete(cart_item)
+                await self._apply_totals_delta(db, cart_id, -cart_item.total_price)
                 await db.commit()
-                await self._update_cart_totals(db, cart_id)
+                await self._refresh_cached_cart(db, cart_id)
                 cart_item_dict["quantity"] = 0
                 cart_item_dict["total_price"] = 0.0
                 return CartItemResponse(**cart_item_dict)
@@ -968,12 +531,14 @@ class CartCrud(BaseCrud[Cart]):
             if available_quantity < quantity:
                 raise ValidationException(f"Insufficient stock. Available: {available_quantity}")
 
+            previous_total = cart_item.total_price
             cart_item.quantity = quantity
             cart_item.total_price = cart_item.quantity * cart_item.unit_price
+            await db.flush()
+            await self._apply_totals_delta(db, cart_item.cart_id, cart_item.total_price - previous_total)
             await db.commit()
-            await db.refresh(cart_item)
             
-            await self._update_cart_totals(db, str(cart_item.cart_id))
+            await self._refresh_cached_cart(db, str(cart_item.cart_id))
             
             logger.info(f"Updated cart item {cart_item_id} quantity to {quantity}")
             return CartItemResponse(**cart_item.to_dict())
@@ -985,6 +550,7 @@ class CartCrud(BaseCrud[Cart]):
     async def remove_cart_item(self, db: AsyncSession, cart_item_id: str) -> bool:
         try:
             from app.core.config import settings
+            await self._lock_cart_of_item(db, cart_item_id)
             cart_item_query = select(CartItem).where(CartItem.id == cart_item_id)
             if "supabase.co" in (settings.DATABASE_URL or ""):
                 cart_item_result = await db.execute(cart_item_query.execution_options(prepared_statement_cache_size=0))
@@ -998,9 +564,10 @@ class CartCrud(BaseCrud[Cart]):
 
             cart_id = str(cart_item.cart_id)
             await db.delete(cart_item)
+            await self._apply_totals_delta(db, cart_id, -cart_item.total_price)
             await db.commit()
             
-            await self._update_cart_totals(db, cart_id)
+            await self._refresh_cached_cart(db, cart_id)
             
             logger.info(f"Removed cart item {cart_item_id}")
             return True
@@ -1012,14 +579,16 @@ class CartCrud(BaseCrud[Cart]):
     async def clear_cart(self, db: AsyncSession, cart_id: str) -> bool:
         try:
             from app.core.config import settings
+            await self._lock_cart(db, cart_id)
             delete_query = delete(CartItem).where(CartItem.cart_id == cart_id)
             if "supabase.co" in (settings.DATABASE_URL or ""):
                 await db.execute(delete_query.execution_options(prepared_statement_cache_size=0))
             else:
                 await db.execute(delete_query)
+            await db.execute(pgbouncer_safe(update(Cart).where(Cart.id == cart_id).values(subtotal=0, total_amount=0)))
             await db.commit()
             
-            await self._update_cart_totals(db, cart_id)
+            await self._refresh_cached_cart(db, cart_id)
             
             logger.info(f"Cleared cart {cart_id}")
             return True
@@ -1043,6 +612,9 @@ class CartCrud(BaseCrud[Cart]):
                 cart = await self.get_or_create_cart(db, user_id=user_id)
                 return CartResponse(**cart.to_dict())
 
+            cart_cache.forget_owner(session_id=session_id)
+            cart_cache.forget_owner(user_id=user_id)
+
             user_cart_query = select(Cart).where(Cart.user_id == user_id)
             if "supabase.co" in (settings.DATABASE_URL or ""):
                 user_cart_result = await db.execute(user_cart_query.execution_options(prepared_statement_cache_size=0))
@@ -1056,8 +628,10 @@ class CartCrud(BaseCrud[Cart]):
                 session_cart.session_id = None
                 await db.commit()
                 await db.refresh(session_cart)
+                await self._refresh_cached_cart(db, str(session_cart.id))
                 return CartResponse(**session_cart.to_dict())
             else:
+                await self._lock_cart(db, session_cart.id, user_cart.id)
                 session_items_query = select(CartItem).where(CartItem.cart_id == session_cart.id)
                 if "supabase.co" in (settings.DATABASE_URL or ""):
                     session_items_result = await db.execute(session_items_query.execution_options(prepared_statement_cache_size=0))
@@ -1066,6 +640,7 @@ class CartCrud(BaseCrud[Cart]):
                     session_items_result = await db.execute(session_items_query)
                 session_items = session_items_result.scalars().all()
 
+                moved_total = 0
                 for item in session_items:
                     existing_item_query = select(CartItem).where(
                         and_(
@@ -1084,13 +659,18 @@ class CartCrud(BaseCrud[Cart]):
                     if existing_item:
                         existing_item.quantity += item.quantity
                         existing_item.total_price = existing_item.quantity * existing_item.unit_price
+                        moved_total += item.quantity * existing_item.unit_price
                     else:
                         item.cart_id = user_cart.id
+                        moved_total += item.total_price
 
                 await db.delete(session_cart)
+                await self._apply_totals_delta(db, user_cart.id, moved_total)
                 await db.commit()
+                await db.refresh(user_cart)
                 
-                await self._update_cart_totals(db, str(user_cart.id))
+                cart_cache.invalidate(str(session_cart.id))
+                await self._refresh_cached_cart(db, str(user_cart.id))
                 
                 return CartResponse(**user_cart.to_dict())
         except Exception as e:
@@ -1099,6 +679,11 @@ class CartCrud(BaseCrud[Cart]):
             raise
 
     async def get_cart_count(self, db: AsyncSession, user_id: Optional[str] = None, session_id: Optional[str] = None) -> int:
+        if not user_id and not session_id:
+            return 0
+        view = await self._current_view(db, cart_cache.get_owner_view(user_id, session_id))
+        if view:
+            return sum(item["quantity"] for item in view["items"])
         try:
             from app.core.config import settings
             # First find the cart
@@ -1120,15 +705,9 @@ class CartCrud(BaseCrud[Cart]):
             if not cart:
                 return 0
             
-            # Then count items in that cart
-            count_query = select(func.sum(CartItem.quantity)).where(CartItem.cart_id == cart.id)
-            if "supabase.co" in (settings.DATABASE_URL or ""):
-                result = await db.execute(count_query.execution_options(prepared_statement_cache_size=0))
-            else:
-
-                result = await db.execute(count_query)
-            count = result.scalar() or 0
-            return int(count)
+            # Load (and cache) the full view so the badge and the cart page share one entry
+            cart_view = await self.get_cart_with_items(db, str(cart.id))
+            return sum(item.quantity for item in cart_view.items)
         except Exception as e:
             logger.error(f"Error getting cart count: {str(e)}")
             return 0
@@ -1150,6 +729,7 @@ class CartCrud(BaseCrud[Cart]):
                 count += 1
 
             await db.commit()
+            cart_cache.clear()
             logger.info(f"Cleaned up {count} expired carts")
             return count
         except Exception as e:
@@ -1157,28 +737,58 @@ class CartCrud(BaseCrud[Cart]):
             logger.error(f"Error cleaning up expired carts: {str(e)}")
             raise
 
-    async def _update_cart_totals(self, db: AsyncSession, cart_id: str):
+    async def _current_view(self, db: AsyncSession, view: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        ``view`` if the cart row is unchanged since it was rendered, else None.
+
+        Views are cached per worker, but every cart mutation moves
+        ``carts.updated_at``, so comparing it catches writes made by any worker.
+        """
+        if not view:
+            return None
+        updated_at = (await db.execute(pgbouncer_safe(
+            select(Cart.updated_at).where(Cart.id == view["id"])
+        ))).scalar_one_or_none()
+        if updated_at is None or updated_at.isoformat() != view.get("updated_at"):
+            cart_cache.invalidate(view["id"])
+            return None
+        return view
+
+    async def _refresh_cached_cart(self, db: AsyncSession, cart_id: str) -> None:
+        """Write-through after a committed mutation; a failure only costs a cache miss"""
+        cart_cache.invalidate(cart_id)
         try:
-            from app.core.config import settings
-            cart_items_query = select(CartItem).where(CartItem.cart_id == cart_id)
-            if "supabase.co" in (settings.DATABASE_URL or ""):
-                cart_items_result = await db.execute(cart_items_query.execution_options(prepared_statement_cache_size=0))
-            else:
-
-                cart_items_result = await db.execute(cart_items_query)
-            cart_items = cart_items_result.scalars().all()
-
-            subtotal = sum(item.total_price for item in cart_items)
-            
-            update_query = update(Cart).where(Cart.id == cart_id).values(
-                    subtotal=subtotal,
-                    total_amount=subtotal
-                )
-            if "supabase.co" in (settings.DATABASE_URL or ""):
-                await db.execute(update_query.execution_options(prepared_statement_cache_size=0))
-            else:
-                await db.execute(update_query)
-            await db.commit()
+            await self.get_cart_with_items(db, cart_id)
         except Exception as e:
-            logger.error(f"Error updating cart totals: {str(e)}")
-            raise
+            logger.warning(f"Could not refresh cached cart {cart_id}: {e}")
+
+    async def _lock_cart(self, db: AsyncSession, *cart_ids) -> None:
+        """
+        Row-lock carts until the caller commits. Every mutator takes this before
+        touching lines, so checkout sees a stable set of lines; ids are locked
+        in a fixed order so two carts can never deadlock.
+        """
+        for cart_id in sorted({str(cart_id) for cart_id in cart_ids}):
+            await db.execute(pgbouncer_safe(select(Cart.id).where(Cart.id == cart_id).with_for_update()))
+
+    async def _lock_cart_of_item(self, db: AsyncSession, cart_item_id: str):
+        """Lock the cart that owns ``cart_item_id`` and return its id"""
+        cart_id = (await db.execute(pgbouncer_safe(
+            select(CartItem.cart_id).where(CartItem.id == cart_item_id)
+        ))).scalar_one_or_none()
+        if cart_id is None:
+            raise NotFoundException("Cart item not found")
+        await self._lock_cart(db, cart_id)
+        return cart_id
+
+    async def _apply_totals_delta(self, db: AsyncSession, cart_id, delta) -> None:
+        """
+        Shift the cart totals by ``delta`` inside the caller's transaction; the caller commits.
+        Runs even for a zero delta, since the update also moves ``updated_at``, which
+        invalidates every worker's cached view of the cart.
+        """
+        update_query = update(Cart).where(Cart.id == cart_id).values(
+            subtotal=Cart.subtotal + delta,
+            total_amount=Cart.total_amount + delta
+        )
+        await db.execute(pgbouncer_safe(update_query))
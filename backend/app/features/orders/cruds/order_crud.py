@@ -1,8 +1,8 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete, and_, or_, desc, func
+from sqlalchemy import select, update, delete, and_, or_, desc, func, text
 from sqlalchemy.orm import selectinload
 from typing import Optional, List, Dict, Any
-from uuid import UUID
+from uuid import UUID, uuid4
 from datetime import datetime
 import secrets
 import string
@@ -15,12 +15,25 @@ from app.core.pagination import PaginationParams, PaginatedResponse
 from app.features.orders.models.order import Order, OrderItem, OrderStatusEnum, PaymentStatusEnum
 from app.features.orders.models.cart import Cart, CartItem
 from app.features.orders.models.payment import Payment
+from app.features.orders.services.cart_cache import cart_cache
+from app.features.products.services.inventory_reservations import reservation_engine
 from app.features.auth.models.address import Address
 from app.features.orders.requests.order_request import OrderCreateRequest, OrderUpdateStatusRequest, OrderCancelRequest
 from app.features.orders.responses.order_response import OrderResponse, OrderWithItemsResponse, OrderSummaryResponse
 
 logger = get_logger("crud.orders")
 
+ORDER_ITEMS_FROM_CART_SQL = text("""
+    INSERT INTO order_items (id, order_id, product_id, variant_id, supplier_id, product_name, variant_title, sku,
+                             quantity, unit_price, total_price, fulfillment_status, created_at, updated_at)
+    SELECT gen_random_uuid(), :order_id, ci.product_id, ci.variant_id, p.supplier_id, p.name, v.title,
+           coalesce(v.sku, p.sku), ci.quantity, ci.unit_price, ci.total_price, 'unfulfilled', now(), now()
+    FROM cart_items ci
+    JOIN products p ON p.id = ci.product_id
+    LEFT JOIN product_variants v ON v.id = ci.variant_id
+    WHERE ci.id = ANY(:line_ids)
+""")
+
 class OrderCRUD(BaseCrud[Order]):
     def __init__(self):
         super().__init__(get_supabase_client(), Order)
@@ -32,82 +45,69 @@ class OrderCRUD(BaseCrud[Order]):
     
     async def create_order_from_cart(self, db: AsyncSession, user_id: UUID, request: OrderCreateRequest) -> OrderResponse:
         try:
-            cart_query = select(Cart).where(Cart.user_id == user_id).options(
-                selectinload(Cart.items).selectinload(CartItem.product),
-                selectinload(Cart.items).selectinload(CartItem.variant)
-            )
-            cart_result = await db.execute(cart_query)
-            cart = cart_result.scalar_one_or_none()
-            
-            if not cart or not cart.items:
+            # The cart lock (also taken by every cart mutator) holds the lines still until commit
+            cart = (await db.execute(
+                select(Cart).where(Cart.user_id == user_id).with_for_update()
+            )).scalar_one_or_none()
+            lines = []
+            if cart:
+                lines = (await db.execute(
+                    select(CartItem.id, CartItem.product_id, CartItem.variant_id, CartItem.quantity, CartItem.total_price)
+                    .where(CartItem.cart_id == cart.id)
+                )).all()
+            if not lines:
                 raise ValidationException("Cart is empty")
             
-            billing_address_query = select(Address).where(
-                and_(Address.id == request.billing_address_id, Address.user_id == user_id)
-            )
-            billing_result = await db.execute(billing_address_query)
-            billing_address = billing_result.scalar_one_or_none()
-            
+            shipping_address_id = request.shipping_address_id if request.use_different_shipping else request.billing_address_id
+            address_ids = {UUID(str(request.billing_address_id)), UUID(str(shipping_address_id))}
+            addresses = {
+                address.id: address for address in (await db.execute(
+                    select(Address).where(and_(Address.id.in_(address_ids), Address.user_id == user_id))
+                )).scalars().all()
+            }
+            billing_address = addresses.get(UUID(str(request.billing_address_id)))
             if not billing_address:
                 raise NotFoundException("Billing address not found")
-            
-            shipping_address_id = request.shipping_address_id if request.use_different_shipping else request.billing_address_id
-            shipping_address_query = select(Address).where(
-                and_(Address.id == shipping_address_id, Address.user_id == user_id)
-            )
-            shipping_result = await db.execute(shipping_address_query)
-            shipping_address = shipping_result.scalar_one_or_none()
-            
+            shipping_address = addresses.get(UUID(str(shipping_address_id)))
             if not shipping_address:
                 raise NotFoundException("Shipping address not found")
             
-            # Use raw SQL INSERT with proper enum casting to avoid type mismatch
-            from sqlalchemy import text
-            import json
             order_number = self.generate_order_number()
-            billing_addr_json = json.dumps(self.address_to_dict(billing_address))
-            shipping_addr_json = json.dumps(self.address_to_dict(shipping_address))
+            
+            # Hold and take the stock in this transaction; untracked products pass through
+            reservation = await reservation_engine.reserve(
+                db, order_number, [(line.product_id, line.variant_id, line.quantity) for line in lines],
+                require_tracked=False
+            )
+            if not reservation["reserved"]:
+                await db.rollback()
+                short = ", ".join(f"{s['product_id']} (available {s['available']})" for s in reservation["shortages"])
+                raise ValidationException(f"Insufficient stock for: {short}")
+            await reservation_engine.commit(db, order_number)
+            
+            subtotal = sum(line.total_price for line in lines)
+            tax_amount = cart.tax_amount or 0
+            shipping_amount = cart.shipping_amount or 0
+            discount_amount = cart.discount_amount or 0
             
             # Columns are now VARCHAR, so we can use SQLAlchemy ORM directly
             order = Order(
+                id=uuid4(),
                 user_id=user_id,
                 order_number=order_number,
                 status='pending',
                 payment_status='pending',
                 fulfillment_status='unfulfilled',
                 currency=cart.currency,
-                subtotal=cart.subtotal,
-                tax_amount=cart.tax_amount,
-                shipping_amount=cart.shipping_amount,
-                discount_amount=cart.discount_amount,
-                total_amount=cart.total_amount,
+                subtotal=subtotal,
+                tax_amount=tax_amount,
+                shipping_amount=shipping_amount,
+                discount_amount=discount_amount,
+                total_amount=subtotal + tax_amount + shipping_amount - discount_amount,
                 billing_address=self.address_to_dict(billing_address),
                 shipping_address=self.address_to_dict(shipping_address),
                 customer_notes=request.customer_notes
             )
-            
-            db.add(order)
-            await db.flush()  # Get the ID without committing
-            
-            for cart_item in cart.items:
-                product = cart_item.product
-                variant = cart_item.variant
-                
-                order_item = OrderItem(
-                    order_id=order.id,
-                    product_id=cart_item.product_id,
-                    variant_id=cart_item.variant_id,
-                    supplier_id=product.supplier_id,
-                    product_name=product.name,
-                    variant_title=variant.title if variant else None,
-                    sku=variant.sku if variant else product.sku,
-                    quantity=cart_item.quantity,
-                    unit_price=cart_item.unit_price,
-                    total_price=cart_item.total_price,
-                    fulfillment_status='unfulfilled'  # String value for String column
-                )
-                db.add(order_item)
-            
             payment = Payment(
                 order_id=order.id,
                 payment_method=request.payment_method,
@@ -115,17 +115,26 @@ class OrderCRUD(BaseCrud[Order]):
                 amount=order.total_amount,
                 currency=order.currency
             )
-            db.add(payment)
+            db.add_all([order, payment])
+            await db.flush()
             
-            await db.execute(delete(CartItem).where(CartItem.cart_id == cart.id))
-            cart.subtotal = 0
-            cart.total_amount = 0
+            # Copy and clear exactly the lines that were priced and reserved above
+            line_ids = [line.id for line in lines]
+            items_result = await db.execute(ORDER_ITEMS_FROM_CART_SQL, {"order_id": order.id, "line_ids": line_ids})
+            
+            await db.execute(delete(CartItem).where(CartItem.id.in_(line_ids)))
+            await db.execute(update(Cart).where(Cart.id == cart.id).values(subtotal=0, total_amount=0))
             
             await db.commit()
-            await db.refresh(order)
+            cart_cache.invalidate(str(cart.id))
             logger.info(f"Order created: {order.id} for user {user_id}")
-            return OrderResponse(**order.to_dict())
+            
+            # Every column was set client-side, so the response needs no refresh round trip
+            order_dict = order.to_dict()
+            order_dict["items_count"] = items_result.rowcount
+            return OrderResponse(**order_dict)
         except Exception as e:
+            await db.rollback()
             logger.error(f"Error creating order: {str(e)}")
             raise
     
@@ -1,3 +1,4 @@
+import asyncio
 from fastapi import APIRouter, Depends, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Dict, Any, Optional
@@ -23,6 +24,18 @@ orders_buyer_router = APIRouter(prefix="/buyer/orders", tags=["Buyer Orders"])
 
 logger = get_logger("routes.buyer_orders")
 
+
+async def _ensure_cart_user(cart_crud: CartCrud, db: AsyncSession, current_user: Dict[str, Any]) -> None:
+    """Make sure the public.users row exists; memoized, so this is free after the first request"""
+    if await cart_crud.ensure_user(db, current_user):
+        return
+    # Retry once with delay
+    await asyncio.sleep(0.5)
+    if not await cart_crud.ensure_user(db, current_user):
+        logger.error(f"Failed to create user {current_user['id']} in public.users table")
+        raise ValidationException("User account not properly set up. Please try logging out and back in.")
+
+
 @orders_buyer_router.get("/cart", response_model=CartWithItemsResponse)
 async def get_cart(
     session_id: Optional[str] = Query(None),
@@ -30,24 +43,11 @@ async def get_cart(
     db: Optional[AsyncSession] = Depends(get_async_session)
 ):
     try:
+        cart_crud = CartCrud()
+
         # Ensure user exists in database if authenticated
         if current_user and current_user.get("id"):
-            from app.core.user_helper import ensure_user_exists_in_db
-            from app.features.auth.cruds.auth_crud import AuthCrud
-            auth_crud = AuthCrud()
-            user_exists = await ensure_user_exists_in_db(db, current_user, auth_crud)
-            
-            if not user_exists:
-                # Retry once with delay
-                import asyncio
-                await asyncio.sleep(0.5)
-                user_exists = await ensure_user_exists_in_db(db, current_user, auth_crud)
-                if not user_exists:
-                    logger.error(f"Failed to create user {current_user['id']} in public.users table")
-                    from app.core.exceptions import ValidationException
-                    raise ValidationException(f"User account not properly set up. Please try logging out and back in.")
-        
-        cart_crud = CartCrud()
+            await _ensure_cart_user(cart_crud, db, current_user)
         
         if current_user and current_user.get("id"):
             cart = await cart_crud.get_or_create_cart(db, user_id=current_user["id"])
@@ -81,20 +81,7 @@ async def add_to_cart(
             logger.info(f"Ensuring user {user_id} exists before cart operations")
             
             # Ensure user exists in database
-            from app.core.user_helper import ensure_user_exists_in_db
-            from app.features.auth.cruds.auth_crud import AuthCrud
-            auth_crud = AuthCrud()
-            user_exists = await ensure_user_exists_in_db(db, current_user, auth_crud)
-            
-            if not user_exists:
-                # Retry once with delay
-                import asyncio
-                await asyncio.sleep(0.5)
-                user_exists = await ensure_user_exists_in_db(db, current_user, auth_crud)
-                if not user_exists:
-                    logger.error(f"Failed to create user {user_id} in public.users table")
-                    from app.core.exceptions import ValidationException
-                    raise ValidationException(f"User account not properly set up. Please try logging out and back in.")
+            await _ensure_cart_user(cart_crud, db, current_user)
             
             logger.info(f"🔍 Getting or creating cart for user_id: {user_id}")
             cart = await cart_crud.get_or_create_cart(db, user_id=user_id)
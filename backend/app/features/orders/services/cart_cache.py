@@ -0,0 +1,84 @@
+"""
+Read-through cache for buyer carts.
+
+Cart lookups run on every page view (header badge, cart drawer), so the
+resolved cart and its rendered items are kept in process: owner
+(user_id or session_id) -> cart_id, and cart_id -> cart view. CartCrud
+writes through after each item mutation.
+
+The cache is per worker, so a view is only served after CartCrud has
+checked that the cart row's ``updated_at`` still matches the one it was
+rendered from. Every cart mutation, on any worker, moves that timestamp.
+A warm ``GET /cart`` or ``/cart/count`` therefore costs one primary-key
+lookup instead of the cart, item, product and variant queries, and never
+shows another worker's stale cart. Confirmed ``public.users`` rows are
+memoized so the user bootstrap path runs once per user rather than once
+per request.
+"""
+
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+
+class CartCache:
+    def __init__(self, ttl: float, user_ttl: float, maxsize: int = 10000):
+        self._cart_ids = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._views = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._known_users = TTLCache(maxsize=maxsize, ttl=user_ttl)
+
+    @staticmethod
+    def owner_key(user_id: Optional[str] = None, session_id: Optional[str] = None) -> Tuple[str, str]:
+        return ("user", str(user_id)) if user_id else ("session", str(session_id))
+
+    # Carts
+
+    def get_cart_id(self, user_id: Optional[str] = None, session_id: Optional[str] = None) -> Optional[str]:
+        return self._cart_ids.get(self.owner_key(user_id, session_id))
+
+    def set_cart_id(self, cart_id: str, user_id: Optional[str] = None, session_id: Optional[str] = None) -> None:
+        self._cart_ids.set(self.owner_key(user_id, session_id), str(cart_id))
+
+    def get_view(self, cart_id: str) -> Optional[Dict[str, Any]]:
+        return self._views.get(str(cart_id))
+
+    def get_owner_view(self, user_id: Optional[str] = None, session_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        cart_id = self.get_cart_id(user_id, session_id)
+        return self.get_view(cart_id) if cart_id else None
+
+    def put_view(self, view: Dict[str, Any]) -> None:
+        """Store a CartWithItemsResponse payload and index it by its owner"""
+        self._views.set(view["id"], view)
+        if view.get("user_id") or view.get("session_id"):
+            self.set_cart_id(view["id"], view.get("user_id"), view.get("session_id"))
+
+    def invalidate(self, cart_id: str) -> None:
+        self._views.invalidate(str(cart_id))
+
+    def forget_owner(self, user_id: Optional[str] = None, session_id: Optional[str] = None) -> None:
+        cart_id = self.get_cart_id(user_id, session_id)
+        self._cart_ids.invalidate(self.owner_key(user_id, session_id))
+        if cart_id:
+            self.invalidate(cart_id)
+
+    def clear(self) -> None:
+        self._cart_ids.clear()
+        self._views.clear()
+
+    # Users
+
+    def is_known_user(self, user_id: str) -> bool:
+        return bool(self._known_users.get(str(user_id)))
+
+    def remember_user(self, user_id: str) -> None:
+        self._known_users.set(str(user_id), True)
+
+    def forget_user(self, user_id: str) -> None:
+        self._known_users.invalidate(str(user_id))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"carts": self._views.stats(), "owners": self._cart_ids.stats(), "users": self._known_users.stats()}
+
+
+cart_cache = CartCache(ttl=settings.CART_CACHE_TTL, user_ttl=settings.CART_USER_CACHE_TTL)
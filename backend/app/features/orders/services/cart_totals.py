@@ -0,0 +1,90 @@
+"""
+Reconciliation for incrementally maintained cart totals.
+
+CartCrud applies ``subtotal = subtotal + delta`` in the same transaction as
+each item change instead of re-summing the cart. A periodic pass walks the
+carts in id order, CART_RECONCILE_BATCH_SIZE at a time, and corrects any cart
+whose stored totals have drifted (manual edits, writes from other services, a
+crash between statements in an older deploy).
+
+Each batch first locks its carts, skipping any that an item write holds, and
+only then sums ``cart_items`` in a second statement. Under READ COMMITTED that
+statement takes a fresh snapshot, so it sees every item write that committed
+before the lock. An item write still in flight has to wait for the cart lock,
+and its delta then lands on the corrected total.
+"""
+
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+
+import app.database.session as db_session
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.periodic import PeriodicTask
+from app.features.orders.services.cart_cache import cart_cache
+
+logger = get_logger("orders.cart_totals")
+
+LOCK_BATCH_SQL = """
+    SELECT id FROM carts
+    WHERE CAST(:after AS uuid) IS NULL OR id > CAST(:after AS uuid)
+    ORDER BY id
+    LIMIT :limit
+    FOR UPDATE SKIP LOCKED
+"""
+
+RECONCILE_SQL = """
+    UPDATE carts
+    SET subtotal = t.items_total,
+        total_amount = t.items_total,
+        updated_at = now()
+    FROM (
+        SELECT c.id,
+               (SELECT COALESCE(SUM(ci.total_price), 0) FROM cart_items ci WHERE ci.cart_id = c.id) AS items_total
+        FROM carts c
+        WHERE c.id = ANY(:ids)
+    ) t
+    WHERE carts.id = t.id
+      AND (carts.subtotal IS DISTINCT FROM t.items_total
+           OR carts.total_amount IS DISTINCT FROM t.items_total)
+    RETURNING carts.id
+"""
+
+
+async def _reconcile_batch(after: Optional[str], limit: int) -> Tuple[List[str], Optional[str]]:
+    """Reconcile the next ``limit`` unlocked carts after ``after``; returns (corrected ids, last id seen)"""
+    async with db_session.async_engine.begin() as conn:
+        ids = (await conn.execute(text(LOCK_BATCH_SQL), {"after": after, "limit": limit})).scalars().all()
+        if not ids:
+            return [], None
+        result = await conn.execute(text(RECONCILE_SQL), {"ids": list(ids)})
+        return [str(row[0]) for row in result.all()], str(ids[-1])
+
+
+async def reconcile_cart_totals(batch_size: Optional[int] = None) -> Optional[List[str]]:
+    """Fix drifted carts; returns the corrected cart ids, or None when the database is unavailable"""
+    if not db_session.async_engine:
+        return None
+    batch_size = max(1, batch_size or settings.CART_RECONCILE_BATCH_SIZE)
+    drifted: List[str] = []
+    after = None
+    try:
+        while True:
+            fixed, after = await _reconcile_batch(after, batch_size)
+            drifted.extend(fixed)
+            for cart_id in fixed:
+                cart_cache.invalidate(cart_id)
+            if after is None:
+                break
+    except Exception as e:
+        logger.error(f"Cart totals reconciliation failed: {e}")
+        return None
+    if drifted:
+        logger.warning(f"Reconciled drifted totals on {len(drifted)} carts")
+    return drifted
+
+
+cart_totals_reconciler = PeriodicTask(
+    "cart totals reconciliation", reconcile_cart_totals, settings.CART_RECONCILE_INTERVAL
+)
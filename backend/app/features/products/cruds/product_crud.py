@@ -3,12 +3,15 @@ from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, and_, or_, desc
 from sqlalchemy.orm import selectinload
-from app.database.base import get_supabase_client
+from app.database.base import get_supabase_client, get_supabase_rest_client
 from app.core.base import BaseCrud
 from app.core.pagination import PaginationParams, PaginatedResponse
 from app.features.products.models.product import Product, ProductStatusEnum, ProductApprovalEnum, ProductVisibilityEnum
 from app.features.products.models.product_image import ProductImage
 from app.features.products.models.product_variant import ProductVariant
+from app.features.products.services.product_events import (
+    notify_product_changed, PRODUCT_CREATED, PRODUCT_UPDATED, PRODUCT_DELETED
+)
 from app.core.exceptions import NotFoundException, AuthorizationException, ConflictException
 from app.core.logging import get_logger
 
@@ -18,6 +21,21 @@ class ProductCrud(BaseCrud[Product]):
     def __init__(self):
         super().__init__(get_supabase_client(), Product)
 
+    async def create(self, db: AsyncSession, data: Dict[str, Any], commit: bool = True) -> Product:
+        product = await super().create(db, data, commit)
+        notify_product_changed(product.id, PRODUCT_CREATED, product.to_dict())
+        return product
+
+    async def update(self, db: AsyncSession, id: str, data: Dict[str, Any], commit: bool = True) -> Product:
+        product = await super().update(db, id, data, commit)
+        notify_product_changed(product.id, PRODUCT_UPDATED, product.to_dict())
+        return product
+
+    async def delete(self, db: AsyncSession, id: str) -> bool:
+        deleted = await super().delete(db, id)
+        notify_product_changed(id, PRODUCT_DELETED)
+        return deleted
+
     async def get_by_id(self, db: AsyncSession, id: str) -> Optional[Product]:
         try:
             result = await db.execute(
@@ -175,6 +193,44 @@ class ProductCrud(BaseCrud[Product]):
             logger.error(f"Error getting supplier products for {supplier_id}: {str(e)}")
             raise
 
+    @staticmethod
+    def _rest_product_to_list_item(p: Dict[str, Any]) -> Dict[str, Any]:
+        """Shape a PostgREST products row like ProductListResponse"""
+        import json
+        try:
+            tags_list = json.loads(p.get("tags", "[]")) if isinstance(p.get("tags"), str) else (p.get("tags") or [])
+        except:
+            tags_list = []
+        created_at_val = p.get("created_at")
+        if isinstance(created_at_val, str):
+            try:
+                created_at_val = datetime.fromisoformat(created_at_val.replace("Z", "+00:00"))
+            except:
+                created_at_val = datetime.utcnow()
+        elif created_at_val is None:
+            created_at_val = datetime.utcnow()
+        return {
+            "id": str(p.get("id")),
+            "supplier_id": str(p.get("supplier_id")) if p.get("supplier_id") else "00000000-0000-0000-0000-000000000000",
+            "category_id": str(p.get("category_id")) if p.get("category_id") else "00000000-0000-0000-0000-000000000000",
+            "brand_id": str(p.get("brand_id")) if p.get("brand_id") else None,
+            "sku": p.get("sku", ""),
+            "name": p.get("name", ""),
+            "slug": p.get("slug", ""),
+            "short_description": p.get("short_description") or None,
+            "price": float(p.get("price", 0)),
+            "compare_at_price": None,
+            "status": p.get("status", "ACTIVE"),
+            "approval_status": p.get("approval_status", "approved"),
+            "visibility": p.get("visibility", "visible"),
+            "tags": tags_list,
+            "category": None,
+            "brand": None,
+            "images": [],
+            "sustainability_scores": [],
+            "created_at": created_at_val
+        }
+
     async def get_public_products(
         self,
         db: Optional[AsyncSession],
@@ -188,260 +244,7 @@ class ProductCrud(BaseCrud[Product]):
         sort_order: Optional[str] = "desc"
     ) -> PaginatedResponse[Dict[str, Any]]:
         # PRIORITY: Use Supabase REST API (products are created via Supabase RPC)
-        from app.core.config import settings
-        import httpx
-        
-        supabase_url = (settings.SUPABASE_URL or "").strip()
-        service_role_key = (settings.SUPABASE_SERVICE_ROLE_KEY or "").strip()
-        
-        if not supabase_url or not service_role_key:
-            logger.warning(f"Supabase not configured - URL: {bool(supabase_url)}, Key: {bool(service_role_key)}")
-            return PaginatedResponse[Dict[str, Any]](
-                items=[],
-                total=0,
-                page=pagination.page,
-                limit=pagination.limit,
-                total_pages=0
-            )
-        
-        if supabase_url and service_role_key:
-            try:
-                # Build Supabase REST API query using PostgREST syntax
-                from urllib.parse import quote
-                base_url = f"{supabase_url}/rest/v1/products"
-                
-                # Select specific columns - include all required fields for ProductListResponse
-                select_cols = "id,supplier_id,name,slug,sku,price,short_description,category_id,brand_id,status,approval_status,visibility,created_at,tags"
-                
-                # Build the filtered query
-                query_params = [f"select={select_cols}"]
-                
-                # DEBUG: Query all products first (client-side filtering workaround for PostgREST enum filter issue)
-                debug_url_no_filters = f"{base_url}?select={select_cols}&limit=50"
-                try:
-                    async with httpx.AsyncClient(timeout=10.0) as debug_client:
-                        debug_response = await debug_client.get(
-                            debug_url_no_filters,
-                            headers={
-                                "apikey": service_role_key,
-                                "Authorization": f"Bearer {service_role_key}",
-                                "Content-Type": "application/json"
-                            }
-                        )
-                        if debug_response.status_code == 200:
-                            debug_data = debug_response.json()
-                            if isinstance(debug_data, list) and len(debug_data) > 0:
-                                # Filter client-side for products matching our criteria
-                                matching = [p for p in debug_data if str(p.get('status', '')).upper() == 'ACTIVE' and str(p.get('approval_status', '')).upper() == 'APPROVED' and str(p.get('visibility', '')).upper() == 'VISIBLE']
-                                if len(matching) > 0:
-                                    logger.info(f"✅ Found {len(matching)} matching products (client-side filtered)")
-                                    # Apply pagination
-                                    start_idx = (pagination.page - 1) * pagination.limit
-                                    end_idx = start_idx + pagination.limit
-                                    paginated_products = matching[start_idx:end_idx]
-                                    # Convert to response format - match ProductListResponse schema
-                                    items = []
-                                    for p in paginated_products:
-                                        from datetime import datetime
-                                        import json
-                                        try:
-                                            tags_list = json.loads(p.get("tags", "[]")) if isinstance(p.get("tags"), str) else (p.get("tags") or [])
-                                        except:
-                                            tags_list = []
-                                        created_at_val = p.get("created_at")
-                                        if isinstance(created_at_val, str):
-                                            try:
-                                                created_at_val = datetime.fromisoformat(created_at_val.replace("Z", "+00:00"))
-                                            except:
-                                                created_at_val = datetime.utcnow()
-                                        elif created_at_val is None:
-                                            created_at_val = datetime.utcnow()
-                                        items.append({
-                                            "id": str(p.get("id")),
-                                            "supplier_id": str(p.get("supplier_id")) if p.get("supplier_id") else "00000000-0000-0000-0000-000000000000",
-                                            "category_id": str(p.get("category_id")) if p.get("category_id") else "00000000-0000-0000-0000-000000000000",
-                                            "brand_id": str(p.get("brand_id")) if p.get("brand_id") else None,
-                                            "sku": p.get("sku", ""),
-                                            "name": p.get("name", ""),
-                                            "slug": p.get("slug", ""),
-                                            "short_description": p.get("short_description") or None,
-                                            "price": float(p.get("price", 0)),
-                                            "compare_at_price": None,
-                                            "status": p.get("status", "ACTIVE"),
-                                            "approval_status": p.get("approval_status", "approved"),
-                                            "visibility": p.get("visibility", "visible"),
-                                            "tags": tags_list,
-                                            "category": None,
-                                            "brand": None,
-                                            "images": [],
-                                            "sustainability_scores": [],
-                                            "created_at": created_at_val
-                                        })
-                                    return PaginatedResponse.create(
-                                        items=items,
-                                        total=len(matching),
-                                        page=pagination.page,
-                                        limit=pagination.limit
-                                    )
-                except Exception as debug_err:
-                    logger.warning(f"Debug query failed: {debug_err}")
-                
-                # Continue with PostgREST query if client-side filtering didn't return results
-                # Add filters for PostgREST query
-                query_params.extend([
-                    "status=eq.ACTIVE",
-                    "approval_status=eq.approved",
-                    "visibility=eq.visible"
-                ])
-                logger.info(f"Querying with filters: status=ACTIVE, approval_status=APPROVED, visibility=VISIBLE")
-                print(f"🔍 Filters: status=ACTIVE, approval_status=APPROVED, visibility=VISIBLE")
-                
-                if category_id:
-                    query_params.append(f"category_id=eq.{category_id}")
-                if brand_id:
-                    query_params.append(f"brand_id=eq.{brand_id}")
-                if min_price is not None:
-                    query_params.append(f"price=gte.{min_price}")
-                if max_price is not None:
-                    query_params.append(f"price=lte.{max_price}")
-                if search:
-                    # PostgREST search: use ilike with % wildcards
-                    search_encoded = quote(f"%{search}%")
-                    query_params.append(f"or=(name.ilike.{search_encoded},description.ilike.{search_encoded})")
-                
-                # Add ordering and pagination
-                query_params.append(f"order={sort_by}.{sort_order}")
-                query_params.append(f"limit={pagination.limit}")
-                query_params.append(f"offset={(pagination.page - 1) * pagination.limit}")
-                
-                url = f"{base_url}?{'&'.join(query_params)}"
-                logger.info(f"🔍 Querying Supabase REST API: {url[:300]}")
-                print(f"🔍 Supabase query: {url[:300]}")
-                
-                async with httpx.AsyncClient(timeout=10.0) as client:
-                    response = await client.get(
-                        url,
-                        headers={
-                            "apikey": service_role_key,
-                            "Authorization": f"Bearer {service_role_key}",
-                            "Content-Type": "application/json",
-                            "Prefer": "count=exact"
-                        }
-                    )
-                    
-                    response_text = response.text
-                    logger.info(f"Supabase response: status={response.status_code}, headers={dict(response.headers)}, body={response_text[:500]}")
-                    print(f"📥 Supabase response: status={response.status_code}, body={response_text[:500]}")
-                    
-                    if response.status_code == 200:
-                        try:
-                            products_data = response.json()
-                            if not isinstance(products_data, list):
-                                logger.warning(f"Supabase returned non-list data: {type(products_data)}, value={products_data}")
-                                products_data = []
-                            
-                            # Get total count from Content-Range header
-                            content_range = response.headers.get("content-range", "")
-                            total = len(products_data)
-                            if content_range and "/" in content_range:
-                                try:
-                                    # Format: "0-4/100" means items 0-4 of 100 total
-                                    total = int(content_range.split("/")[1])
-                                    logger.info(f"Got total from Content-Range: {total}")
-                                except Exception as range_err:
-                                    logger.warning(f"Could not parse Content-Range '{content_range}': {range_err}")
-                            
-                            logger.info(f"Parsed {len(products_data)} products from Supabase response, total={total}")
-                            if len(products_data) > 0:
-                                logger.info(f"First product sample: status={products_data[0].get('status')}, approval_status={products_data[0].get('approval_status')}, visibility={products_data[0].get('visibility')}")
-                            
-                            # Convert to response format - match ProductListResponse schema
-                            items = []
-                            for p in products_data:
-                                from datetime import datetime
-                                import json
-                                try:
-                                    tags_list = json.loads(p.get("tags", "[]")) if isinstance(p.get("tags"), str) else (p.get("tags") or [])
-                                except:
-                                    tags_list = []
-                                created_at_val = p.get("created_at")
-                                if isinstance(created_at_val, str):
-                                    try:
-                                        created_at_val = datetime.fromisoformat(created_at_val.replace("Z", "+00:00"))
-                                    except:
-                                        created_at_val = datetime.utcnow()
-                                elif created_at_val is None:
-                                    created_at_val = datetime.utcnow()
-                                items.append({
-                                    "id": str(p.get("id")),
-                                    "supplier_id": str(p.get("supplier_id")) if p.get("supplier_id") else "00000000-0000-0000-0000-000000000000",
-                                    "category_id": str(p.get("category_id")) if p.get("category_id") else "00000000-0000-0000-0000-000000000000",
-                                    "brand_id": str(p.get("brand_id")) if p.get("brand_id") else None,
-                                    "sku": p.get("sku", ""),
-                                    "name": p.get("name", ""),
-                                    "slug": p.get("slug", ""),
-                                    "short_description": p.get("short_description") or None,
-                                    "price": float(p.get("price", 0)),
-                                    "compare_at_price": None,
-                                    "status": p.get("status", "ACTIVE"),
-                                    "approval_status": p.get("approval_status", "approved"),
-                                    "visibility": p.get("visibility", "visible"),
-                                    "tags": tags_list,
-                                    "category": None,
-                                    "brand": None,
-                                    "images": [],
-                                    "sustainability_scores": [],
-                                    "created_at": created_at_val
-                                })
-                            
-                            logger.info(f"✅ Found {total} products from Supabase REST API")
-                            return PaginatedResponse.create(
-                                items=items,
-                                total=total,
-                                page=pagination.page,
-                                limit=pagination.limit
-                            )
-                        except Exception as parse_error:
-                            logger.error(f"Failed to parse Supabase response: {parse_error}, body: {response_text[:500]}")
-                            # Don't raise - return empty instead
-                            return PaginatedResponse[Dict[str, Any]](
-                                items=[],
-                                total=0,
-                                page=pagination.page,
-                                limit=pagination.limit,
-                                total_pages=0
-                            )
-                    else:
-                        error_msg = f"Supabase REST API returned {response.status_code}: {response_text[:500]}"
-                        logger.error(error_msg)
-                        # Don't raise - return empty instead
-                        return PaginatedResponse[Dict[str, Any]](
-                            items=[],
-                            total=0,
-                            page=pagination.page,
-                            limit=pagination.limit,
-                            total_pages=0
-                        )
-            except Exception as supabase_error:
-                import traceback
-                error_trace = traceback.format_exc()
-                logger.error(f"❌ Supabase REST API query failed: {supabase_error}")
-                logger.error(f"Error traceback: {error_trace}")
-                print(f"❌ Supabase query error: {supabase_error}")
-                print(f"Full traceback: {error_trace}")
-                # Return empty instead of raising - Supabase only approach
-                logger.warning("Returning empty products list due to Supabase query error")
-                return PaginatedResponse[Dict[str, Any]](
-                    items=[],
-                    total=0,
-                    page=pagination.page,
-                    limit=pagination.limit,
-                    total_pages=0
-                )
-        
-        # If Supabase query failed, return empty (Supabase-only approach)
-        logger.warning("Supabase query not available or failed, returning empty products list")
-        return PaginatedResponse[Dict[str, Any]](
+        empty = PaginatedResponse[Dict[str, Any]](
             items=[],
             total=0,
             page=pagination.page,
@@ -449,8 +252,79 @@ class ProductCrud(BaseCrud[Product]):
             total_pages=0
         )
         
-        # REMOVED: Database fallback - using Supabase only
-        # All product queries should go through Supabase REST API
+        rest = get_supabase_rest_client()
+        if not rest.configured:
+            logger.warning(f"Supabase not configured - URL: {bool(rest.url)}, Key: {bool(rest.key)}")
+            return empty
+        
+        # Select specific columns - include all required fields for ProductListResponse
+        select_cols = "id,supplier_id,name,slug,sku,price,short_description,category_id,brand_id,status,approval_status,visibility,created_at,tags"
+        
+        # Client-side filtering workaround for PostgREST enum filter issue
+        try:
+            recent = await rest.select("products", {"select": select_cols, "limit": 50})
+            matching = [
+                p for p in recent
+                if str(p.get('status', '')).upper() == 'ACTIVE'
+                and str(p.get('approval_status', '')).upper() == 'APPROVED'
+                and str(p.get('visibility', '')).upper() == 'VISIBLE'
+            ]
+            if matching:
+                logger.info(f"✅ Found {len(matching)} matching products (client-side filtered)")
+                start_idx = (pagination.page - 1) * pagination.limit
+                end_idx = start_idx + pagination.limit
+                return PaginatedResponse.create(
+                    items=[self._rest_product_to_list_item(p) for p in matching[start_idx:end_idx]],
+                    total=len(matching),
+                    page=pagination.page,
+                    limit=pagination.limit
+                )
+        except Exception as debug_err:
+            logger.warning(f"Client-side filtered query failed: {debug_err}")
+        
+        # Continue with PostgREST query if client-side filtering didn't return results
+        params: Dict[str, Any] = {
+            "select": select_cols,
+            "status": "eq.ACTIVE",
+            "approval_status": "eq.approved",
+            "visibility": "eq.visible"
+        }
+        if category_id:
+            params["category_id"] = f"eq.{category_id}"
+        if brand_id:
+            params["brand_id"] = f"eq.{brand_id}"
+        if min_price is not None and max_price is not None:
+            params["and"] = f"(price.gte.{min_price},price.lte.{max_price})"
+        elif min_price is not None:
+            params["price"] = f"gte.{min_price}"
+        elif max_price is not None:
+            params["price"] = f"lte.{max_price}"
+        if search:
+            # PostgREST search: use ilike with * wildcards (httpx encodes the value)
+            params["or"] = f"(name.ilike.*{search}*,description.ilike.*{search}*)"
+        params["order"] = f"{sort_by}.{sort_order}"
+        params["limit"] = pagination.limit
+        params["offset"] = (pagination.page - 1) * pagination.limit
+        
+        try:
+            products_data, total = await rest.select_with_count("products", params)
+            if not isinstance(products_data, list):
+                logger.warning(f"Supabase returned non-list data: {type(products_data)}")
+                products_data = []
+            if total is None:
+                total = len(products_data)
+            
+            logger.info(f"✅ Found {total} products from Supabase REST API")
+            return PaginatedResponse.create(
+                items=[self._rest_product_to_list_item(p) for p in products_data],
+                total=total,
+                page=pagination.page,
+                limit=pagination.limit
+            )
+        except Exception as supabase_error:
+            logger.error(f"❌ Supabase REST API query failed: {supabase_error}")
+            # Return empty instead of raising - Supabase only approach
+            return empty
 
     async def publish_product(self, db: AsyncSession, product_id: str, supplier_id: str) -> Dict[str, Any]:
         try:
@@ -5,6 +5,7 @@ from supabase_auth import datetime
 from app.database.base import get_supabase_client
 from app.core.base import BaseCrud
 from app.features.products.models.product_inventory import ProductInventory
+from app.features.products.services.inventory_reservations import reservation_engine
 from app.core.exceptions import NotFoundException, ValidationException
 from app.core.logging import get_logger
 
@@ -79,19 +80,14 @@ class ProductInventoryCrud(BaseCrud[ProductInventory]):
         variant_id: Optional[str] = None
     ) -> bool:
         try:
-            inventory = await self.get_product_inventory(db, product_id, variant_id)
-            if not inventory:
-                return False
-            
-            if inventory.available_quantity < quantity:
-                return False
-            
-            new_reserved = inventory.reserved_quantity + quantity
-            await self.update(db, str(inventory.id), {"reserved_quantity": new_reserved})
-            
-            logger.info(f"Reserved {quantity} units for product {product_id}, variant {variant_id}")
-            return True
+            # Conditional increment: fails instead of overselling when stock ran out concurrently
+            reserved = await reservation_engine.reserve_one(db, product_id, quantity, variant_id)
+            await db.commit()
+            if reserved:
+                logger.info(f"Reserved {quantity} units for product {product_id}, variant {variant_id}")
+            return reserved
         except Exception as e:
+            await db.rollback()
             logger.error(f"Error reserving inventory for product {product_id}: {str(e)}")
             return False
 
@@ -103,19 +99,40 @@ class ProductInventoryCrud(BaseCrud[ProductInventory]):
         variant_id: Optional[str] = None
     ) -> bool:
         try:
-            inventory = await self.get_product_inventory(db, product_id, variant_id)
-            if not inventory:
-                return False
-            
-            new_reserved = max(0, inventory.reserved_quantity - quantity)
-            await self.update(db, str(inventory.id), {"reserved_quantity": new_reserved})
-            
-            logger.info(f"Released {quantity} units for product {product_id}, variant {variant_id}")
-            return True
+            released = await reservation_engine.release_one(db, product_id, quantity, variant_id)
+            await db.commit()
+            if released:
+                logger.info(f"Released {quantity} units for product {product_id}, variant {variant_id}")
+            return released
         except Exception as e:
+            await db.rollback()
             logger.error(f"Error releasing inventory for product {product_id}: {str(e)}")
             return False
 
+    async def reserve_cart(self, db: AsyncSession, reference: str, lines: List[tuple], ttl: Optional[int] = None) -> Dict[str, Any]:
+        """Reserve (product_id, variant_id, quantity) lines all-or-nothing under ``reference``"""
+        try:
+            result = await reservation_engine.reserve(db, reference, lines, ttl)
+            if result["reserved"]:
+                await db.commit()
+            else:
+                await db.rollback()
+            return result
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"Error reserving inventory for {reference}: {str(e)}")
+            raise
+
+    async def release_reservation(self, db: AsyncSession, reference: str) -> int:
+        try:
+            released = await reservation_engine.release(db, reference)
+            await db.commit()
+            return released
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"Error releasing reservation {reference}: {str(e)}")
+            raise
+
     async def get_low_stock_products(self, db: AsyncSession, supplier_id: str) -> List[Dict[str, Any]]:
         try:
             result = await db.execute(
@@ -0,0 +1,180 @@
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from sqlalchemy import select, func, and_, asc, desc, tuple_, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.core.exceptions import BadRequestException
+from app.core.logging import get_logger
+from app.features.products.models.product import Product, ProductStatusEnum
+from app.features.products.requests.product_search_request import SortByEnum
+from app.features.products.services.product_search_engine import get_search_backend
+
+logger = get_logger("products.query_builder")
+
+# Sorts that map onto a plain column can be paginated by keyset (column, id).
+# Computed orderings (rating, popularity, discount, search rank) fall back to OFFSET.
+_KEYSET_SORTS = {
+    SortByEnum.RELEVANCE: (Product.created_at, desc, datetime.fromisoformat),
+    SortByEnum.NEWEST: (Product.created_at, desc, datetime.fromisoformat),
+    SortByEnum.OLDEST: (Product.created_at, asc, datetime.fromisoformat),
+    SortByEnum.PRICE_LOW_TO_HIGH: (Product.price, asc, Decimal),
+    SortByEnum.PRICE_HIGH_TO_LOW: (Product.price, desc, Decimal),
+    SortByEnum.NAME_A_TO_Z: (Product.name, asc, str),
+    SortByEnum.NAME_Z_TO_A: (Product.name, desc, str),
+}
+
+
+def encode_cursor(sort_value: Any, product_id: Any, total: int) -> str:
+    payload = {"v": sort_value.isoformat() if isinstance(sort_value, datetime) else str(sort_value),
+               "id": str(product_id), "t": total}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(cursor: str, parse: Callable[[str], Any]) -> Tuple[Any, UUID, Optional[int]]:
+    """``(sort value, product id, total)`` from a cursor; any malformed cursor is a 400"""
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        total = state.get("t")
+        if total is not None and (not isinstance(total, int) or isinstance(total, bool) or total < 0):
+            raise ValueError(f"bad total {total!r}")
+        return parse(state["v"]), UUID(state["id"]), total
+    except Exception:
+        raise BadRequestException("Invalid pagination cursor")
+
+
+class ProductQueryBuilder:
+    """Collects product filters once and renders the page query and its total from them"""
+
+    def __init__(self, visible_only: bool = True):
+        self._filters: List[ColumnElement] = []
+        self._joins: List[Any] = []
+        self.search_rank: Optional[ColumnElement] = None
+        self.search_engine: Optional[str] = None
+        if visible_only:
+            self._filters.extend([
+                Product.status == ProductStatusEnum.ACTIVE,
+                Product.approval_status == "approved",
+                Product.visibility == "visible"
+            ])
+
+    def where(self, *clauses: ColumnElement) -> "ProductQueryBuilder":
+        self._filters.extend(clauses)
+        return self
+
+    def join(self, target: Any) -> "ProductQueryBuilder":
+        if target not in self._joins:
+            self._joins.append(target)
+        return self
+
+    def search(self, term: str, engine: Optional[str] = None) -> "ProductQueryBuilder":
+        backend = get_search_backend(engine)
+        search_filter, self.search_rank = backend.build_filter(term)
+        self.search_engine = backend.name
+        return self.where(search_filter)
+
+    def build(self, *entities: Any) -> Select:
+        query = select(*(entities or (Product,))).select_from(Product)
+        for target in self._joins:
+            query = query.join(target)
+        if self._filters:
+            query = query.where(and_(*self._filters))
+        return query
+
+    def supports_keyset(self, sort_by: SortByEnum) -> bool:
+        if sort_by == SortByEnum.RELEVANCE and self.search_rank is not None:
+            return False
+        return sort_by in _KEYSET_SORTS
+
+    async def count(self, db: AsyncSession) -> int:
+        result = await db.execute(select(func.count()).select_from(self.build(Product.id).subquery()))
+        return result.scalar() or 0
+
+    async def estimate_count(self, db: AsyncSession) -> int:
+        """Planner row estimate; avoids scanning the full predicate on huge result sets"""
+        try:
+            query = self.build(Product.id)
+            compiled = query.compile(dialect=db.bind.dialect, compile_kwargs={"literal_binds": True})
+            async with db.begin_nested():
+                result = await db.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}"))
+                plan = result.scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]["Plan"]["Plan Rows"])
+        except Exception as e:
+            logger.warning(f"Count estimate failed, using exact count: {e}")
+            return await self.count(db)
+
+    async def fetch_page(
+        self,
+        db: AsyncSession,
+        sort_by: SortByEnum,
+        page: int,
+        per_page: int,
+        sorter: Callable[[Select, SortByEnum, Optional[ColumnElement]], Select],
+        options: Sequence[Any] = (),
+        cursor: Optional[str] = None,
+        estimate_total: bool = False,
+    ) -> Tuple[List[Product], int, Optional[str]]:
+        """
+        Return one page of products, the total match count and a cursor for the next page.
+
+        The total comes from ``count(*) OVER()`` on the page query itself, so a page costs
+        a single round trip. With ``cursor`` the page is fetched by keyset instead of OFFSET
+        and the total is carried forward inside the cursor.
+        """
+        keyset = _KEYSET_SORTS.get(sort_by) if self.supports_keyset(sort_by) else None
+        if cursor and keyset is None:
+            raise BadRequestException(f"Cursor pagination is not available for sort '{sort_by.value}'")
+
+        total: Optional[int] = None
+        if cursor:
+            column, direction, parse = keyset
+            value, product_id, total = decode_cursor(cursor, parse)
+            boundary = tuple_(column, Product.id)
+            after = tuple_(value, product_id)
+            self.where(boundary < after if direction is desc else boundary > after)
+        elif estimate_total:
+            total = await self.estimate_count(db)
+
+        if total is None:
+            query = self.build(Product, func.count().over().label("total_count"))
+        else:
+            query = self.build(Product)
+
+        if keyset is not None:
+            column, direction, _ = keyset
+            query = query.order_by(direction(column), direction(Product.id))
+        else:
+            query = sorter(query, sort_by, self.search_rank).order_by(desc(Product.id))
+
+        if options:
+            query = query.options(*options)
+        if not cursor:
+            query = query.offset((page - 1) * per_page)
+        result = await db.execute(query.limit(per_page))
+
+        if total is None:
+            rows = result.all()
+            products = [row[0] for row in rows]
+            if rows:
+                total = rows[0].total_count
+            else:
+                # Past the last page the window has no rows to report the total on
+                total = await self.count(db) if page > 1 else 0
+        else:
+            products = list(result.scalars().all())
+
+        next_cursor = None
+        if keyset is not None and len(products) == per_page:
+            column, _, _ = keyset
+            last = products[-1]
+            next_cursor = encode_cursor(getattr(last, column.key), last.id, total)
+
+        return products, total, next_cursor
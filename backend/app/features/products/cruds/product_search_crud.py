@@ -6,7 +6,7 @@ from uuid import UUID
 from decimal import Decimal
 
 from app.database.base import get_supabase_client
-from app.features.products.models.product import Product
+from app.features.products.models.product import Product, ProductStatusEnum
 from app.features.products.models.category import Category
 from app.features.products.models.brand import Brand
 from app.features.products.models.product_inventory import ProductInventory
@@ -14,6 +14,7 @@ from app.features.products.models.product_review import ProductReview
 from app.features.products.models.product_sustainability_score import ProductSustainabilityScore
 from app.features.products.models.product_image import ProductImage
 from app.features.products.models.product_view import ProductView
+from app.features.products.models.product_view_count import ProductViewCount
 from app.features.products.requests.product_search_request import (
     ProductSearchRequest, SortByEnum, ProductFilterRequest, ProductComparisonRequest,
     ProductAutoCompleteRequest, ProductSearchSuggestionsRequest, ProductTrendingRequest,
@@ -23,8 +24,13 @@ from app.features.products.requests.product_search_request import (
     ProductLocationBasedRequest, ProductPriceHistoryRequest, ProductStockAlertRequest,
     ProductBulkSearchRequest, ProductSearchAnalyticsRequest, AdvancedFilterRequest
 )
+from app.features.products.cruds.product_query_builder import ProductQueryBuilder
+from app.features.products.services.product_facet_store import facet_store
+from app.features.products.services.autocomplete_index import autocomplete_index
 from app.core.base import BaseCrud
 from app.core.logging import get_logger
+from app.features.analytics.services.cooccurrence_index import cooccurrence_index
+from app.features.products.services.trending_engine import trending_engine, window_for_days
         
 logger = get_logger("products.search_crud")
 
@@ -32,92 +38,55 @@ class ProductSearchCRUD(BaseCrud[Product]):
     def __init__(self):
         super().__init__(get_supabase_client(), Product)
 
-    async def search_products(self, db: AsyncSession, request: ProductSearchRequest) -> Tuple[List[Product], int]:
-        base_query = select(Product).where(
-            and_(
-                Product.status == ProductStatusEnum.ACTIVE,
-                Product.approval_status == "approved",
-                Product.visibility == "visible"
-            )
-        )
-        
-        count_query = select(func.count(Product.id)).where(
-            and_(
-                Product.status == ProductStatusEnum.ACTIVE,
-                Product.approval_status == "approved",
-                Product.visibility == "visible"
-            )
-        )
+    async def search_products(self, db: AsyncSession, request: ProductSearchRequest) -> Tuple[List[Product], int, Optional[str]]:
+        builder = ProductQueryBuilder()
         
         if request.query:
-            search_filter = or_(
-                Product.name.ilike(f"%{request.query}%"),
-                Product.description.ilike(f"%{request.query}%"),
-                Product.short_description.ilike(f"%{request.query}%"),
-                cast(Product.tags, String).ilike(f"%{request.query}%")
-            )
-            base_query = base_query.where(search_filter)
-            count_query = count_query.where(search_filter)
+            builder.search(request.query, request.search_engine)
         
         if request.category_ids:
-            base_query = base_query.where(Product.category_id.in_(request.category_ids))
-            count_query = count_query.where(Product.category_id.in_(request.category_ids))
+            builder.where(Product.category_id.in_(request.category_ids))
         
         if request.brand_ids:
-            base_query = base_query.where(Product.brand_id.in_(request.brand_ids))
-            count_query = count_query.where(Product.brand_id.in_(request.brand_ids))
+            builder.where(Product.brand_id.in_(request.brand_ids))
         
         if request.supplier_ids:
-            base_query = base_query.where(Product.supplier_id.in_(request.supplier_ids))
-            count_query = count_query.where(Product.supplier_id.in_(request.supplier_ids))
+            builder.where(Product.supplier_id.in_(request.supplier_ids))
         
         if request.min_price is not None:
-            base_query = base_query.where(Product.price >= request.min_price)
-            count_query = count_query.where(Product.price >= request.min_price)
+            builder.where(Product.price >= request.min_price)
         
         if request.max_price is not None:
-            base_query = base_query.where(Product.price <= request.max_price)
-            count_query = count_query.where(Product.price <= request.max_price)
+            builder.where(Product.price <= request.max_price)
         
         if request.on_sale_only:
-            base_query = base_query.where(Product.compare_at_price.isnot(None))
-            count_query = count_query.where(Product.compare_at_price.isnot(None))
+            builder.where(Product.compare_at_price.isnot(None))
         
         if request.tags:
             for tag in request.tags:
-                tag_filter = cast(Product.tags, String).ilike(f"%{tag}%")
-                base_query = base_query.where(tag_filter)
-                count_query = count_query.where(tag_filter)
+                builder.where(cast(Product.tags, String).ilike(f"%{tag}%"))
         
         if request.materials:
             for material in request.materials:
-                material_filter = cast(Product.materials, String).ilike(f"%{material}%")
-                base_query = base_query.where(material_filter)
-                count_query = count_query.where(material_filter)
+                builder.where(cast(Product.materials, String).ilike(f"%{material}%"))
         
         if request.origin_countries:
-            base_query = base_query.where(Product.origin_country.in_(request.origin_countries))
-            count_query = count_query.where(Product.origin_country.in_(request.origin_countries))
+            builder.where(Product.origin_country.in_(request.origin_countries))
         
         if request.in_stock_only:
-            base_query = base_query.join(ProductInventory).where(
-                ProductInventory.available_quantity > 0
-            )
-            count_query = count_query.join(ProductInventory).where(
-                ProductInventory.available_quantity > 0
+            # available_quantity is a Python property; compare the underlying columns
+            builder.join(ProductInventory).where(
+                ProductInventory.quantity - ProductInventory.reserved_quantity > 0
             )
         
         if request.min_sustainability_score is not None or request.max_sustainability_score is not None:
-            base_query = base_query.join(ProductSustainabilityScore)
-            count_query = count_query.join(ProductSustainabilityScore)
+            builder.join(ProductSustainabilityScore)
             
             if request.min_sustainability_score is not None:
-                base_query = base_query.where(ProductSustainabilityScore.overall_score >= request.min_sustainability_score)
-                count_query = count_query.where(ProductSustainabilityScore.overall_score >= request.min_sustainability_score)
+                builder.where(ProductSustainabilityScore.overall_score >= request.min_sustainability_score)
             
             if request.max_sustainability_score is not None:
-                base_query = base_query.where(ProductSustainabilityScore.overall_score <= request.max_sustainability_score)
-                count_query = count_query.where(ProductSustainabilityScore.overall_score <= request.max_sustainability_score)
+                builder.where(ProductSustainabilityScore.overall_score <= request.max_sustainability_score)
         
         if request.min_rating is not None or request.max_rating is not None:
             avg_rating = (
@@ -127,37 +96,33 @@ class ProductSearchCRUD(BaseCrud[Product]):
             )
             
             if request.min_rating is not None:
-                base_query = base_query.where(avg_rating >= request.min_rating)
-                count_query = count_query.where(avg_rating >= request.min_rating)
+                builder.where(avg_rating >= request.min_rating)
             
             if request.max_rating is not None:
-                base_query = base_query.where(avg_rating <= request.max_rating)
-                count_query = count_query.where(avg_rating <= request.max_rating)
-        
-        total_result = await db.execute(count_query)
-        total = total_result.scalar() or 0
-        
-        base_query = self._apply_sorting(base_query, request.sort_by)
-        
-        base_query = base_query.options(
-            selectinload(Product.brand),
-            selectinload(Product.category),
-            selectinload(Product.images),
-            selectinload(Product.inventory),
-            selectinload(Product.sustainability_scores),
-            selectinload(Product.supplier)
+                builder.where(avg_rating <= request.max_rating)
+        
+        return await builder.fetch_page(
+            db,
+            sort_by=request.sort_by,
+            page=request.page,
+            per_page=request.per_page,
+            sorter=self._apply_sorting,
+            options=(
+                selectinload(Product.brand),
+                selectinload(Product.category),
+                selectinload(Product.images),
+                selectinload(Product.inventory),
+                selectinload(Product.sustainability_scores),
+                selectinload(Product.supplier)
+            ),
+            cursor=request.cursor,
+            estimate_total=request.estimate_total
         )
-        
-        offset = (request.page - 1) * request.per_page
-        base_query = base_query.offset(offset).limit(request.per_page)
-        
-        result = await db.execute(base_query)
-        products = result.scalars().all()
-        
-        return products, total
     
-    def _apply_sorting(self, query, sort_by: SortByEnum):
-        if sort_by == SortByEnum.PRICE_LOW_TO_HIGH:
+    def _apply_sorting(self, query, sort_by: SortByEnum, search_rank=None):
+        if sort_by == SortByEnum.RELEVANCE and search_rank is not None:
+            return query.order_by(desc(search_rank), desc(Product.created_at))
+        elif sort_by == SortByEnum.PRICE_LOW_TO_HIGH:
             return query.order_by(asc(Product.price))
         elif sort_by == SortByEnum.PRICE_HIGH_TO_LOW:
             return query.order_by(desc(Product.price))
@@ -185,8 +150,8 @@ class ProductSearchCRUD(BaseCrud[Product]):
             return query.order_by(asc(avg_rating))
         elif sort_by == SortByEnum.POPULARITY:
             view_count = (
-                select(func.count(ProductView.id))
-                .where(ProductView.product_id == Product.id)
+                select(func.coalesce(func.sum(ProductViewCount.views), 0))
+                .where(ProductViewCount.product_id == Product.id)
                 .scalar_subquery()
             )
             return query.order_by(desc(view_count))
@@ -201,6 +166,12 @@ class ProductSearchCRUD(BaseCrud[Product]):
             return query.order_by(desc(Product.created_at))
     
     async def get_filter_options(self, db: AsyncSession) -> Dict[str, Any]:
+        options = await facet_store.get_filter_options(db)
+        if options is not None:
+            return options
+        return await self._scan_filter_options(db)
+    
+    async def _scan_filter_options(self, db: AsyncSession) -> Dict[str, Any]:
         categories_query = select(Category).where(Category.is_active == True)
         brands_query = select(Brand).where(Brand.is_active == True)
         
@@ -352,6 +323,11 @@ class ProductSearchCRUD(BaseCrud[Product]):
         return result.scalars().all()
     
     async def _get_frequently_viewed_together(self, db: AsyncSession, product_id: UUID, limit: int) -> List[Product]:
+        neighbors = cooccurrence_index.neighbors('viewed', str(product_id), limit)
+        if neighbors is not None:
+            products = await self._get_ranked_products(db, [neighbor_id for neighbor_id, _ in neighbors])
+            return products or await self._get_related_fallback(db, product_id, limit)
+        
         product_sessions_subquery = select(
             ProductView.session_id
         ).where(
@@ -389,62 +365,66 @@ class ProductSearchCRUD(BaseCrud[Product]):
         products = result.scalars().all()
         
         if not products:
-            product_query = select(Product).where(Product.id == product_id)
-            product_result = await db.execute(product_query)
-            product = product_result.scalar_one_or_none()
-            
-            if product:
-                fallback_query = select(Product).where(
-                    and_(
-                        Product.id != product_id,
-                        or_(
-                            Product.category_id == product.category_id,
-                            Product.brand_id == product.brand_id
-                        ),
-                        Product.status == ProductStatusEnum.ACTIVE,
-                        Product.approval_status == "approved",
-                        Product.visibility == "visible"
-                    )
-                ).options(
-                    selectinload(Product.brand),
-                    selectinload(Product.category),
-                    selectinload(Product.images)
-                ).limit(limit)
-                
-                fallback_result = await db.execute(fallback_query)
-                products = fallback_result.scalars().all()
+            products = await self._get_related_fallback(db, product_id, limit)
         
         return products
     
+    async def _get_ranked_products(self, db: AsyncSession, product_ids: List[str]) -> List[Product]:
+        """Listable products for ``product_ids``, in the given order"""
+        if not product_ids:
+            return []
+        products_query = select(Product).where(
+            and_(
+                Product.id.in_(product_ids),
+                Product.status == ProductStatusEnum.ACTIVE,
+                Product.approval_status == "approved"
+            )
+        ).options(
+            selectinload(Product.brand),
+            selectinload(Product.category),
+            selectinload(Product.images)
+        )
+        result = await db.execute(products_query)
+        rank = {product_id: position for position, product_id in enumerate(product_ids)}
+        return sorted(result.scalars().all(), key=lambda product: rank[str(product.id)])
+    
+    async def _get_related_fallback(self, db: AsyncSession, product_id: UUID, limit: int) -> List[Product]:
+        """Same category or brand, for products nobody has co-viewed yet"""
+        product_query = select(Product).where(Product.id == product_id)
+        product_result = await db.execute(product_query)
+        product = product_result.scalar_one_or_none()
+        
+        if not product:
+            return []
+        
+        fallback_query = select(Product).where(
+            and_(
+                Product.id != product_id,
+                or_(
+                    Product.category_id == product.category_id,
+                    Product.brand_id == product.brand_id
+                ),
+                Product.status == ProductStatusEnum.ACTIVE,
+                Product.approval_status == "approved",
+                Product.visibility == "visible"
+            )
+        ).options(
+            selectinload(Product.brand),
+            selectinload(Product.category),
+            selectinload(Product.images)
+        ).limit(limit)
+        
+        fallback_result = await db.execute(fallback_query)
+        return fallback_result.scalars().all()
+    
     async def _get_trending_products(self, db: AsyncSession, limit: int) -> List[Product]:
         try:
-            # Try with ProductView join first
-            try:
-                trending_query = select(Product).outerjoin(ProductView).where(
-                    and_(
-                        Product.status == ProductStatusEnum.ACTIVE,
-                        Product.approval_status == "approved",
-                        Product.visibility == "visible"
-                    )
-                ).group_by(Product.id).order_by(
-                    desc(func.coalesce(func.count(ProductView.id), 0)),
-                    desc(Product.created_at)
-                ).options(
-                    selectinload(Product.brand),
-                    selectinload(Product.category),
-                    selectinload(Product.images)
-                ).limit(limit)
-                
-                result = await db.execute(trending_query)
-                products = result.scalars().all()
-                
-                if products:
-                    return products
-            except Exception:
-                # If ProductView join fails, use simple query
-                pass
+            ranked = trending_engine.top('week', limit) or []
+            products = await self._get_ranked_products(db, [product_id for product_id, _ in ranked])
+            if products:
+                return products
             
-            # Fallback: simple query without ProductView join
+            # Fallback: newest products, before anything has trended
             fallback_query = select(Product).where(
                 and_(
                     Product.status == ProductStatusEnum.ACTIVE,
@@ -540,69 +520,41 @@ class ProductSearchCRUD(BaseCrud[Product]):
         
         return products
 
-    async def filter_products(self, db: AsyncSession, request: ProductFilterRequest) -> Tuple[List[Product], int]:
-        base_query = select(Product).where(
-            and_(
-                Product.status == ProductStatusEnum.ACTIVE,
-                Product.approval_status == "approved",
-                Product.visibility == "visible"
-            )
-        )
-        
-        count_query = select(func.count(Product.id)).where(
-            and_(
-                Product.status == ProductStatusEnum.ACTIVE,
-                Product.approval_status == "approved",
-                Product.visibility == "visible"
-            )
-        )
+    async def filter_products(self, db: AsyncSession, request: ProductFilterRequest) -> Tuple[List[Product], int, Optional[str]]:
+        builder = ProductQueryBuilder()
         
         if request.category_id:
-            category_filter = Product.category_id == request.category_id
-            base_query = base_query.where(category_filter)
-            count_query = count_query.where(category_filter)
+            builder.where(Product.category_id == request.category_id)
         
         if request.brand_id:
-            brand_filter = Product.brand_id == request.brand_id
-            base_query = base_query.where(brand_filter)
-            count_query = count_query.where(brand_filter)
+            builder.where(Product.brand_id == request.brand_id)
         
         if request.supplier_id:
-            supplier_filter = Product.supplier_id == request.supplier_id
-            base_query = base_query.where(supplier_filter)
-            count_query = count_query.where(supplier_filter)
+            builder.where(Product.supplier_id == request.supplier_id)
         
         if request.min_price is not None:
-            price_filter = Product.price >= request.min_price
-            base_query = base_query.where(price_filter)
-            count_query = count_query.where(price_filter)
+            builder.where(Product.price >= request.min_price)
         
         if request.max_price is not None:
-            price_filter = Product.price <= request.max_price
-            base_query = base_query.where(price_filter)
-            count_query = count_query.where(price_filter)
-        
-        base_query = self._apply_sorting(base_query, request.sort_by)
-        
-        base_query = base_query.options(
-            selectinload(Product.brand),
-            selectinload(Product.category),
-            selectinload(Product.supplier),
-            selectinload(Product.images),
-            selectinload(Product.inventory),
-            selectinload(Product.sustainability_scores)
+            builder.where(Product.price <= request.max_price)
+        
+        return await builder.fetch_page(
+            db,
+            sort_by=request.sort_by,
+            page=request.page,
+            per_page=request.per_page,
+            sorter=self._apply_sorting,
+            options=(
+                selectinload(Product.brand),
+                selectinload(Product.category),
+                selectinload(Product.supplier),
+                selectinload(Product.images),
+                selectinload(Product.inventory),
+                selectinload(Product.sustainability_scores)
+            ),
+            cursor=request.cursor,
+            estimate_total=request.estimate_total
         )
-        
-        offset = (request.page - 1) * request.per_page
-        base_query = base_query.offset(offset).limit(request.per_page)
-        
-        products_result = await db.execute(base_query)
-        products = products_result.scalars().all()
-        
-        count_result = await db.execute(count_query)
-        total = count_result.scalar()
-        
-        return products, total
 
     async def compare_products(self, db: AsyncSession, request: ProductComparisonRequest) -> List[Product]:
         comparison_query = select(Product).where(
@@ -626,6 +578,17 @@ class ProductSearchCRUD(BaseCrud[Product]):
         return result.scalars().all()
 
     async def autocomplete_search(self, db: AsyncSession, request: ProductAutoCompleteRequest) -> Dict[str, Any]:
+        if autocomplete_index.ready:
+            return autocomplete_index.search(
+                request.query,
+                limit=request.limit,
+                include_products=request.include_products,
+                include_categories=request.include_categories,
+                include_brands=request.include_brands
+            )
+        return await self._autocomplete_from_db(db, request)
+    
+    async def _autocomplete_from_db(self, db: AsyncSession, request: ProductAutoCompleteRequest) -> Dict[str, Any]:
         query = request.query.lower()
         results = {"suggestions": [], "categories": [], "brands": [], "products": []}
         
@@ -736,38 +699,15 @@ class ProductSearchCRUD(BaseCrud[Product]):
 
     async def get_trending_products_advanced(self, db: AsyncSession, request: ProductTrendingRequest) -> Tuple[List[Product], int]:
         time_mapping = {
-            "day": "1 day",
-            "week": "7 days",
-            "month": "30 days",
-            "year": "365 days"
+            "day": 1,
+            "week": 7,
+            "month": 30,
+            "year": 365
         }
-        interval = time_mapping.get(request.time_period, "7 days")
+        window = window_for_days(time_mapping.get(request.time_period, 7))
         
-        trending_query = select(Product).join(ProductView).where(
-            and_(
-                Product.status == ProductStatusEnum.ACTIVE,
-                Product.approval_status == "approved",
-                Product.visibility == "visible",
-                ProductView.viewed_at >= func.current_date() - text(f"INTERVAL '{interval}'")
-            )
-        )
-        
-        if request.category_id:
-            trending_query = trending_query.where(Product.category_id == request.category_id)
-        
-        if request.brand_id:
-            trending_query = trending_query.where(Product.brand_id == request.brand_id)
-        
-        trending_query = trending_query.group_by(Product.id).order_by(
-            desc(func.count(ProductView.id))
-        ).options(
-            selectinload(Product.brand),
-            selectinload(Product.category),
-            selectinload(Product.images)
-        ).limit(request.limit)
-        
-        result = await db.execute(trending_query)
-        products = result.scalars().all()
+        ranked = trending_engine.top(window, request.limit, request.category_id, request.brand_id) or []
+        products = await self._get_ranked_products(db, [product_id for product_id, _ in ranked])
         
         return products, len(products)
 
@@ -834,63 +774,81 @@ class ProductSearchCRUD(BaseCrud[Product]):
         return products, len(products)
 
     async def get_best_sellers(self, db: AsyncSession, request: ProductBestSellersRequest) -> Tuple[List[Product], Dict[str, Any]]:
-        trending_query = select(Product).join(ProductView).where(
+        time_mapping = {
+            "week": 7,
+            "month": 30,
+            "quarter": 90,
+            "year": 365
+        }
+        days = time_mapping.get(request.time_period, 30)
+        # Only periods the trending engine has a decay window for; longer ones are counted from the view rollup
+        window = request.time_period if request.time_period in ("week", "month") else None
+
+        ranked = trending_engine.top(window, request.limit, request.category_id, request.brand_id) if window else None
+        if ranked is not None and request.category_id and request.brand_id and len(ranked) < request.limit:
+            # The engine intersects the category and brand top-k lists, which can come back short
+            ranked = None
+
+        if ranked is not None:
+            products = await self._get_ranked_products(db, [product_id for product_id, _ in ranked])
+            scores = dict(ranked)
+            counts = await self._get_view_counts_since(db, request, days, [str(product.id) for product in products])
+            # Ranked by a decayed engagement score (views, add-to-carts, purchases), which is
+            # reported next to the same period count the other periods return
+            sales_data = [
+                {
+                    "product_id": str(product.id),
+                    "sales_count": counts.get(str(product.id), 0),
+                    "trending_score": scores[str(product.id)],
+                    "revenue": 0
+                }
+                for product in products
+            ]
+        else:
+            counts = await self._get_view_counts_since(db, request, days)
+            products = await self._get_ranked_products(db, list(counts))
+            sales_data = [
+                {"product_id": str(product.id), "sales_count": counts[str(product.id)], "revenue": 0}
+                for product in products
+            ]
+        
+        return products, {"sales_data": sales_data, "time_period": request.time_period}
+
+    async def _get_view_counts_since(
+        self, db: AsyncSession, request: ProductBestSellersRequest, days: int,
+        product_ids: Optional[List[str]] = None
+    ) -> Dict[str, int]:
+        """
+        Most viewed listed products over the last ``days`` from the daily rollup, best first.
+        With ``product_ids``, only those products are counted; ones without views are left out.
+        """
+        views = func.sum(ProductViewCount.views).label('views')
+        counts_query = select(ProductViewCount.product_id, views).join(
+            Product, Product.id == ProductViewCount.product_id
+        ).where(
             and_(
                 Product.status == ProductStatusEnum.ACTIVE,
                 Product.approval_status == "approved",
-                Product.visibility == "visible"
+                Product.visibility == "visible",
+                ProductViewCount.day >= func.current_date() - text(f"INTERVAL '{days} days'")
             )
         )
         
         if request.category_id:
-            trending_query = trending_query.where(Product.category_id == request.category_id)
+            counts_query = counts_query.where(Product.category_id == request.category_id)
         
         if request.brand_id:
-            trending_query = trending_query.where(Product.brand_id == request.brand_id)
+            counts_query = counts_query.where(Product.brand_id == request.brand_id)
         
-        time_mapping = {
-            "week": 7,
-            "month": 30,
-            "quarter": 90,
-            "year": 365
-        }
-        days = time_mapping.get(request.time_period, 30)
-        cutoff_date = func.current_date() - text(f"INTERVAL '{days} days'")
+        if product_ids is not None:
+            counts_query = counts_query.where(ProductViewCount.product_id.in_(product_ids))
         
-        trending_query = trending_query.where(
-            ProductView.viewed_at >= cutoff_date
-        ).group_by(Product.id).order_by(
-            desc(func.count(ProductView.id))
-        ).options(
-            selectinload(Product.brand),
-            selectinload(Product.category),
-            selectinload(Product.images)
+        counts_query = counts_query.group_by(ProductViewCount.product_id).order_by(
+            desc(views), ProductViewCount.product_id
         ).limit(request.limit)
         
-        result = await db.execute(trending_query)
-        products = result.scalars().all()
-        
-        sales_data = []
-        for product in products:
-            view_count_query = select(
-                func.count(ProductView.id)
-            ).where(
-                and_(
-                    ProductView.product_id == product.id,
-                    ProductView.viewed_at >= cutoff_date
-                )
-            )
-            
-            view_result = await db.execute(view_count_query)
-            view_count = view_result.scalar()
-            
-            sales_data.append({
-                "product_id": str(product.id),
-                "sales_count": view_count or 0,
-                "revenue": 0
-            })
-        
-        return products, {"sales_data": sales_data, "time_period": request.time_period}
+        result = await db.execute(counts_query)
+        return {str(row.product_id): int(row.views) for row in result.all()}
 
     async def get_cross_selling_products(self, db: AsyncSession, request: ProductCrossSellingRequest) -> Tuple[List[Product], List[float]]:
         base_product_query = select(Product).where(Product.id == request.product_id)
@@ -1346,85 +1304,69 @@ class ProductSearchCRUD(BaseCrud[Product]):
         }
 
     async def advanced_filter_products(self, db: AsyncSession, request: AdvancedFilterRequest) -> Tuple[List[Product], Dict[str, Any]]:
-        base_query = select(Product).where(
-            and_(
-                Product.status == ProductStatusEnum.ACTIVE,
-                Product.approval_status == "approved",
-                Product.visibility == "visible"
-            )
-        )
-        
+        builder = ProductQueryBuilder()
         applied_filters = {}
         
         if request.search_term:
-            search_filter = or_(
-                Product.name.ilike(f"%{request.search_term}%"),
-                Product.description.ilike(f"%{request.search_term}%"),
-                cast(Product.tags, String).ilike(f"%{request.search_term}%")
-            )
-            base_query = base_query.where(search_filter)
+            builder.search(request.search_term, request.search_engine)
             applied_filters["search_term"] = request.search_term
+            applied_filters["search_engine"] = builder.search_engine
         
         if request.category_ids:
-            base_query = base_query.where(Product.category_id.in_(request.category_ids))
+            builder.where(Product.category_id.in_(request.category_ids))
             applied_filters["category_ids"] = request.category_ids
         
         if request.brand_ids:
-            base_query = base_query.where(Product.brand_id.in_(request.brand_ids))
+            builder.where(Product.brand_id.in_(request.brand_ids))
             applied_filters["brand_ids"] = request.brand_ids
         
         if request.supplier_ids:
-            base_query = base_query.where(Product.supplier_id.in_(request.supplier_ids))
+            builder.where(Product.supplier_id.in_(request.supplier_ids))
             applied_filters["supplier_ids"] = request.supplier_ids
         
         if request.price_range:
             min_price, max_price = request.price_range
             if min_price is not None:
-                base_query = base_query.where(Product.price >= min_price)
+                builder.where(Product.price >= min_price)
                 applied_filters["min_price"] = min_price
             if max_price is not None:
-                base_query = base_query.where(Product.price <= max_price)
+                builder.where(Product.price <= max_price)
                 applied_filters["max_price"] = max_price
         
         if request.discount_only:
-            base_query = base_query.where(Product.compare_at_price.isnot(None))
+            builder.where(Product.compare_at_price.isnot(None))
             applied_filters["discount_only"] = True
         
         if request.materials:
             for material in request.materials:
-                material_filter = cast(Product.materials, String).ilike(f"%{material}%")
-                base_query = base_query.where(material_filter)
+                builder.where(cast(Product.materials, String).ilike(f"%{material}%"))
             applied_filters["materials"] = request.materials
         
         if request.origin_countries:
-            base_query = base_query.where(Product.origin_country.in_(request.origin_countries))
+            builder.where(Product.origin_country.in_(request.origin_countries))
             applied_filters["origin_countries"] = request.origin_countries
         
         if request.tags:
             for tag in request.tags:
-                tag_filter = cast(Product.tags, String).ilike(f"%{tag}%")
-                base_query = base_query.where(tag_filter)
+                builder.where(cast(Product.tags, String).ilike(f"%{tag}%"))
             applied_filters["tags"] = request.tags
         
-        base_query = self._apply_sorting(base_query, request.sort_by)
-        
-        count_query = select(func.count()).select_from(base_query.subquery())
-        total_result = await db.execute(count_query)
-        total = total_result.scalar() or 0
-        
-        base_query = base_query.options(
-            selectinload(Product.brand),
-            selectinload(Product.category),
-            selectinload(Product.images),
-            selectinload(Product.sustainability_scores)
+        products, total, next_cursor = await builder.fetch_page(
+            db,
+            sort_by=request.sort_by,
+            page=request.page,
+            per_page=request.per_page,
+            sorter=self._apply_sorting,
+            options=(
+                selectinload(Product.brand),
+                selectinload(Product.category),
+                selectinload(Product.images),
+                selectinload(Product.sustainability_scores)
+            ),
+            cursor=request.cursor,
+            estimate_total=request.estimate_total
         )
         
-        offset = (request.page - 1) * request.per_page
-        base_query = base_query.offset(offset).limit(request.per_page)
-        
-        result = await db.execute(base_query)
-        products = result.scalars().all()
-        
         total_pages = (total + request.per_page - 1) // request.per_page
         
         filter_results = {
@@ -1432,7 +1374,8 @@ class ProductSearchCRUD(BaseCrud[Product]):
             "applied_filters": applied_filters,
             "page": request.page,
             "per_page": request.per_page,
-            "total_pages": total_pages
+            "total_pages": total_pages,
+            "next_cursor": next_cursor
         }
         
-        return products, filter_results
\ No newline at end of file
+        return products, filter_results
@@ -11,6 +11,7 @@ from app.core.exceptions import NotFoundException, ConflictException
 from app.core.logging import get_logger
 from app.core.supabase_storage import SupabaseStorageClient, extract_blob_path_from_url, delete_file_from_url, upload_product_image
 import asyncio
+from app.core.image_store import image_store
 
 logger = get_logger("crud.product_variants")
 
@@ -264,7 +265,9 @@ class ProductVariantImageCrud(BaseCrud[ProductImage]):
                 raise NotFoundException("Image not found")
             
             try:
-                delete_file_from_url(image.url)
+                # Shared images only lose this product's link; the pruner removes the object
+                if not await image_store.release(image.url, image.product_id):
+                    delete_file_from_url(image.url)
             except Exception as e:
                 logger.warning(f"Failed to delete file from storage: {str(e)}")
             
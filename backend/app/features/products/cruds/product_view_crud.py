@@ -5,6 +5,8 @@ from app.database.base import get_supabase_client
 from app.core.base import BaseCrud
 from app.features.products.models.product_view import ProductView
 from app.core.logging import get_logger
+from app.core.exceptions import ValidationException
+from app.features.products.services.product_view_counter import product_view_counter
 
 logger = get_logger("crud.product_views")
 
@@ -23,30 +25,25 @@ class ProductViewCrud(BaseCrud[ProductView]):
         referrer: Optional[str] = None
     ) -> Dict[str, Any]:
         try:
-            view_data = {
-                "product_id": product_id,
-                "user_id": user_id,
-                "session_id": session_id,
-                "ip_address": ip_address,
-                "user_agent": user_agent,
-                "referrer": referrer
-            }
-            
-            created_view = await self.create(db, view_data)
+            view = await product_view_counter.record(
+                product_id=product_id,
+                user_id=user_id,
+                session_id=session_id,
+                ip_address=ip_address,
+                user_agent=user_agent,
+                referrer=referrer
+            )
             logger.debug(f"Product view recorded for product {product_id}")
-            return created_view.to_dict()
+            return {**view, "viewed_at": view["viewed_at"].isoformat()}
+        except ValueError:
+            raise ValidationException("Invalid product id")
         except Exception as e:
             logger.error(f"Error recording view for product {product_id}: {str(e)}")
             raise
 
     async def get_product_view_count(self, db: AsyncSession, product_id: str) -> int:
         try:
-            result = await db.execute(
-                select(func.count())
-                .select_from(ProductView)
-                .where(ProductView.product_id == product_id)
-            )
-            return result.scalar() or 0
+            return await product_view_counter.view_count(db, product_id)
         except Exception as e:
             logger.error(f"Error getting view count for product {product_id}: {str(e)}")
             return 0
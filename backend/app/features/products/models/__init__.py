@@ -10,6 +10,9 @@ from .product_view import ProductView
 from .wishlist import Wishlist
 from .product_price_history import ProductPriceHistory
 from .product_search_log import ProductSearchLog
+from .product_facet_count import ProductFacetCount
+from .inventory_reservation import InventoryReservation
+from .product_view_count import ProductViewCount
 
 __all__ = [
     "Brand",
@@ -23,5 +26,8 @@ __all__ = [
     "ProductView",
     "Wishlist",
     "ProductPriceHistory",
-    "ProductSearchLog"
+    "ProductSearchLog",
+    "ProductFacetCount",
+    "InventoryReservation",
+    "ProductViewCount"
 ]
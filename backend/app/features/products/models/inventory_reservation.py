@@ -0,0 +1,23 @@
+from datetime import datetime
+from sqlalchemy import Column, String, Integer, DateTime, UUID, ForeignKey
+from app.core.base import Base, BaseUUID
+
+class InventoryReservation(BaseUUID, Base):
+    """Units held against ``product_inventory.reserved_quantity`` until committed, released or expired"""
+    __tablename__ = "inventory_reservations"
+
+    inventory_id = Column(UUID(as_uuid=True), ForeignKey("product_inventory.id", ondelete="CASCADE"), nullable=False, index=True)
+    reference = Column(String(100), nullable=False, index=True)
+    quantity = Column(Integer, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def to_dict(self):
+        return {
+            "id": str(self.id),
+            "inventory_id": str(self.inventory_id),
+            "reference": self.reference,
+            "quantity": self.quantity,
+            "expires_at": self.expires_at.isoformat() if self.expires_at else None,
+            "created_at": self.created_at.isoformat() if self.created_at else None
+        }
@@ -0,0 +1,20 @@
+from datetime import datetime
+from sqlalchemy import Column, String, Integer, DateTime
+from app.core.base import Base
+
+class ProductFacetCount(Base):
+    """Listed-product count per facet value, maintained by the trg_products_facets trigger"""
+    __tablename__ = "product_facet_counts"
+
+    facet = Column(String(50), primary_key=True)
+    value = Column(String(500), primary_key=True)
+    product_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    def to_dict(self):
+        return {
+            "facet": self.facet,
+            "value": self.value,
+            "product_count": self.product_count,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
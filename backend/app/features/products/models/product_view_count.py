@@ -0,0 +1,20 @@
+from datetime import datetime
+from sqlalchemy import Column, Date, Integer, DateTime, UUID, ForeignKey
+from app.core.base import Base
+
+class ProductViewCount(Base):
+    """Views per product per day, maintained by the buffered view counter"""
+    __tablename__ = "product_view_counts"
+
+    product_id = Column(UUID(as_uuid=True), ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    views = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    def to_dict(self):
+        return {
+            "product_id": str(self.product_id),
+            "day": self.day.isoformat() if self.day else None,
+            "views": self.views,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
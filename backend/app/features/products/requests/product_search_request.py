@@ -20,6 +20,12 @@ class SortByEnum(str, Enum):
     DISCOUNT = "discount"
 
 
+class SearchEngineEnum(str, Enum):
+    ILIKE = "ilike"
+    FULLTEXT = "fulltext"
+    TRIGRAM = "trigram"
+
+
 class ProductSearchRequest(BaseModel):
     query: Optional[str] = None
     category_ids: Optional[List[UUID]] = Field(default_factory=list)
@@ -37,8 +43,11 @@ class ProductSearchRequest(BaseModel):
     min_sustainability_score: Optional[float] = Field(None, ge=0, le=10)
     max_sustainability_score: Optional[float] = Field(None, ge=0, le=10)
     sort_by: SortByEnum = Field(default=SortByEnum.RELEVANCE)
+    search_engine: Optional[SearchEngineEnum] = None
     page: int = Field(default=1, ge=1)
     per_page: int = Field(default=20, ge=1, le=100)
+    cursor: Optional[str] = None
+    estimate_total: bool = Field(default=False)
     
     @validator('max_price')
     def validate_max_price(cls, v, values):
@@ -68,6 +77,8 @@ class ProductFilterRequest(BaseModel):
     sort_by: SortByEnum = SortByEnum.RELEVANCE
     page: int = Field(default=1, ge=1)
     per_page: int = Field(default=20, ge=1, le=100)
+    cursor: Optional[str] = None
+    estimate_total: bool = Field(default=False)
 
 
 class ProductComparisonRequest(BaseModel):
@@ -96,8 +107,11 @@ class AdvancedFilterRequest(BaseModel):
     tags: Optional[List[str]] = Field(default_factory=list)
     date_range: Optional[Tuple[Optional[str], Optional[str]]] = None
     sort_by: SortByEnum = Field(default=SortByEnum.RELEVANCE)
+    search_engine: Optional[SearchEngineEnum] = None
     page: int = Field(default=1, ge=1)
     per_page: int = Field(default=20, ge=1, le=100)
+    cursor: Optional[str] = None
+    estimate_total: bool = Field(default=False)
 
 
 class ProductSearchAnalyticsRequest(BaseModel):
@@ -39,6 +39,7 @@ class ProductSearchResponse(BaseModel):
     total_pages: int
     filters_applied: Dict[str, Any]
     available_filters: Dict[str, Any]
+    next_cursor: Optional[str] = None
 
 
 class ProductFilterOptionsResponse(BaseModel):
@@ -50,6 +51,7 @@ class ProductFilterOptionsResponse(BaseModel):
     materials: List[str]
     origin_countries: List[str]
     tags: List[str]
+    facet_counts: Dict[str, Dict[str, int]] = Field(default_factory=dict)
 
 
 class ProductComparisonResponse(BaseModel):
@@ -190,6 +192,7 @@ class ProductAdvancedFilterResponse(BaseModel):
     page: int
     per_page: int
     total_pages: int
+    next_cursor: Optional[str] = None
 
 class ProductFilterInsightsResponse(BaseModel):
     filter_performance: Dict[str, Any]
@@ -251,7 +251,7 @@ async def optimize_existing_vendor_images(
     user_token: str = Depends(get_user_from_token)
 ):
     """
-    Optimize existing vendor images for better compression
+    Report what deduplication saves the vendor (orphaned renditions are pruned in the background)
     
     Args:
         vendor_id: Vendor identifier
@@ -278,6 +278,21 @@ async def optimize_existing_vendor_images(
         logger.error(f"Optimization failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Optimization failed: {str(e)}")
 
+@router.get("/upload-metrics")
+async def get_upload_metrics(
+    user_token: Dict[str, Any] = Depends(require_roles([UserRole.ADMIN]))
+):
+    """
+    Get per-bucket upload latency histograms for this worker
+    
+    Returns:
+        Storage backend, concurrency cap and latency buckets per storage bucket
+    """
+    return {
+        "success": True,
+        "data": optimized_storage.get_upload_metrics()
+    }
+
 @router.get("/compression-levels")
 async def get_compression_levels():
     """
@@ -3,6 +3,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional, Dict, Any
 from uuid import UUID
 
+from app.core.exceptions import AveoException
 from app.database.session import get_async_session
 from app.core.role_auth import get_all_users, get_optional_user, require_buyer_or_supplier
 from app.features.products.cruds.product_search_crud import ProductSearchCRUD
@@ -49,7 +50,7 @@ async def search_products(
             )
         
         crud = ProductSearchCRUD()
-        products, total = await crud.search_products(db, request)
+        products, total, next_cursor = await crud.search_products(db, request)
         
         if current_user and request.query:
             try:
@@ -112,8 +113,12 @@ async def search_products(
             per_page=request.per_page,
             total_pages=total_pages,
             filters_applied=request.model_dump(exclude_none=True),
-            available_filters={}
+            available_filters={},
+            next_cursor=next_cursor
         )
+    except AveoException:
+        # Client errors such as a malformed cursor are reported, not hidden behind empty results
+        raise
     except Exception as e:
         from app.core.logging import get_logger
         logger = get_logger("search")
@@ -282,7 +287,7 @@ async def filter_products(
     db: AsyncSession = Depends(get_async_session)
 ):
     crud = ProductSearchCRUD()
-    products, total = await crud.filter_products(db, request)
+    products, total, next_cursor = await crud.filter_products(db, request)
     
     product_items = []
     for product in products:
@@ -313,7 +318,8 @@ async def filter_products(
         suggested_filters={},
         page=request.page,
         per_page=request.per_page,
-        total_pages=total_pages
+        total_pages=total_pages,
+        next_cursor=next_cursor
     )
 
 @product_search_router.post("/compare", response_model=ProductComparisonDetailResponse)
@@ -755,5 +761,6 @@ async def advanced_filter_products(
         suggested_filters={},
         page=filter_results["page"],
         per_page=filter_results["per_page"],
-        total_pages=filter_results["total_pages"]
+        total_pages=filter_results["total_pages"],
+        next_cursor=filter_results["next_cursor"]
     )
@@ -7,7 +7,8 @@ from app.core.pagination import PaginationParams
 from app.database.session import get_async_session
 from app.core.exceptions import ValidationException, NotFoundException, AuthorizationException, ConflictException, BadRequestException
 from app.core.logging import get_logger
-from app.core.supabase_storage import SupabaseStorageClient
+from app.core.supabase_storage import SupabaseStorageClient, extract_blob_path_from_url
+from app.core.image_store import image_store, is_shared
 from app.features.products.cruds.product_crud import ProductCrud, ProductImageCrud, ProductImageCrud
 from app.features.products.cruds.category_crud import CategoryCrud
 from app.features.products.cruds.brand_crud import BrandCrud
@@ -123,11 +124,13 @@ async def delete_product(
     product = await product_crud.get_by_id(db, product_id)
     
     if product:
-        storage_client = get_storage_client()
+        # Content-addressed images may back other products: drop this product's links
+        # and leave the objects to the orphan pruner
+        await image_store.unlink_product(product_id)
         
         if product.images:
             for img in product.images:
-                if img.url:
+                if img.url and not is_shared(img.url):
                     try:
                         blob_path = extract_blob_path_from_url(img.url)[1]
                         storage_client.delete_file("aveoearth-product-assets", blob_path)
@@ -138,7 +141,7 @@ async def delete_product(
             for variant in product.variants:
                 if hasattr(variant, 'images') and variant.images:
                     for variant_img in variant.images:
-                        if variant_img.url:
+                        if variant_img.url and not is_shared(variant_img.url):
                             try:
                                 blob_path = extract_blob_path_from_url(variant_img.url)[1]
                                 storage_client.delete_file("aveoearth-product-assets", blob_path)
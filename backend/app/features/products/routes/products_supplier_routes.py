@@ -40,6 +40,8 @@ from app.features.products.responses.analytics_response import SupplierAnalytics
 from app.core.pagination import PaginatedResponse
 from app.core.base import SuccessResponse
 from app.core.config import settings
+from app.database.base import get_supabase_client, get_supabase_rest_client, SupabaseRestError
+from app.core.image_store import image_store, is_shared
 import os
 import uuid
 from datetime import datetime
@@ -249,13 +251,12 @@ async def create_product(
         if supabase_url and service_role_key and not allow_fake:
             # Ensure supplier exists in Supabase Auth
             try:
-                from supabase import create_client
-                admin_client = create_client(supabase_url, service_role_key)
+                admin_client = get_supabase_client()
                 try:
-                    auth_user = admin_client.auth.admin.get_user_by_id(current_user["id"])
+                    auth_user = await asyncio.to_thread(admin_client.auth.admin.get_user_by_id, current_user["id"])
                     if not auth_user or not auth_user.user:
                         logger.info(f"Creating supplier in Supabase Auth: {current_user['id']}")
-                        admin_client.auth.admin.create_user({
+                        await asyncio.to_thread(admin_client.auth.admin.create_user, {
                             "id": current_user["id"],
                             "email": f"supplier-{current_user['id']}@example.com",
                             "password": "TempPassword123!",
@@ -291,64 +292,49 @@ async def create_product(
                     "p_updated_at": now.isoformat()
                 }
                 
-                rpc_url = f"{supabase_url}/rest/v1/rpc/insert_product_bulk"
-                import httpx
-                async with httpx.AsyncClient(timeout=30.0) as client:
-                    response = await client.post(
-                        rpc_url,
-                        json=rpc_payload,
-                        headers={
-                            "apikey": service_role_key,
-                            "Authorization": f"Bearer {service_role_key}",
-                            "Content-Type": "application/json",
-                            "Prefer": "return=representation"
-                        }
-                    )
-                    
-                    if response.status_code in [200, 201]:
-                        created_id = response.json()
-                        if isinstance(created_id, list) and len(created_id) > 0:
-                            created_id = created_id[0]
-                        if isinstance(created_id, dict):
-                            created_id = created_id.get("insert_product_bulk") or created_id.get("id")
-                        product_id = str(created_id) if created_id else product_uuid
-                        
-                        result = {
-                            "id": product_id,
-                            "supplier_id": current_user["id"],
-                            "category_id": product_data.get("category_id"),
-                            "brand_id": product_data.get("brand_id"),
-                            "sku": sku,
-                            "name": name,
-                            "slug": product_data["slug"],
-                            "short_description": short_description,
-                            "description": description,
-                            "price": float(price) if price else 0.0,
-                            "compare_at_price": compare_at_price,
-                            "cost_per_item": cost_per_item,
-                            "track_quantity": bool(track_quantity),
-                            "continue_selling": bool(continue_selling),
-                            "weight": weight,
-                            "dimensions": product_data.get("dimensions", {}),
-                            "materials": product_data.get("materials", []),
-                            "care_instructions": product_data.get("care_instructions"),
-                            "origin_country": product_data.get("origin_country"),
-                            "manufacturing_details": product_data.get("manufacturing_details", {}),
-                            "status": "ACTIVE",
-                            "approval_status": "approved",
-                            "visibility": visibility if visibility else "visible",
-                            "tags": tags if tags else [],
-                            "seo_meta": product_data.get("seo_meta", {}),
-                            "images": uploaded_images,
-                            "created_at": now,
-                            "updated_at": now
-                        }
-                        logger.info(f"✅ Product created via Supabase RPC: {product_id}")
-                        return result
-                    else:
-                        error_text = response.text[:500]
-                        logger.error(f"Supabase RPC failed: {response.status_code} - {error_text}")
-                        raise ValidationException(f"Failed to create product: {error_text}")
+                try:
+                    created_id = await get_supabase_rest_client().rpc("insert_product_bulk", rpc_payload)
+                except SupabaseRestError as rpc_error:
+                    logger.error(f"Supabase RPC failed: {rpc_error.status_code} - {rpc_error.body[:500]}")
+                    raise ValidationException(f"Failed to create product: {rpc_error.body[:500]}")
+                if isinstance(created_id, list) and len(created_id) > 0:
+                    created_id = created_id[0]
+                if isinstance(created_id, dict):
+                    created_id = created_id.get("insert_product_bulk") or created_id.get("id")
+                product_id = str(created_id) if created_id else product_uuid
+
+                result = {
+                    "id": product_id,
+                    "supplier_id": current_user["id"],
+                    "category_id": product_data.get("category_id"),
+                    "brand_id": product_data.get("brand_id"),
+                    "sku": sku,
+                    "name": name,
+                    "slug": product_data["slug"],
+                    "short_description": short_description,
+                    "description": description,
+                    "price": float(price) if price else 0.0,
+                    "compare_at_price": compare_at_price,
+                    "cost_per_item": cost_per_item,
+                    "track_quantity": bool(track_quantity),
+                    "continue_selling": bool(continue_selling),
+                    "weight": weight,
+                    "dimensions": product_data.get("dimensions", {}),
+                    "materials": product_data.get("materials", []),
+                    "care_instructions": product_data.get("care_instructions"),
+                    "origin_country": product_data.get("origin_country"),
+                    "manufacturing_details": product_data.get("manufacturing_details", {}),
+                    "status": "ACTIVE",
+                    "approval_status": "approved",
+                    "visibility": visibility if visibility else "visible",
+                    "tags": tags if tags else [],
+                    "seo_meta": product_data.get("seo_meta", {}),
+                    "images": uploaded_images,
+                    "created_at": now,
+                    "updated_at": now
+                }
+                logger.info(f"✅ Product created via Supabase RPC: {product_id}")
+                return result
             except Exception as supabase_error:
                 logger.error(f"Supabase product creation failed: {supabase_error}")
                 raise ValidationException(f"Failed to create product via Supabase: {str(supabase_error)}")
@@ -663,7 +649,7 @@ async def update_product(
         
         if product.images:
             for img in product.images:
-                if img.url:
+                if img.url and not await image_store.release(img.url, product_id):
                     try:
                         blob_path = extract_blob_path_from_url(img.url)[1]
                         storage_client.delete_file("product-assets", blob_path)
@@ -739,10 +725,13 @@ async def delete_product(
         raise AuthorizationException("You can only delete your own products")
     
     storage_client = SupabaseStorageClient()
+    # Content-addressed images may back other products: drop this product's links
+    # and leave the objects to the orphan pruner
+    await image_store.unlink_product(product_id)
     
     if product.images:
         for img in product.images:
-            if img.url:
+            if img.url and not is_shared(img.url):
                 try:
                     blob_path = extract_blob_path_from_url(img.url)[1]
                     storage_client.delete_file("product-assets", blob_path)
@@ -753,7 +742,7 @@ async def delete_product(
         for variant in product.variants:
             if hasattr(variant, 'images') and variant.images:
                 for variant_img in variant.images:
-                    if variant_img.url:
+                    if variant_img.url and not is_shared(variant_img.url):
                         try:
                             blob_path = extract_blob_path_from_url(variant_img.url)[1]
                             storage_client.delete_file("product-assets", blob_path)
@@ -992,7 +981,7 @@ async def delete_product_image_by_id(
         raise NotFoundException("Image not found")
     
     try:
-        if image_to_delete.url:
+        if image_to_delete.url and not await image_store.release(image_to_delete.url, product_id):
             storage_client = SupabaseStorageClient()
             blob_path = extract_blob_path_from_url(image_to_delete.url)[1]
             storage_client.delete_file("product-assets", blob_path)
@@ -1178,7 +1167,7 @@ async def delete_product_variant(
     if variant and hasattr(variant, 'images') and variant.images:
         storage_client = SupabaseStorageClient()
         for variant_img in variant.images:
-            if variant_img.url:
+            if variant_img.url and not await image_store.release(variant_img.url, product_id):
                 try:
                     blob_path = extract_blob_path_from_url(variant_img.url)[1]
                     storage_client.delete_file("product-assets", blob_path)
@@ -1267,7 +1256,7 @@ async def delete_variant_image(
     variant_image_crud = ProductVariantImageCrud()
     variant_image = await variant_image_crud.get_variant_image_by_id(db, image_id)
     
-    if variant_image and variant_image.url:
+    if variant_image and variant_image.url and not await image_store.release(variant_image.url, product_id):
         storage_client = SupabaseStorageClient()
         try:
             blob_path = extract_blob_path_from_url(variant_image.url)[1]
@@ -0,0 +1,331 @@
+"""
+In-memory prefix index for ``/search/autocomplete``.
+
+Product, category and brand names plus popular search terms are indexed by
+every word-boundary suffix ("organic cotton tee", "cotton tee", "tee") in one
+sorted array, so a prefix lookup is a bisect followed by a short scan and
+never touches the database. Short prefixes, whose match ranges are large,
+keep a ranked top-N cache. The index is rebuilt from the database in the
+background, patched from product change events in between, and snapshotted
+to disk so a new worker can serve suggestions before its first rebuild.
+"""
+
+import asyncio
+import bisect
+import gzip
+import heapq
+import json
+import os
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, func, and_, cast, String
+
+import app.database.session as db_session
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.features.products.models.brand import Brand
+from app.features.products.models.category import Category
+from app.features.products.models.product import Product
+from app.features.products.models.product_facet_count import ProductFacetCount
+from app.features.products.models.product_search_log import ProductSearchLog
+from app.features.products.models.product_view import ProductView
+from app.features.products.services.product_events import on_product_changed, PRODUCT_DELETED
+
+logger = get_logger("products.autocomplete_index")
+
+_TOKEN_RE = re.compile(r"[\w']+")
+
+KIND_PRODUCT = "product"
+KIND_CATEGORY = "category"
+KIND_BRAND = "brand"
+KIND_QUERY = "query"
+
+SNAPSHOT_VERSION = 1
+SHORT_PREFIX_LENGTH = 3
+SHORT_PREFIX_TOP_N = 200
+MAX_SUFFIXES_PER_NAME = 8
+POPULARITY_WINDOW_DAYS = 30
+MAX_QUERY_TERMS = 5000
+
+
+def normalize(text_value: str) -> str:
+    return " ".join(_TOKEN_RE.findall((text_value or "").lower()))
+
+
+def _is_listed(product: Dict[str, Any]) -> bool:
+    return (
+        str(product.get("status") or "").upper() == "ACTIVE"
+        and str(product.get("approval_status") or "").upper() == "APPROVED"
+        and str(product.get("visibility") or "").upper() == "VISIBLE"
+    )
+
+
+class AutocompleteIndex:
+    def __init__(self, snapshot_path: str, rebuild_interval: int):
+        self.snapshot_path = snapshot_path
+        self.rebuild_interval = rebuild_interval
+        self.ready = False
+        self.built_at: Optional[float] = None
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._keys: List[Tuple[str, str]] = []
+        self._kind_max: Dict[str, float] = {}
+        self._prefix_cache: Dict[str, List[str]] = {}
+        self._pending: Optional[List[Tuple[str, str, Optional[Dict[str, Any]]]]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # Index maintenance
+
+    @staticmethod
+    def _suffixes(name: str) -> List[str]:
+        tokens = normalize(name).split()
+        return [" ".join(tokens[i:]) for i in range(min(len(tokens), MAX_SUFFIXES_PER_NAME))]
+
+    def _add(self, entry: Dict[str, Any]) -> None:
+        entry_key = f"{entry['type']}:{entry['id']}"
+        self._entries[entry_key] = entry
+        for suffix in self._suffixes(entry["name"]):
+            bisect.insort(self._keys, (suffix, entry_key))
+        if entry["score"] > self._kind_max.get(entry["type"], 0):
+            self._kind_max[entry["type"]] = entry["score"]
+
+    def _remove(self, entry_key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.pop(entry_key, None)
+        if entry is None:
+            return None
+        for suffix in self._suffixes(entry["name"]):
+            position = bisect.bisect_left(self._keys, (suffix, entry_key))
+            if position < len(self._keys) and self._keys[position] == (suffix, entry_key):
+                del self._keys[position]
+        return entry
+
+    def _load_entries(self, entries: Iterable[Dict[str, Any]]) -> None:
+        """Swap in a fully built index, then replay changes that arrived during the build"""
+        entry_map: Dict[str, Dict[str, Any]] = {}
+        keys: List[Tuple[str, str]] = []
+        kind_max: Dict[str, float] = {}
+        for entry in entries:
+            entry_key = f"{entry['type']}:{entry['id']}"
+            entry_map[entry_key] = entry
+            keys.extend((suffix, entry_key) for suffix in self._suffixes(entry["name"]))
+            kind_max[entry["type"]] = max(kind_max.get(entry["type"], 0), entry["score"])
+        keys.sort()
+
+        self._entries, self._keys, self._kind_max = entry_map, keys, kind_max
+        self._prefix_cache.clear()
+        self.ready = True
+        self.built_at = time.time()
+
+        pending, self._pending = self._pending, None
+        for product_id, change, product in pending or []:
+            self.apply_product_change(product_id, change, product)
+
+    def upsert(self, kind: str, entry_id: str, name: str, slug: Optional[str] = None, score: Optional[float] = None) -> None:
+        if not name:
+            return
+        previous = self._remove(f"{kind}:{entry_id}")
+        if score is None:
+            score = previous["score"] if previous else 0.0
+        self._add({"type": kind, "id": entry_id, "name": name, "slug": slug, "score": float(score)})
+        self._prefix_cache.clear()
+
+    def remove(self, kind: str, entry_id: str) -> None:
+        if self._remove(f"{kind}:{entry_id}") is not None:
+            self._prefix_cache.clear()
+
+    def apply_product_change(self, product_id: str, change: str, product: Optional[Dict[str, Any]]) -> None:
+        if self._pending is not None:
+            self._pending.append((product_id, change, product))
+        if change == PRODUCT_DELETED or not product or not _is_listed(product):
+            self.remove(KIND_PRODUCT, product_id)
+        else:
+            self.upsert(KIND_PRODUCT, product_id, product.get("name"), product.get("slug"))
+
+    # Lookup
+
+    def _ranked_matches(self, prefix: str) -> List[str]:
+        cached = self._prefix_cache.get(prefix)
+        if cached is not None:
+            return cached
+
+        matches = set()
+        position = bisect.bisect_left(self._keys, (prefix,))
+        while position < len(self._keys) and self._keys[position][0].startswith(prefix):
+            matches.add(self._keys[position][1])
+            position += 1
+
+        def rank(entry_key: str) -> float:
+            entry = self._entries[entry_key]
+            return entry["score"] / (self._kind_max.get(entry["type"]) or 1.0)
+
+        if len(prefix) <= SHORT_PREFIX_LENGTH:
+            ranked = heapq.nlargest(SHORT_PREFIX_TOP_N, matches, key=rank)
+            self._prefix_cache[prefix] = ranked
+        else:
+            ranked = sorted(matches, key=rank, reverse=True)
+        return ranked
+
+    def search(
+        self,
+        query: str,
+        limit: int = 10,
+        include_products: bool = True,
+        include_categories: bool = True,
+        include_brands: bool = True
+    ) -> Dict[str, Any]:
+        results = {"suggestions": [], "categories": [], "brands": [], "products": []}
+        prefix = normalize(query)
+        if not prefix:
+            return results
+
+        buckets = {KIND_PRODUCT: "products", KIND_CATEGORY: "categories", KIND_BRAND: "brands"}
+        enabled = {KIND_PRODUCT: include_products, KIND_CATEGORY: include_categories, KIND_BRAND: include_brands, KIND_QUERY: True}
+
+        for entry_key in self._ranked_matches(prefix):
+            entry = self._entries[entry_key]
+            if not enabled[entry["type"]]:
+                continue
+            item = {"name": entry["name"], "type": entry["type"]}
+            if entry["type"] != KIND_QUERY:
+                item.update({"id": entry["id"], "slug": entry["slug"]})
+                bucket = results[buckets[entry["type"]]]
+                if len(bucket) < limit:
+                    bucket.append(item)
+            if len(results["suggestions"]) < limit:
+                results["suggestions"].append(item)
+        return results
+
+    # Building and persistence
+
+    async def rebuild_from_db(self) -> bool:
+        if db_session.AsyncSessionLocal is None:
+            return False
+        self._pending = []
+        try:
+            entries = []
+            since = datetime.utcnow() - timedelta(days=POPULARITY_WINDOW_DAYS)
+            async with db_session.AsyncSessionLocal() as db:
+                views = (
+                    select(ProductView.product_id, func.count().label("views"))
+                    .where(ProductView.viewed_at >= since)
+                    .group_by(ProductView.product_id)
+                    .subquery()
+                )
+                products = await db.execute(
+                    select(Product.id, Product.name, Product.slug, func.coalesce(views.c.views, 0))
+                    .outerjoin(views, views.c.product_id == Product.id)
+                    .where(and_(
+                        func.upper(Product.status) == "ACTIVE",
+                        func.upper(Product.approval_status) == "APPROVED",
+                        func.upper(Product.visibility) == "VISIBLE"
+                    ))
+                )
+                entries.extend(
+                    {"type": KIND_PRODUCT, "id": str(pid), "name": name, "slug": slug, "score": float(score)}
+                    for pid, name, slug, score in products.all()
+                )
+
+                for kind, model in ((KIND_CATEGORY, Category), (KIND_BRAND, Brand)):
+                    rows = await db.execute(
+                        select(model.id, model.name, model.slug, func.coalesce(ProductFacetCount.product_count, 0))
+                        .outerjoin(ProductFacetCount, and_(
+                            ProductFacetCount.facet == kind,
+                            ProductFacetCount.value == cast(model.id, String)
+                        ))
+                        .where(model.is_active == True)
+                    )
+                    entries.extend(
+                        {"type": kind, "id": str(eid), "name": name, "slug": slug, "score": float(score)}
+                        for eid, name, slug, score in rows.all()
+                    )
+
+                term = func.lower(ProductSearchLog.query_term)
+                queries = await db.execute(
+                    select(term, func.count().label("searches"))
+                    .where(ProductSearchLog.created_at >= since)
+                    .group_by(term)
+                    .having(func.count() > 1)
+                    .order_by(func.count().desc())
+                    .limit(MAX_QUERY_TERMS)
+                )
+                entries.extend(
+                    {"type": KIND_QUERY, "id": normalize(query_term), "name": query_term, "slug": None, "score": float(count)}
+                    for query_term, count in queries.all() if normalize(query_term)
+                )
+
+            self._load_entries(entries)
+            logger.info(f"Autocomplete index rebuilt with {len(self._entries)} entries")
+            await asyncio.to_thread(self.save_snapshot)
+            return True
+        except Exception as e:
+            self._pending = None
+            logger.error(f"Autocomplete index rebuild failed: {e}")
+            return False
+
+    def save_snapshot(self) -> None:
+        if not self.ready or not self.snapshot_path:
+            return
+        # Per-process temp name: every worker saves the same snapshot path
+        tmp_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.snapshot_path) or ".", exist_ok=True)
+            payload = {"version": SNAPSHOT_VERSION, "built_at": self.built_at, "entries": list(self._entries.values())}
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                json.dump(payload, f)
+            os.replace(tmp_path, self.snapshot_path)
+        except Exception as e:
+            logger.warning(f"Could not write autocomplete snapshot: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def load_snapshot(self) -> bool:
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return False
+        try:
+            with gzip.open(self.snapshot_path, "rt", encoding="utf-8") as f:
+                payload = json.load(f)
+            if payload.get("version") != SNAPSHOT_VERSION:
+                return False
+            self._load_entries(payload["entries"])
+            self.built_at = payload.get("built_at")
+            logger.info(f"Autocomplete index loaded {len(self._entries)} entries from snapshot")
+            return True
+        except Exception as e:
+            logger.warning(f"Could not load autocomplete snapshot: {e}")
+            return False
+
+    # Lifecycle
+
+    async def start(self) -> None:
+        await asyncio.to_thread(self.load_snapshot)
+        self._task = asyncio.create_task(self._rebuild_loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.save_snapshot()
+
+    async def _rebuild_loop(self) -> None:
+        while True:
+            await self.rebuild_from_db()
+            await asyncio.sleep(self.rebuild_interval)
+
+
+autocomplete_index = AutocompleteIndex(
+    snapshot_path=settings.AUTOCOMPLETE_SNAPSHOT_PATH,
+    rebuild_interval=settings.AUTOCOMPLETE_REBUILD_INTERVAL
+)
+
+
+@on_product_changed
+def _apply_product_change(product_id: str, change: str, product: Optional[Dict[str, Any]]) -> None:
+    autocomplete_index.apply_product_change(product_id, change, product)
@@ -0,0 +1,271 @@
+"""
+Contention-safe inventory reservations.
+
+Stock is held by raising ``product_inventory.reserved_quantity`` with a
+conditional UPDATE that only succeeds while ``quantity - reserved_quantity``
+covers the request, so two checkouts can never both take the last unit. A
+whole cart is reserved in one statement: the inventory rows are locked in id
+order (no deadlocks between overlapping carts), checked, incremented and
+recorded in ``inventory_reservations`` all-or-nothing. Each reservation
+carries an expiry; a sweeper returns abandoned holds to stock.
+
+Engine methods run inside the caller's transaction and do not commit.
+"""
+
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import app.database.session as db_session
+from app.database.session import pgbouncer_safe
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.periodic import PeriodicTask
+
+logger = get_logger("products.inventory_reservations")
+
+# (product_id, variant_id or None, quantity)
+ReservationLine = Tuple[Any, Optional[Any], int]
+
+
+def build_reservation_schema_statements() -> List[str]:
+    return [
+        """
+        CREATE TABLE IF NOT EXISTS inventory_reservations (
+            id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+            inventory_id UUID NOT NULL REFERENCES product_inventory(id) ON DELETE CASCADE,
+            reference VARCHAR(100) NOT NULL,
+            quantity INTEGER NOT NULL CHECK (quantity > 0),
+            expires_at TIMESTAMP NOT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT now()
+        );
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_inventory_reservations_reference ON inventory_reservations(reference);",
+        "CREATE INDEX IF NOT EXISTS idx_inventory_reservations_expires_at ON inventory_reservations(expires_at);",
+        "CREATE INDEX IF NOT EXISTS idx_inventory_reservations_inventory_id ON inventory_reservations(inventory_id);",
+        # Last line of defence: the database refuses a reservation that would oversell.
+        # NOT VALID so pre-existing inconsistent rows do not block startup.
+        """
+        DO $$
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'chk_product_inventory_reserved') THEN
+                ALTER TABLE product_inventory ADD CONSTRAINT chk_product_inventory_reserved
+                    CHECK (reserved_quantity >= 0 AND reserved_quantity <= quantity) NOT VALID;
+            END IF;
+        END
+        $$;
+        """,
+    ]
+
+
+RESERVE_SQL = text("""
+    WITH wanted AS (
+        SELECT w.product_id, w.variant_id, sum(w.quantity)::int AS quantity
+        FROM unnest(CAST(:product_ids AS uuid[]), CAST(:variant_ids AS uuid[]), CAST(:quantities AS int[]))
+            AS w(product_id, variant_id, quantity)
+        GROUP BY w.product_id, w.variant_id
+    ),
+    locked AS (
+        SELECT i.id, w.product_id, w.variant_id, w.quantity AS wanted, i.quantity - i.reserved_quantity AS available
+        FROM wanted w
+        JOIN product_inventory i ON CASE
+            WHEN w.variant_id IS NULL THEN i.product_id = w.product_id AND i.variant_id IS NULL
+            ELSE i.variant_id = w.variant_id
+        END
+        ORDER BY i.id
+        FOR UPDATE OF i
+    ),
+    feasible AS (
+        SELECT NOT EXISTS (SELECT 1 FROM locked WHERE available < wanted)
+           AND (NOT CAST(:require_tracked AS boolean) OR (SELECT count(*) FROM locked) = (SELECT count(*) FROM wanted)) AS ok
+    ),
+    reserved AS (
+        UPDATE product_inventory i
+        SET reserved_quantity = i.reserved_quantity + l.wanted, updated_at = now()
+        FROM locked l, feasible f
+        WHERE i.id = l.id AND f.ok AND i.quantity - i.reserved_quantity >= l.wanted
+        RETURNING i.id, l.wanted
+    ),
+    recorded AS (
+        INSERT INTO inventory_reservations (id, inventory_id, reference, quantity, expires_at, created_at)
+        SELECT gen_random_uuid(), r.id, :reference, r.wanted, :expires_at, now() FROM reserved r
+    )
+    SELECT w.product_id, w.variant_id, w.quantity AS wanted, l.id AS inventory_id,
+           coalesce(l.available, 0) AS available, (SELECT ok FROM feasible) AS ok
+    FROM wanted w
+    LEFT JOIN locked l ON l.product_id = w.product_id AND l.variant_id IS NOT DISTINCT FROM w.variant_id
+""")
+
+# Shared tail for release / commit / sweep: ``released`` yields (inventory_id, quantity)
+_SETTLE_TAIL = """
+    , totals AS (
+        SELECT inventory_id, sum(quantity)::int AS quantity FROM released GROUP BY inventory_id
+    )
+    UPDATE product_inventory i
+    SET {assignments}, updated_at = now()
+    FROM totals t
+    WHERE i.id = t.inventory_id
+    RETURNING i.id, t.quantity
+"""
+_RELEASE_ASSIGNMENTS = "reserved_quantity = greatest(i.reserved_quantity - t.quantity, 0)"
+_COMMIT_ASSIGNMENTS = (
+    "quantity = i.quantity - t.quantity, "
+    "reserved_quantity = greatest(i.reserved_quantity - t.quantity, 0)"
+)
+
+RELEASE_SQL = text(
+    "WITH released AS (DELETE FROM inventory_reservations WHERE reference = :reference RETURNING inventory_id, quantity)"
+    + _SETTLE_TAIL.format(assignments=_RELEASE_ASSIGNMENTS)
+)
+
+COMMIT_SQL = text(
+    "WITH released AS (DELETE FROM inventory_reservations WHERE reference = :reference RETURNING inventory_id, quantity)"
+    + _SETTLE_TAIL.format(assignments=_COMMIT_ASSIGNMENTS)
+)
+
+SWEEP_SQL = text("""
+    WITH expired AS (
+        SELECT id FROM inventory_reservations
+        WHERE expires_at < now()
+        ORDER BY expires_at
+        LIMIT :batch_size
+        FOR UPDATE SKIP LOCKED
+    ),
+    released AS (
+        DELETE FROM inventory_reservations r USING expired e
+        WHERE r.id = e.id
+        RETURNING r.inventory_id, r.quantity
+    )
+""" + _SETTLE_TAIL.format(assignments=_RELEASE_ASSIGNMENTS))
+
+RESERVE_ONE_SQL = text("""
+    UPDATE product_inventory
+    SET reserved_quantity = reserved_quantity + :quantity, updated_at = now()
+    WHERE id = (
+        SELECT id FROM product_inventory
+        WHERE CASE WHEN CAST(:variant_id AS uuid) IS NULL
+                   THEN product_id = :product_id AND variant_id IS NULL
+                   ELSE variant_id = CAST(:variant_id AS uuid) END
+        LIMIT 1
+    )
+    AND quantity - reserved_quantity >= :quantity
+    RETURNING id, quantity - reserved_quantity AS available
+""")
+
+RELEASE_ONE_SQL = text("""
+    UPDATE product_inventory
+    SET reserved_quantity = greatest(reserved_quantity - :quantity, 0), updated_at = now()
+    WHERE CASE WHEN CAST(:variant_id AS uuid) IS NULL
+               THEN product_id = :product_id AND variant_id IS NULL
+               ELSE variant_id = CAST(:variant_id AS uuid) END
+    RETURNING id
+""")
+
+
+def _as_uuid(value: Any) -> Optional[uuid.UUID]:
+    if value is None or isinstance(value, uuid.UUID):
+        return value
+    return uuid.UUID(str(value))
+
+
+class InventoryReservationEngine:
+    def __init__(self, default_ttl: int):
+        self.default_ttl = default_ttl
+
+    async def reserve(
+        self,
+        db: AsyncSession,
+        reference: str,
+        lines: Iterable[ReservationLine],
+        ttl: Optional[int] = None,
+        require_tracked: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Reserve every line or none of them.
+
+        Returns ``{"reserved": bool, "expires_at": datetime, "shortages": [...]}``;
+        each shortage names the product/variant with the requested and available units.
+        With ``require_tracked=False`` lines without an inventory row are let through
+        unreserved instead of failing the whole request.
+        """
+        lines = [(_as_uuid(p), _as_uuid(v), int(q)) for p, v, q in lines if int(q) > 0]
+        expires_at = datetime.utcnow() + timedelta(seconds=ttl or self.default_ttl)
+        if not lines:
+            return {"reserved": True, "expires_at": expires_at, "shortages": []}
+
+        product_ids, variant_ids, quantities = (list(column) for column in zip(*lines))
+        rows = (await db.execute(pgbouncer_safe(RESERVE_SQL), {
+            "product_ids": product_ids,
+            "variant_ids": variant_ids,
+            "quantities": quantities,
+            "reference": str(reference),
+            "expires_at": expires_at,
+            "require_tracked": require_tracked,
+        })).all()
+
+        # The rows stay locked until the caller's transaction ends, so ``ok`` means every update landed
+        reserved = bool(rows) and bool(rows[0].ok)
+        shortages = [
+            {
+                "product_id": str(row.product_id),
+                "variant_id": str(row.variant_id) if row.variant_id else None,
+                "requested": row.wanted,
+                "available": max(int(row.available), 0),
+                "tracked": row.inventory_id is not None,
+            }
+            for row in rows
+            if (row.inventory_id is None and require_tracked)
+            or (row.inventory_id is not None and row.available < row.wanted)
+        ]
+        return {"reserved": reserved, "expires_at": expires_at, "shortages": shortages}
+
+    async def release(self, db: AsyncSession, reference: str) -> int:
+        """Return every unit held under ``reference`` to stock; returns the units released"""
+        rows = (await db.execute(pgbouncer_safe(RELEASE_SQL), {"reference": str(reference)})).all()
+        return sum(row.quantity for row in rows)
+
+    async def commit(self, db: AsyncSession, reference: str) -> int:
+        """Turn the holds under ``reference`` into sold stock; returns the units committed"""
+        rows = (await db.execute(pgbouncer_safe(COMMIT_SQL), {"reference": str(reference)})).all()
+        return sum(row.quantity for row in rows)
+
+    async def reserve_one(self, db: AsyncSession, product_id: Any, quantity: int, variant_id: Any = None) -> bool:
+        """Untracked hold on a single product or variant (no reservation row, no expiry)"""
+        result = await db.execute(pgbouncer_safe(RESERVE_ONE_SQL), {
+            "product_id": _as_uuid(product_id), "variant_id": _as_uuid(variant_id), "quantity": quantity
+        })
+        return result.first() is not None
+
+    async def release_one(self, db: AsyncSession, product_id: Any, quantity: int, variant_id: Any = None) -> bool:
+        result = await db.execute(pgbouncer_safe(RELEASE_ONE_SQL), {
+            "product_id": _as_uuid(product_id), "variant_id": _as_uuid(variant_id), "quantity": quantity
+        })
+        return result.first() is not None
+
+
+async def sweep_expired_reservations(batch_size: int = 1000) -> int:
+    """Release expired holds in batches; safe to run from every worker at once"""
+    if not db_session.async_engine:
+        return 0
+    released = 0
+    try:
+        while True:
+            async with db_session.async_engine.begin() as conn:
+                rows = (await conn.execute(pgbouncer_safe(SWEEP_SQL), {"batch_size": batch_size})).all()
+            if not rows:
+                break
+            released += sum(row.quantity for row in rows)
+    except Exception as e:
+        logger.error(f"Inventory reservation sweep failed: {e}")
+    if released:
+        logger.info(f"Released {released} units from expired inventory reservations")
+    return released
+
+
+reservation_engine = InventoryReservationEngine(default_ttl=settings.INVENTORY_RESERVATION_TTL)
+reservation_sweeper = PeriodicTask(
+    "reservation sweep", sweep_expired_reservations, settings.INVENTORY_SWEEP_INTERVAL, run_at_start=True
+)
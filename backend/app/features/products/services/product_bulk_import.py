@@ -0,0 +1,574 @@
+"""
+Streaming, batched CSV product import.
+
+Uploads are spooled to a temporary file and parsed incrementally, so memory
+stays flat regardless of catalog size. Rows are validated a chunk at a time,
+one column per pass (category/brand references resolved with one lookup per
+chunk), and written with one multi-row statement per chunk: ``COPY`` into a
+staging table when a direct database connection is available, a PostgREST
+bulk insert otherwise.
+Both paths skip SKUs that already exist, so retrying a failed or partial
+import never creates duplicates; any other unique violation (a slug taken by
+a different SKU) is reported as an error on that row.
+
+Job progress is written to ``product_import_jobs`` as the import runs, so any
+worker can answer a progress poll. Without a direct database connection jobs
+are tracked in-process only, and polls must reach the worker running them.
+"""
+
+import asyncio
+import csv
+import json
+import os
+import re
+import tempfile
+import time
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from fastapi import UploadFile
+from sqlalchemy import text
+
+import app.database.session as db_session
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.exceptions import BadRequestException
+from app.core.logging import get_logger
+from app.database.base import get_supabase_rest_client
+from app.features.products.models.product import ProductStatusEnum, ProductApprovalEnum, ProductVisibilityEnum
+from app.features.products.services.product_events import notify_product_changed, PRODUCT_CREATED
+
+logger = get_logger("products.bulk_import")
+
+REQUIRED_COLUMNS = ("name", "sku", "price", "category_id")
+VISIBILITY_VALUES = {v.value for v in ProductVisibilityEnum}
+MAX_REPORTED_ERRORS = 1000
+SPOOL_CHUNK_BYTES = 1024 * 1024
+
+# Column order shared by the COPY staging table and the PostgREST payload
+PRODUCT_COLUMNS = (
+    "id", "supplier_id", "category_id", "brand_id", "sku", "name", "slug",
+    "short_description", "description", "price", "compare_at_price", "weight",
+    "materials", "care_instructions", "origin_country", "status",
+    "approval_status", "visibility", "tags", "created_at", "updated_at",
+)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+# Seconds between progress writes while a job runs
+JOB_SAVE_INTERVAL = 1.0
+
+
+def slugify(value: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", (value or "").lower()).strip("-")
+
+
+class ImportJob:
+    def __init__(self, supplier_id: str, filename: str, chunk_size: int):
+        self.id = str(uuid.uuid4())
+        self.supplier_id = str(supplier_id)
+        self.filename = filename
+        self.chunk_size = chunk_size
+        self.status = JOB_QUEUED
+        self.method: Optional[str] = None
+        self.total_rows = 0
+        self.successful = 0
+        self.skipped = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.created_product_ids: List[str] = []
+        self.skipped_skus: List[str] = []
+        self.error: Optional[str] = None
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+
+    @property
+    def processed_rows(self) -> int:
+        return self.successful + self.skipped + self.failed
+
+    def record_error(self, row: int, sku: Optional[str], name: Optional[str], error: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "sku": sku, "product_name": name or "Unknown", "error": error})
+
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed = None
+        if self.started_at:
+            elapsed = round(((self.finished_at or datetime.utcnow()) - self.started_at).total_seconds(), 2)
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "filename": self.filename,
+            "method": self.method,
+            "total_rows": self.total_rows,
+            "processed_rows": self.processed_rows,
+            "successful": self.successful,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+            "created_product_ids": self.created_product_ids,
+            "skipped_skus": self.skipped_skus,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "elapsed_seconds": elapsed
+        }
+
+
+def build_import_job_schema_statements() -> List[str]:
+    return [
+        """
+        CREATE TABLE IF NOT EXISTS product_import_jobs (
+            id UUID PRIMARY KEY,
+            supplier_id UUID NOT NULL,
+            state JSONB NOT NULL,
+            updated_at TIMESTAMP NOT NULL DEFAULT now()
+        );
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_product_import_jobs_updated_at ON product_import_jobs(updated_at);",
+    ]
+
+
+SAVE_JOB_SQL = text("""
+    INSERT INTO product_import_jobs (id, supplier_id, state, updated_at)
+    VALUES (CAST(:id AS uuid), CAST(:supplier_id AS uuid), CAST(:state AS jsonb), now())
+    ON CONFLICT (id) DO UPDATE SET state = EXCLUDED.state, updated_at = now()
+""")
+
+LOAD_JOB_SQL = text("""
+    SELECT state FROM product_import_jobs
+    WHERE id = CAST(:id AS uuid) AND supplier_id = CAST(:supplier_id AS uuid)
+""")
+
+PRUNE_JOBS_SQL = text("DELETE FROM product_import_jobs WHERE updated_at < now() - make_interval(secs => :ttl)")
+
+
+class ImportJobStore:
+    """
+    Job registry: the running worker holds the job object, and its progress is
+    mirrored to ``product_import_jobs`` so other workers can report it. Jobs
+    are kept for a day after their last update.
+    """
+
+    def __init__(self, ttl: int = 86400):
+        self.ttl = ttl
+        self._jobs = TTLCache(maxsize=1000, ttl=ttl)
+        self._saved_at: Dict[str, float] = {}
+
+    def create(self, supplier_id: str, filename: str, chunk_size: Optional[int] = None) -> ImportJob:
+        job = ImportJob(supplier_id, filename, chunk_size or settings.BULK_IMPORT_CHUNK_SIZE)
+        self._jobs.set(job.id, job)
+        return job
+
+    def get(self, job_id: str, supplier_id: str) -> Optional[ImportJob]:
+        job = self._jobs.get(job_id)
+        if job is None or job.supplier_id != str(supplier_id):
+            return None
+        return job
+
+    async def save(self, job: ImportJob, force: bool = False) -> None:
+        """Mirror ``job`` to the database; throttled to JOB_SAVE_INTERVAL unless ``force``"""
+        if db_session.async_engine is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._saved_at.get(job.id, 0.0) < JOB_SAVE_INTERVAL:
+            return
+        self._saved_at[job.id] = now
+        try:
+            async with db_session.async_engine.begin() as conn:
+                if job.status == JOB_QUEUED:
+                    await conn.execute(PRUNE_JOBS_SQL, {"ttl": self.ttl})
+                await conn.execute(SAVE_JOB_SQL, {
+                    "id": job.id, "supplier_id": job.supplier_id, "state": json.dumps(job.to_dict())
+                })
+        except Exception as e:
+            logger.warning(f"Could not save import job {job.id}: {e}")
+        if job.status in (JOB_COMPLETED, JOB_FAILED):
+            self._saved_at.pop(job.id, None)
+
+    async def status(self, job_id: str, supplier_id: str) -> Optional[Dict[str, Any]]:
+        """The job's progress, from this worker if it runs the job, else from its last saved state"""
+        job = self.get(job_id, supplier_id)
+        if job is not None:
+            return job.to_dict()
+        if db_session.async_engine is None:
+            return None
+        try:
+            uuid.UUID(str(job_id))
+            async with db_session.async_engine.connect() as conn:
+                state = (await conn.execute(LOAD_JOB_SQL, {"id": job_id, "supplier_id": str(supplier_id)})).scalar()
+        except Exception as e:
+            logger.warning(f"Could not load import job {job_id}: {e}")
+            return None
+        if isinstance(state, str):
+            state = json.loads(state)
+        return state
+
+
+import_jobs = ImportJobStore()
+
+
+# Parsing and validation
+
+async def spool_upload(file: UploadFile) -> str:
+    """Copy the upload to a temp file in fixed-size chunks; returns the path"""
+    max_bytes = settings.BULK_IMPORT_MAX_FILE_MB * 1024 * 1024
+    fd, path = tempfile.mkstemp(prefix="product-import-", suffix=".csv")
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await file.read(SPOOL_CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise BadRequestException(f"File exceeds {settings.BULK_IMPORT_MAX_FILE_MB} MB limit")
+                out.write(chunk)
+        if size == 0:
+            raise BadRequestException("File is empty")
+        return path
+    except Exception:
+        os.unlink(path)
+        raise
+
+
+def iter_csv_chunks(path: str, chunk_size: int) -> Iterator[List[Tuple[int, Dict[str, str]]]]:
+    """Yield ``(line_number, row)`` lists without loading the whole file"""
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        columns = {(c or "").strip().lower() for c in (reader.fieldnames or [])}
+        missing = [c for c in REQUIRED_COLUMNS if c not in columns]
+        if missing:
+            raise BadRequestException(f"CSV is missing required columns: {', '.join(missing)}")
+
+        chunk: List[Tuple[int, Dict[str, str]]] = []
+        for row in reader:
+            row = {(k or "").strip().lower(): (v or "").strip() for k, v in row.items() if k}
+            if not any(row.values()):
+                continue
+            # Header is line 1, so data rows start at 2
+            chunk.append((reader.line_num, row))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def _decimal(value: str) -> Optional[Decimal]:
+    if not value:
+        return None
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f"Invalid number: {value}")
+    if not number.is_finite() or number < 0:
+        raise ValueError(f"Must be a non-negative number: {value}")
+    return number
+
+
+def _uuid(value: str, field: str) -> Optional[uuid.UUID]:
+    if not value or value == "0":
+        return None
+    try:
+        return uuid.UUID(value)
+    except ValueError:
+        raise ValueError(f"Invalid {field}: {value}")
+
+
+def _split_list(value: str) -> List[str]:
+    return [item.strip() for item in value.split(";") if item.strip()] if value else []
+
+
+def _required(message: str):
+    def check(value: str) -> str:
+        if not value:
+            raise ValueError(message)
+        return value
+    return check
+
+
+def _category_id(value: str) -> uuid.UUID:
+    category_id = _uuid(value, "category_id")
+    if category_id is None:
+        raise ValueError("category_id is required. Please provide a valid category_id from existing categories.")
+    return category_id
+
+
+def _visibility(value: str) -> str:
+    visibility = (value or ProductVisibilityEnum.VISIBLE.value).upper()
+    return visibility if visibility in VISIBILITY_VALUES else ProductVisibilityEnum.VISIBLE.value
+
+
+def parse_chunk(
+    chunk: List[Tuple[int, Dict[str, str]]],
+    supplier_id: str,
+    seen_skus: Set[str]
+) -> Tuple[List[Tuple[int, Dict[str, Any]]], List[Tuple[int, Dict[str, str], str]]]:
+    """
+    Turn raw CSV rows into product records; returns ``(records, errors)``.
+
+    Validation runs one column at a time over the whole chunk. A row keeps the
+    first error found and later columns skip it; only rows left without an
+    error are assembled into records.
+    """
+    now = datetime.utcnow()
+    supplier_uuid = uuid.UUID(str(supplier_id))
+    rows = [row for _, row in chunk]
+    row_errors: List[Optional[str]] = [None] * len(rows)
+
+    def column(name: str) -> List[str]:
+        return [row.get(name, "") for row in rows]
+
+    def check(values: List[str], convert) -> List[Any]:
+        converted = []
+        for i, value in enumerate(values):
+            result = None
+            if row_errors[i] is None:
+                try:
+                    result = convert(value)
+                except ValueError as e:
+                    row_errors[i] = str(e)
+            converted.append(result)
+        return converted
+
+    names = check(column("name"), _required("Product name is required"))
+    skus = check(column("sku"), _required("Product SKU is required"))
+    check(column("price"), _required("Product price is required"))
+    category_ids = check(column("category_id"), _category_id)
+    brand_ids = check(column("brand_id"), lambda value: _uuid(value, "brand_id"))
+    prices = check(column("price"), _decimal)
+    compare_at_prices = check(column("compare_at_price"), _decimal)
+    weights = check(column("weight"), _decimal)
+    visibilities = [_visibility(value) for value in column("visibility")]
+
+    # A SKU belongs to its first valid row in the file
+    for i, sku in enumerate(skus):
+        if row_errors[i] is None:
+            if sku in seen_skus:
+                row_errors[i] = f"Duplicate SKU in file: {sku}"
+            else:
+                seen_skus.add(sku)
+
+    records, errors = [], []
+    for i, (line, row) in enumerate(chunk):
+        if row_errors[i] is not None:
+            errors.append((line, row, row_errors[i]))
+            continue
+        records.append((line, {
+            "id": uuid.uuid4(),
+            "supplier_id": supplier_uuid,
+            "category_id": category_ids[i],
+            "brand_id": brand_ids[i],
+            "sku": skus[i],
+            "name": names[i],
+            "slug": f"{slugify(names[i])}-{slugify(skus[i])}",
+            "short_description": row.get("short_description") or None,
+            "description": row.get("description") or None,
+            "price": prices[i],
+            "compare_at_price": compare_at_prices[i],
+            "weight": weights[i],
+            "materials": _split_list(row.get("materials", "")),
+            "care_instructions": row.get("care_instructions") or None,
+            "origin_country": row.get("origin_country") or None,
+            "status": ProductStatusEnum.ACTIVE.value,
+            "approval_status": ProductApprovalEnum.APPROVED.value,
+            "visibility": visibilities[i],
+            "tags": _split_list(row.get("tags", "")),
+            "created_at": now,
+            "updated_at": now
+        }))
+    return records, errors
+
+
+async def _existing_ids(table: str, ids: Set[uuid.UUID]) -> Set[uuid.UUID]:
+    if not ids:
+        return set()
+    if db_session.async_engine is not None:
+        async with db_session.async_engine.connect() as conn:
+            rows = await conn.execute(
+                text(f"SELECT id FROM {table} WHERE id = ANY(:ids)"),
+                {"ids": list(ids)}
+            )
+            return {row[0] for row in rows}
+    found = await get_supabase_rest_client().select(
+        table, {"select": "id", "id": f"in.({','.join(str(i) for i in ids)})"}
+    )
+    return {uuid.UUID(row["id"]) for row in found}
+
+
+# Writers
+
+class ProductBatchWriter(ABC):
+    """Inserts a batch of records and returns ``{sku: product_id}`` for new rows only"""
+
+    method = "base"
+
+    @abstractmethod
+    async def write(self, records: List[Dict[str, Any]]) -> Dict[str, str]:
+        ...
+
+
+class CopyProductWriter(ProductBatchWriter):
+    method = "copy"
+
+    async def write(self, records: List[Dict[str, Any]]) -> Dict[str, str]:
+        columns = ", ".join(PRODUCT_COLUMNS)
+        async with db_session.async_engine.begin() as conn:
+            raw = await conn.get_raw_connection()
+            pg = raw.driver_connection
+            await pg.execute("CREATE TEMP TABLE product_import_stage (LIKE products INCLUDING DEFAULTS) ON COMMIT DROP")
+            await pg.copy_records_to_table(
+                "product_import_stage",
+                columns=list(PRODUCT_COLUMNS),
+                records=[
+                    tuple(json.dumps(r[c]) if c in ("materials", "tags") else r[c] for c in PRODUCT_COLUMNS)
+                    for r in records
+                ]
+            )
+            inserted = await pg.fetch(
+                f"INSERT INTO products ({columns}) SELECT {columns} FROM product_import_stage "
+                f"ON CONFLICT (sku) DO NOTHING RETURNING id, sku"
+            )
+        return {row["sku"]: str(row["id"]) for row in inserted}
+
+
+class RestProductWriter(ProductBatchWriter):
+    method = "rest"
+
+    async def write(self, records: List[Dict[str, Any]]) -> Dict[str, str]:
+        payload = [
+            {
+                c: (str(r[c]) if isinstance(r[c], uuid.UUID)
+                    else float(r[c]) if isinstance(r[c], Decimal)
+                    else r[c].isoformat() if isinstance(r[c], datetime)
+                    else r[c])
+                for c in PRODUCT_COLUMNS
+            }
+            for r in records
+        ]
+        inserted = await get_supabase_rest_client().insert("products", payload, on_conflict="sku", ignore_duplicates=True)
+        return {row["sku"]: str(row["id"]) for row in inserted}
+
+
+def _writers() -> List[ProductBatchWriter]:
+    writers: List[ProductBatchWriter] = []
+    if settings.BULK_IMPORT_USE_COPY and db_session.async_engine is not None:
+        writers.append(CopyProductWriter())
+    writers.append(RestProductWriter())
+    return writers
+
+
+# Pipeline
+
+async def _write_chunk(job: ImportJob, records: List[Tuple[int, Dict[str, Any]]], writers: List[ProductBatchWriter]) -> None:
+    batch = [record for _, record in records]
+    inserted: Optional[Dict[str, str]] = None
+    for writer in writers:
+        try:
+            inserted = await writer.write(batch)
+            job.method = job.method or writer.method
+            break
+        except Exception as e:
+            logger.warning(f"Import job {job.id}: {writer.method} batch insert of {len(batch)} rows failed: {e}")
+
+    if inserted is None:
+        # A bad row sinks the whole statement; retry row by row to attribute errors
+        inserted = {}
+        for line, record in records:
+            try:
+                inserted.update(await writers[-1].write([record]))
+            except Exception as e:
+                job.record_error(line, record["sku"], record["name"], str(e)[:500])
+                record["failed"] = True
+
+    for line, record in records:
+        if record.get("failed"):
+            continue
+        product_id = inserted.get(record["sku"])
+        if product_id:
+            job.successful += 1
+            job.created_product_ids.append(product_id)
+            notify_product_changed(product_id, PRODUCT_CREATED, {
+                "id": product_id,
+                "name": record["name"],
+                "slug": record["slug"],
+                "status": record["status"],
+                "approval_status": record["approval_status"],
+                "visibility": record["visibility"]
+            })
+        else:
+            # Already imported (same SKU) - a retry of this file is a no-op
+            job.skipped += 1
+            job.skipped_skus.append(record["sku"])
+
+
+async def run_import(job: ImportJob, path: str) -> ImportJob:
+    """Process a spooled CSV; removes the file when done"""
+    job.status = JOB_RUNNING
+    job.started_at = datetime.utcnow()
+    await import_jobs.save(job, force=True)
+    writers = _writers()
+    seen_skus: Set[str] = set()
+    known_categories: Set[uuid.UUID] = set()
+    known_brands: Set[uuid.UUID] = set()
+    start = time.perf_counter()
+
+    try:
+        chunks = iter_csv_chunks(path, job.chunk_size)
+        while True:
+            chunk = await asyncio.to_thread(next, chunks, None)
+            if chunk is None:
+                break
+            job.total_rows += len(chunk)
+            records, errors = parse_chunk(chunk, job.supplier_id, seen_skus)
+            for line, row, error in errors:
+                job.record_error(line, row.get("sku"), row.get("name"), error)
+
+            # Resolve references for the whole chunk in two lookups
+            categories = {r["category_id"] for _, r in records} - known_categories
+            brands = {r["brand_id"] for _, r in records if r["brand_id"]} - known_brands
+            known_categories |= await _existing_ids("categories", categories)
+            known_brands |= await _existing_ids("brands", brands)
+
+            valid = []
+            for line, record in records:
+                if record["category_id"] not in known_categories:
+                    job.record_error(line, record["sku"], record["name"], f"Unknown category_id: {record['category_id']}")
+                elif record["brand_id"] and record["brand_id"] not in known_brands:
+                    job.record_error(line, record["sku"], record["name"], f"Unknown brand_id: {record['brand_id']}")
+                else:
+                    valid.append((line, record))
+
+            if valid:
+                await _write_chunk(job, valid, writers)
+            await import_jobs.save(job)
+            logger.info(f"Import job {job.id}: {job.processed_rows} rows processed ({job.successful} created, {job.skipped} skipped, {job.failed} failed)")
+
+        if job.total_rows == 0:
+            raise BadRequestException("CSV file is empty or has no data rows")
+        job.status = JOB_COMPLETED
+    except Exception as e:
+        job.status = JOB_FAILED
+        job.error = getattr(e, "message", None) or str(e)
+        logger.error(f"Import job {job.id} failed: {job.error}")
+    finally:
+        job.finished_at = datetime.utcnow()
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+    await import_jobs.save(job, force=True)
+
+    logger.info(f"Import job {job.id} {job.status} in {time.perf_counter() - start:.2f}s via {job.method}")
+    return job
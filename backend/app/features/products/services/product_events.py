@@ -0,0 +1,36 @@
+"""
+In-process product change notifications.
+
+ProductCrud publishes here after every create/update/delete so derived,
+in-memory views of the catalog (filter facets, autocomplete, ...) can
+invalidate or patch themselves without polling the database.
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.logging import get_logger
+
+logger = get_logger("products.events")
+
+PRODUCT_CREATED = "created"
+PRODUCT_UPDATED = "updated"
+PRODUCT_DELETED = "deleted"
+
+ProductChangeListener = Callable[[str, str, Optional[Dict[str, Any]]], None]
+
+_listeners: List[ProductChangeListener] = []
+
+
+def on_product_changed(listener: ProductChangeListener) -> ProductChangeListener:
+    """Register ``listener(product_id, change, product_dict)``; usable as a decorator"""
+    if listener not in _listeners:
+        _listeners.append(listener)
+    return listener
+
+
+def notify_product_changed(product_id: Any, change: str, product: Optional[Dict[str, Any]] = None) -> None:
+    for listener in list(_listeners):
+        try:
+            listener(str(product_id), change, product)
+        except Exception as e:
+            logger.warning(f"Product change listener {getattr(listener, '__name__', listener)} failed: {e}")
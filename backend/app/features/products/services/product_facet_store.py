@@ -0,0 +1,214 @@
+"""
+Precomputed filter facets for ``/search/filters``.
+
+``product_facet_counts`` holds one row per (facet, value) with the number of
+listed products carrying it. A trigger on ``products`` applies +1/-1 deltas as
+products enter or leave the listed set or change a faceted column, so the
+table is never rebuilt on the request path. Results are served from an
+in-process TTL cache that ProductCrud invalidates on every product write.
+"""
+
+from typing import Any, Dict, Optional
+
+from sqlalchemy import select, func, and_, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import app.database.session as db_session
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.features.products.models.product import Product
+from app.features.products.models.product_facet_count import ProductFacetCount
+from app.features.products.models.product_review import ProductReview
+from app.features.products.models.product_sustainability_score import ProductSustainabilityScore
+from app.features.products.services.product_events import on_product_changed
+
+logger = get_logger("products.facet_store")
+
+FACETS = ("category", "brand", "origin_country", "material", "tag")
+
+
+def build_listed_predicate_sql(alias: str) -> str:
+    # Status columns hold mixed-case values depending on the write path
+    return (
+        f"upper(coalesce({alias}.status, '')) = 'ACTIVE' AND "
+        f"upper(coalesce({alias}.approval_status, '')) = 'APPROVED' AND "
+        f"upper(coalesce({alias}.visibility, '')) = 'VISIBLE'"
+    )
+
+
+def build_facet_values_sql(alias: str) -> str:
+    """One (facet, value) row per facet value of the product row ``alias``"""
+    def json_array(column: str) -> str:
+        return f"CASE WHEN jsonb_typeof({alias}.{column}) = 'array' THEN {alias}.{column} ELSE '[]'::jsonb END"
+
+    return f"""
+        SELECT 'category' AS facet, {alias}.category_id::text AS value WHERE {alias}.category_id IS NOT NULL
+        UNION ALL SELECT 'brand', {alias}.brand_id::text WHERE {alias}.brand_id IS NOT NULL
+        UNION ALL SELECT 'origin_country', {alias}.origin_country WHERE {alias}.origin_country IS NOT NULL
+        UNION ALL SELECT DISTINCT 'material', left(m.value, 500) FROM jsonb_array_elements_text({json_array('materials')}) AS m(value)
+        UNION ALL SELECT DISTINCT 'tag', left(t.value, 500) FROM jsonb_array_elements_text({json_array('tags')}) AS t(value)
+    """
+
+
+def build_facet_schema_statements() -> list:
+    return [
+        """
+        CREATE TABLE IF NOT EXISTS product_facet_counts (
+            facet VARCHAR(50) NOT NULL,
+            value VARCHAR(500) NOT NULL,
+            product_count INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP NOT NULL DEFAULT now(),
+            PRIMARY KEY (facet, value)
+        );
+        """,
+        f"""
+        CREATE OR REPLACE FUNCTION product_facets_apply(p products, delta integer) RETURNS void AS $$
+        BEGIN
+            INSERT INTO product_facet_counts (facet, value, product_count, updated_at)
+            SELECT f.facet, f.value, delta, now() FROM ({build_facet_values_sql("p")}) AS f
+            ON CONFLICT (facet, value) DO UPDATE
+                SET product_count = product_facet_counts.product_count + EXCLUDED.product_count,
+                    updated_at = now();
+        END
+        $$ LANGUAGE plpgsql;
+        """,
+        f"""
+        CREATE OR REPLACE FUNCTION products_facets_sync() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') AND {build_listed_predicate_sql("OLD")} THEN
+                PERFORM product_facets_apply(OLD, -1);
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') AND {build_listed_predicate_sql("NEW")} THEN
+                PERFORM product_facets_apply(NEW, 1);
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql;
+        """,
+        "DROP TRIGGER IF EXISTS trg_products_facets ON products;",
+        "CREATE TRIGGER trg_products_facets "
+        "AFTER INSERT OR DELETE OR UPDATE OF status, approval_status, visibility, category_id, brand_id, origin_country, materials, tags "
+        "ON products FOR EACH ROW EXECUTE FUNCTION products_facets_sync();",
+    ]
+
+
+async def rebuild_facet_counts() -> bool:
+    """Recompute every facet count from the catalog; used to seed and reconcile the table"""
+    if not db_session.async_engine:
+        return False
+    try:
+        async with db_session.async_engine.begin() as conn:
+            # Blocks the trigger for the duration so no delta lands between delete and insert
+            await conn.execute(text("LOCK TABLE product_facet_counts IN EXCLUSIVE MODE"))
+            await conn.execute(text("DELETE FROM product_facet_counts"))
+            await conn.execute(text(f"""
+                INSERT INTO product_facet_counts (facet, value, product_count, updated_at)
+                SELECT f.facet, f.value, count(*), now()
+                FROM products p CROSS JOIN LATERAL ({build_facet_values_sql("p")}) AS f
+                WHERE {build_listed_predicate_sql("p")}
+                GROUP BY f.facet, f.value
+            """))
+        facet_store.invalidate()
+        logger.info("Product facet counts rebuilt")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to rebuild product facet counts: {e}")
+        return False
+
+
+class ProductFacetStore:
+    CACHE_KEY = "filter_options"
+
+    def __init__(self, ttl: int = 300):
+        self._cache = TTLCache(maxsize=4, ttl=ttl)
+
+    def invalidate(self) -> None:
+        self._cache.clear()
+
+    async def get_filter_options(self, db: AsyncSession) -> Optional[Dict[str, Any]]:
+        """Cached filter options, or None when the facet table is unavailable"""
+        cached = self._cache.get(self.CACHE_KEY)
+        if cached is not None:
+            return cached
+        try:
+            async with db.begin_nested():
+                options = await self._load(db)
+        except Exception as e:
+            logger.warning(f"Facet store unavailable, falling back to catalog scan: {e}")
+            return None
+        self._cache.set(self.CACHE_KEY, options)
+        return options
+
+    async def _load(self, db: AsyncSession) -> Dict[str, Any]:
+        facet_rows = (await db.execute(
+            select(ProductFacetCount.facet, ProductFacetCount.value, ProductFacetCount.product_count)
+            .where(ProductFacetCount.product_count > 0)
+            .order_by(ProductFacetCount.product_count.desc())
+        )).all()
+
+        counts: Dict[str, Dict[str, int]] = {facet: {} for facet in FACETS}
+        for facet, value, product_count in facet_rows:
+            counts.setdefault(facet, {})[value] = product_count
+
+        names = (await db.execute(text(
+            "SELECT 'category' AS kind, id, name FROM categories WHERE is_active = true "
+            "UNION ALL SELECT 'brand', id, name FROM brands WHERE is_active = true"
+        ))).all()
+
+        listed = and_(
+            func.upper(Product.status) == "ACTIVE",
+            func.upper(Product.approval_status) == "APPROVED",
+            func.upper(Product.visibility) == "VISIBLE"
+        )
+        avg_ratings = select(func.avg(ProductReview.rating).label("avg_rating")).group_by(ProductReview.product_id).subquery()
+        ranges = (await db.execute(select(
+            select(func.min(Product.price)).where(listed).scalar_subquery().label("min_price"),
+            select(func.max(Product.price)).where(listed).scalar_subquery().label("max_price"),
+            select(func.min(avg_ratings.c.avg_rating)).scalar_subquery().label("min_rating"),
+            select(func.max(avg_ratings.c.avg_rating)).scalar_subquery().label("max_rating"),
+            select(func.min(ProductSustainabilityScore.overall_score)).scalar_subquery().label("min_score"),
+            select(func.max(ProductSustainabilityScore.overall_score)).scalar_subquery().label("max_score"),
+        ))).first()
+
+        categories = [
+            {"id": str(row.id), "name": row.name, "product_count": counts["category"].get(str(row.id), 0)}
+            for row in names if row.kind == "category"
+        ]
+        brands = [
+            {"id": str(row.id), "name": row.name, "product_count": counts["brand"].get(str(row.id), 0)}
+            for row in names if row.kind == "brand"
+        ]
+
+        return {
+            "categories": categories,
+            "brands": brands,
+            "price_range": {
+                "min": ranges.min_price or 0,
+                "max": ranges.max_price or 0
+            },
+            "rating_range": {
+                "min": float(ranges.min_rating) if ranges.min_rating else 0.0,
+                "max": float(ranges.max_rating) if ranges.max_rating else 5.0
+            },
+            "sustainability_range": {
+                "min": float(ranges.min_score) if ranges.min_score else 0.0,
+                "max": float(ranges.max_score) if ranges.max_score else 100.0
+            },
+            "materials": list(counts["material"].keys()),
+            "origin_countries": list(counts["origin_country"].keys()),
+            "tags": list(counts["tag"].keys()),
+            "facet_counts": {
+                "material": counts["material"],
+                "origin_country": counts["origin_country"],
+                "tag": counts["tag"]
+            }
+        }
+
+
+facet_store = ProductFacetStore(ttl=settings.FILTER_OPTIONS_CACHE_TTL)
+
+
+@on_product_changed
+def _invalidate_facets_on_product_change(product_id: str, change: str, product: Optional[Dict[str, Any]]) -> None:
+    facet_store.invalidate()
@@ -0,0 +1,136 @@
+"""
+Pluggable full-text search backends for product search.
+
+ILIKE scans cannot use an index, so search latency grows with the catalog.
+The ``fulltext`` backend matches against a weighted ``tsvector`` column that a
+trigger keeps in sync on every product write, and ranks with ``ts_rank_cd``.
+The ``trigram`` backend uses ``pg_trgm`` for typo-tolerant name matching.
+The schema objects both backends need are created by
+``create_search_infrastructure`` in ``app/database/indexes.py``. Until that
+reports them ready in this process (no database, or the DDL failed), those
+backends resolve to ``ilike`` so search degrades instead of failing on the
+missing column.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Tuple
+from sqlalchemy import or_, func, cast, String, literal_column
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.features.products.models.product import Product
+
+logger = get_logger("products.search_engine")
+
+TEXT_SEARCH_CONFIG = "english"
+
+# Not mapped on the Product model so ORM selects keep working on databases
+# where the search infrastructure has not been created yet.
+PRODUCT_SEARCH_VECTOR = literal_column("products.search_vector")
+
+
+def build_search_vector_sql(prefix: str = "") -> str:
+    """Weighted tsvector expression; ``prefix`` is ``NEW.`` inside the trigger."""
+    return (
+        f"setweight(to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce({prefix}name, '')), 'A') || "
+        f"setweight(to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce({prefix}short_description, '')), 'B') || "
+        f"setweight(to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce({prefix}tags::text, '')), 'B') || "
+        f"setweight(to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce({prefix}description, '')), 'C')"
+    )
+
+
+class SearchBackend(ABC):
+    """Turns a search term into a product filter and an optional rank expression"""
+
+    name = "base"
+    # Needs the objects created by create_search_infrastructure
+    requires_infrastructure = False
+
+    @abstractmethod
+    def build_filter(self, term: str) -> Tuple[ColumnElement, Optional[ColumnElement]]:
+        ...
+
+    def apply(self, query: Select, term: str) -> Tuple[Select, Optional[ColumnElement]]:
+        search_filter, rank = self.build_filter(term)
+        return query.where(search_filter), rank
+
+
+class IlikeSearchBackend(SearchBackend):
+    """Original substring matching; kept as the baseline and as a fallback"""
+
+    name = "ilike"
+
+    def build_filter(self, term: str) -> Tuple[ColumnElement, Optional[ColumnElement]]:
+        pattern = f"%{term}%"
+        search_filter = or_(
+            Product.name.ilike(pattern),
+            Product.description.ilike(pattern),
+            Product.short_description.ilike(pattern),
+            cast(Product.tags, String).ilike(pattern)
+        )
+        return search_filter, None
+
+
+class FullTextSearchBackend(SearchBackend):
+    """GIN-indexed tsvector match ranked by cover density"""
+
+    name = "fulltext"
+    requires_infrastructure = True
+
+    def build_filter(self, term: str) -> Tuple[ColumnElement, Optional[ColumnElement]]:
+        ts_query = func.websearch_to_tsquery(TEXT_SEARCH_CONFIG, term)
+        rank = func.ts_rank_cd(PRODUCT_SEARCH_VECTOR, ts_query)
+        return PRODUCT_SEARCH_VECTOR.op("@@")(ts_query), rank
+
+
+class TrigramSearchBackend(SearchBackend):
+    """pg_trgm similarity on product names; tolerates typos and partial words"""
+
+    name = "trigram"
+    requires_infrastructure = True
+
+    def build_filter(self, term: str) -> Tuple[ColumnElement, Optional[ColumnElement]]:
+        # Both predicates are served by the gin_trgm_ops index on products.name
+        search_filter = or_(
+            Product.name.op("%")(term),
+            Product.name.ilike(f"%{term}%")
+        )
+        return search_filter, func.similarity(Product.name, term)
+
+
+_search_backends: Dict[str, SearchBackend] = {
+    IlikeSearchBackend.name: IlikeSearchBackend(),
+    FullTextSearchBackend.name: FullTextSearchBackend(),
+    TrigramSearchBackend.name: TrigramSearchBackend(),
+}
+
+
+_infrastructure_ready = False
+
+
+def set_search_infrastructure_ready(ready: bool) -> None:
+    global _infrastructure_ready
+    _infrastructure_ready = ready
+
+
+def search_infrastructure_ready() -> bool:
+    return _infrastructure_ready
+
+
+def register_search_backend(backend: SearchBackend) -> None:
+    _search_backends[backend.name] = backend
+
+
+def get_search_backend(engine: Optional[str] = None) -> SearchBackend:
+    """Resolve a backend by name, defaulting to ``settings.SEARCH_ENGINE``"""
+    name = (engine or settings.SEARCH_ENGINE or IlikeSearchBackend.name).lower()
+    backend = _search_backends.get(name)
+    if backend is None:
+        logger.warning(f"Unknown search engine '{name}', falling back to ilike")
+        backend = _search_backends[IlikeSearchBackend.name]
+    elif backend.requires_infrastructure and not _infrastructure_ready:
+        logger.debug(f"Search infrastructure not ready, serving '{name}' with ilike")
+        backend = _search_backends[IlikeSearchBackend.name]
+    return backend
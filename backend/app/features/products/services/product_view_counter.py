@@ -0,0 +1,275 @@
+"""
+Buffered product view ingestion and counting.
+
+Every product page load used to insert a ``product_views`` row through
+BaseCrud (flush, commit, refresh). It then ran ``COUNT(*)`` over all of the
+product's views to show the view count. Views are now recorded in memory, as
+the raw row plus a per-product counter. A writer flushes them every
+PRODUCT_VIEW_FLUSH_INTERVAL seconds, or sooner once PRODUCT_VIEW_BATCH_SIZE
+are waiting. A single statement inserts the raw rows and adds them to the
+``product_view_counts`` rollup (one row per product per day).
+
+A product's view count is its rollup total plus the views this worker has
+not written yet. The rollup total is cached for PRODUCT_VIEW_COUNT_TTL and
+advanced by this worker's own flushes. Views recorded by other workers show
+up when the cache expires.
+"""
+
+import asyncio
+import ipaddress
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import app.database.session as db_session
+from app.database.session import pgbouncer_safe
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.features.products.models.product_view_count import ProductViewCount
+from app.features.products.services.trending_engine import trending_engine
+
+logger = get_logger("products.product_view_counter")
+
+# flush statement array parameter -> buffered row key
+VIEW_PARAMS = {
+    'ids': 'id', 'product_ids': 'product_id', 'user_ids': 'user_id', 'session_ids': 'session_id',
+    'ip_addresses': 'ip_address', 'user_agents': 'user_agent', 'referrers': 'referrer', 'viewed_ats': 'viewed_at',
+}
+
+
+def build_view_count_schema_statements() -> List[str]:
+    return [
+        """
+        CREATE TABLE IF NOT EXISTS product_view_counts (
+            product_id UUID NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+            day DATE NOT NULL,
+            views INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP NOT NULL DEFAULT now(),
+            PRIMARY KEY (product_id, day)
+        );
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_product_view_counts_day ON product_view_counts(day);",
+    ]
+
+
+# Views of products deleted since they were recorded are skipped rather than failing the batch, and
+# viewers without a users row (authenticated in Supabase only) are stored as anonymous views
+FLUSH_SQL = text("""
+    WITH batch AS (
+        SELECT v.id::uuid AS id, v.product_id::uuid AS product_id, u.id AS user_id, v.session_id,
+               v.ip_address::inet AS ip_address, v.user_agent, v.referrer, v.viewed_at
+        FROM unnest(
+            CAST(:ids AS text[]), CAST(:product_ids AS text[]), CAST(:user_ids AS text[]),
+            CAST(:session_ids AS text[]), CAST(:ip_addresses AS text[]), CAST(:user_agents AS text[]),
+            CAST(:referrers AS text[]), CAST(:viewed_ats AS timestamp[])
+        ) AS v(id, product_id, user_id, session_id, ip_address, user_agent, referrer, viewed_at)
+        JOIN products p ON p.id = v.product_id::uuid
+        LEFT JOIN users u ON u.id = v.user_id::uuid
+    ),
+    inserted AS (
+        INSERT INTO product_views (id, product_id, user_id, session_id, ip_address, user_agent, referrer,
+                                   viewed_at, created_at, updated_at)
+        SELECT id, product_id, user_id, session_id, ip_address, user_agent, referrer, viewed_at, viewed_at, viewed_at
+        FROM batch
+        RETURNING product_id, viewed_at
+    )
+    INSERT INTO product_view_counts (product_id, day, views, updated_at)
+    SELECT product_id, viewed_at::date, count(*), now()
+    FROM inserted
+    GROUP BY product_id, viewed_at::date
+    ON CONFLICT (product_id, day) DO UPDATE
+        SET views = product_view_counts.views + EXCLUDED.views,
+            updated_at = now()
+""")
+
+
+async def rebuild_view_counts() -> bool:
+    """Recompute the rollup from ``product_views``; used to seed the table"""
+    if not db_session.async_engine:
+        return False
+    try:
+        async with db_session.async_engine.begin() as conn:
+            # Flushes wait on the lock, so every raw row is counted exactly once
+            await conn.execute(text("LOCK TABLE product_view_counts IN EXCLUSIVE MODE"))
+            await conn.execute(text("DELETE FROM product_view_counts"))
+            await conn.execute(text("""
+                INSERT INTO product_view_counts (product_id, day, views, updated_at)
+                SELECT product_id, coalesce(viewed_at, created_at)::date, count(*), now()
+                FROM product_views
+                GROUP BY product_id, coalesce(viewed_at, created_at)::date
+            """))
+        product_view_counter.invalidate()
+        logger.info("Product view counts rebuilt")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to rebuild product view counts: {e}")
+        return False
+
+
+class ProductViewCounter:
+    def __init__(self, flush_interval: float = 2.0, batch_size: int = 500, max_buffer: int = 50000, count_ttl: int = 60):
+        self.flush_interval = flush_interval
+        self.batch_size = max(1, batch_size)
+        self.max_buffer = max(1, max_buffer)
+        self._rows: List[Dict[str, Any]] = []
+        # Views recorded but not yet committed: waiting in the buffer, and being written
+        self._pending: Counter = Counter()
+        self._inflight: Counter = Counter()
+        self._totals = TTLCache(maxsize=50000, ttl=count_ttl)
+        # Bumped after each commit; a total read from the database before then is not cached
+        self._generation = 0
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._flushing: Optional[asyncio.Future] = None
+        self._stats = {'recorded': 0, 'written': 0, 'batches': 0, 'dropped': 0, 'failed': 0, 'last_flush_ms': 0.0}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """Write everything still buffered"""
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        if self._flushing is not None and not self._flushing.done():
+            await self._flushing
+        while self._rows:
+            await self._flush()
+
+    def invalidate(self) -> None:
+        self._totals.clear()
+
+    async def record(
+        self,
+        product_id: str,
+        user_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+        ip_address: Optional[str] = None,
+        user_agent: Optional[str] = None,
+        referrer: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Buffer one view and return it as a ``product_views`` row; raises ValueError for a malformed id"""
+        product_id = str(uuid.UUID(str(product_id)))
+        try:
+            ip_address = str(ipaddress.ip_address(ip_address)) if ip_address else None
+        except ValueError:
+            ip_address = None
+        row = {
+            'id': str(uuid.uuid4()),
+            'product_id': product_id,
+            'user_id': str(uuid.UUID(str(user_id))) if user_id else None,
+            'session_id': session_id,
+            'ip_address': ip_address,
+            'user_agent': user_agent,
+            'referrer': referrer,
+            'viewed_at': datetime.utcnow(),
+        }
+        if self._task is None:
+            # Not running (scripts, or after shutdown): write straight through
+            self._rows.append(row)
+            self._pending[product_id] += 1
+            await self._flush()
+            return row
+        if len(self._rows) >= self.max_buffer:
+            self._stats['dropped'] += 1
+            logger.warning(f"Product view buffer full ({self.max_buffer}), dropping view of {product_id}")
+            return row
+        self._rows.append(row)
+        self._pending[product_id] += 1
+        self._stats['recorded'] += 1
+        if len(self._rows) >= self.batch_size:
+            self._wake.set()
+        return row
+
+    def unflushed(self, product_id: str) -> int:
+        return self._pending.get(product_id, 0) + self._inflight.get(product_id, 0)
+
+    async def view_count(self, db: AsyncSession, product_id: str) -> int:
+        product_id = str(product_id)
+        total = self._totals.get(product_id)
+        if total is None:
+            generation = self._generation
+            result = await db.execute(
+                select(func.coalesce(func.sum(ProductViewCount.views), 0))
+                .where(ProductViewCount.product_id == product_id)
+            )
+            total = int(result.scalar() or 0)
+            if generation == self._generation:
+                self._totals.set(product_id, total)
+        return total + self.unflushed(product_id)
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            while self._rows:
+                # Shielded so stop() can let an in-flight insert finish rather than abort it
+                self._flushing = asyncio.ensure_future(self._flush())
+                await asyncio.shield(self._flushing)
+
+    async def _flush(self) -> None:
+        rows, self._rows = self._rows[:self.batch_size], self._rows[self.batch_size:]
+        if not rows:
+            return
+        counts = Counter(row['product_id'] for row in rows)
+        self._pending -= counts
+        self._inflight += counts
+        start = time.perf_counter()
+        try:
+            if db_session.async_engine is None:
+                self._stats['dropped'] += len(rows)
+                return
+            params = {param: [row[key] for row in rows] for param, key in VIEW_PARAMS.items()}
+            async with db_session.async_engine.begin() as conn:
+                await conn.execute(pgbouncer_safe(FLUSH_SQL), params)
+            self._generation += 1
+            for product_id, views in counts.items():
+                total = self._totals.get(product_id)
+                if total is not None:
+                    self._totals.set(product_id, total + views)
+                trending_engine.record([product_id], weight=views)
+            self._stats['written'] += len(rows)
+            self._stats['batches'] += 1
+            self._stats['last_flush_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        except Exception as e:
+            self._stats['failed'] += len(rows)
+            logger.error(f"Writing {len(rows)} product views failed: {e}")
+        finally:
+            self._inflight -= counts
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            'running': self.running,
+            'buffered': len(self._rows),
+            'buffer_capacity': self.max_buffer,
+            'cached_totals': len(self._totals),
+            **self._stats,
+        }
+
+
+product_view_counter = ProductViewCounter(
+    flush_interval=settings.PRODUCT_VIEW_FLUSH_INTERVAL,
+    batch_size=settings.PRODUCT_VIEW_BATCH_SIZE,
+    max_buffer=settings.PRODUCT_VIEW_BUFFER_SIZE,
+    count_ttl=settings.PRODUCT_VIEW_COUNT_TTL
+)
@@ -0,0 +1,435 @@
+"""
+Sliding-window trending scores.
+
+Trending, best-seller, dashboard and fast-moving lists used to GROUP BY raw
+``product_views`` / ``user_activities`` joined to products on every request.
+This engine instead keeps one exponentially decayed score per product and
+window (hour, day, week, month). Each window's time constant equals its
+length, so a steady stream of events settles at roughly the number of events
+seen in one window. Product views (from the view counter) and add-to-cart /
+purchase activities (from activity ingestion) each add 1.
+
+Events first accumulate in this worker's local deltas. These use forward
+decay, so recording one is a dict update. Every TRENDING_CHECKPOINT_INTERVAL
+the deltas are merged into ``product_trending_scores``: the stored score is
+decayed to the checkpoint time, then the delta is added. The totals, merged
+from every worker, are then read back together with each listed product's
+category and brand. Every TRENDING_SNAPSHOT_INTERVAL those totals, plus any
+delta not yet checkpointed, are ranked into a top-k snapshot per window,
+overall and per category and brand. Reads only look up that snapshot.
+"""
+
+import asyncio
+import math
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import text
+
+import app.database.session as db_session
+from app.database.session import pgbouncer_safe
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.features.products.services.product_events import on_product_changed
+from app.features.products.services.product_facet_store import build_listed_predicate_sql
+
+logger = get_logger("products.trending_engine")
+
+# window -> time constant (seconds)
+WINDOWS = {
+    'hour': 3600,
+    'day': 86400,
+    'week': 7 * 86400,
+    'month': 30 * 86400,
+}
+WINDOW_NAMES = tuple(WINDOWS)
+TAUS = np.array([WINDOWS[name] for name in WINDOW_NAMES], dtype=np.float64)
+
+# Local deltas are rebased before exp() could overflow a float
+MAX_DECAY_EXPONENT = 600.0
+# Stored rows whose month score has decayed below this are pruned
+PRUNE_BELOW = 0.01
+PRUNE_INTERVAL = 3600
+SEED_DAYS = 90
+
+ENGAGEMENT_ACTIVITY_TYPES = ('add_to_cart', 'purchase')
+
+_NOW = "timezone('utc', now())"
+
+
+def _decayed_sql(column: str, tau: int, since: str) -> str:
+    # exp() raises on underflow in Postgres, hence the floor on the exponent
+    return f"{column} * exp(greatest(-extract(epoch FROM ({_NOW} - {since})) / {tau}, -700))"
+
+
+def build_trending_schema_statements() -> List[str]:
+    columns = ",\n            ".join(f"{name}_score DOUBLE PRECISION NOT NULL DEFAULT 0" for name in WINDOW_NAMES)
+    return [
+        f"""
+        CREATE TABLE IF NOT EXISTS product_trending_scores (
+            product_id UUID PRIMARY KEY REFERENCES products(id) ON DELETE CASCADE,
+            {columns},
+            updated_at TIMESTAMP NOT NULL DEFAULT now()
+        );
+        """,
+    ]
+
+
+def _checkpoint_sql() -> Any:
+    score_columns = ", ".join(f"{name}_score" for name in WINDOW_NAMES)
+    arrays = ", ".join(f"CAST(:{name} AS float8[])" for name in WINDOW_NAMES)
+    updates = ",\n            ".join(
+        f"{name}_score = product_trending_scores.{name}_score * exp(least(0, greatest("
+        f"-extract(epoch FROM (EXCLUDED.updated_at - product_trending_scores.updated_at)) / {tau}, -700))) "
+        f"+ EXCLUDED.{name}_score"
+        for name, tau in WINDOWS.items()
+    )
+    return text(f"""
+        INSERT INTO product_trending_scores (product_id, {score_columns}, updated_at)
+        SELECT v.product_id::uuid, {", ".join(f"v.{name}" for name in WINDOW_NAMES)}, CAST(:at AS timestamp)
+        FROM unnest(CAST(:product_ids AS text[]), {arrays}) AS v(product_id, {", ".join(WINDOW_NAMES)})
+        JOIN products p ON p.id = v.product_id::uuid
+        ON CONFLICT (product_id) DO UPDATE SET
+            {updates},
+            updated_at = greatest(EXCLUDED.updated_at, product_trending_scores.updated_at)
+    """)
+
+
+def _load_sql() -> Any:
+    scores = ", ".join(
+        f"{_decayed_sql(f's.{name}_score', tau, 's.updated_at')} AS {name}"
+        for name, tau in WINDOWS.items()
+    )
+    return text(f"""
+        SELECT s.product_id, p.category_id, p.brand_id, {scores}
+        FROM product_trending_scores s
+        JOIN products p ON p.id = s.product_id
+        WHERE {build_listed_predicate_sql('p')}
+    """)
+
+
+def _prune_sql() -> Any:
+    return text(f"""
+        DELETE FROM product_trending_scores
+        WHERE {_decayed_sql('month_score', WINDOWS['month'], 'updated_at')} < {PRUNE_BELOW}
+    """)
+
+
+def _seed_sql() -> Any:
+    scores = ", ".join(f"sum(exp(greatest(-e.age / {tau}, -700)))" for tau in WINDOWS.values())
+    return text(f"""
+        INSERT INTO product_trending_scores (product_id, {", ".join(f"{name}_score" for name in WINDOW_NAMES)}, updated_at)
+        SELECT e.product_id, {scores}, {_NOW}
+        FROM (
+            SELECT product_id, extract(epoch FROM ({_NOW} - viewed_at)) AS age
+            FROM product_views
+            WHERE viewed_at >= {_NOW} - INTERVAL '{SEED_DAYS} days'
+            UNION ALL
+            SELECT product_id, extract(epoch FROM ({_NOW} - created_at)) AS age
+            FROM user_activities
+            WHERE activity_type IN ({", ".join(f"'{t}'" for t in ENGAGEMENT_ACTIVITY_TYPES)})
+              AND product_id IS NOT NULL AND created_at >= {_NOW} - INTERVAL '{SEED_DAYS} days'
+        ) e
+        JOIN products p ON p.id = e.product_id
+        GROUP BY e.product_id
+        ON CONFLICT (product_id) DO NOTHING
+    """)
+
+
+CHECKPOINT_SQL = _checkpoint_sql()
+LOAD_SQL = _load_sql()
+PRUNE_SQL = _prune_sql()
+SEED_SQL = _seed_sql()
+
+
+def window_for_days(days: float) -> str:
+    """Shortest window covering a period of ``days``"""
+    for name, tau in WINDOWS.items():
+        if days * 86400 <= tau:
+            return name
+    return WINDOW_NAMES[-1]
+
+
+async def seed_trending_scores() -> bool:
+    """Fill an empty score table from the last SEED_DAYS of views and engagement"""
+    if not db_session.async_engine:
+        return False
+    try:
+        async with db_session.async_engine.begin() as conn:
+            await conn.execute(pgbouncer_safe(SEED_SQL))
+        logger.info("Trending scores seeded from history")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to seed trending scores: {e}")
+        return False
+
+
+def rank_groups(codes: np.ndarray, scores: np.ndarray, k: int) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+    """Top ``k`` rows per group code by score (best first; ties by row); rows scoring 0 are left out"""
+    candidates = np.flatnonzero(scores > 0)
+    if not len(candidates):
+        return {}
+    order = candidates[np.lexsort((candidates, -scores[candidates], codes[candidates]))]
+    group_codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, group_codes[1:] != group_codes[:-1]])
+    ends = np.r_[starts[1:], len(order)]
+    return {
+        int(group_codes[start]): (order[start:min(end, start + k)], scores[order[start:min(end, start + k)]])
+        for start, end in zip(starts, ends)
+    }
+
+
+class TrendingSnapshot:
+    """Immutable top-k lists per window for all products, each category and each brand"""
+
+    def __init__(self, ids: List[str], lists: Dict[Tuple[str, Optional[str], Optional[str]], List[Tuple[str, float]]]):
+        self.ids = ids
+        self.lists = lists
+        self.built_at = time.time()
+
+    @classmethod
+    def build(
+        cls,
+        ids: List[str],
+        category_ids: List[Optional[str]],
+        brand_ids: List[Optional[str]],
+        scores: np.ndarray,
+        k: int
+    ) -> "TrendingSnapshot":
+        category_keys = sorted({c for c in category_ids if c})
+        brand_keys = sorted({b for b in brand_ids if b})
+        category_code = {c: i for i, c in enumerate(category_keys)}
+        brand_code = {b: i for i, b in enumerate(brand_keys)}
+        categories = np.array([category_code.get(c, -1) for c in category_ids], dtype=np.int64)
+        brands = np.array([brand_code.get(b, -1) for b in brand_ids], dtype=np.int64)
+        everything = np.zeros(len(ids), dtype=np.int64)
+
+        lists: Dict[Tuple[str, Optional[str], Optional[str]], List[Tuple[str, float]]] = {}
+        for w, window in enumerate(WINDOW_NAMES):
+            column = np.ascontiguousarray(scores[:, w])
+            for kind, codes, keys in (('all', everything, [None]), ('category', categories, category_keys),
+                                      ('brand', brands, brand_keys)):
+                for code, (rows, row_scores) in rank_groups(codes, column, k).items():
+                    if code < 0:
+                        continue
+                    lists[(window, kind, keys[code])] = [
+                        (ids[row], round(score, 4)) for row, score in zip(rows.tolist(), row_scores.tolist())
+                    ]
+        return cls(ids, lists)
+
+    def top(self, window: str, kind: str = 'all', key: Optional[str] = None) -> List[Tuple[str, float]]:
+        return self.lists.get((window, kind, key), [])
+
+
+class TrendingEngine:
+    def __init__(self, snapshot_interval: float = 10.0, checkpoint_interval: float = 60.0, top_k: int = 100):
+        self.snapshot_interval = snapshot_interval
+        self.checkpoint_interval = checkpoint_interval
+        self.top_k = top_k
+        # Local, not yet checkpointed scores per product, forward-decayed from _landmark
+        self._landmark = time.time()
+        self._delta: Dict[str, List[float]] = {}
+        self._checkpointing: Dict[str, List[float]] = {}
+        # Merged totals as of _base_at, for listed products
+        self._base_at = time.time()
+        self._base_ids: List[str] = []
+        self._base_rows: Dict[str, int] = {}
+        self._base_category: List[Optional[str]] = []
+        self._base_brand: List[Optional[str]] = []
+        self._base_scores = np.zeros((0, len(WINDOW_NAMES)), dtype=np.float64)
+        self._snapshot: Optional[TrendingSnapshot] = None
+        self._catalog_changed = False
+        self._last_prune = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {'events': 0, 'checkpoints': 0, 'checkpoint_failures': 0, 'last_checkpoint_ms': 0.0,
+                       'snapshots': 0, 'last_snapshot_ms': 0.0}
+
+    @property
+    def ready(self) -> bool:
+        return self._snapshot is not None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """Checkpoint whatever this worker recorded since the last checkpoint"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self.checkpoint()
+
+    def record(self, product_ids: Iterable[Any], weight: float = 1.0, at: Optional[float] = None) -> None:
+        at = time.time() if at is None else at
+        exponents = (at - self._landmark) / TAUS
+        if exponents[0] > MAX_DECAY_EXPONENT:
+            self._rebase(at)
+            exponents = np.zeros(len(WINDOW_NAMES))
+        increments = [weight * math.exp(e) for e in exponents.tolist()]
+        for product_id in product_ids:
+            if not product_id:
+                continue
+            scores = self._delta.setdefault(str(product_id), [0.0] * len(WINDOW_NAMES))
+            for w, increment in enumerate(increments):
+                scores[w] += increment
+            self._stats['events'] += 1
+
+    @staticmethod
+    def _merge(target: Dict[str, List[float]], source: Dict[str, List[float]]) -> None:
+        for product_id, values in source.items():
+            scores = target.setdefault(product_id, [0.0] * len(WINDOW_NAMES))
+            for w, value in enumerate(values):
+                scores[w] += value
+
+    def _rebase(self, at: float) -> None:
+        scale = np.exp(-(at - self._landmark) / TAUS).tolist()
+        for deltas in (self._delta, self._checkpointing):
+            for scores in deltas.values():
+                for w, factor in enumerate(scale):
+                    scores[w] *= factor
+        self._landmark = at
+
+    def top(
+        self,
+        window: str,
+        k: int,
+        category_id: Optional[Any] = None,
+        brand_id: Optional[Any] = None
+    ) -> Optional[List[Tuple[str, float]]]:
+        """Best ``(product_id, score)`` pairs for a window; None until the first snapshot exists"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return None
+        if window not in WINDOWS:
+            window = 'week'
+        if category_id:
+            ranked = snapshot.top(window, 'category', str(category_id))
+            if brand_id:
+                # Only the category's top-k is kept, so a narrow brand may come back short
+                brand_rows = {product_id for product_id, _ in snapshot.top(window, 'brand', str(brand_id))}
+                ranked = [entry for entry in ranked if entry[0] in brand_rows]
+        elif brand_id:
+            ranked = snapshot.top(window, 'brand', str(brand_id))
+        else:
+            ranked = snapshot.top(window)
+        return ranked[:k]
+
+    def _current_scores(self) -> np.ndarray:
+        """Base totals plus every local delta, all decayed to now, aligned with the base rows"""
+        now = time.time()
+        scores = self._base_scores * np.exp(-(now - self._base_at) / TAUS)
+        scale = np.exp(-(now - self._landmark) / TAUS)
+        rows = self._base_rows
+        for deltas in (self._checkpointing, self._delta):
+            hits = [(rows[product_id], values) for product_id, values in deltas.items() if product_id in rows]
+            if hits:
+                index = np.fromiter((row for row, _ in hits), dtype=np.int64, count=len(hits))
+                np.add.at(scores, index, np.array([values for _, values in hits]) * scale)
+        return scores
+
+    async def refresh_snapshot(self) -> None:
+        start = time.perf_counter()
+        if self._catalog_changed:
+            await self._load_base()
+        scores = self._current_scores()
+        ids, categories, brands = self._base_ids, self._base_category, self._base_brand
+        self._snapshot = await asyncio.get_running_loop().run_in_executor(
+            None, TrendingSnapshot.build, ids, categories, brands, scores, self.top_k
+        )
+        self._stats['snapshots'] += 1
+        self._stats['last_snapshot_ms'] = round((time.perf_counter() - start) * 1000, 2)
+
+    async def _load_base(self) -> None:
+        if db_session.async_engine is None:
+            return
+        self._catalog_changed = False
+        async with db_session.async_engine.connect() as conn:
+            rows = (await conn.execute(pgbouncer_safe(LOAD_SQL))).all()
+        self._base_at = time.time()
+        self._base_ids = [str(row[0]) for row in rows]
+        self._base_rows = {product_id: i for i, product_id in enumerate(self._base_ids)}
+        self._base_category = [str(row[1]) if row[1] else None for row in rows]
+        self._base_brand = [str(row[2]) if row[2] else None for row in rows]
+        self._base_scores = np.array([row[3:] for row in rows], dtype=np.float64).reshape(len(rows), len(WINDOW_NAMES))
+
+    async def checkpoint(self) -> None:
+        """Merge local deltas into the shared table, then reload the merged totals"""
+        if db_session.async_engine is None:
+            return
+        start = time.perf_counter()
+        at = time.time()
+        self._rebase(at)
+        # Left over if a previous checkpoint was cancelled mid-write
+        self._merge(self._delta, self._checkpointing)
+        self._checkpointing, self._delta = self._delta, {}
+        try:
+            if self._checkpointing:
+                product_ids = list(self._checkpointing)
+                params = {'product_ids': product_ids, 'at': datetime.utcfromtimestamp(at)}
+                for w, name in enumerate(WINDOW_NAMES):
+                    params[name] = [self._checkpointing[product_id][w] for product_id in product_ids]
+                async with db_session.async_engine.begin() as conn:
+                    await conn.execute(pgbouncer_safe(CHECKPOINT_SQL), params)
+            if at - self._last_prune >= PRUNE_INTERVAL:
+                async with db_session.async_engine.begin() as conn:
+                    await conn.execute(pgbouncer_safe(PRUNE_SQL))
+                self._last_prune = at
+        except Exception as e:
+            self._stats['checkpoint_failures'] += 1
+            logger.error(f"Trending checkpoint failed: {e}")
+            # Keep the scores for the next attempt
+            self._merge(self._delta, self._checkpointing)
+            self._checkpointing = {}
+            return
+        try:
+            await self._load_base()
+        except Exception as e:
+            logger.error(f"Loading trending scores failed: {e}")
+        finally:
+            self._checkpointing = {}
+        self._stats['checkpoints'] += 1
+        self._stats['last_checkpoint_ms'] = round((time.perf_counter() - start) * 1000, 2)
+
+    async def _loop(self) -> None:
+        next_checkpoint = 0.0
+        while True:
+            try:
+                if time.monotonic() >= next_checkpoint:
+                    await self.checkpoint()
+                    next_checkpoint = time.monotonic() + self.checkpoint_interval
+                await self.refresh_snapshot()
+            except Exception as e:
+                logger.error(f"Trending refresh failed: {e}")
+            await asyncio.sleep(self.snapshot_interval)
+
+    def invalidate_catalog(self) -> None:
+        self._catalog_changed = True
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            'ready': self.ready,
+            'products': len(self._base_ids),
+            'pending_products': len(self._delta),
+            'snapshot_age_s': round(time.time() - self._snapshot.built_at, 1) if self._snapshot else None,
+            **self._stats,
+        }
+
+
+trending_engine = TrendingEngine(
+    snapshot_interval=settings.TRENDING_SNAPSHOT_INTERVAL,
+    checkpoint_interval=settings.TRENDING_CHECKPOINT_INTERVAL,
+    top_k=settings.TRENDING_TOP_K
+)
+
+
+@on_product_changed
+def _reload_trending_catalog(product_id: str, change: str, product: Optional[Dict[str, Any]]) -> None:
+    # Category, brand or listing changes take effect at the next snapshot
+    trending_engine.invalidate_catalog()
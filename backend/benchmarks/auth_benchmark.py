@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Auth overhead per request: local JWT verification and the principal cache.
+
+Mints HS256 tokens (with SUPABASE_JWT_SECRET, or a throwaway secret) and
+ES256 tokens checked against an in-memory JWKS. It then times:
+
+  * cold verification: every token is new
+  * warm verification: the same tokens again, served from the verified-token LRU
+  * authenticate_token: verification plus the users row, cold and then cached
+    (only when DATABASE_URL is reachable; pass --user-id to pick the user)
+
+It also counts outbound Supabase calls made during the timed runs, which
+should be zero. Pass --legacy-token with a real access token to time the old
+per-request supabase.auth.get_user() round trip for comparison.
+
+    python benchmarks/auth_benchmark.py --requests 5000
+"""
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+
+sys.path.insert(0, '.')
+
+from jose import jwk, jwt
+
+import app.core.security as security
+import app.database.session as db_session
+from app.core.config import settings
+from app.core.role_auth import _claims_via_supabase_api, _principals, authenticate_token
+from app.database.base import get_supabase_rest_client
+from app.database.session import init_database
+from benchmarks.common import summarize, print_table, timed
+
+
+def mint_hs256(count: int, user_id: str) -> list:
+    now = int(time.time())
+    return [
+        jwt.encode({
+            "sub": user_id, "aud": settings.SUPABASE_AUDIENCE, "iss": settings.SUPABASE_ISSUER or None,
+            "exp": now + 3600, "iat": now, "session_id": str(uuid.uuid4()), "email": "bench@example.com",
+        }, settings.SUPABASE_JWT_SECRET, algorithm="HS256")
+        for _ in range(count)
+    ]
+
+
+def mint_es256(count: int, user_id: str) -> list:
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+
+    private_key = ec.generate_private_key(ec.SECP256R1())
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    public_jwk = jwk.construct(private_pem, algorithm="ES256").public_key().to_dict()
+    public_jwk.update({"kid": "bench-key", "alg": "ES256", "use": "sig"})
+    # Stand in for a fetched key set so no request reaches the network
+    security._jwks_cache = {"keys": [public_jwk]}
+    security._jwks_cache_ts = time.time()
+    security._jwks_keys = {}
+
+    now = int(time.time())
+    return [
+        jwt.encode({
+            "sub": user_id, "aud": settings.SUPABASE_AUDIENCE, "iss": settings.SUPABASE_ISSUER or None,
+            "exp": now + 3600, "iat": now, "session_id": str(uuid.uuid4()),
+        }, private_pem, algorithm="ES256", headers={"kid": "bench-key"})
+        for _ in range(count)
+    ]
+
+
+async def time_verify(tokens: list) -> list:
+    samples = []
+    for token in tokens:
+        with timed(samples):
+            await security.verify_access_token(token)
+    return samples
+
+
+async def time_authenticate(tokens: list) -> list:
+    samples = []
+    async with db_session.AsyncSessionLocal() as db:
+        for token in tokens:
+            with timed(samples):
+                await authenticate_token(db, token)
+    return samples
+
+
+def outbound_calls() -> int:
+    return sum(stats["calls"] for stats in get_supabase_rest_client().metrics().values())
+
+
+async def main(args) -> None:
+    if not settings.SUPABASE_JWT_SECRET:
+        settings.SUPABASE_JWT_SECRET = "benchmark-secret-" + uuid.uuid4().hex
+    user_id = args.user_id or str(uuid.uuid4())
+    rows = {}
+    calls_before = outbound_calls()
+
+    for alg, mint in (("HS256", mint_hs256), ("ES256", mint_es256)):
+        tokens = mint(args.requests, user_id)
+        security._verified_tokens.clear()
+        rows[f"{alg} verify (cold)"] = summarize(await time_verify(tokens))
+        rows[f"{alg} verify (warm LRU)"] = summarize(await time_verify(tokens))
+
+    if await init_database():
+        tokens = mint_hs256(args.requests, user_id)
+        security._verified_tokens.clear()
+        _principals.clear()
+        cold = await time_authenticate(tokens[:1])
+        rows["authenticate (cold user)"] = summarize(cold)
+        rows["authenticate (warm)"] = summarize(await time_authenticate(tokens))
+        await db_session.close_database_connections()
+    else:
+        print("DATABASE_URL not reachable; skipping authenticate_token cases")
+
+    outbound = outbound_calls() - calls_before
+
+    if args.legacy_token:
+        samples = []
+        for _ in range(args.legacy_requests):
+            with timed(samples):
+                await asyncio.get_running_loop().run_in_executor(None, _claims_via_supabase_api, args.legacy_token)
+        rows["legacy auth.get_user()"] = summarize(samples)
+
+    print_table(f"auth overhead per request ({args.requests} tokens)", rows)
+    print(f"\noutbound Supabase calls during local verification: {outbound}")
+    if outbound:
+        raise SystemExit("FAIL: local verification reached the network")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--user-id", help="users.id to authenticate as (defaults to a random, unknown user)")
+    parser.add_argument("--legacy-token", help="real access token to time the network get_user() path")
+    parser.add_argument("--legacy-requests", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Behaviour profile cost per tracked event: full rebuild vs incremental counters.
+
+Generates one synthetic user with --events activities spread over 30 days
+(mixed categories, brands, prices, orders and sessions). The old path rebuilt
+the profile from the user's whole history on every event, so event n cost a
+fold over n rows. That rebuild is timed at every --sample-every'th event and
+the total is extrapolated. The incremental path applies each event to
+BehaviorCounters and reads the metrics. At the end both profiles are
+compared, and they must match exactly.
+
+    python benchmarks/behavior_profile_benchmark.py --events 10000
+"""
+import argparse
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+sys.path.insert(0, '.')
+
+from app.features.analytics.services.behavior_aggregator import BehaviorCounters
+from benchmarks.common import summarize, print_table, timed
+
+
+def synthetic_history(count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    categories = [uuid.uuid4() for _ in range(12)]
+    brands = [uuid.uuid4() for _ in range(20)]
+    moment = datetime.utcnow() - timedelta(days=30)
+    step = 30 * 86400 / count
+    events = []
+    for n in range(count):
+        moment += timedelta(seconds=rng.uniform(0.2, 1.8) * step)
+        ordered = rng.random() < 0.01
+        events.append(SimpleNamespace(
+            user_id="bench-user",
+            session_id=f"session-{n // 25}",
+            created_at=moment,
+            category_id=rng.choice(categories) if rng.random() < 0.8 else None,
+            brand_id=rng.choice(brands) if rng.random() < 0.6 else None,
+            price=round(rng.lognormvariate(3.5, 0.6), 2) if rng.random() < 0.7 else None,
+            time_spent=rng.randint(5, 600) if rng.random() < 0.5 else None,
+            order_value=round(rng.uniform(20, 400), 2) if ordered else None,
+            device_type=rng.choice(["mobile", "mobile", "desktop", "tablet"]),
+            click_count=rng.randint(0, 3),
+            view_count=rng.randint(0, 4),
+        ))
+    return events
+
+
+def main(args) -> None:
+    events = synthetic_history(args.events, args.seed)
+
+    rebuild_samples = []
+    sampled_rows = 0
+    for n in range(args.sample_every, len(events) + 1, args.sample_every):
+        with timed(rebuild_samples):
+            BehaviorCounters.from_activities(events[:n]).metrics()
+        sampled_rows += n
+    # Cost per row folded, applied to the 1 + 2 + ... + N rows the old path folded in total
+    per_row_ms = sum(rebuild_samples) / sampled_rows
+    rebuild_total_s = per_row_ms * len(events) * (len(events) + 1) / 2 / 1000
+
+    counters = BehaviorCounters()
+    apply_samples = []
+    metrics_samples = []
+    start = time.perf_counter()
+    for event in events:
+        with timed(apply_samples):
+            counters.apply(event)
+        if len(apply_samples) % args.sample_every == 0:
+            with timed(metrics_samples):
+                counters.metrics()
+    incremental_total_s = time.perf_counter() - start
+
+    print_table(f"one user, {len(events)} events", {
+        f"full rebuild (every {args.sample_every})": summarize(rebuild_samples),
+        "incremental apply": summarize(apply_samples),
+        "incremental metrics()": summarize(metrics_samples),
+    })
+    print(f"\nfull rebuild on every event (extrapolated): {rebuild_total_s:.1f} s")
+    print(f"incremental, all events:                   {incremental_total_s:.3f} s")
+    print(f"speedup: {rebuild_total_s / incremental_total_s:.0f}x")
+
+    expected = BehaviorCounters.from_activities(events).metrics()
+    if counters.metrics() != expected:
+        raise SystemExit("FAIL: incremental counters diverged from a full rebuild")
+    print("incremental profile matches a full rebuild")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=10000)
+    parser.add_argument("--sample-every", type=int, default=250)
+    parser.add_argument("--seed", type=int, default=7)
+    main(parser.parse_args())
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Checkout throughput benchmark: OrderCRUD.create_order_from_cart with large carts.
+
+Seeds a catalog with tracked inventory and a buyer address into the database
+pointed to by DATABASE_URL. It then repeatedly fills the buyer's cart with
+N lines (20 by default) and checks it out. Refilling the cart is not timed.
+Reports orders/sec and per-order latency. Use a scratch database; seeded
+products and the orders created here are removed at the end unless --keep is
+passed.
+
+    python benchmarks/checkout_benchmark.py --orders 200 --lines 20
+"""
+import argparse
+import asyncio
+import sys
+import uuid
+
+sys.path.insert(0, '.')
+
+from sqlalchemy import text
+
+import app.database.session as db_session
+from app.database.session import init_database
+from app.database.indexes import create_reservation_infrastructure
+from app.features.orders.cruds.order_crud import OrderCRUD
+from app.features.orders.requests.order_request import OrderCreateRequest
+from benchmarks.common import summarize, print_table, timed
+
+SKU_PREFIX = "BENCH-CHECKOUT-"
+CATEGORY_SLUG = "bench-checkout-category"
+ADDRESS_LABEL = "bench-checkout"
+
+
+async def seed(products: int, stock: int) -> dict:
+    async with db_session.async_engine.begin() as conn:
+        user_id = (await conn.execute(text("SELECT id FROM users ORDER BY created_at LIMIT 1"))).scalar()
+        if user_id is None:
+            raise SystemExit("No users found; create at least one user before seeding")
+        await conn.execute(text(
+            "INSERT INTO categories (id, name, slug, is_active, created_at, updated_at) "
+            "VALUES (gen_random_uuid(), 'Benchmark', :slug, true, now(), now()) ON CONFLICT (slug) DO NOTHING"
+        ), {"slug": CATEGORY_SLUG})
+        category_id = (await conn.execute(
+            text("SELECT id FROM categories WHERE slug = :slug"), {"slug": CATEGORY_SLUG}
+        )).scalar()
+        await conn.execute(text("""
+            INSERT INTO products (id, supplier_id, category_id, sku, name, slug, price, status, approval_status,
+                                  visibility, tags, materials, created_at, updated_at)
+            SELECT gen_random_uuid(), :user_id, :category_id, CAST(:prefix AS text) || g, 'Checkout benchmark ' || g,
+                   lower(CAST(:prefix AS text)) || g, 10 + g, 'ACTIVE', 'approved', 'visible', '[]'::jsonb, '[]'::jsonb,
+                   now(), now()
+            FROM generate_series(1, :count) AS g
+        """), {"user_id": user_id, "category_id": category_id, "prefix": SKU_PREFIX, "count": products})
+        await conn.execute(text("""
+            INSERT INTO product_inventory (id, product_id, quantity, reserved_quantity, created_at, updated_at)
+            SELECT gen_random_uuid(), id, :stock, 0, now(), now() FROM products WHERE sku LIKE :pattern
+        """), {"stock": stock, "pattern": f"{SKU_PREFIX}%"})
+        product_ids = [row[0] for row in (await conn.execute(
+            text("SELECT id FROM products WHERE sku LIKE :pattern ORDER BY sku"), {"pattern": f"{SKU_PREFIX}%"}
+        )).all()]
+
+        address_id = uuid.uuid4()
+        await conn.execute(text("""
+            INSERT INTO addresses (id, user_id, type, label, address_line_1, city, state, postal_code, country,
+                                   is_default, created_at, updated_at)
+            VALUES (:id, :user_id, 'HOME', :label, '1 Benchmark Road', 'Pune', 'MH', '411001', 'India', false, now(), now())
+        """), {"id": address_id, "user_id": user_id, "label": ADDRESS_LABEL})
+
+        await conn.execute(text("""
+            INSERT INTO carts (id, user_id, currency, subtotal, tax_amount, shipping_amount, discount_amount,
+                               total_amount, expires_at, created_at, updated_at)
+            SELECT gen_random_uuid(), :user_id, 'INR', 0, 0, 0, 0, 0, now() + interval '30 days', now(), now()
+            WHERE NOT EXISTS (SELECT 1 FROM carts WHERE user_id = :user_id)
+        """), {"user_id": user_id})
+        cart_id = (await conn.execute(text("SELECT id FROM carts WHERE user_id = :user_id"), {"user_id": user_id})).scalar()
+    return {"user_id": user_id, "address_id": address_id, "cart_id": cart_id, "product_ids": product_ids}
+
+
+async def fill_cart(fixture: dict, lines: int, offset: int) -> None:
+    product_ids = fixture["product_ids"]
+    picked = [product_ids[(offset + n) % len(product_ids)] for n in range(lines)]
+    async with db_session.async_engine.begin() as conn:
+        await conn.execute(text("DELETE FROM cart_items WHERE cart_id = :cart_id"), {"cart_id": fixture["cart_id"]})
+        await conn.execute(text("""
+            INSERT INTO cart_items (id, cart_id, product_id, quantity, unit_price, total_price, created_at, updated_at)
+            SELECT gen_random_uuid(), :cart_id, p.id, 1, p.price, p.price, now(), now()
+            FROM products p WHERE p.id = ANY(:ids)
+        """), {"cart_id": fixture["cart_id"], "ids": picked})
+        await conn.execute(text("""
+            UPDATE carts SET subtotal = t.total, total_amount = t.total
+            FROM (SELECT coalesce(sum(total_price), 0) AS total FROM cart_items WHERE cart_id = :cart_id) t
+            WHERE carts.id = :cart_id
+        """), {"cart_id": fixture["cart_id"]})
+
+
+async def cleanup(fixture: dict) -> None:
+    async with db_session.async_engine.begin() as conn:
+        await conn.execute(text(
+            "DELETE FROM orders WHERE id IN (SELECT order_id FROM order_items oi JOIN products p ON p.id = oi.product_id "
+            "WHERE p.sku LIKE :pattern)"
+        ), {"pattern": f"{SKU_PREFIX}%"})
+        if fixture:
+            await conn.execute(text("DELETE FROM cart_items WHERE cart_id = :cart_id"), {"cart_id": fixture["cart_id"]})
+            await conn.execute(text("DELETE FROM addresses WHERE id = :id"), {"id": fixture["address_id"]})
+        await conn.execute(text("DELETE FROM products WHERE sku LIKE :pattern"), {"pattern": f"{SKU_PREFIX}%"})
+        await conn.execute(text("DELETE FROM categories WHERE slug = :slug"), {"slug": CATEGORY_SLUG})
+
+
+async def main(args) -> None:
+    if not await init_database():
+        raise SystemExit("DATABASE_URL is not configured or unreachable")
+    if not await create_reservation_infrastructure():
+        print("warning: reservation infrastructure incomplete")
+
+    fixture = None
+    try:
+        fixture = await seed(max(args.lines * 5, 100), stock=args.orders * args.lines + 1000)
+        crud = OrderCRUD()
+        request = OrderCreateRequest(billing_address_id=str(fixture["address_id"]), payment_method="cod")
+        samples = []
+        for n in range(args.orders):
+            await fill_cart(fixture, args.lines, offset=n * args.lines)
+            async with db_session.AsyncSessionLocal() as db:
+                with timed(samples):
+                    await crud.create_order_from_cart(db, fixture["user_id"], request)
+        checkout_time = sum(samples) / 1000
+
+        print_table(f"create_order_from_cart, {args.lines}-line carts", {"checkout": summarize(samples)})
+        print(f"\nthroughput: {args.orders / checkout_time:.1f} orders/sec ({args.orders * args.lines / checkout_time:.0f} lines/sec)")
+    finally:
+        if not args.keep:
+            await cleanup(fixture)
+        await db_session.close_database_connections()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--lines", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="keep seeded rows for repeated runs")
+    asyncio.run(main(parser.parse_args()))
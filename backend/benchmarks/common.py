@@ -0,0 +1,48 @@
+"""
+Shared helpers for the backend benchmark scripts.
+
+Run benchmarks from the backend directory, e.g. ``python benchmarks/search_benchmark.py``.
+"""
+import statistics
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of ``samples``"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def summarize(samples_ms: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(samples_ms),
+        "mean_ms": statistics.fmean(samples_ms) if samples_ms else 0.0,
+        "p50_ms": percentile(samples_ms, 50),
+        "p99_ms": percentile(samples_ms, 99),
+        "max_ms": max(samples_ms) if samples_ms else 0.0,
+    }
+
+
+def print_table(title: str, rows: Dict[str, Dict[str, float]]) -> None:
+    print(f"\n{title}")
+    print("=" * len(title))
+    print(f"{'case':<28}{'count':>8}{'mean ms':>12}{'p50 ms':>12}{'p99 ms':>12}{'max ms':>12}")
+    for name, stats in rows.items():
+        print(
+            f"{name:<28}{stats['count']:>8}{stats['mean_ms']:>12.3f}"
+            f"{stats['p50_ms']:>12.3f}{stats['p99_ms']:>12.3f}{stats['max_ms']:>12.3f}"
+        )
+
+
+@contextmanager
+def timed(samples_ms: List[float]):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        samples_ms.append((time.perf_counter() - start) * 1000)
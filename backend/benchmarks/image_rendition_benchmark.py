@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Image rendition throughput: serial in-process rendering vs the process pool.
+
+Renders every size of each image in a fixture corpus. The corpus is either
+the JPEG/PNG/WebP files in --corpus or N synthetic photos generated with
+Pillow (mixed resolutions, some with alpha). Each image is rendered once
+serially on the calling process, which is what a request handler used to do
+on the event loop, and once through RenditionEngine.render_many. The report
+shows per-image latency, images/sec and images/sec per worker core.
+
+    python benchmarks/image_rendition_benchmark.py --images 48 --workers 4
+"""
+import argparse
+import asyncio
+import io
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, '.')
+
+from app.core.image_renditions import RenditionEngine, render_image
+from benchmarks.common import summarize, print_table, timed
+
+FIXTURE_SIZES = [(4000, 3000), (3024, 4032), (1920, 1080), (1200, 1200), (800, 600)]
+
+
+def synthetic_corpus(count: int, seed: int) -> list:
+    from PIL import Image, ImageDraw, ImageFilter
+
+    rng = random.Random(seed)
+    corpus = []
+    for n in range(count):
+        width, height = FIXTURE_SIZES[n % len(FIXTURE_SIZES)]
+        mode = 'RGBA' if n % 4 == 0 else 'RGB'
+        image = Image.new(mode, (width, height), (255, 255, 255, 0) if mode == 'RGBA' else (255, 255, 255))
+        draw = ImageDraw.Draw(image)
+        for _ in range(60):
+            x, y = rng.randrange(width), rng.randrange(height)
+            radius = rng.randrange(20, max(21, width // 4))
+            color = tuple(rng.randrange(256) for _ in range(len(mode)))
+            draw.ellipse((x - radius, y - radius, x + radius, y + radius), fill=color)
+        # Blur so the encoders see photo-like gradients rather than flat shapes
+        image = image.filter(ImageFilter.GaussianBlur(3))
+        output = io.BytesIO()
+        image.save(output, format='PNG' if mode == 'RGBA' else 'JPEG', quality=92)
+        corpus.append(output.getvalue())
+    return corpus
+
+
+def load_corpus(directory: str) -> list:
+    paths = sorted(
+        p for p in Path(directory).iterdir()
+        if p.suffix.lower() in ('.jpg', '.jpeg', '.png', '.webp')
+    )
+    if not paths:
+        raise SystemExit(f"No images found in {directory}")
+    return [p.read_bytes() for p in paths]
+
+
+def run_serial(corpus: list, compression_level: str) -> tuple:
+    samples = []
+    start = time.perf_counter()
+    for data in corpus:
+        with timed(samples):
+            render_image(data, compression_level)
+    return samples, time.perf_counter() - start
+
+
+async def run_pool(engine: RenditionEngine, corpus: list, compression_level: str) -> tuple:
+    samples = []
+
+    async def render(data: bytes) -> None:
+        with timed(samples):
+            await engine.render(data, compression_level)
+
+    # Warm the pool so worker start-up is not billed to the first images
+    await engine.render(corpus[0], compression_level)
+    start = time.perf_counter()
+    await asyncio.gather(*(render(data) for data in corpus))
+    return samples, time.perf_counter() - start
+
+
+async def main(args) -> None:
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.images, args.seed)
+    source_mb = sum(len(data) for data in corpus) / (1024 * 1024)
+    print(f"corpus: {len(corpus)} images, {source_mb:.1f} MB")
+
+    engine = RenditionEngine(max_workers=args.workers or None, max_pending=args.max_pending or None)
+    try:
+        serial_samples, serial_time = run_serial(corpus, args.compression)
+        pool_samples, pool_time = await run_pool(engine, corpus, args.compression)
+    finally:
+        engine.shutdown()
+
+    print_table(
+        f"render all sizes, compression={args.compression}, {engine.max_workers} workers",
+        {"serial (per image)": summarize(serial_samples), "process pool (per image)": summarize(pool_samples)}
+    )
+    print(f"\n{'mode':<16}{'images/sec':>12}{'cores':>8}{'images/sec/core':>18}")
+    for mode, elapsed, cores in (("serial", serial_time, 1), ("process pool", pool_time, engine.max_workers)):
+        rate = len(corpus) / elapsed
+        print(f"{mode:<16}{rate:>12.2f}{cores:>8}{rate / cores:>18.2f}")
+    print(f"\nspeedup: {serial_time / pool_time:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="directory of images to use instead of the synthetic corpus")
+    parser.add_argument("--images", type=int, default=48)
+    parser.add_argument("--workers", type=int, default=0, help="pool size (0 = CPU count)")
+    parser.add_argument("--max-pending", type=int, default=0)
+    parser.add_argument("--compression", default="auto", choices=["auto", "high", "medium", "low"])
+    parser.add_argument("--seed", type=int, default=7)
+    asyncio.run(main(parser.parse_args()))
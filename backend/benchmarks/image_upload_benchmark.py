@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Rendition upload throughput: serial uploads vs the bounded upload scheduler.
+
+Runs offline against the local filesystem backend in a temp directory. Each
+upload is delayed by --latency-ms (with jitter) to stand in for the storage
+round trip; every Nth attempt can be made to fail (--fail-every) to exercise
+retries. The workload is P products x I images x 5 renditions with realistic
+encoded sizes. The baseline uploads one rendition at a time, as
+upload_vendor_image did; the scheduler fans out under --concurrency.
+Reports wall time, uploads/sec and the per-bucket latency histogram.
+
+    python benchmarks/image_upload_benchmark.py --products 10 --images 8 --latency-ms 40
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, '.')
+
+from app.core.upload_scheduler import LocalStorageBackend, UploadScheduler
+from benchmarks.common import summarize, print_table, timed
+
+# (bucket, typical encoded size) per rendition, matching OptimizedStorageService._get_bucket_for_size
+RENDITIONS = {
+    'original': ('product-assets', 600_000),
+    'large': ('product-assets', 180_000),
+    'medium': ('compressed-images', 90_000),
+    'small': ('compressed-images', 30_000),
+    'thumbnail': ('thumbnails', 6_000),
+}
+
+
+class SimulatedNetworkBackend:
+    """Local backend plus a per-call delay and optional injected failures"""
+
+    name = "simulated"
+
+    def __init__(self, inner: LocalStorageBackend, latency_ms: float, fail_every: int, seed: int):
+        self.inner = inner
+        self.latency_ms = latency_ms
+        self.fail_every = fail_every
+        self._rng = random.Random(seed)
+        self._calls = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def upload(self, bucket, path, data):
+        with self._lock:
+            call = next(self._calls)
+            delay = self.latency_ms * self._rng.uniform(0.5, 1.5) / 1000
+        time.sleep(delay)
+        if self.fail_every and call % self.fail_every == 0:
+            raise ConnectionError("injected transient failure")
+        return self.inner.upload(bucket, path, data)
+
+    def delete(self, bucket, path):
+        return self.inner.delete(bucket, path)
+
+
+def build_workload(products: int, images: int) -> list:
+    payloads = {name: os.urandom(size) for name, (_, size) in RENDITIONS.items()}
+    return [
+        (bucket, f"bench/p{p}/i{i}/{name}.jpg", payloads[name])
+        for p in range(products)
+        for i in range(images)
+        for name, (bucket, _) in RENDITIONS.items()
+    ]
+
+
+async def run_serial(scheduler: UploadScheduler, workload: list) -> tuple:
+    samples = []
+    start = time.perf_counter()
+    for bucket, path, data in workload:
+        with timed(samples):
+            await scheduler.upload(bucket, path, data)
+    return samples, time.perf_counter() - start
+
+
+async def run_concurrent(scheduler: UploadScheduler, workload: list) -> tuple:
+    samples = []
+
+    async def upload(bucket, path, data):
+        with timed(samples):
+            await scheduler.upload(bucket, path, data)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(upload(*item) for item in workload))
+    return samples, time.perf_counter() - start
+
+
+async def main(args) -> None:
+    workload = build_workload(args.products, args.images)
+    total_mb = sum(len(data) for _, _, data in workload) / (1024 * 1024)
+    print(f"workload: {len(workload)} uploads ({args.products} products x {args.images} images x "
+          f"{len(RENDITIONS)} renditions), {total_mb:.1f} MB, ~{args.latency_ms:.0f} ms per round trip")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as root:
+        for mode, concurrency in (("serial", 1), ("scheduler", args.concurrency)):
+            backend = SimulatedNetworkBackend(
+                LocalStorageBackend(root=os.path.join(root, mode), url_base="/media"),
+                args.latency_ms, args.fail_every, args.seed
+            )
+            scheduler = UploadScheduler(backend, max_concurrency=concurrency, max_retries=args.retries, backoff=0.01)
+            try:
+                runner = run_serial if mode == "serial" else run_concurrent
+                samples, elapsed = await runner(scheduler, workload)
+            finally:
+                scheduler.shutdown()
+            results[mode] = (samples, elapsed, scheduler.metrics())
+
+    print_table("per-upload latency (including queueing)", {mode: summarize(r[0]) for mode, r in results.items()})
+    print(f"\n{'mode':<12}{'wall s':>10}{'uploads/sec':>14}{'MB/s':>10}")
+    for mode, (_, elapsed, _) in results.items():
+        print(f"{mode:<12}{elapsed:>10.2f}{len(workload) / elapsed:>14.1f}{total_mb / elapsed:>10.1f}")
+    print(f"\nspeedup: {results['serial'][1] / results['scheduler'][1]:.1f}x")
+
+    print(f"\nscheduler latency histogram per bucket (concurrency={args.concurrency})")
+    for bucket, snapshot in results["scheduler"][2].items():
+        print(f"  {bucket}: calls={snapshot['calls']} errors={snapshot['errors']} retries={snapshot['retries']} "
+              f"p50<={snapshot['p50_ms']}ms p99<={snapshot['p99_ms']}ms")
+        print("    " + " ".join(f"{label}={count}" for label, count in snapshot['buckets'].items() if count))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=10)
+    parser.add_argument("--images", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=40.0)
+    parser.add_argument("--fail-every", type=int, default=0, help="fail every Nth attempt (0 = never)")
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=7)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Inventory reservation stress test: concurrent checkouts against scarce stock.
+
+Seeds a few products with limited stock into the database pointed to by
+DATABASE_URL, then fires N concurrent checkouts (500 by default). Each
+checkout reserves a random multi-line cart. It runs twice: once with the
+legacy read / compare / write pattern, and once with the single-statement
+reservation engine. For each pattern it reports latency, how many checkouts
+were granted, and whether more units were granted than existed (oversell).
+Use a scratch database; seeded rows are removed at the end unless --keep is
+passed.
+
+    python benchmarks/inventory_reservation_benchmark.py --checkouts 500 --stock 100
+"""
+import argparse
+import asyncio
+import random
+import sys
+import uuid
+
+sys.path.insert(0, '.')
+
+from sqlalchemy import text
+
+import app.database.session as db_session
+from app.database.session import init_database
+from app.database.indexes import create_reservation_infrastructure
+from app.features.products.services.inventory_reservations import reservation_engine
+from benchmarks.common import summarize, print_table, timed
+
+SKU_PREFIX = "BENCH-RESERVE-"
+CATEGORY_SLUG = "bench-reserve-category"
+
+
+async def seed(products: int, stock: int) -> list:
+    async with db_session.async_engine.begin() as conn:
+        supplier_id = (await conn.execute(text("SELECT id FROM users ORDER BY created_at LIMIT 1"))).scalar()
+        if supplier_id is None:
+            raise SystemExit("No users found; create at least one user before seeding")
+        await conn.execute(text(
+            "INSERT INTO categories (id, name, slug, is_active, created_at, updated_at) "
+            "VALUES (gen_random_uuid(), 'Benchmark', :slug, true, now(), now()) ON CONFLICT (slug) DO NOTHING"
+        ), {"slug": CATEGORY_SLUG})
+        category_id = (await conn.execute(
+            text("SELECT id FROM categories WHERE slug = :slug"), {"slug": CATEGORY_SLUG}
+        )).scalar()
+
+        product_ids = []
+        for n in range(products):
+            product_id = uuid.uuid4()
+            await conn.execute(text("""
+                INSERT INTO products (id, supplier_id, category_id, sku, name, slug, price, status, approval_status,
+                                      visibility, tags, materials, created_at, updated_at)
+                VALUES (:id, :supplier_id, :category_id, :sku, :name, lower(:sku), 10, 'ACTIVE', 'approved',
+                        'visible', '[]'::jsonb, '[]'::jsonb, now(), now())
+            """), {
+                "id": product_id, "supplier_id": supplier_id, "category_id": category_id,
+                "sku": f"{SKU_PREFIX}{n}", "name": f"Reservation benchmark {n}",
+            })
+            await conn.execute(text("""
+                INSERT INTO product_inventory (id, product_id, quantity, reserved_quantity, created_at, updated_at)
+                VALUES (gen_random_uuid(), :product_id, :stock, 0, now(), now())
+            """), {"product_id": product_id, "stock": stock})
+            product_ids.append(product_id)
+    return product_ids
+
+
+async def reset_stock(product_ids: list, stock: int) -> None:
+    async with db_session.async_engine.begin() as conn:
+        await conn.execute(text("DELETE FROM inventory_reservations WHERE reference LIKE 'bench-%'"))
+        await conn.execute(
+            text("UPDATE product_inventory SET quantity = :stock, reserved_quantity = 0 WHERE product_id = ANY(:ids)"),
+            {"stock": stock, "ids": product_ids}
+        )
+
+
+async def cleanup() -> None:
+    async with db_session.async_engine.begin() as conn:
+        await conn.execute(text("DELETE FROM inventory_reservations WHERE reference LIKE 'bench-%'"))
+        await conn.execute(text("DELETE FROM products WHERE sku LIKE :prefix"), {"prefix": f"{SKU_PREFIX}%"})
+        await conn.execute(text("DELETE FROM categories WHERE slug = :slug"), {"slug": CATEGORY_SLUG})
+
+
+def random_cart(product_ids: list) -> list:
+    picked = random.sample(product_ids, k=random.randint(1, min(3, len(product_ids))))
+    return [(product_id, None, random.randint(1, 3)) for product_id in picked]
+
+
+async def legacy_checkout(cart: list) -> bool:
+    """The previous reserve_inventory pattern: read, compare in Python, write the new value"""
+    async with db_session.AsyncSessionLocal() as db:
+        for product_id, _, quantity in cart:
+            row = (await db.execute(
+                text("SELECT id, quantity, reserved_quantity FROM product_inventory WHERE product_id = :id AND variant_id IS NULL"),
+                {"id": product_id}
+            )).first()
+            if row is None or row.quantity - row.reserved_quantity < quantity:
+                await db.rollback()
+                return False
+            await asyncio.sleep(0)  # the request handler yields here in practice
+            await db.execute(
+                text("UPDATE product_inventory SET reserved_quantity = :reserved WHERE id = :id"),
+                {"reserved": row.reserved_quantity + quantity, "id": row.id}
+            )
+        await db.commit()
+        return True
+
+
+async def engine_checkout(cart: list, reference: str) -> bool:
+    async with db_session.AsyncSessionLocal() as db:
+        result = await reservation_engine.reserve(db, reference, cart)
+        if result["reserved"]:
+            await db.commit()
+        else:
+            await db.rollback()
+        return result["reserved"]
+
+
+async def run(mode: str, product_ids: list, checkouts: int, stock: int) -> dict:
+    await reset_stock(product_ids, stock)
+    carts = [random_cart(product_ids) for _ in range(checkouts)]
+    samples = []
+    granted_units = {product_id: 0 for product_id in product_ids}
+
+    async def checkout(index: int, cart: list) -> None:
+        with timed(samples):
+            try:
+                if mode == "legacy":
+                    ok = await legacy_checkout(cart)
+                else:
+                    ok = await engine_checkout(cart, f"bench-{index}")
+            except Exception:
+                ok = False  # e.g. the CHECK constraint rejecting a legacy oversell
+        if ok:
+            for product_id, _, quantity in cart:
+                granted_units[product_id] += quantity
+
+    await asyncio.gather(*(checkout(i, cart) for i, cart in enumerate(carts)))
+
+    async with db_session.async_engine.connect() as conn:
+        recorded = dict((await conn.execute(text("""
+            SELECT i.product_id, coalesce(sum(r.quantity), 0)
+            FROM product_inventory i LEFT JOIN inventory_reservations r ON r.inventory_id = i.id
+            WHERE i.product_id = ANY(:ids) GROUP BY i.product_id
+        """), {"ids": product_ids})).all())
+        reserved = dict((await conn.execute(
+            text("SELECT product_id, reserved_quantity FROM product_inventory WHERE product_id = ANY(:ids)"),
+            {"ids": product_ids}
+        )).all())
+
+    oversold = sum(max(units - stock, 0) for units in granted_units.values())
+    lost_updates = sum(granted_units[p] - reserved[p] for p in product_ids)
+    drift = sum(reserved[p] - recorded[p] for p in product_ids) if mode == "engine" else 0
+    return {
+        "stats": summarize(samples),
+        "granted": sum(granted_units.values()),
+        "oversold": oversold,
+        "lost_updates": lost_updates,
+        "reservation_drift": drift,
+    }
+
+
+async def main(args) -> None:
+    if not await init_database():
+        raise SystemExit("DATABASE_URL is not configured or unreachable")
+    if not await create_reservation_infrastructure():
+        print("warning: reservation infrastructure incomplete")
+
+    random.seed(args.seed)
+    try:
+        product_ids = await seed(args.products, args.stock)
+        results = {mode: await run(mode, product_ids, args.checkouts, args.stock) for mode in ("legacy", "engine")}
+        print_table(
+            f"{args.checkouts} concurrent checkouts, {args.products} products x {args.stock} units",
+            {mode: result["stats"] for mode, result in results.items()}
+        )
+        print(f"\n{'mode':<10}{'granted units':>16}{'oversold':>12}{'lost updates':>14}{'drift':>8}")
+        for mode, result in results.items():
+            print(
+                f"{mode:<10}{result['granted']:>16}{result['oversold']:>12}"
+                f"{result['lost_updates']:>14}{result['reservation_drift']:>8}"
+            )
+        engine = results["engine"]
+        if engine["oversold"] or engine["lost_updates"] or engine["reservation_drift"]:
+            raise SystemExit("FAIL: reservation engine oversold or drifted")
+        print("\nOK: reservation engine never oversold")
+    finally:
+        if not args.keep:
+            await cleanup()
+        await db_session.close_database_connections()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--checkouts", type=int, default=500)
+    parser.add_argument("--products", type=int, default=5)
+    parser.add_argument("--stock", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--keep", action="store_true", help="keep seeded rows for repeated runs")
+    asyncio.run(main(parser.parse_args()))
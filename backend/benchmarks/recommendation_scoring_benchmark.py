@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Profile-based recommendation scoring: per-product Python loop vs the vectorized scorer.
+
+Builds a synthetic listed catalog of --products products (categories,
+brands, log-normal prices) and --users random behaviour profiles. It times:
+
+  * the old per-product scoring loop, on a sample of users
+  * CatalogMatrix.top_k for one user at a time (the request path)
+  * CatalogMatrix.top_k for all users in one batch (email campaigns)
+
+It reports users/sec for each and checks that the vectorized top-k matches
+the loop for every sampled user.
+
+    python benchmarks/recommendation_scoring_benchmark.py --products 50000 --users 2000
+"""
+import argparse
+import random
+import sys
+import time
+import uuid
+
+sys.path.insert(0, '.')
+
+from app.features.analytics.services.recommendation_scorer import CatalogMatrix, UserPreferences
+from benchmarks.common import summarize, print_table, timed
+
+
+def synthetic_catalog(count: int, categories: list, brands: list, rng: random.Random) -> list:
+    return [
+        (uuid.uuid4(), f"Product {n}", round(rng.lognormvariate(3.5, 0.8), 2),
+         rng.choice(categories), rng.choice(brands) if rng.random() < 0.85 else None, None)
+        for n in range(count)
+    ]
+
+
+def synthetic_users(count: int, categories: list, brands: list, rng: random.Random) -> list:
+    return [
+        UserPreferences(
+            user_id=str(uuid.uuid4()),
+            categories=rng.sample(categories, 5),
+            brands=rng.sample(brands, 5),
+            price_sensitivity=rng.choice([None, 0.2, 0.6, 0.9]),
+            avg_order_value=rng.choice([None, 25.0, 60.0, 120.0]),
+        )
+        for _ in range(count)
+    ]
+
+
+def loop_top_k(rows: list, prefs: UserPreferences, k: int) -> list:
+    """The per-product rule from PersonalizationEngine._calculate_product_score, with its candidate filter"""
+    categories, brands = set(prefs.categories), set(prefs.brands)
+    aov, sensitivity = prefs.avg_order_value, prefs.price_sensitivity
+    scored = []
+    for row, (_, _, price, category_id, brand_id, _) in enumerate(rows):
+        category_hit = str(category_id) in categories
+        brand_hit = brand_id is not None and str(brand_id) in brands
+        if not (category_hit or brand_hit):
+            continue
+        score = 0.5 + (0.3 if category_hit else 0) + (0.2 if brand_hit else 0)
+        if aov and sensitivity and sensitivity < 0.5:
+            if not price / aov > 1.2:
+                continue
+            score += 0.1
+        elif aov and sensitivity and sensitivity > 0.7:
+            if not price / aov < 0.8:
+                continue
+            score += 0.1
+        scored.append((row, round(min(1.0, score), 4)))
+    scored.sort(key=lambda item: (-item[1], item[0]))
+    return scored[:k]
+
+
+def main(args) -> None:
+    rng = random.Random(args.seed)
+    categories = [str(uuid.uuid4()) for _ in range(args.categories)]
+    brands = [str(uuid.uuid4()) for _ in range(args.brands)]
+    rows = synthetic_catalog(args.products, categories, brands, rng)
+    users = synthetic_users(args.users, categories, brands, rng)
+
+    start = time.perf_counter()
+    catalog = CatalogMatrix(rows)
+    print(f"catalog: {len(catalog)} products, {len(catalog.category_codes)} categories, "
+          f"{len(catalog.brand_codes)} brands, built in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    sample = users[:args.loop_users]
+    loop_samples, loop_results = [], []
+    for prefs in sample:
+        with timed(loop_samples):
+            loop_results.append(loop_top_k(rows, prefs, args.k))
+
+    single_samples = []
+    for prefs in users:
+        with timed(single_samples):
+            catalog.top_k([prefs], args.k)
+
+    start = time.perf_counter()
+    batch_results = catalog.top_k(users, args.k)
+    batch_elapsed = time.perf_counter() - start
+
+    print_table(f"top-{args.k} per user over {len(catalog)} products", {
+        "python loop": summarize(loop_samples),
+        "vectorized, one user": summarize(single_samples),
+    })
+    print(f"\n{'mode':<24}{'users/sec':>12}")
+    print(f"{'python loop':<24}{len(loop_samples) / (sum(loop_samples) / 1000):>12.1f}")
+    print(f"{'vectorized, one user':<24}{len(single_samples) / (sum(single_samples) / 1000):>12.1f}")
+    print(f"{'vectorized, batch':<24}{len(users) / batch_elapsed:>12.1f}")
+
+    mismatched = sum(1 for expected, got in zip(loop_results, batch_results) if expected != got)
+    if mismatched:
+        raise SystemExit(f"FAIL: {mismatched} of {len(sample)} users ranked differently from the loop")
+    print(f"\nvectorized top-{args.k} matches the loop for all {len(sample)} sampled users")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=50000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--loop-users", type=int, default=50, help="users scored with the slow loop")
+    parser.add_argument("--categories", type=int, default=60)
+    parser.add_argument("--brands", type=int, default=400)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    main(parser.parse_args())
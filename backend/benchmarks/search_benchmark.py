@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Product search latency benchmark: ILIKE vs tsvector/GIN vs pg_trgm.
+
+Seeds a synthetic catalog (100k products by default) into the database pointed
+to by DATABASE_URL, runs ProductSearchCRUD.search_products with every search
+engine and prints p50/p99 latency per engine. Use a scratch database; seeded
+rows are removed at the end unless --keep is passed.
+
+    python benchmarks/search_benchmark.py --products 100000 --iterations 50
+"""
+import argparse
+import asyncio
+import sys
+
+sys.path.insert(0, '.')
+
+from sqlalchemy import text
+
+import app.database.session as db_session
+from app.database.session import init_database
+from app.database.indexes import create_search_infrastructure
+from app.features.products.cruds.product_search_crud import ProductSearchCRUD
+from app.features.products.requests.product_search_request import ProductSearchRequest, SearchEngineEnum
+from benchmarks.common import summarize, print_table, timed
+
+SKU_PREFIX = "BENCH-SEARCH-"
+CATEGORY_SLUG = "bench-search-category"
+
+VOCABULARY = [
+    "bamboo", "organic", "cotton", "recycled", "glass", "bottle", "solar", "lamp", "compostable",
+    "bag", "hemp", "tote", "steel", "straw", "cork", "mat", "wool", "blanket", "linen", "shirt",
+    "soap", "shampoo", "bar", "beeswax", "wrap", "reusable", "cup", "jute", "rug", "planter",
+]
+
+QUERIES = ["bamboo", "organic cotton", "recycled glass", "solar lamp", "compostable bag", "beeswax wrap"]
+
+
+def _random_word_sql() -> str:
+    words = ", ".join(f"'{w}'" for w in VOCABULARY)
+    return f"(ARRAY[{words}])[1 + floor(random() * {len(VOCABULARY)})::int]"
+
+
+async def seed_products(count: int, batch_size: int = 10000) -> None:
+    async with db_session.async_engine.begin() as conn:
+        supplier_id = (await conn.execute(text("SELECT id FROM users ORDER BY created_at LIMIT 1"))).scalar()
+        if supplier_id is None:
+            raise SystemExit("No users found; create at least one user before seeding")
+        await conn.execute(text(
+            "INSERT INTO categories (id, name, slug, is_active, created_at, updated_at) "
+            "VALUES (gen_random_uuid(), 'Benchmark', :slug, true, now(), now()) ON CONFLICT (slug) DO NOTHING"
+        ), {"slug": CATEGORY_SLUG})
+        category_id = (await conn.execute(
+            text("SELECT id FROM categories WHERE slug = :slug"), {"slug": CATEGORY_SLUG}
+        )).scalar()
+        existing = (await conn.execute(
+            text("SELECT count(*) FROM products WHERE sku LIKE :prefix"), {"prefix": f"{SKU_PREFIX}%"}
+        )).scalar()
+
+    w = _random_word_sql()
+    insert_sql = text(f"""
+        INSERT INTO products (id, supplier_id, category_id, sku, name, slug, short_description, description,
+                              price, status, approval_status, visibility, tags, materials, created_at, updated_at)
+        SELECT gen_random_uuid(), :supplier_id, :category_id,
+               CAST(:prefix AS text) || g, {w} || ' ' || {w} || ' ' || {w}, lower(CAST(:prefix AS text)) || g,
+               'Sustainable ' || {w} || ' ' || {w},
+               'Made from ' || {w} || ' and ' || {w} || '. ' || repeat({w} || ' ', 20),
+               round((random() * 500)::numeric, 2), 'ACTIVE', 'approved', 'visible',
+               jsonb_build_array({w}, {w}), '[]'::jsonb, now(), now()
+        FROM generate_series(:start, :stop) AS g
+    """)
+
+    for start in range(existing + 1, count + 1, batch_size):
+        stop = min(start + batch_size - 1, count)
+        async with db_session.async_engine.begin() as conn:
+            await conn.execute(insert_sql, {
+                "supplier_id": supplier_id, "category_id": category_id,
+                "prefix": SKU_PREFIX, "start": start, "stop": stop,
+            })
+        print(f"seeded {stop}/{count}")
+
+    async with db_session.async_engine.begin() as conn:
+        await conn.execute(text("ANALYZE products"))
+
+
+async def cleanup() -> None:
+    async with db_session.async_engine.begin() as conn:
+        await conn.execute(text("DELETE FROM products WHERE sku LIKE :prefix"), {"prefix": f"{SKU_PREFIX}%"})
+        await conn.execute(text("DELETE FROM categories WHERE slug = :slug"), {"slug": CATEGORY_SLUG})
+
+
+async def run_engine(engine: SearchEngineEnum, iterations: int) -> list:
+    crud = ProductSearchCRUD()
+    samples = []
+    async with db_session.AsyncSessionLocal() as db:
+        for query in QUERIES:
+            request = ProductSearchRequest(query=query, in_stock_only=False, search_engine=engine, per_page=20)
+            await crud.search_products(db, request)  # warm-up
+            for _ in range(iterations):
+                with timed(samples):
+                    await crud.search_products(db, request)
+    return samples
+
+
+async def main(args) -> None:
+    if not await init_database():
+        raise SystemExit("DATABASE_URL is not configured or unreachable")
+    if not await create_search_infrastructure():
+        print("warning: search infrastructure incomplete; fulltext/trigram numbers may be invalid")
+
+    try:
+        await seed_products(args.products)
+        rows = {}
+        for engine in SearchEngineEnum:
+            rows[engine.value] = summarize(await run_engine(engine, args.iterations))
+        print_table(f"search_products over {args.products} products", rows)
+    finally:
+        if not args.keep:
+            await cleanup()
+        await db_session.close_database_connections()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--keep", action="store_true", help="keep seeded rows for repeated runs")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Supabase client set-up cost per request: create_client per request vs the registry.
+
+A typical authenticated request used to build an AuthCrud (two create_client
+calls: service role and anon) and often a SupabaseStorageClient (a third).
+This times and counts allocations for that pattern against the shared
+registry clients, and measures the cold start to the first usable client.
+No request leaves the process: create_client only builds HTTP clients, and the
+storage connection check is not part of either measured path. When
+SUPABASE_URL or the keys are not set, a dummy project URL and JWT-shaped keys
+are used.
+
+    python benchmarks/supabase_client_benchmark.py --requests 500
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, '.')
+
+from jose import jwt
+from supabase import create_client
+
+from app.core.config import settings
+from app.database.base import get_anon_supabase_client, get_client_registry, get_supabase_client
+from benchmarks.common import summarize, print_table, timed
+
+
+def ensure_settings() -> None:
+    if not settings.SUPABASE_URL:
+        settings.SUPABASE_URL = "https://benchmark.supabase.co"
+    for attr, role in (("SUPABASE_SERVICE_ROLE_KEY", "service_role"), ("SUPABASE_ANON_KEY", "anon")):
+        if not getattr(settings, attr):
+            setattr(settings, attr, jwt.encode({"role": role, "iss": "supabase"}, "benchmark", algorithm="HS256"))
+
+
+def per_request_clients() -> None:
+    # AuthCrud.__init__ and SupabaseStorageClient.client before the registry
+    create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_ROLE_KEY)
+    create_client(settings.SUPABASE_URL, settings.SUPABASE_ANON_KEY)
+    create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_ROLE_KEY)
+
+
+def registry_clients() -> None:
+    get_supabase_client()
+    get_anon_supabase_client()
+    get_supabase_client()
+
+
+def measure(fn, requests: int) -> tuple:
+    samples = []
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before, _ = tracemalloc.get_traced_memory()
+    for _ in range(requests):
+        with timed(samples):
+            fn()
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return samples, (after - before) / requests, peak - before
+
+
+def main(args) -> None:
+    ensure_settings()
+    registry = get_client_registry()
+    registry.clear()
+
+    start = time.perf_counter()
+    get_supabase_client()
+    cold_ms = (time.perf_counter() - start) * 1000
+
+    rows = {}
+    allocations = {}
+    for name, fn in (("create_client per request", per_request_clients), ("shared registry", registry_clients)):
+        samples, retained, peak = measure(fn, args.requests)
+        rows[name] = summarize(samples)
+        allocations[name] = (retained, peak)
+
+    print_table(f"client set-up per request ({args.requests} requests, 3 clients each)", rows)
+    print(f"\n{'case':<28}{'retained KB/req':>18}{'peak KB':>12}")
+    for name, (retained, peak) in allocations.items():
+        print(f"{name:<28}{retained / 1024:>18.1f}{peak / 1024:>12.1f}")
+    print(f"\ncold start to first client: {cold_ms:.1f} ms")
+    print(f"registry: {registry.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    main(parser.parse_args())
@@ -9,6 +9,20 @@ from app.core.config import settings
 from app.core.exceptions import AveoException
 from app.core.logging import get_logger
 from app.database.session import init_database, close_database_connections
+from app.database.base import get_supabase_rest_client, close_supabase_rest_client, get_client_registry
+from app.database.indexes import create_search_infrastructure, create_facet_infrastructure, create_reservation_infrastructure, create_image_store_infrastructure, create_import_job_infrastructure, create_behavior_infrastructure, create_view_count_infrastructure, create_trending_infrastructure
+from app.features.products.services.autocomplete_index import autocomplete_index
+from app.features.orders.services.cart_totals import cart_totals_reconciler
+from app.features.products.services.inventory_reservations import reservation_sweeper
+from app.features.products.services.product_view_counter import product_view_counter
+from app.features.products.services.trending_engine import trending_engine
+from app.core.image_renditions import rendition_engine
+from app.core.upload_scheduler import upload_scheduler
+from app.core.optimized_storage import image_orphan_pruner
+from app.core.security import jwks_refresher
+from app.features.analytics.services.activity_ingestion import activity_ingestion
+from app.features.analytics.services.behavior_aggregator import behavior_compactor
+from app.features.analytics.services.cooccurrence_index import cooccurrence_refresher
 from app.features.auth.routes.auth_routes import auth_router
 from app.features.auth.routes.profile_routes import profile_router
 from app.features.auth.routes.referral_routes import referral_router
@@ -40,6 +54,14 @@ async def lifespan(app: FastAPI):
         db_success = await init_database()
         if db_success:
             app_logger.info("Database initialization completed successfully")
+            await create_search_infrastructure()
+            await create_facet_infrastructure()
+            await create_reservation_infrastructure()
+            await create_image_store_infrastructure()
+            await create_import_job_infrastructure()
+            await create_behavior_infrastructure()
+            await create_view_count_infrastructure()
+            await create_trending_infrastructure()
         else:
             app_logger.warning("Database initialization failed - continuing with limited functionality")
     except Exception as e:
@@ -59,9 +81,37 @@ async def lifespan(app: FastAPI):
         app_logger.error(f"Supabase storage initialization failed: {str(e)}")
         app_logger.info("Continuing without Supabase storage")
     
+    try:
+        await autocomplete_index.start()
+    except Exception as e:
+        app_logger.error(f"Autocomplete index startup failed: {str(e)}")
+    
+    cart_totals_reconciler.start()
+    reservation_sweeper.start()
+    jwks_refresher.start()
+    activity_ingestion.start()
+    behavior_compactor.start()
+    cooccurrence_refresher.start()
+    product_view_counter.start()
+    trending_engine.start()
+    image_orphan_pruner.start()
+    
     yield
     
     app_logger.info("Shutting down application...")
+    await autocomplete_index.stop()
+    await cart_totals_reconciler.stop()
+    await reservation_sweeper.stop()
+    await jwks_refresher.stop()
+    await activity_ingestion.stop()
+    await behavior_compactor.stop()
+    await cooccurrence_refresher.stop()
+    await product_view_counter.stop()
+    await trending_engine.stop()
+    await image_orphan_pruner.stop()
+    rendition_engine.shutdown()
+    upload_scheduler.shutdown()
+    await close_supabase_rest_client()
     await close_database_connections()
     app_logger.info("Application shutdown completed")
 
@@ -188,7 +238,12 @@ async def health_check():
         "status": "healthy",
         "service": settings.PROJECT_NAME,
         "version": settings.PROJECT_VERSION,
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": datetime.utcnow().isoformat(),
+        "supabase_rest": get_supabase_rest_client().metrics(),
+        "supabase_clients": get_client_registry().stats(),
+        "activity_ingestion": activity_ingestion.metrics(),
+        "product_views": product_view_counter.metrics(),
+        "trending": trending_engine.metrics()
     }
 
 if __name__ == "__main__":
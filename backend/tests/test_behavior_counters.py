@@ -0,0 +1,120 @@
+"""
+Incremental behaviour counters against a full rebuild over the same events.
+"""
+import math
+import random
+import statistics
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.features.analytics.services.behavior_aggregator import BehaviorCounters
+
+HALF_LIFE_DAYS = 7.0
+START = datetime(2025, 3, 1)
+
+
+def make_events(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    events = []
+    for _ in range(count):
+        order = rng.random() < 0.1
+        events.append({
+            'created_at': START + timedelta(seconds=rng.randrange(30 * 86400)),
+            'session_id': f"s{rng.randrange(12)}",
+            'category_id': rng.choice([None, 'c1', 'c2', 'c3', 'c4', 'c5', 'c6']),
+            'brand_id': rng.choice([None, 'b1', 'b2', 'b3']),
+            'price': rng.choice([None, round(rng.uniform(5, 200), 2)]),
+            'time_spent': rng.choice([None, rng.randrange(1, 600)]),
+            'order_value': round(rng.uniform(10, 300), 2) if order else None,
+            'device_type': rng.choice([None, 'mobile', 'desktop', 'tablet']),
+            'click_count': rng.randrange(3),
+            'view_count': rng.randrange(1, 4),
+        })
+    return sorted(events, key=lambda event: event['created_at'])
+
+
+def assert_same_metrics(actual, expected):
+    assert actual.keys() == expected.keys()
+    for key, value in expected.items():
+        if isinstance(value, float):
+            assert actual[key] == pytest.approx(value, rel=1e-9, abs=1e-12), key
+        else:
+            assert actual[key] == value, key
+
+
+def test_incremental_apply_matches_rebuild():
+    events = make_events(400)
+    counters = BehaviorCounters(HALF_LIFE_DAYS)
+    for i, event in enumerate(events):
+        counters.apply(event)
+        if i == 200:
+            # Saved and reloaded halfway, as a stored row would be
+            counters = BehaviorCounters.from_dict(counters.to_dict(), HALF_LIFE_DAYS)
+
+    rebuilt = BehaviorCounters.from_activities(reversed(events), HALF_LIFE_DAYS)
+
+    assert counters.events == rebuilt.events == len(events)
+    assert_same_metrics(counters.metrics(), rebuilt.metrics())
+
+
+def test_rebuild_matches_direct_computation():
+    events = make_events(300)
+    metrics = BehaviorCounters.from_activities(events, HALF_LIFE_DAYS).metrics()
+
+    tau = HALF_LIFE_DAYS * 86400 / math.log(2)
+    scores = Counter()
+    for event in events:
+        if event['category_id']:
+            scores[event['category_id']] += math.exp((event['created_at'] - START).total_seconds() / tau)
+    assert metrics['preferred_categories'] == [category for category, _ in scores.most_common(5)]
+
+    prices = [event['price'] for event in events if event['price']]
+    assert metrics['price_sensitivity'] == pytest.approx(min(1.0, statistics.pstdev(prices) / statistics.mean(prices)))
+
+    brands = Counter(event['brand_id'] for event in events if event['brand_id'])
+    assert metrics['brand_loyalty'] == pytest.approx(brands.most_common(1)[0][1] / sum(brands.values()))
+
+    orders = [event for event in events if event['order_value']]
+    assert metrics['total_orders'] == len(orders)
+    assert metrics['total_spent'] == pytest.approx(sum(event['order_value'] for event in orders))
+
+    views = sum(event['view_count'] for event in events)
+    clicks = sum(event['click_count'] for event in events)
+    assert metrics['avg_pages_per_session'] == pytest.approx(views / len({event['session_id'] for event in events}))
+    assert metrics['bounce_rate'] == pytest.approx(1.0 - clicks / views)
+
+
+def test_merged_deltas_match_rebuild():
+    events = make_events(500, seed=11)
+    stored = BehaviorCounters.from_activities(events[:250], HALF_LIFE_DAYS)
+    # Two workers each saw part of what came next
+    first = BehaviorCounters.from_activities(events[250:400], HALF_LIFE_DAYS)
+    second = BehaviorCounters.from_activities(events[400:], HALF_LIFE_DAYS)
+
+    merged = BehaviorCounters.from_dict(stored.to_dict(), HALF_LIFE_DAYS)
+    merged.merge(first)
+    merged.merge(second)
+    rebuilt = BehaviorCounters.from_activities(events, HALF_LIFE_DAYS)
+
+    assert merged.events == rebuilt.events
+    assert merged.brand_max == rebuilt.brand_max
+    assert merged.sessions == rebuilt.sessions
+    assert merged.price_m2 == pytest.approx(rebuilt.price_m2)
+    # Same decayed affinities once expressed against the same landmark
+    shift = math.exp((merged.landmark - rebuilt.landmark) / rebuilt.tau)
+    for category, score in rebuilt.category_scores.items():
+        assert merged.category_scores[category] * shift == pytest.approx(score)
+    assert_same_metrics(merged.metrics(), rebuilt.metrics())
+
+
+def test_merge_into_empty_counters():
+    events = make_events(50)
+    delta = BehaviorCounters.from_activities(events, HALF_LIFE_DAYS)
+
+    merged = BehaviorCounters(HALF_LIFE_DAYS)
+    merged.merge(delta)
+    merged.merge(BehaviorCounters(HALF_LIFE_DAYS))
+
+    assert_same_metrics(merged.metrics(), delta.metrics())
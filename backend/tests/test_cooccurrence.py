@@ -0,0 +1,110 @@
+"""
+Bought/viewed-together counts built from basket incidence.
+"""
+import random
+import uuid
+from collections import Counter
+from itertools import combinations
+
+import numpy as np
+
+from app.features.analytics.services.cooccurrence_index import CooccurrenceMatrix, build_cooccurrence
+
+
+def reference_counts(baskets, max_basket):
+    """Pair counts over distinct products per basket, skipping oversized baskets"""
+    counts = Counter()
+    for products in baskets.values():
+        distinct = sorted(set(products))
+        if max_basket and len(distinct) > max_basket:
+            continue
+        for a, b in combinations(distinct, 2):
+            counts[a, b] += 1
+            counts[b, a] += 1
+    return counts
+
+
+def as_codes(baskets):
+    pairs = [(basket, product) for basket, products in baskets.items() for product in products]
+    return np.array([b for b, _ in pairs], dtype=np.int64), np.array([p for _, p in pairs], dtype=np.int64)
+
+
+def rows_of(index, n_products):
+    indptr, indices, data = index['indptr'], index['indices'], index['data']
+    return [
+        list(zip(indices[indptr[row]:indptr[row + 1]].tolist(), data[indptr[row]:indptr[row + 1]].tolist()))
+        for row in range(n_products)
+    ]
+
+
+def test_counts_match_pairwise_reference():
+    rng = random.Random(5)
+    n_products = 30
+    baskets = {
+        basket: [rng.randrange(n_products) for _ in range(rng.randrange(1, 8))]
+        for basket in range(200)
+    }
+    # One oversized basket that must not contribute
+    baskets[200] = list(range(n_products))
+    basket_codes, product_codes = as_codes(baskets)
+
+    index = build_cooccurrence(basket_codes, product_codes, n_products, max_neighbors=n_products, max_basket=10)
+    expected = reference_counts(baskets, max_basket=10)
+
+    for row, neighbors in enumerate(rows_of(index, n_products)):
+        assert {col: count for col, count in neighbors} == {
+            b: count for (a, b), count in expected.items() if a == row
+        }
+        counts = [count for _, count in neighbors]
+        assert counts == sorted(counts, reverse=True)
+
+
+def test_max_neighbors_keeps_the_strongest():
+    rng = random.Random(9)
+    n_products = 20
+    baskets = {basket: rng.sample(range(n_products), rng.randrange(2, 6)) for basket in range(300)}
+    basket_codes, product_codes = as_codes(baskets)
+
+    index = build_cooccurrence(basket_codes, product_codes, n_products, max_neighbors=3)
+    expected = reference_counts(baskets, max_basket=100)
+
+    for row, neighbors in enumerate(rows_of(index, n_products)):
+        strongest = sorted((count for (a, _), count in expected.items() if a == row), reverse=True)[:3]
+        assert [count for _, count in neighbors] == strongest
+    assert index['indptr'][-1] == len(index['indices']) == len(index['data'])
+
+
+def test_repeat_views_count_once_and_min_count_filters():
+    # Product 0 appears twice in basket 0; pair (0, 1) co-occurs twice, (1, 2) once
+    baskets = {0: [0, 0, 1], 1: [0, 1], 2: [1, 2]}
+    basket_codes, product_codes = as_codes(baskets)
+
+    rows = rows_of(build_cooccurrence(basket_codes, product_codes, 4), 4)
+    assert rows[0] == [(1, 2.0)]
+    assert rows[1] == [(0, 2.0), (2, 1.0)]
+    assert rows[3] == []
+
+    filtered = rows_of(build_cooccurrence(basket_codes, product_codes, 4, min_count=2), 4)
+    assert filtered == [[(1, 2.0)], [(0, 2.0)], [], []]
+
+
+def test_empty_history():
+    empty = np.array([], dtype=np.int64)
+    index = build_cooccurrence(empty, empty, 3)
+
+    assert index['indptr'].tolist() == [0, 0, 0, 0]
+    assert len(index['indices']) == 0
+
+
+def test_matrix_neighbors_and_top_products():
+    baskets = {0: [0, 1], 1: [0, 1], 2: [0, 2], 3: [1, 2], 4: [1, 2], 5: [1, 2]}
+    basket_codes, product_codes = as_codes(baskets)
+    index = build_cooccurrence(basket_codes, product_codes, 4)
+    ids = [str(uuid.UUID(int=i + 1)) for i in range(4)]
+    matrix = CooccurrenceMatrix('v1', ids, index['indptr'], index['indices'], index['data'])
+
+    assert matrix.neighbors(ids[1], 5) == [(ids[2], 3.0), (ids[0], 2.0)]
+    assert matrix.neighbors(ids[1], 1) == [(ids[2], 3.0)]
+    assert matrix.neighbors(ids[3], 5) == []
+    assert matrix.neighbors(str(uuid.uuid4()), 5) == []
+    assert matrix.top_products(2) == [ids[1], ids[2]]
@@ -0,0 +1,26 @@
+"""
+Recognising shared, content-addressed image objects by URL.
+"""
+from app.core.image_store import content_key, content_path, is_shared
+
+HASH = 'ab' * 32
+
+
+def test_content_paths_round_trip():
+    for size_name, level in [('thumbnail', 'medium'), ('original', 'raw'), ('large_2x', 'high')]:
+        path = content_path(HASH, size_name, level, 'webp')
+        assert content_key(path) == (HASH, level)
+
+
+def test_public_urls_are_recognised():
+    url = f"https://x.supabase.co/storage/v1/object/public/product-assets/{content_path(HASH, 'medium', 'low', 'jpg')}"
+    assert content_key(url) == (HASH, 'low')
+    assert content_key(f"{url}?width=200") == (HASH, 'low')
+    assert is_shared(url)
+
+
+def test_product_owned_objects_are_not_shared():
+    assert content_key(None) is None
+    assert not is_shared('')
+    assert not is_shared('https://x.supabase.co/storage/v1/object/public/product-assets/products/p1/a.jpg')
+    assert not is_shared(f"content/ab/{HASH[:40]}/medium_low.jpg")
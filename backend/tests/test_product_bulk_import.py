@@ -0,0 +1,77 @@
+"""
+Column-wise validation of one CSV chunk.
+"""
+import uuid
+from decimal import Decimal
+
+from app.features.products.services.product_bulk_import import parse_chunk
+
+SUPPLIER = str(uuid.UUID(int=1))
+CATEGORY = str(uuid.UUID(int=2))
+
+
+def row(**values):
+    base = {"name": "Bamboo brush", "sku": "BB-1", "price": "4.50", "category_id": CATEGORY}
+    base.update(values)
+    return base
+
+
+def test_valid_rows_become_records():
+    records, errors = parse_chunk([
+        (2, row(compare_at_price="6", tags="eco; bamboo", visibility="hidden")),
+        (3, row(sku="BB-2", brand_id="0", visibility="nonsense")),
+    ], SUPPLIER, set())
+
+    assert errors == []
+    (line, first), (_, second) = records
+    assert line == 2
+    assert first["price"] == Decimal("4.50") and first["compare_at_price"] == Decimal("6")
+    assert first["tags"] == ["eco", "bamboo"]
+    assert first["slug"] == "bamboo-brush-bb-1"
+    assert first["visibility"] == "HIDDEN"
+    assert second["brand_id"] is None and second["visibility"] == "VISIBLE"
+
+
+def test_each_row_reports_its_first_error():
+    chunk = [
+        (2, row(name="", price="abc")),
+        (3, row(sku="")),
+        (4, row(price="")),
+        (5, row(category_id="")),
+        (6, row(category_id="not-a-uuid")),
+        (7, row(brand_id="nope")),
+        (8, row(price="-1")),
+        (9, row(weight="heavy")),
+    ]
+
+    records, errors = parse_chunk(chunk, SUPPLIER, set())
+
+    assert records == []
+    assert [(line, error) for line, _, error in errors] == [
+        (2, "Product name is required"),
+        (3, "Product SKU is required"),
+        (4, "Product price is required"),
+        (5, "category_id is required. Please provide a valid category_id from existing categories."),
+        (6, "Invalid category_id: not-a-uuid"),
+        (7, "Invalid brand_id: nope"),
+        (8, "Must be a non-negative number: -1"),
+        (9, "Invalid number: heavy"),
+    ]
+
+
+def test_a_sku_belongs_to_its_first_valid_row():
+    seen = {"OLD-1"}
+    records, errors = parse_chunk([
+        (2, row(sku="BB-1", price="bad")),
+        (3, row(sku="BB-1")),
+        (4, row(sku="BB-1")),
+        (5, row(sku="OLD-1")),
+    ], SUPPLIER, seen)
+
+    assert [line for line, _ in records] == [3]
+    assert [(line, error) for line, _, error in errors] == [
+        (2, "Invalid number: bad"),
+        (4, "Duplicate SKU in file: BB-1"),
+        (5, "Duplicate SKU in file: OLD-1"),
+    ]
+    assert seen == {"OLD-1", "BB-1"}
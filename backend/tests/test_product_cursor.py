@@ -0,0 +1,57 @@
+"""
+Keyset pagination cursors for product listings.
+"""
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal
+from uuid import UUID
+
+import pytest
+
+from app.core.exceptions import BadRequestException
+from app.features.products.cruds.product_query_builder import decode_cursor, encode_cursor
+
+PRODUCT_ID = "9b2f0b0e-8f4a-4a4e-9a7c-1f7a0c1f7a0c"
+
+
+def raw_cursor(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+@pytest.mark.parametrize("value, parse", [
+    (datetime(2025, 3, 1, 12, 30, 15, 250000), datetime.fromisoformat),
+    (Decimal("19.99"), Decimal),
+    ("Bamboo toothbrush", str),
+])
+def test_round_trip(value, parse):
+    cursor = encode_cursor(value, PRODUCT_ID, 42)
+
+    assert decode_cursor(cursor, parse) == (value, UUID(PRODUCT_ID), 42)
+
+
+def test_total_is_optional():
+    cursor = raw_cursor({"v": "10.00", "id": PRODUCT_ID})
+
+    assert decode_cursor(cursor, Decimal) == (Decimal("10.00"), UUID(PRODUCT_ID), None)
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64 !",
+    base64.urlsafe_b64encode(b"not json").decode(),
+    raw_cursor([1, 2]),
+    raw_cursor({"id": PRODUCT_ID}),
+    raw_cursor({"v": "10.00"}),
+    raw_cursor({"v": "10.00", "id": "not-a-uuid"}),
+    raw_cursor({"v": "ten", "id": PRODUCT_ID}),
+    raw_cursor({"v": "10.00", "id": PRODUCT_ID, "t": "many"}),
+    raw_cursor({"v": "10.00", "id": PRODUCT_ID, "t": -1}),
+])
+def test_malformed_cursor_is_a_bad_request(cursor):
+    with pytest.raises(BadRequestException, match="Invalid pagination cursor"):
+        decode_cursor(cursor, Decimal)
+
+
+def test_unparseable_sort_value_for_datetime_sorts():
+    with pytest.raises(BadRequestException):
+        decode_cursor(raw_cursor({"v": "yesterday", "id": PRODUCT_ID}), datetime.fromisoformat)
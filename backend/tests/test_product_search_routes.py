@@ -0,0 +1,44 @@
+"""
+Search route error handling: client errors surface as 400s instead of empty results.
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.role_auth import get_optional_user
+from app.database.session import get_async_session
+from app.features.products.cruds import product_search_crud
+from app.features.products.routes.product_search_routes import product_search_router
+# The app module imports every model, so the mapper relationships resolve as they do in production
+import main  # noqa: F401
+
+
+class UnusedSession:
+    """Any query reaching the database would fail the test"""
+
+    async def execute(self, *args, **kwargs):
+        raise AssertionError("the request should be rejected before querying")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # No Supabase project here; the search itself only uses the session
+    monkeypatch.setattr(product_search_crud, 'get_supabase_client', lambda: None)
+    app = FastAPI()
+    app.include_router(product_search_router)
+    app.dependency_overrides[get_async_session] = lambda: UnusedSession()
+    app.dependency_overrides[get_optional_user] = lambda: None
+    return TestClient(app)
+
+
+def test_malformed_cursor_is_a_bad_request(client):
+    response = client.post("/search/", json={"sort_by": "newest", "cursor": "not base64 !"})
+
+    assert response.status_code == 400
+    assert "cursor" in response.json()["detail"].lower()
+
+
+def test_cursor_with_non_keyset_sort_is_a_bad_request(client):
+    response = client.post("/search/", json={"sort_by": "relevance", "cursor": "eyJ2IjogIjEifQ=="})
+
+    assert response.status_code == 400
@@ -0,0 +1,160 @@
+"""
+Buffered product views: pending/in-flight accounting around a flush.
+"""
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+
+import pytest
+
+import app.database.session as db_session
+from app.features.products.services import product_view_counter as view_counter_module
+from app.features.products.services.product_view_counter import ProductViewCounter
+
+PRODUCT = str(uuid.UUID(int=1))
+OTHER = str(uuid.UUID(int=2))
+
+
+class FakeEngine:
+    """Each flush waits on ``release`` so a test can look at the counter mid-write"""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+        self.batches = []
+
+    @asynccontextmanager
+    async def begin(self):
+        yield self
+
+    async def execute(self, statement, params):
+        self.started.set()
+        await self.release.wait()
+        if self.fail:
+            raise RuntimeError("insert failed")
+        self.batches.append(params)
+
+
+class FakeResult:
+    def __init__(self, value):
+        self.value = value
+
+    def scalar(self):
+        return self.value
+
+
+class FakeSession:
+    def __init__(self, total):
+        self.total = total
+        self.queries = 0
+
+    async def execute(self, statement):
+        self.queries += 1
+        return FakeResult(self.total)
+
+
+@pytest.fixture
+def trending(monkeypatch):
+    recorded = []
+
+    class Recorder:
+        def record(self, product_ids, weight=1.0):
+            recorded.append((tuple(product_ids), weight))
+
+    monkeypatch.setattr(view_counter_module, 'trending_engine', Recorder())
+    return recorded
+
+
+def buffering_counter(**kwargs) -> ProductViewCounter:
+    counter = ProductViewCounter(flush_interval=3600, **kwargs)
+    # Buffer as the running app does, without starting the flush loop
+    counter._task = object()
+    counter._wake = asyncio.Event()
+    return counter
+
+
+def test_recorded_views_count_before_they_are_written(monkeypatch, trending):
+    async def scenario():
+        engine = FakeEngine()
+        monkeypatch.setattr(db_session, 'async_engine', engine)
+        counter = buffering_counter(batch_size=10)
+        for _ in range(3):
+            await counter.record(PRODUCT)
+        await counter.record(OTHER)
+
+        db = FakeSession(total=40)
+        assert counter.unflushed(PRODUCT) == 3
+        assert await counter.view_count(db, PRODUCT) == 43
+
+        flush = asyncio.create_task(counter._flush())
+        await engine.started.wait()
+        # Moved from pending to in flight; the count does not dip while the insert runs
+        assert counter._pending[PRODUCT] == 0 and counter._inflight[PRODUCT] == 3
+        assert await counter.view_count(db, PRODUCT) == 43
+
+        engine.release.set()
+        await flush
+        assert counter.unflushed(PRODUCT) == 0
+        # The cached rollup total advanced by the write, no new query needed
+        assert await counter.view_count(db, PRODUCT) == 43
+        assert db.queries == 1
+        return counter
+
+    counter = asyncio.run(scenario())
+    assert counter.metrics()['written'] == 4
+    assert sorted(trending) == [((PRODUCT,), 3), ((OTHER,), 1)]
+
+
+def test_failed_flush_releases_in_flight_views(monkeypatch, trending):
+    async def scenario():
+        engine = FakeEngine(fail=True)
+        engine.release.set()
+        monkeypatch.setattr(db_session, 'async_engine', engine)
+        counter = buffering_counter()
+        await counter.record(PRODUCT)
+        await counter.record(PRODUCT)
+        await counter._flush()
+        return counter
+
+    counter = asyncio.run(scenario())
+    assert counter.unflushed(PRODUCT) == 0
+    assert counter.metrics()['failed'] == 2
+    assert trending == []
+
+
+def test_flush_takes_one_batch_at_a_time(monkeypatch, trending):
+    async def scenario():
+        engine = FakeEngine()
+        engine.release.set()
+        monkeypatch.setattr(db_session, 'async_engine', engine)
+        counter = buffering_counter(batch_size=2)
+        for _ in range(5):
+            await counter.record(PRODUCT)
+        await counter._flush()
+        assert counter._pending[PRODUCT] == 3
+        while counter._rows:
+            await counter._flush()
+        return counter, engine
+
+    counter, engine = asyncio.run(scenario())
+    assert [len(batch['ids']) for batch in engine.batches] == [2, 2, 1]
+    assert counter.unflushed(PRODUCT) == 0
+
+
+def test_full_buffer_drops_views(monkeypatch):
+    async def scenario():
+        monkeypatch.setattr(db_session, 'async_engine', None)
+        counter = buffering_counter(max_buffer=2)
+        for _ in range(3):
+            await counter.record(PRODUCT)
+        return counter
+
+    counter = asyncio.run(scenario())
+    assert counter.unflushed(PRODUCT) == 2
+    assert counter.metrics()['dropped'] == 1
+
+
+def test_malformed_product_id_is_rejected():
+    with pytest.raises(ValueError):
+        asyncio.run(buffering_counter().record("not-a-uuid"))
@@ -0,0 +1,93 @@
+"""
+Vectorized profile scoring: top-k selection and the per-product scoring rule.
+"""
+import random
+
+import pytest
+
+from app.features.analytics.services import recommendation_scorer
+from app.features.analytics.services.recommendation_scorer import CatalogMatrix, UserPreferences
+
+
+def catalog(*products):
+    """``products`` are ``(price, category_id, brand_id)``"""
+    return CatalogMatrix([
+        (f"p{i}", f"Product {i}", price, category_id, brand_id, None)
+        for i, (price, category_id, brand_id) in enumerate(products)
+    ])
+
+
+def reference_score(product, prefs: UserPreferences):
+    """The rule PersonalizationEngine applied one product at a time"""
+    category_hit = product.category_id in prefs.categories
+    brand_hit = product.brand_id in prefs.brands
+    price_ok = True
+    if prefs.price_mode == 1:
+        price_ok = product.price > prefs.avg_order_value * 1.2
+    elif prefs.price_mode == -1:
+        price_ok = product.price < prefs.avg_order_value * 0.8
+    if not (category_hit or brand_hit) or not price_ok:
+        return None
+    score = 0.5 + 0.3 * category_hit + 0.2 * brand_hit + 0.1 * (prefs.price_mode != 0)
+    return round(min(score, 1.0), 4)
+
+
+def test_ties_keep_catalog_order():
+    matrix = catalog((10, 'c1', None), (10, 'c1', 'b1'), (10, 'c1', None), (10, 'c1', None), (10, 'c2', None))
+    prefs = UserPreferences(categories=['c1'], brands=['b1'])
+
+    assert matrix.top_k([prefs], 3) == [[(1, 1.0), (0, 0.8), (2, 0.8)]]
+
+
+def test_k_larger_than_catalog_returns_every_candidate():
+    matrix = catalog((10, 'c1', None), (10, 'c2', None), (10, None, 'b1'))
+    prefs = UserPreferences(categories=['c1'], brands=['b1'])
+
+    assert matrix.top_k([prefs], 10) == [[(0, 0.8), (2, 0.7)]]
+
+
+def test_no_candidates():
+    matrix = catalog((10, 'c1', None), (10, 'c2', 'b2'))
+
+    assert matrix.top_k([UserPreferences(categories=['c9']), UserPreferences()], 5) == [[], []]
+    assert matrix.top_k([UserPreferences(categories=['c1'])], 0) == [[]]
+    assert catalog().top_k([UserPreferences(categories=['c1'])], 5) == [[]]
+
+
+def test_price_modes_filter_candidates():
+    matrix = catalog((50, 'c1', None), (100, 'c1', None), (150, 'c1', None))
+    premium = UserPreferences(categories=['c1'], price_sensitivity=0.2, avg_order_value=100)
+    budget = UserPreferences(categories=['c1'], price_sensitivity=0.9, avg_order_value=100)
+
+    assert matrix.top_k([premium, budget], 3) == [[(2, 0.9)], [(0, 0.9)]]
+
+
+def test_matches_per_product_rule_across_batches(monkeypatch):
+    rng = random.Random(3)
+    categories = [f"c{i}" for i in range(6)]
+    brands = [f"b{i}" for i in range(4)]
+    matrix = catalog(*(
+        (rng.choice([5, 20, 60, 150, 400]), rng.choice(categories + [None]), rng.choice(brands + [None]))
+        for _ in range(200)
+    ))
+    users = [
+        UserPreferences(
+            categories=rng.sample(categories, rng.randrange(3)),
+            brands=rng.sample(brands, rng.randrange(2)),
+            price_sensitivity=rng.choice([None, 0.2, 0.6, 0.9]),
+            avg_order_value=rng.choice([None, 50.0, 120.0]),
+        )
+        for _ in range(40)
+    ]
+    # Force several scoring chunks
+    monkeypatch.setattr(recommendation_scorer, 'MAX_BATCH_CELLS', 7 * len(matrix))
+
+    results = matrix.top_k(users, 15)
+
+    for prefs, top in zip(users, results):
+        scored = [
+            (row, score) for row in range(len(matrix))
+            if (score := reference_score(matrix.product(row), prefs)) is not None
+        ]
+        expected = sorted(scored, key=lambda item: (-item[1], item[0]))[:15]
+        assert top == [(row, pytest.approx(score)) for row, score in expected]
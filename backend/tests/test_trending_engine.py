@@ -0,0 +1,115 @@
+"""
+Sliding-window trending scores: forward-decayed deltas and top-k ranking.
+"""
+import math
+
+import numpy as np
+import pytest
+
+from app.features.products.services import trending_engine as trending_module
+from app.features.products.services.trending_engine import (
+    WINDOW_NAMES, WINDOWS, TrendingEngine, TrendingSnapshot, rank_groups, window_for_days
+)
+
+T0 = 1_750_000_000.0
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = {'t': T0}
+    monkeypatch.setattr(trending_module.time, 'time', lambda: now['t'])
+    return now
+
+
+def decayed(events, now):
+    """Reference score per window: every ``(at, weight)`` event decayed to ``now``"""
+    return np.array([sum(weight * math.exp(-(now - at) / tau) for at, weight in events) for tau in WINDOWS.values()])
+
+
+def engine_with_base(ids, categories=None, brands=None, base_scores=None):
+    engine = TrendingEngine()
+    engine._base_ids = list(ids)
+    engine._base_rows = {product_id: i for i, product_id in enumerate(ids)}
+    engine._base_category = categories or [None] * len(ids)
+    engine._base_brand = brands or [None] * len(ids)
+    engine._base_scores = (
+        np.zeros((len(ids), len(WINDOW_NAMES))) if base_scores is None else np.array(base_scores, dtype=np.float64)
+    )
+    return engine
+
+
+def test_recorded_events_decay_per_window(clock):
+    engine = engine_with_base(['a', 'b'])
+    events = [(T0 + 60, 1.0), (T0 + 1800, 2.0), (T0 + 7200, 1.0)]
+    for at, weight in events:
+        engine.record(['a'], weight=weight, at=at)
+    engine.record(['b', None, ''], at=T0 + 10)
+
+    clock['t'] = T0 + 3 * 3600
+    scores = engine._current_scores()
+
+    assert scores[0] == pytest.approx(decayed(events, clock['t']))
+    assert scores[1] == pytest.approx(decayed([(T0 + 10, 1.0)], clock['t']))
+    assert engine.metrics()['events'] == 4
+
+
+def test_rebase_keeps_scores(clock):
+    engine = engine_with_base(['a'])
+    far = T0 + (trending_module.MAX_DECAY_EXPONENT + 1) * WINDOWS['hour']
+    events = [(T0, 1.0), (far, 1.0)]
+    for at, weight in events:
+        engine.record(['a'], weight=weight, at=at)
+
+    clock['t'] = far + 60
+    assert engine._landmark == far
+    assert engine._current_scores()[0] == pytest.approx(decayed(events, clock['t']))
+
+
+def test_current_scores_add_deltas_to_decayed_base(clock):
+    base = [[4.0, 10.0, 20.0, 30.0], [0.0, 0.0, 0.0, 0.0]]
+    engine = engine_with_base(['a', 'b'], base_scores=base)
+    engine._base_at = T0
+    engine._landmark = T0
+    engine.record(['a'], at=T0 + 600)
+    # Deltas for products that are not listed are ignored
+    engine.record(['unlisted'], at=T0 + 600)
+    engine._checkpointing = {'b': [1.0, 1.0, 1.0, 1.0]}
+
+    clock['t'] = T0 + 1200
+    scores = engine._current_scores()
+
+    taus = np.array(list(WINDOWS.values()), dtype=np.float64)
+    assert scores[0] == pytest.approx(np.array(base[0]) * np.exp(-1200 / taus) + decayed([(T0 + 600, 1.0)], T0 + 1200))
+    assert scores[1] == pytest.approx(np.exp(-1200 / taus))
+
+
+def test_rank_groups_ties_k_and_zero_scores():
+    codes = np.array([0, 1, 0, 0, 1, 0, 2])
+    scores = np.array([1.0, 5.0, 3.0, 3.0, 0.0, 2.0, 0.0])
+
+    groups = rank_groups(codes, scores, 2)
+
+    assert sorted(groups) == [0, 1]
+    rows, top_scores = groups[0]
+    assert rows.tolist() == [2, 3] and top_scores.tolist() == [3.0, 3.0]
+    assert groups[1][0].tolist() == [1]
+    assert rank_groups(codes, np.zeros(len(codes)), 3) == {}
+
+
+def test_snapshot_lists_per_category_and_brand():
+    ids = ['a', 'b', 'c', 'd']
+    scores = np.tile(np.array([[4.0], [3.0], [2.0], [1.0]]), (1, len(WINDOW_NAMES)))
+    snapshot = TrendingSnapshot.build(ids, ['c1', 'c1', 'c2', None], ['b1', None, 'b1', 'b1'], scores, k=10)
+
+    assert [product_id for product_id, _ in snapshot.top('day')] == ['a', 'b', 'c', 'd']
+    assert [product_id for product_id, _ in snapshot.top('day', 'category', 'c1')] == ['a', 'b']
+    assert [product_id for product_id, _ in snapshot.top('week', 'brand', 'b1')] == ['a', 'c', 'd']
+    assert snapshot.top('day', 'category', 'missing') == []
+
+
+def test_window_for_days():
+    assert window_for_days(1 / 24) == 'hour'
+    assert window_for_days(1) == 'day'
+    assert window_for_days(7) == 'week'
+    assert window_for_days(30) == 'month'
+    assert window_for_days(365) == 'month'